@@ -1002,7 +1002,8 @@ class DiscoverPatternsPage:
             search_query = st.text_input(
                 "Search patterns", 
                 placeholder="Search by name, description, or xpath...",
-                help="Search across pattern names, descriptions, and xpath expressions"
+                help="Search across pattern names, descriptions, xpath expressions, categories and prompts; "
+                     "words match by prefix and the best matches are listed first"
             )
         
         with col2:
@@ -1016,13 +1017,8 @@ class DiscoverPatternsPage:
         filtered_patterns = default_patterns
         
         if search_query:
-            search_lower = search_query.lower()
-            filtered_patterns = [
-                p for p in filtered_patterns 
-                if (search_lower in p.name.lower() or 
-                    search_lower in (p.description or "").lower() or 
-                    search_lower in (p.xpath or "").lower())
-            ]
+            # Full-text search, ranked by relevance
+            filtered_patterns = self._pattern_manager.default_patterns_manager.search_patterns(search_query)
         
         if filter_category != "All Categories":
             filtered_patterns = [p for p in filtered_patterns if p.category == filter_category]
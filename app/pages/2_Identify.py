@@ -165,8 +165,8 @@ class EnhancedIdentifyPatternsPage:
             
             # Also check shared patterns
             try:
-                from core.database.default_patterns_manager import DefaultPatternsManager
-                default_patterns_manager = DefaultPatternsManager()
+                from core.database.default_patterns_manager import get_default_patterns_manager
+                default_patterns_manager = get_default_patterns_manager()
                 shared_patterns_count = len(default_patterns_manager.get_all_patterns())
             except:
                 shared_patterns_count = 0
@@ -342,8 +342,8 @@ class EnhancedIdentifyPatternsPage:
             extracted_patterns = getattr(st.session_state, 'pattern_responses', {})
             
             # Get shared patterns from default patterns manager
-            from core.database.default_patterns_manager import DefaultPatternsManager
-            default_patterns_manager = DefaultPatternsManager()
+            from core.database.default_patterns_manager import get_default_patterns_manager
+            default_patterns_manager = get_default_patterns_manager()
             shared_patterns = default_patterns_manager.get_all_patterns()
             
             # Get database patterns (user saved patterns)
@@ -528,8 +528,8 @@ class EnhancedIdentifyPatternsPage:
                         versions.add(pattern.api_version)
             
             # Get shared patterns
-            from core.database.default_patterns_manager import DefaultPatternsManager
-            default_patterns_manager = DefaultPatternsManager()
+            from core.database.default_patterns_manager import get_default_patterns_manager
+            default_patterns_manager = get_default_patterns_manager()
             shared_patterns = default_patterns_manager.get_all_patterns()
             
             for pattern in shared_patterns:
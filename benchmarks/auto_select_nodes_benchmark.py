@@ -0,0 +1,159 @@
+"""
+Benchmark of automatic node selection against the previous implementation.
+
+Runs the implementation that PatternManager.auto_select_nodes used before XMLNodeScorer
+(kept here verbatim as the reference, and used by test_node_scorer.py) and the scorer on
+the same documents, checks that both select exactly the same nodes and reports the
+timings.
+By default it uses the LATAM test files, each also scaled up by repeating its children.
+
+Usage:
+    python -m benchmarks.auto_select_nodes_benchmark
+    python -m benchmarks.auto_select_nodes_benchmark path/to/file.xml --repeat 5 --scale 1 200
+"""
+
+import argparse
+import copy
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from lxml import etree
+
+from core.xml_processing.node_scorer import XMLNodeScorer
+
+DEFAULT_DATA_DIR = Path(__file__).resolve().parent.parent / "core" / "config" / "test_data" / "LATAM"
+
+
+def reference_select_nodes(root) -> Dict[str, str]:
+    """The selection as implemented before XMLNodeScorer"""
+    MAX_NODE_SIZE = 5000
+    MIN_NODE_SIZE = 50
+    MAX_NODES_PER_BATCH = 15
+    MAX_RECURSION_DEPTH = 3
+
+    suitable_nodes = {}
+
+    def get_max_depth(node):
+        if len(list(node)) == 0:
+            return 1
+        return 1 + max(get_max_depth(child) for child in node)
+
+    def calculate_node_size(node):
+        xml_string = etree.tostring(node, pretty_print=True, encoding='unicode')
+        char_count = len(xml_string)
+        child_count = len(list(node))
+        depth = get_max_depth(node)
+        attr_count = len(node.attrib)
+        return char_count * 0.4 + child_count * 100 + depth * 50 + attr_count * 10
+
+    def calculate_usefulness_score(node):
+        score = 0
+        if node.text and node.text.strip():
+            score += 50
+        if node.attrib:
+            score += len(node.attrib) * 20
+        child_count = len(list(node))
+        if 1 <= child_count <= 10:
+            score += 30
+        elif child_count > 10:
+            score -= 10
+        if node.tag and not node.tag.lower() in ['root', 'document', 'wrapper']:
+            score += 20
+        return score
+
+    def analyze_node_recursive(node, path="", depth=0):
+        if depth > MAX_RECURSION_DEPTH:
+            return
+        tag = str(node.tag)
+        current_path = f"{path}/{tag}[0]" if not path else f"{path}/{tag}[{len([p for p in suitable_nodes.keys() if p.startswith(f'{path}/{tag}')])}]"
+        node_size = calculate_node_size(node)
+        usefulness = calculate_usefulness_score(node)
+        if MIN_NODE_SIZE <= node_size <= MAX_NODE_SIZE and usefulness >= 30:
+            suitable_nodes[current_path] = etree.tostring(node, pretty_print=True, encoding='unicode')
+        elif node_size > MAX_NODE_SIZE:
+            for child in list(node):
+                analyze_node_recursive(child, current_path, depth + 1)
+        else:
+            children = list(node)
+            if children and depth < MAX_RECURSION_DEPTH - 1:
+                for child in children[:5]:
+                    analyze_node_recursive(child, current_path, depth + 1)
+
+    analyze_node_recursive(root)
+
+    if len(suitable_nodes) > MAX_NODES_PER_BATCH:
+        scored_nodes = []
+        for path, xml_content in suitable_nodes.items():
+            try:
+                temp_node = etree.fromstring(xml_content)
+                scored_nodes.append((path, xml_content, calculate_usefulness_score(temp_node)))
+            except Exception:
+                scored_nodes.append((path, xml_content, 0))
+        scored_nodes.sort(key=lambda x: x[2], reverse=True)
+        suitable_nodes = {path: content for path, content, score in scored_nodes[:MAX_NODES_PER_BATCH]}
+
+    return suitable_nodes
+
+
+def scorer_select_nodes(root) -> Dict[str, str]:
+    return XMLNodeScorer(root).select_nodes()
+
+
+def scale_document(root, factor: int):
+    """Copy of the document with the root's children repeated factor times"""
+    if factor <= 1:
+        return root
+    scaled = copy.deepcopy(root)
+    children = list(scaled)
+    for _ in range(factor - 1):
+        for child in children:
+            scaled.append(copy.deepcopy(child))
+    return scaled
+
+
+def best_time(function: Callable, root, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(root)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def run(files: List[Path], scales: List[int], repeat: int) -> int:
+    mismatches = 0
+    print(f"{'file':<44} {'scale':>5} {'elements':>9} {'reference ms':>13} {'scorer ms':>11} {'speedup':>8}")
+    for path in files:
+        try:
+            root = etree.parse(str(path)).getroot()
+        except etree.XMLSyntaxError as e:
+            print(f"{path.name:<44} skipped: {e}")
+            continue
+        for factor in scales:
+            document = scale_document(root, factor)
+            if reference_select_nodes(document) != scorer_select_nodes(document):
+                mismatches += 1
+                print(f"{path.name:<44} {factor:>5} selections differ")
+                continue
+            reference = best_time(reference_select_nodes, document, repeat)
+            scorer = best_time(scorer_select_nodes, document, repeat)
+            elements = sum(1 for _ in document.iter())
+            print(f"{path.name[:44]:<44} {factor:>5} {elements:>9} {reference * 1000:>13.2f} "
+                  f"{scorer * 1000:>11.2f} {reference / scorer:>7.1f}x")
+    return 1 if mismatches else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("files", nargs="*", type=Path, help=f"XML files (default: {DEFAULT_DATA_DIR})")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement; the best is reported")
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10, 50], help="Document scale factors")
+    args = parser.parse_args(argv)
+    files = args.files or sorted(DEFAULT_DATA_DIR.rglob("*.xml"))
+    return run(files, args.scale, args.repeat)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
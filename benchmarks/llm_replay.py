@@ -0,0 +1,221 @@
+"""
+End-to-end discovery and identification runs against the mock OpenAI server.
+
+mock_llm_environment points a model configuration ({MODEL}_AZURE_OPENAI_ENDPOINT and the
+related variables) at a MockOpenAIServer and disables the LLM response cache, so every
+LLMAgent, Hive and manager created inside it talks to the mock exactly as it would to
+Azure. The identify and extract commands run PatternIdentifyManager.verify_and_confirm_airline
+and PatternManager.generate_airline_focused_patterns headless over XML files and report
+throughput, per-file latency percentiles (for extract also the time to the first streamed
+pattern) and the requests the server saw.
+
+Record the store once against a real endpoint, then replay it in CI without network access:
+
+    python -m benchmarks.llm_replay identify captures/ --workspace demo --store llm.jsonl \\
+        --record --upstream https://my-resource.openai.azure.com --upstream-key $GPT4O_AZURE_OPENAI_KEY
+    python -m benchmarks.llm_replay identify captures/ --workspace demo --store llm.jsonl --latency lognormal:800,0.4
+    python -m benchmarks.llm_replay extract core/config/test_data/LATAM --store llm.jsonl --throttle-every 10
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from core.common.constants import GPT_4O
+from core.common.logging_manager import get_logger
+from benchmarks.mock_openai_server import (
+    DEFAULT_FALLBACK_CONTENT, DEFAULT_RETRY_AFTER_MS, LatencyModel, MockOpenAIServer, ReplayStore, ThrottlePolicy
+)
+
+logger = get_logger(__name__)
+
+DEFAULT_DEPLOYMENT = "gpt-4o"
+DEFAULT_API_VERSION = "2024-08-01-preview"
+DEFAULT_DATA_DIR = Path(__file__).resolve().parent.parent / "core" / "config" / "test_data" / "LATAM"
+
+
+@contextmanager
+def mock_llm_environment(server_url: str, model_name: str = GPT_4O, deployment: str = DEFAULT_DEPLOYMENT,
+                         api_version: str = DEFAULT_API_VERSION, api_key: str = "mock-key") -> Iterator[None]:
+    """Route a model configuration to server_url for the duration of the block"""
+    settings = {
+        f"{model_name}_AZURE_OPENAI_ENDPOINT": server_url,
+        f"{model_name}_AZURE_OPENAI_KEY": api_key,
+        f"{model_name}_AZURE_API_VERSION": api_version,
+        f"{model_name}_MODEL_DEPLOYMENT_NAME": deployment,
+        # Cached responses would hide the calls being measured
+        "LLM_RESPONSE_CACHE_ENABLED": "false",
+    }
+    previous = {name: os.environ.get(name) for name in settings}
+    os.environ.update(settings)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        from core.llm.client_registry import get_client_registry
+        get_client_registry().close()
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def latency_summary(latencies: List[float], elapsed: float) -> Dict:
+    return {
+        "runs": len(latencies),
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_per_second": round(len(latencies) / elapsed, 3) if elapsed > 0 else 0.0,
+        "latency_mean_seconds": round(statistics.fmean(latencies), 3) if latencies else 0.0,
+        "latency_p50_seconds": round(_percentile(latencies, 0.5), 3),
+        "latency_p95_seconds": round(_percentile(latencies, 0.95), 3),
+    }
+
+
+def replay_identification(db_utils, files: List[Path], model_name: str = GPT_4O, workers: int = 4,
+                          max_concurrency: Optional[int] = None, batch_patterns: Optional[bool] = None) -> Dict:
+    """Identify every file with a headless PatternIdentifyManager; returns the run summary"""
+    from core.assisted_discovery.batch_identify import run_batch
+    from core.assisted_discovery.identify_pattern_manager import PatternIdentifyManager
+
+    manager = PatternIdentifyManager(model_name, db_utils, headless=True)
+    output = io.StringIO()
+    started = time.perf_counter()
+    summary = run_batch(manager, files, output, workers, None, max_concurrency, batch_patterns)
+    elapsed = time.perf_counter() - started
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    summary.update(latency_summary([record["latency_seconds"] for record in records], elapsed))
+    return summary
+
+
+def replay_extraction(files: List[Path], model_name: str = GPT_4O, max_concurrency: Optional[int] = None,
+                      stream: bool = True) -> Dict:
+    """
+    Extract airline-focused patterns from the auto-selected nodes of every file; returns the run summary.
+    With stream (as on the Discovery page) the summary also has the time to the first pattern of each file.
+    """
+    from lxml import etree
+    from core.assisted_discovery.pattern_manager import PatternManager
+    from core.xml_processing.node_scorer import XMLNodeScorer
+
+    manager = PatternManager(model_name, headless=True)
+    latencies = []
+    first_pattern_latencies = []
+    summary = {"files": len(files), "errors": 0, "patterns": 0}
+    started = time.perf_counter()
+    for path in files:
+        file_started = time.perf_counter()
+        first_pattern = []
+
+        def on_pattern(entry):
+            if not first_pattern:
+                first_pattern.append(time.perf_counter() - file_started)
+
+        try:
+            nodes = XMLNodeScorer(etree.parse(str(path)).getroot()).select_nodes()
+            response = manager.generate_airline_focused_patterns(
+                nodes, max_concurrency=max_concurrency, on_pattern=on_pattern if stream else None
+            )
+        except Exception as e:
+            logger.error(f"Extraction failed for {path}: {e}")
+            response = None
+        latencies.append(time.perf_counter() - file_started)
+        first_pattern_latencies.extend(first_pattern)
+        if response is None:
+            summary["errors"] += 1
+        else:
+            summary["patterns"] += len(response.get("patterns") or [])
+    summary.update(latency_summary(latencies, time.perf_counter() - started))
+    if stream:
+        summary["first_pattern_p50_seconds"] = round(_percentile(first_pattern_latencies, 0.5), 3)
+        summary["first_pattern_p95_seconds"] = round(_percentile(first_pattern_latencies, 0.95), 3)
+    return summary
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.llm_replay",
+        description="Benchmark identification or pattern extraction against the mock OpenAI server."
+    )
+    parser.add_argument("pipeline", choices=("identify", "extract"))
+    parser.add_argument("inputs", nargs="*", help=f"XML files, directories or globs (default: {DEFAULT_DATA_DIR})")
+    parser.add_argument("--store", required=True, help="Replay store (JSON lines) of recorded completions")
+    parser.add_argument("--workspace", help="Discovery workspace whose patterns are identified (identify only)")
+    parser.add_argument("--model", default=GPT_4O, help=f"Model configuration prefix (default: {GPT_4O})")
+    parser.add_argument("--deployment", default=DEFAULT_DEPLOYMENT)
+    parser.add_argument("--workers", type=int, default=4, help="Files identified in parallel (identify only)")
+    parser.add_argument("--max-concurrency", type=int, default=None, help="In-flight LLM calls per file")
+    parser.add_argument("--no-stream", action="store_true", help="Extract without streaming (extract only)")
+    parser.add_argument("--latency", default="recorded", help="Latency spec (see benchmarks.mock_openai_server)")
+    parser.add_argument("--per-token-ms", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-every", type=int, default=0)
+    parser.add_argument("--retry-after-ms", type=int, default=DEFAULT_RETRY_AFTER_MS)
+    parser.add_argument("--on-miss", choices=("error", "fallback"), default="error")
+    parser.add_argument("--fallback-content", default=DEFAULT_FALLBACK_CONTENT)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--record", action="store_true", help="Record from --upstream instead of replaying")
+    parser.add_argument("--upstream")
+    parser.add_argument("--upstream-key")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_arg_parser().parse_args(argv)
+    if args.record and not args.upstream:
+        print("error: --record requires --upstream", file=sys.stderr)
+        return 2
+
+    from core.assisted_discovery.batch_identify import collect_xml_files
+    files = collect_xml_files(args.inputs or [str(DEFAULT_DATA_DIR)])
+    if not files:
+        print("error: no XML files matched the given inputs", file=sys.stderr)
+        return 2
+
+    db_utils = None
+    if args.pipeline == "identify":
+        if not args.workspace:
+            print("error: identify requires --workspace", file=sys.stderr)
+            return 2
+        from core.common.usecase_manager import UseCaseManager
+        db_utils = UseCaseManager().get_db_utils_for_use_case(args.workspace)
+        if db_utils is None:
+            print(f"error: workspace '{args.workspace}' not found or its database could not be opened", file=sys.stderr)
+            return 2
+
+    rng = random.Random(args.seed)
+    server = MockOpenAIServer(
+        ReplayStore(args.store),
+        latency=LatencyModel(args.latency, args.per_token_ms, rng),
+        throttle=ThrottlePolicy(args.throttle_rate, args.throttle_every, args.retry_after_ms, rng),
+        on_miss=args.on_miss, fallback_content=args.fallback_content,
+        upstream=args.upstream if args.record else None, upstream_key=args.upstream_key,
+    )
+    with server, mock_llm_environment(server.url, args.model, args.deployment):
+        if args.pipeline == "identify":
+            summary = replay_identification(db_utils, files, args.model, args.workers, args.max_concurrency)
+        else:
+            summary = replay_extraction(files, args.model, args.max_concurrency, not args.no_stream)
+        summary["server"] = server.stats()
+
+    print(json.dumps(summary, indent=2))
+    misses = summary["server"].get("misses", 0) if args.on_miss == "error" else 0
+    return 1 if summary["errors"] or misses else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
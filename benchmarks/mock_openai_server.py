@@ -0,0 +1,511 @@
+"""
+Local stand-in for Azure OpenAI chat completions, for offline end-to-end benchmarks.
+
+The server answers chat completion requests from a replay store of recorded responses,
+keyed by a hash of the request (deployment, messages, tools and sampling parameters), so
+LLMAgent, Hive and the discovery and identification managers run unchanged against it
+with no network access. Both the Azure route
+(/openai/deployments/{deployment}/chat/completions) and the OpenAI route
+(/v1/chat/completions) are served, with or without streaming.
+
+Each response can be delayed by a latency model (fixed, uniform, normal, lognormal or the
+recorded latency, plus an optional per-completion-token time), requests can be throttled
+with 429s carrying retry-after headers, and usage is reported from the recording or
+counted with the model's tokenizer. All randomness comes from one seeded generator.
+
+In record mode every request is forwarded to a real endpoint, and the response and its
+latency are appended to the store.
+
+Usage:
+    python -m benchmarks.mock_openai_server --store recordings.jsonl --port 8089
+    python -m benchmarks.mock_openai_server --store recordings.jsonl --latency lognormal:800,0.4 --throttle-rate 0.05
+    python -m benchmarks.mock_openai_server --store recordings.jsonl --record \\
+        --upstream https://my-resource.openai.azure.com --upstream-key $GPT4O_AZURE_OPENAI_KEY
+
+Point a model configuration at it with {MODEL}_AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8089
+(see benchmarks.llm_replay.mock_llm_environment).
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from core.common.logging_manager import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8089
+DEFAULT_RETRY_AFTER_MS = 1000
+DEFAULT_FALLBACK_CONTENT = "{}"
+# Request fields that do not change the completion, so streamed and plain calls share recordings
+UNKEYED_FIELDS = {"stream", "stream_options", "user"}
+
+_AZURE_ROUTE = re.compile(r"^/openai/deployments/(?P<deployment>[^/]+)/chat/completions$")
+_OPENAI_ROUTE = re.compile(r"^(/v1)?/chat/completions$")
+
+
+def request_key(deployment: str, body: Dict) -> str:
+    """Hash identifying a chat completion request in the replay store"""
+    keyed = {name: value for name, value in body.items() if name not in UNKEYED_FIELDS and value is not None}
+    keyed["model"] = deployment or body.get("model")
+    canonical = json.dumps(keyed, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class Recording:
+    """A recorded completion: the assistant message, usage and how long the endpoint took"""
+    key: str
+    model: str
+    message: Dict
+    finish_reason: str = "stop"
+    usage: Optional[Dict] = None
+    latency_ms: Optional[float] = None
+
+    def to_json(self) -> str:
+        return json.dumps(self.__dict__, ensure_ascii=False)
+
+    @classmethod
+    def from_response(cls, key: str, response: Dict, latency_ms: float) -> "Recording":
+        choice = response["choices"][0]
+        message = {k: v for k, v in choice["message"].items() if k in ("role", "content", "tool_calls") and v is not None}
+        return cls(key, response.get("model", ""), message, choice.get("finish_reason") or "stop",
+                   response.get("usage"), round(latency_ms, 1))
+
+
+class ReplayStore:
+    """Recorded completions in a JSON lines file, the latest recording of a key winning"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path) if path else None
+        self._recordings: Dict[str, Recording] = {}
+        self._lock = threading.Lock()
+        if self.path and self.path.exists():
+            with self.path.open(encoding="utf-8") as f:
+                for line_number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        recording = Recording(**json.loads(line))
+                    except (TypeError, ValueError) as e:
+                        logger.warning(f"Skipping invalid recording at {self.path}:{line_number}: {e}")
+                        continue
+                    self._recordings[recording.key] = recording
+            logger.info(f"Loaded {len(self._recordings)} recording(s) from {self.path}")
+
+    def __len__(self):
+        return len(self._recordings)
+
+    def get(self, key: str) -> Optional[Recording]:
+        return self._recordings.get(key)
+
+    def add(self, recording: Recording):
+        with self._lock:
+            self._recordings[recording.key] = recording
+            if self.path:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with self.path.open("a", encoding="utf-8") as f:
+                    f.write(recording.to_json() + "\n")
+
+
+class LatencyModel:
+    """
+    Response delay drawn from a distribution, given as a spec string:
+
+        none | fixed:MS | uniform:LO,HI | normal:MEAN,STD | lognormal:MEDIAN,SIGMA | recorded[:SCALE]
+
+    recorded replays the latency captured with each response (scaled, 0 when unknown).
+    per_token_ms adds generation time for each completion token; streamed responses spend it
+    between their chunks instead of before the first one.
+    """
+
+    def __init__(self, spec: str = "none", per_token_ms: float = 0.0, rng: Optional[random.Random] = None):
+        self.spec = spec
+        self.per_token_ms = per_token_ms
+        self.rng = rng or random.Random()
+        kind, _, args = spec.partition(":")
+        self.kind = kind.strip().lower()
+        try:
+            self.args = [float(a) for a in args.split(",")] if args else []
+        except ValueError:
+            raise ValueError(f"Invalid latency spec: {spec}")
+        expected = {"none": 0, "fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "recorded": (0, 1)}.get(self.kind)
+        if expected is None or len(self.args) not in (expected if isinstance(expected, tuple) else (expected,)):
+            raise ValueError(f"Invalid latency spec: {spec}")
+
+    def sample_ms(self, recorded_ms: Optional[float] = None, completion_tokens: int = 0) -> float:
+        if self.kind == "fixed":
+            delay = self.args[0]
+        elif self.kind == "uniform":
+            delay = self.rng.uniform(*self.args)
+        elif self.kind == "normal":
+            delay = self.rng.gauss(*self.args)
+        elif self.kind == "lognormal":
+            median, sigma = self.args
+            delay = self.rng.lognormvariate(math.log(max(median, 1e-3)), sigma)
+        elif self.kind == "recorded":
+            delay = (recorded_ms or 0.0) * (self.args[0] if self.args else 1.0)
+        else:
+            delay = 0.0
+        return max(0.0, delay + self.per_token_ms * completion_tokens)
+
+
+class ThrottlePolicy:
+    """Decides which requests get a 429: a random fraction and/or every Nth request"""
+
+    def __init__(self, rate: float = 0.0, every: int = 0, retry_after_ms: int = DEFAULT_RETRY_AFTER_MS,
+                 rng: Optional[random.Random] = None):
+        self.rate = rate
+        self.every = every
+        self.retry_after_ms = retry_after_ms
+        self.rng = rng or random.Random()
+
+    def should_throttle(self, request_number: int) -> bool:
+        if self.every and request_number % self.every == 0:
+            return True
+        return self.rate > 0 and self.rng.random() < self.rate
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "MockOpenAI/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s" % (self.address_string(), format % args))
+
+    def _send_json(self, status: int, payload: Dict, headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status: int, code: str, message: str, headers: Optional[Dict[str, str]] = None):
+        self._send_json(status, {"error": {"code": code, "message": message}}, headers)
+
+    def do_GET(self):
+        if self.path.split("?")[0] == "/stats":
+            self._send_json(200, self.server.mock.stats())
+        else:
+            self._send_error(404, "NotFound", f"No route for GET {self.path}")
+
+    def do_POST(self):
+        route = self.path.split("?")[0]
+        match = _AZURE_ROUTE.match(route) or _OPENAI_ROUTE.match(route)
+        length = int(self.headers.get("Content-Length") or 0)
+        raw_body = self.rfile.read(length) if length else b""
+        if not match:
+            self._send_error(404, "NotFound", f"No route for POST {self.path}")
+            return
+        try:
+            body = json.loads(raw_body or b"{}")
+        except ValueError:
+            self._send_error(400, "InvalidRequest", "Request body is not valid JSON")
+            return
+        deployment = match.groupdict().get("deployment") or body.get("model", "")
+        self.server.mock.handle_completion(self, deployment, body, raw_body)
+
+
+class MockOpenAIServer:
+    """
+    OpenAI-compatible chat completion server replaying a ReplayStore on a background thread.
+
+    Use as a context manager, or call start() and stop(). url is the endpoint to configure
+    as {MODEL}_AZURE_OPENAI_ENDPOINT.
+    """
+
+    def __init__(self, store: ReplayStore, host: str = DEFAULT_HOST, port: int = 0,
+                 latency: Optional[LatencyModel] = None, throttle: Optional[ThrottlePolicy] = None,
+                 on_miss: str = "error", fallback_content: str = DEFAULT_FALLBACK_CONTENT,
+                 upstream: Optional[str] = None, upstream_key: Optional[str] = None,
+                 upstream_api_version: Optional[str] = None, seed: Optional[int] = None):
+        if on_miss not in ("error", "fallback"):
+            raise ValueError(f"on_miss must be 'error' or 'fallback', not {on_miss!r}")
+        rng = random.Random(seed)
+        self.store = store
+        self.latency = latency or LatencyModel(rng=rng)
+        self.throttle = throttle or ThrottlePolicy(rng=rng)
+        self.on_miss = on_miss
+        self.fallback_content = fallback_content
+        self.upstream = upstream.rstrip("/") if upstream else None
+        self.upstream_key = upstream_key
+        self.upstream_api_version = upstream_api_version
+        self._counters = Counter()
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.mock = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def recording(self) -> bool:
+        return self.upstream is not None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockOpenAIServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-openai", daemon=True)
+        self._thread.start()
+        logger.info(f"Mock OpenAI server listening on {self.url} ({len(self.store)} recordings, "
+                    f"{'recording from ' + self.upstream if self.recording else 'replay'})")
+        return self
+
+    def stop(self):
+        if self._thread:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _count(self, name: str, amount: int = 1) -> int:
+        with self._lock:
+            self._counters[name] += amount
+            return self._counters[name]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+    def reset_stats(self):
+        with self._lock:
+            self._counters.clear()
+
+    def handle_completion(self, handler: _Handler, deployment: str, body: Dict, raw_body: bytes):
+        request_number = self._count("requests")
+        if self.throttle.should_throttle(request_number):
+            self._count("throttled")
+            retry_after_ms = self.throttle.retry_after_ms
+            handler._send_error(429, "429", "Rate limit is exceeded (injected by the mock server).", {
+                "retry-after-ms": str(retry_after_ms),
+                "retry-after": str(max(1, math.ceil(retry_after_ms / 1000))),
+            })
+            return
+
+        key = request_key(deployment, body)
+        recording = self.store.get(key)
+        if recording is not None:
+            self._count("hits")
+        elif self.recording:
+            recording, error = self._record(handler, deployment, body, raw_body, key)
+            if recording is None:
+                self._count("upstream_errors")
+                handler._send_json(*error)
+                return
+            self._count("recorded")
+        elif self.on_miss == "fallback":
+            self._count("misses")
+            recording = Recording(key, deployment, {"role": "assistant", "content": self.fallback_content})
+        else:
+            self._count("misses")
+            handler._send_error(404, "RecordingNotFound", f"No recording for request {key[:12]} to {deployment}")
+            return
+
+        usage = recording.usage or self._count_usage(deployment, body, recording.message)
+        streamed = bool(body.get("stream"))
+        generation_ms = 0.0
+        if not self.recording:
+            completion_tokens = usage.get("completion_tokens", 0)
+            if streamed:
+                # Streams send the first chunk after the base latency and generate the rest while sending
+                generation_ms = self.latency.per_token_ms * completion_tokens
+                completion_tokens = 0
+            delay_ms = self.latency.sample_ms(recording.latency_ms, completion_tokens)
+            if delay_ms:
+                time.sleep(delay_ms / 1000)
+        self._count("prompt_tokens", usage.get("prompt_tokens", 0))
+        self._count("completion_tokens", usage.get("completion_tokens", 0))
+        if streamed:
+            self._send_stream(handler, recording, usage, bool((body.get("stream_options") or {}).get("include_usage")),
+                              generation_ms)
+        else:
+            handler._send_json(200, self._completion(recording, usage))
+
+    @staticmethod
+    def _count_usage(deployment: str, body: Dict, message: Dict) -> Dict[str, int]:
+        from core.llm.token_counter import get_token_counter
+        counter = get_token_counter(deployment)
+        completion = message.get("content") or json.dumps(message.get("tool_calls") or [])
+        prompt_tokens = counter.count_messages([
+            {"content": m.get("content") if isinstance(m.get("content"), str) else json.dumps(m.get("content"))}
+            for m in body.get("messages", [])
+        ])
+        completion_tokens = counter.count(completion)
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+    @staticmethod
+    def _completion(recording: Recording, usage: Dict) -> Dict:
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": recording.model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": None, **recording.message},
+                "finish_reason": recording.finish_reason,
+            }],
+            "usage": usage,
+        }
+
+    @staticmethod
+    def _send_stream(handler: _Handler, recording: Recording, usage: Dict, include_usage: bool,
+                     generation_ms: float = 0.0):
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+
+        def chunk(delta, finish_reason=None, chunk_usage=None):
+            choices = [] if delta is None else [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            payload = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                       "model": recording.model, "choices": choices}
+            if chunk_usage is not None:
+                payload["usage"] = chunk_usage
+            return f"data: {json.dumps(payload)}\n\n".encode("utf-8")
+
+        events = [chunk({"role": "assistant", "content": ""})]
+        content = recording.message.get("content") or ""
+        # Word-sized pieces, so consumers see the content arrive incrementally
+        pieces = re.findall(r"\S+\s*|\s+", content)
+        for piece in pieces:
+            events.append(chunk({"content": piece}))
+        piece_delay = generation_ms / 1000 / len(pieces) if pieces else 0.0
+        for index, tool_call in enumerate(recording.message.get("tool_calls") or []):
+            events.append(chunk({"tool_calls": [{"index": index, **tool_call}]}))
+        events.append(chunk({}, recording.finish_reason))
+        if include_usage:
+            events.append(chunk(None, chunk_usage=usage))
+        events.append(b"data: [DONE]\n\n")
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Cache-Control", "no-cache")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+        handler.close_connection = True
+        for index, event in enumerate(events):
+            if piece_delay and 1 <= index <= len(pieces):
+                handler.wfile.flush()
+                time.sleep(piece_delay)
+            handler.wfile.write(event)
+        handler.wfile.flush()
+
+    def _record(self, handler: _Handler, deployment: str, body: Dict, raw_body: bytes,
+                key: str) -> Tuple[Optional[Recording], Optional[tuple]]:
+        """Forward a request upstream without streaming; returns (recording, None) or (None, error response)"""
+        upstream_body = {name: value for name, value in body.items() if name not in ("stream", "stream_options")}
+        route = handler.path.split("?")[0]
+        query = handler.path.partition("?")[2]
+        if self.upstream_api_version:
+            query = f"api-version={self.upstream_api_version}"
+        request = urllib.request.Request(
+            f"{self.upstream}{route}" + (f"?{query}" if query else ""),
+            data=json.dumps(upstream_body).encode("utf-8"),
+            headers={
+                "Content-Type": "application/json",
+                "api-key": self.upstream_key or handler.headers.get("api-key", ""),
+                "Authorization": f"Bearer {self.upstream_key}" if self.upstream_key else handler.headers.get("Authorization", ""),
+            },
+            method="POST",
+        )
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=600) as response:
+                payload = json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            # Upstream errors (including its own 429s) are relayed and not recorded
+            headers = {name: e.headers[name] for name in ("retry-after", "retry-after-ms") if e.headers.get(name)}
+            try:
+                error_payload = json.loads(e.read())
+            except ValueError:
+                error_payload = {"error": {"code": str(e.code), "message": str(e)}}
+            return None, (e.code, error_payload, headers)
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            logger.error(f"Upstream request to {self.upstream} failed: {e}")
+            return None, (502, {"error": {"code": "UpstreamError", "message": str(e)}})
+        recording = Recording.from_response(key, payload, (time.perf_counter() - started) * 1000)
+        self.store.add(recording)
+        return recording, None
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.mock_openai_server",
+        description="Serve recorded Azure OpenAI chat completions locally, or record them from a real endpoint."
+    )
+    parser.add_argument("--store", required=True, help="JSON lines replay store (appended to in record mode)")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", default="none",
+                        help="none | fixed:MS | uniform:LO,HI | normal:MEAN,STD | lognormal:MEDIAN,SIGMA | recorded[:SCALE]")
+    parser.add_argument("--per-token-ms", type=float, default=0.0, help="Extra latency per completion token")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--throttle-every", type=int, default=0, help="Answer every Nth request with 429")
+    parser.add_argument("--retry-after-ms", type=int, default=DEFAULT_RETRY_AFTER_MS, help="retry-after sent with injected 429s")
+    parser.add_argument("--on-miss", choices=("error", "fallback"), default="error",
+                        help="Unrecorded requests get a 404 (error) or --fallback-content (fallback)")
+    parser.add_argument("--fallback-content", default=DEFAULT_FALLBACK_CONTENT)
+    parser.add_argument("--seed", type=int, default=None, help="Seed for latency and throttling")
+    parser.add_argument("--record", action="store_true", help="Forward requests to --upstream and record the responses")
+    parser.add_argument("--upstream", help="Real endpoint to record from, e.g. https://my-resource.openai.azure.com")
+    parser.add_argument("--upstream-key", help="API key for the upstream endpoint (default: the caller's key)")
+    parser.add_argument("--upstream-api-version", help="Override the api-version sent upstream")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_arg_parser().parse_args(argv)
+    if args.record and not args.upstream:
+        print("error: --record requires --upstream", file=sys.stderr)
+        return 2
+    rng = random.Random(args.seed)
+    server = MockOpenAIServer(
+        ReplayStore(args.store), args.host, args.port,
+        latency=LatencyModel(args.latency, args.per_token_ms, rng),
+        throttle=ThrottlePolicy(args.throttle_rate, args.throttle_every, args.retry_after_ms, rng),
+        on_miss=args.on_miss, fallback_content=args.fallback_content,
+        upstream=args.upstream if args.record else None, upstream_key=args.upstream_key,
+        upstream_api_version=args.upstream_api_version,
+    )
+    print(f"Mock OpenAI server on {server.url}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        print(json.dumps(server.stats()), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
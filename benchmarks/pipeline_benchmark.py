@@ -0,0 +1,443 @@
+"""
+Benchmark suite for the discovery and identification hot paths.
+
+Times the functions the Discover and Identify pages spend their time in, on the LATAM
+test files and on synthetic OrderViewRS payloads scaled up to the requested sizes:
+
+    auto_select_nodes           PatternManager.auto_select_nodes
+    xml_to_tree                 XMLTreeHelper.xml_to_tree
+    list_main_elements          SQLDatabaseUtils.list_main_elements
+    analyze_relationships       IntelligentPatternMatcher.analyze_relationships (fresh matcher)
+    verify_and_confirm_airline  a full headless PatternIdentifyManager run against the mock LLM
+    get_all_patterns_cold       SQLDatabaseUtils.get_all_patterns after the catalog cache is invalidated
+    get_all_patterns_warm       SQLDatabaseUtils.get_all_patterns served from the catalog cache
+    filter_patterns             AirlinePatternClassifier.filter_patterns over the workspace patterns
+
+The workspace cases run on a temporary workspace seeded with --patterns patterns, and
+verify_and_confirm_airline also reads a temporary default patterns database seeded with
+SHARED_PATTERNS shared patterns for the filtered airline, leaving the one under
+core/database/data untouched. LLM calls
+go to a MockOpenAIServer answering every verification with a fixed confirmation (or from
+--llm-store recordings), with no added latency unless --llm-latency is given, so the
+timings measure the application's own overhead.
+
+Every run is appended to a JSON lines history (benchmarks/results/history.jsonl by
+default) with the commit it ran on, and each timing is compared with the latest earlier
+run of the same case and input.
+
+Usage:
+    python -m benchmarks.pipeline_benchmark
+    python -m benchmarks.pipeline_benchmark --sizes-mb 1 10 50 --repeat 5
+    python -m benchmarks.pipeline_benchmark --cases list_main_elements xml_to_tree --no-latam
+    python -m benchmarks.pipeline_benchmark --fail-on-regression --threshold 0.25
+"""
+
+import argparse
+import copy
+import io
+import json
+import math
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from lxml import etree
+
+from benchmarks.llm_replay import mock_llm_environment
+from benchmarks.mock_openai_server import LatencyModel, MockOpenAIServer, ReplayStore
+from core.common.constants import GPT_4O
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_DATA_DIR = ROOT_DIR / "core" / "config" / "test_data" / "LATAM"
+DEFAULT_TEMPLATE = DEFAULT_DATA_DIR / "OVRS_Singapore_Airlines_21_3.xml"
+DEFAULT_HISTORY = Path(__file__).resolve().parent / "results" / "history.jsonl"
+SCHEMA_FILE = ROOT_DIR / "core" / "database" / "data" / "API table.sql"
+
+DEFAULT_SIZES_MB = [1, 10, 50]
+DEFAULT_PATTERNS = 2000
+DEFAULT_REPEAT = 3
+DEFAULT_REGRESSION_THRESHOLD = 0.2
+# Slowdowns smaller than this are timer noise, whatever their relative size
+MIN_REGRESSION_SECONDS = 0.001
+BENCHMARK_AIRLINES = ["SQ", "LA", "AF", "KL", "BA", "IB", "QF", "VY", "LH", "EK", "TK", "AA"]
+BENCHMARK_VERSIONS = ["17.2", "18.1", "19.2", "21.3"]
+# Airline and version whose patterns verify_and_confirm_airline checks (the Identify page filter)
+VERIFY_FILTER = {"airlines": ["SQ"], "versions": ["21.3"]}
+# Shared patterns of the filter's airline and version in the temporary default patterns database
+SHARED_PATTERNS = 20
+MOCK_CONFIRMATION = json.dumps({"confirmation": "YES", "reason": "Pattern found (benchmark mock response)"})
+
+
+class BenchmarkInput(NamedTuple):
+    """A document (or, for workspace cases, the workspace) a case is timed on"""
+    name: str
+    xml_bytes: bytes = b""
+
+    @property
+    def size(self) -> int:
+        return len(self.xml_bytes)
+
+
+class BenchmarkCase(NamedTuple):
+    """
+    A timed operation. setup(context, input) prepares the argument outside the timing and
+    run(argument) is what is timed.
+    """
+    name: str
+    setup: Callable[["BenchmarkContext", BenchmarkInput], Any]
+    run: Callable[[Any], Any]
+    per_document: bool = True
+
+
+class BenchmarkContext(NamedTuple):
+    db_utils: Any
+    workspace_patterns: List[Dict[str, str]]
+    model_name: str
+    default_patterns_manager: Any = None
+
+
+def _local_name(element) -> str:
+    return etree.QName(element).localname
+
+
+def _list_elements(root) -> List:
+    """Outermost elements holding two or more children of one tag (PaxList, OrderItem lists, ...)"""
+    lists = []
+    for element in root.iter(etree.Element):
+        children = [child for child in element if isinstance(child.tag, str)]
+        if len(children) >= 2 and len({child.tag for child in children}) == 1:
+            if not any(ancestor in lists for ancestor in element.iterancestors()):
+                lists.append(element)
+    return lists
+
+
+def synthetic_document(template: bytes, target_bytes: int) -> bytes:
+    """
+    A document of about target_bytes made from the template by repeating the records of
+    its lists, so the structure stays that of a real (much longer) response.
+    """
+    root = etree.fromstring(template)
+    lists = [(element, [child for child in element if isinstance(child.tag, str)]) for element in (_list_elements(root) or [root])]
+
+    def repeat_records(times):
+        for element, records in lists:
+            for _ in range(times):
+                for record in records:
+                    element.append(copy.deepcopy(record))
+
+    # Grow by one copy to measure the serialized size of a copy of every list's records
+    base_size = len(etree.tostring(root, xml_declaration=True, encoding="UTF-8"))
+    repeat_records(1)
+    copy_size = len(etree.tostring(root, xml_declaration=True, encoding="UTF-8")) - base_size
+    repeat_records(max(0, math.ceil((target_bytes - base_size) / max(1, copy_size)) - 1))
+    return etree.tostring(root, xml_declaration=True, encoding="UTF-8")
+
+
+def load_inputs(data_dir: Optional[Path], template: Path, sizes_mb: List[float]) -> List[BenchmarkInput]:
+    inputs = []
+    if data_dir:
+        for path in sorted(data_dir.rglob("*.xml")):
+            xml_bytes = path.read_bytes()
+            try:
+                etree.fromstring(xml_bytes)
+            except etree.XMLSyntaxError as e:
+                print(f"skipping {path.relative_to(data_dir)}: {e}", file=sys.stderr)
+                continue
+            inputs.append(BenchmarkInput(str(path.relative_to(data_dir)), xml_bytes))
+    template_bytes = template.read_bytes()
+    for size_mb in sizes_mb:
+        inputs.append(BenchmarkInput(f"synthetic_{size_mb:g}MB", synthetic_document(template_bytes, int(size_mb * 1024 * 1024))))
+    return inputs
+
+
+def section_paths(root) -> List[str]:
+    """Distinct paths of the document's elements, absolute and as every shorter suffix"""
+    paths = {}
+    for element in root.iter(etree.Element):
+        steps = [_local_name(ancestor) for ancestor in reversed(list(element.iterancestors()))] + [_local_name(element)]
+        paths.setdefault("/" + "/".join(steps), None)
+        for start in range(1, len(steps)):
+            paths.setdefault("/".join(steps[start:]), None)
+        paths.setdefault("//" + steps[-1], None)
+    return list(paths)
+
+
+def create_workspace(directory: str, template: Path, pattern_count: int):
+    """
+    A workspace database created from the schema as UseCaseManager does, holding about
+    pattern_count patterns. Section names are unique within a workspace, so the airlines
+    take turns over the template's element paths and every pattern applies to all versions.
+    """
+    from core.database.schema_migration import SchemaMigration
+    from core.database.sql_db_utils import PatternRecord, SQLDatabaseUtils
+
+    db_path = Path(directory) / "benchmark_workspace.db"
+    conn = sqlite3.connect(str(db_path))
+    conn.executescript(SCHEMA_FILE.read_text())
+    conn.close()
+    SchemaMigration(str(db_path)).migrate_to_latest()
+    db_utils = SQLDatabaseUtils(db_path.name, directory)
+
+    paths = section_paths(etree.parse(str(template)).getroot())
+    sections = paths[:max(1, math.ceil(pattern_count / len(BENCHMARK_VERSIONS)))]
+    for position, airline in enumerate(BENCHMARK_AIRLINES):
+        api_id = db_utils.insert_data("api", (airline,), ["api_name"])
+        for version in BENCHMARK_VERSIONS:
+            db_utils.insert_api_version(api_id, version)
+        db_utils.save_patterns(api_id, [
+            PatternRecord(
+                section, f"{airline} {section}",
+                f"{section.rsplit('/', 1)[-1]} of {airline} with PaxRefID references",
+                f"Verify that {section} is present and that each entry carries the {airline} "
+                f"specific identifiers, type codes and references."
+            )
+            for section in sections[position::len(BENCHMARK_AIRLINES)]
+        ])
+    return db_utils
+
+
+def create_shared_patterns(directory: str, template: Path, pattern_count: int):
+    """
+    A default patterns database in directory holding pattern_count shared patterns of the
+    VERIFY_FILTER airline and version over the template's element paths.
+    """
+    from core.database.default_patterns_manager import DefaultPattern, DefaultPatternsManager
+
+    manager = DefaultPatternsManager(str(Path(directory) / "default_patterns.db"),
+                                     str(Path(directory) / "default_patterns"))
+    airline, version = VERIFY_FILTER["airlines"][0], VERIFY_FILTER["versions"][0]
+    for position, section in enumerate(section_paths(etree.parse(str(template)).getroot())[:pattern_count]):
+        manager.save_pattern(DefaultPattern(
+            f"shared_{position}", f"Shared {section}", f"{section.rsplit('/', 1)[-1]} from the shared patterns",
+            f"Verify that {section} is present with its identifiers and references.", "", section,
+            api=airline, api_version=version,
+        ))
+    return manager
+
+
+def _workspace_pattern_dicts(db_utils) -> List[Dict[str, str]]:
+    return [
+        {"name": f"{p.api_name} {p.section_name}", "description": p.pattern_description,
+         "path": p.section_name, "prompt": p.pattern_prompt}
+        for p in db_utils.get_all_patterns()
+    ]
+
+
+def _setup_auto_select(context, document):
+    from core.assisted_discovery.pattern_manager import PatternManager
+    return PatternManager(context.model_name, headless=True), io.BytesIO(document.xml_bytes)
+
+
+def _setup_parsed(context, document):
+    return etree.fromstring(document.xml_bytes)
+
+
+def _setup_text(context, document):
+    return document.xml_bytes.decode("utf-8")
+
+
+def _setup_relationships(context, document):
+    from core.assisted_discovery.intelligent_pattern_matcher import IntelligentPatternMatcher
+    return IntelligentPatternMatcher(), document.xml_bytes.decode("utf-8")
+
+
+def _setup_verify(context, document):
+    from core.assisted_discovery.identify_pattern_manager import PatternIdentifyManager
+    manager = PatternIdentifyManager(context.model_name, context.db_utils, headless=True,
+                                     default_patterns_manager=context.default_patterns_manager)
+    return manager, document.xml_bytes.decode("utf-8")
+
+
+def _setup_cold_catalog(context, document):
+    from core.database.pattern_catalog_cache import get_pattern_catalog_cache
+    get_pattern_catalog_cache().invalidate(context.db_utils.db_path)
+    return context.db_utils
+
+
+def _setup_classifier(context, document):
+    from core.assisted_discovery.airline_pattern_classifier import AirlinePatternClassifier
+    return AirlinePatternClassifier(), [dict(p) for p in context.workspace_patterns]
+
+
+def _xml_to_tree(root):
+    from core.assisted_discovery.xml_tree_helper import XMLTreeHelper
+    return XMLTreeHelper.xml_to_tree(root)
+
+
+def _list_main_elements(xml_text):
+    from core.database.sql_db_utils import SQLDatabaseUtils
+    return SQLDatabaseUtils.list_main_elements(xml_text)
+
+
+CASES = [
+    BenchmarkCase("auto_select_nodes", _setup_auto_select, lambda arg: arg[0].auto_select_nodes(arg[1])),
+    BenchmarkCase("xml_to_tree", _setup_parsed, _xml_to_tree),
+    BenchmarkCase("list_main_elements", _setup_text, _list_main_elements),
+    BenchmarkCase("analyze_relationships", _setup_relationships, lambda arg: arg[0].analyze_relationships(arg[1])),
+    BenchmarkCase("verify_and_confirm_airline", _setup_verify,
+                  lambda arg: arg[0].verify_and_confirm_airline(arg[1], VERIFY_FILTER)),
+    BenchmarkCase("get_all_patterns_cold", _setup_cold_catalog, lambda db_utils: db_utils.get_all_patterns(), per_document=False),
+    BenchmarkCase("get_all_patterns_warm", lambda context, _: context.db_utils,
+                  lambda db_utils: db_utils.get_all_patterns(), per_document=False),
+    BenchmarkCase("filter_patterns", _setup_classifier, lambda arg: arg[0].filter_patterns(arg[1]), per_document=False),
+]
+CASE_NAMES = [case.name for case in CASES]
+
+
+def measure(case: BenchmarkCase, context: BenchmarkContext, document: BenchmarkInput, repeat: int) -> Dict:
+    timings = []
+    for _ in range(repeat):
+        argument = case.setup(context, document)
+        started = time.perf_counter()
+        case.run(argument)
+        timings.append(time.perf_counter() - started)
+    best = min(timings)
+    return {
+        "case": case.name,
+        "input": document.name,
+        "bytes": document.size,
+        "repeat": repeat,
+        "min_seconds": round(best, 6),
+        "median_seconds": round(statistics.median(timings), 6),
+        "mean_seconds": round(statistics.fmean(timings), 6),
+        "mb_per_second": round(document.size / 1048576 / best, 3) if document.size and best > 0 else None,
+    }
+
+
+def _git_revision() -> Dict[str, Any]:
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=ROOT_DIR, capture_output=True, text=True, timeout=30).stdout.strip()
+    try:
+        return {"commit": git("rev-parse", "--short", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+    except (OSError, subprocess.SubprocessError):
+        return {"commit": None, "dirty": None}
+
+
+def load_history(path: Path) -> List[Dict]:
+    if not path.exists():
+        return []
+    runs = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        try:
+            runs.append(json.loads(line))
+        except ValueError:
+            continue
+    return runs
+
+
+def previous_timings(history: List[Dict]) -> Dict[tuple, Dict]:
+    """Latest earlier result per (case, input)"""
+    latest = {}
+    for run in history:
+        for result in run.get("results", []):
+            latest[(result["case"], result["input"])] = dict(result, commit=run.get("commit"))
+    return latest
+
+
+def compare(result: Dict, previous: Optional[Dict], threshold: float) -> Optional[float]:
+    """Relative change of the best time against the previous run; positive is slower"""
+    if not previous or not previous.get("min_seconds"):
+        return None
+    change = result["min_seconds"] / previous["min_seconds"] - 1
+    result["change_vs_previous"] = round(change, 4)
+    result["previous_commit"] = previous.get("commit")
+    result["regression"] = change > threshold and result["min_seconds"] - previous["min_seconds"] > MIN_REGRESSION_SECONDS
+    return change
+
+
+def run_suite(cases: List[BenchmarkCase], inputs: List[BenchmarkInput], context: BenchmarkContext,
+              repeat: int, history: List[Dict], threshold: float) -> List[Dict]:
+    previous = previous_timings(history)
+    results = []
+    print(f"{'case':<28} {'input':<38} {'MB':>7} {'best ms':>10} {'median ms':>10} {'MB/s':>8} {'vs prev':>8}")
+    for case in cases:
+        workspace_input = BenchmarkInput(f"workspace_{len(context.workspace_patterns)}_patterns")
+        for document in (inputs if case.per_document else [workspace_input]):
+            result = measure(case, context, document, repeat)
+            change = compare(result, previous.get((case.name, document.name)), threshold)
+            results.append(result)
+            change_text = "" if change is None else f"{change:+.0%}" + (" !" if result["regression"] else "")
+            print(f"{case.name:<28} {document.name[:38]:<38} {document.size / 1048576:>7.2f} "
+                  f"{result['min_seconds'] * 1000:>10.2f} {result['median_seconds'] * 1000:>10.2f} "
+                  f"{result['mb_per_second'] or 0:>8.1f} {change_text:>8}", flush=True)
+    return results
+
+
+def append_history(path: Path, results: List[Dict], settings: Dict, server_stats: Dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    run = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        **_git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": settings,
+        "llm_server": server_stats,
+        "results": results,
+    }
+    with path.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(run) + "\n")
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.pipeline_benchmark",
+        description="Time the discovery and identification hot paths and record the results in a JSON history."
+    )
+    parser.add_argument("--cases", nargs="+", choices=CASE_NAMES, default=CASE_NAMES, help="Cases to run (default: all)")
+    parser.add_argument("--data-dir", type=Path, default=DEFAULT_DATA_DIR, help="Directory of real XML inputs")
+    parser.add_argument("--no-latam", action="store_true", help="Only run on the synthetic payloads")
+    parser.add_argument("--template", type=Path, default=DEFAULT_TEMPLATE, help="Document the synthetic payloads are scaled from")
+    parser.add_argument("--sizes-mb", type=float, nargs="*", default=DEFAULT_SIZES_MB, help="Synthetic payload sizes")
+    parser.add_argument("--patterns", type=int, default=DEFAULT_PATTERNS, help="Patterns in the benchmark workspace")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Runs per measurement; the best is compared")
+    parser.add_argument("--llm-latency", default="none", help="Mock LLM latency spec (see benchmarks.mock_openai_server)")
+    parser.add_argument("--llm-store", help="Replay store of recorded completions; unrecorded requests get the mock confirmation")
+    parser.add_argument("--history", type=Path, default=DEFAULT_HISTORY, help="JSON lines history the run is appended to")
+    parser.add_argument("--no-history", action="store_true", help="Compare with the history without appending to it")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                        help="Slowdown of the best time, as a fraction, reported as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 if any case regressed")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_arg_parser().parse_args(argv)
+    cases = [case for case in CASES if case.name in args.cases]
+    inputs = load_inputs(None if args.no_latam else args.data_dir, args.template, args.sizes_mb or [])
+    history = load_history(args.history)
+
+    server = MockOpenAIServer(
+        ReplayStore(args.llm_store), latency=LatencyModel(args.llm_latency),
+        on_miss="fallback", fallback_content=MOCK_CONFIRMATION, seed=0,
+    )
+    with tempfile.TemporaryDirectory() as directory, server, mock_llm_environment(server.url, GPT_4O):
+        db_utils = create_workspace(directory, args.template, args.patterns)
+        shared_patterns = create_shared_patterns(directory, args.template, SHARED_PATTERNS)
+        context = BenchmarkContext(db_utils, _workspace_pattern_dicts(db_utils), GPT_4O, shared_patterns)
+        results = run_suite(cases, inputs, context, max(1, args.repeat), history, args.threshold)
+        server_stats = server.stats()
+        from core.database.connection_pool import close_connection_pool
+        close_connection_pool(db_utils.db_path)
+        close_connection_pool(shared_patterns.db_path)
+
+    if not args.no_history:
+        settings = {"repeat": args.repeat, "patterns": args.patterns, "llm_latency": args.llm_latency}
+        append_history(args.history, results, settings, server_stats)
+        print(f"Results appended to {args.history}", file=sys.stderr)
+
+    regressions = [r for r in results if r.get("regression")]
+    for result in regressions:
+        print(f"regression: {result['case']} on {result['input']} is {result['change_vs_previous']:+.0%} "
+              f"slower than at {result['previous_commit']}", file=sys.stderr)
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
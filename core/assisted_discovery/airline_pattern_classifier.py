@@ -1,8 +1,13 @@
 """
 Airline Pattern Classifier - Determines which patterns are valuable for airline identification
+
+Keyword lists are compiled once into a KeywordMatcher, which finds every keyword of every
+category in a single scan of a pattern's text instead of one regex search per keyword.
 """
 import re
-from typing import Dict, List, Any, Tuple
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterable, List, Any, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
 
@@ -21,6 +26,132 @@ class PatternClassification:
     reasons: List[str]
     category: str  # "relationship", "combination", "structural", "generic"
 
+# Literal terms the scoring checks with a plain (case-sensitive) substring test
+PASSENGER_TYPES = ['adt', 'chd', 'inf', 'adult', 'child', 'infant']
+BASIC_FIELDS = ['name', 'birthdate', 'gender', 'title', 'surname', 'givenname']
+BUSINESS_LOGIC_TERMS = ['relationship', 'combination', 'unique']
+SUBSTRING_TERMS = PASSENGER_TYPES + BASIC_FIELDS + BUSINESS_LOGIC_TERMS + [
+    'paxrefid', 'reference', 'pax', 'mix', 'structure', 'pattern', 'validation'
+]
+# Keywords checked besides the configured lists
+PARENT_CHILD_KEYWORDS = ['parent.*child', 'child.*parent']
+API_VERSION_KEYWORD = 'api.*version'
+_VERSION_NUMBER = re.compile(r'version.*\d+\.\d+', re.IGNORECASE)
+
+# Characters IGNORECASE matches to an ASCII letter that lower() leaves as they are
+_ASCII_CASE_FOLD = str.maketrans({'\u0130': 'i', '\u0131': 'i', '\u017f': 's', '\u212a': 'k'})
+_KEYWORD_ATOM = re.compile(r'[a-z0-9 -]+')
+
+
+class KeywordHits:
+    """Keywords and terms found in one text by KeywordMatcher.scan"""
+
+    def __init__(self, matcher: "KeywordMatcher", text: str, exact: Dict[str, List[int]], folded: Dict[str, List[int]]):
+        self.text = text
+        self._matcher = matcher
+        self._exact = exact
+        self._folded = folded
+
+    def contains(self, term: str) -> bool:
+        """term in text"""
+        return term in self._exact
+
+    def matches(self, keyword: str) -> bool:
+        """re.search(keyword, text, re.IGNORECASE) is not None"""
+        atoms = self._matcher.atoms(keyword)
+        folded = self._folded
+        if len(atoms) == 1:
+            return atoms[0] in folded
+        if not all(atom in folded for atom in atoms):
+            return False
+        return self._search(atoms)
+
+    def _search(self, atoms: Tuple[str, ...]) -> bool:
+        # 'a.*b' matches if some occurrence of a is followed on the same line by b; taking
+        # the earliest possible occurrence of each following atom finds one if there is one
+        first, rest = atoms[0], atoms[1:]
+        for start in self._folded.get(first, ()):
+            line_end = self.text.find('\n', start)
+            if line_end < 0:
+                line_end = len(self.text)
+            end = start + len(first)
+            for atom in rest:
+                occurrences = self._folded.get(atom, ())
+                i = bisect_left(occurrences, end)
+                if i == len(occurrences):
+                    return False
+                end = occurrences[i] + len(atom)
+            if end <= line_end:
+                return True
+        return False
+
+
+class KeywordMatcher:
+    """
+    Keyword regexes of the form 'literal' or 'literal.*literal...' and literal substring
+    terms, compiled into one trie-shaped regex.
+
+    scan() runs that regex once at every position of the text (and once more over its
+    ASCII case-folded form if they differ), recording where each literal starts, and
+    answers every keyword and term from those positions with the same result as
+    re.search(keyword, text, re.IGNORECASE) and term in text on lowercase text.
+    """
+
+    def __init__(self, keywords: Iterable[str], terms: Iterable[str] = ()):
+        self._atoms: Dict[str, Tuple[str, ...]] = {}
+        literals = set(terms)
+        for keyword in keywords:
+            atoms = tuple(keyword.split('.*'))
+            if not all(_KEYWORD_ATOM.fullmatch(atom) for atom in atoms):
+                raise ValueError(f"Unsupported keyword pattern: {keyword!r}")
+            self._atoms[keyword] = atoms
+            literals.update(atoms)
+
+        # The regex reports the longest literal starting at a position; the literals that
+        # are prefixes of it start there as well
+        self._prefixes = {
+            literal: [other for other in literals if literal.startswith(other)]
+            for literal in literals
+        }
+        self._scanner = re.compile(f"(?=({self._trie_pattern(sorted(literals))}))")
+
+    @classmethod
+    def _trie_pattern(cls, literals: List[str]) -> str:
+        """Regex alternation of sorted literals sharing prefixes, preferring the longest match"""
+        branches = []
+        groups = defaultdict(list)
+        for literal in literals:
+            groups[literal[0]].append(literal[1:])
+        for first, suffixes in groups.items():
+            rest = [suffix for suffix in suffixes if suffix]
+            if not rest:
+                branches.append(re.escape(first))
+                continue
+            tail = cls._trie_pattern(rest)
+            optional = '?' if '' in suffixes else ''
+            branches.append(f"{re.escape(first)}(?:{tail}){optional}")
+        return '|'.join(branches)
+
+    def atoms(self, keyword: str) -> Tuple[str, ...]:
+        """Literals of a compiled keyword (KeyError if it was not compiled)"""
+        return self._atoms[keyword]
+
+    def _positions(self, text: str) -> Dict[str, List[int]]:
+        positions = defaultdict(list)
+        prefixes = self._prefixes
+        for match in self._scanner.finditer(text):
+            start = match.start()
+            for literal in prefixes[match.group(1)]:
+                positions[literal].append(start)
+        return positions
+
+    def scan(self, text: str) -> KeywordHits:
+        exact = self._positions(text)
+        folded_text = text if text.isascii() else text.translate(_ASCII_CASE_FOLD)
+        folded = exact if folded_text == text else self._positions(folded_text)
+        return KeywordHits(self, text, exact, folded)
+
+
 class AirlinePatternClassifier:
     """
     Classifies extracted patterns based on their value for airline identification.
@@ -60,6 +191,15 @@ class AirlinePatternClassifier:
             'validation.*only', 'format.*check', 'field.*presence',
             'element.*exists', 'required.*field', 'data.*type'
         ]
+        
+        self.compile_keywords()
+    
+    def compile_keywords(self):
+        """Compile the keyword lists into the matcher; call again after changing them"""
+        keywords = [keyword for keywords in self.high_value_keywords.values() for keyword in keywords]
+        keywords += self.low_value_keywords + self.noise_keywords
+        keywords += PARENT_CHILD_KEYWORDS + [API_VERSION_KEYWORD, 'version']
+        self.keyword_matcher = KeywordMatcher(keywords, SUBSTRING_TERMS)
     
     def classify_pattern(self, pattern: Dict[str, Any]) -> PatternClassification:
         """
@@ -71,13 +211,48 @@ class AirlinePatternClassifier:
         Returns:
             PatternClassification with value type, score, and reasons
         """
+        return self._classify_text(self._pattern_text(pattern))
+    
+    def classify_patterns(self, patterns: List[Dict[str, Any]]) -> List[PatternClassification]:
+        """
+        Classify a batch of patterns; patterns with identical text are scanned once
+        
+        Args:
+            patterns: List of pattern dictionaries
+            
+        Returns:
+            One PatternClassification per pattern, in order
+        """
+        by_text: Dict[str, PatternClassification] = {}
+        classifications = []
+        for pattern in patterns:
+            text = self._pattern_text(pattern)
+            classification = by_text.get(text)
+            if classification is None:
+                classification = by_text[text] = self._classify_text(text)
+            else:
+                # Each pattern gets its own reasons list, as with classify_pattern
+                classification = PatternClassification(
+                    value_type=classification.value_type,
+                    score=classification.score,
+                    reasons=list(classification.reasons),
+                    category=classification.category
+                )
+            classifications.append(classification)
+        return classifications
+    
+    @staticmethod
+    def _pattern_text(pattern: Dict[str, Any]) -> str:
         name = pattern.get('name', '').lower()
         description = pattern.get('description', '').lower()
         path = pattern.get('path', '').lower()
         prompt = pattern.get('prompt', '').lower()
         
         # Combine all text for analysis
-        full_text = f"{name} {description} {path} {prompt}"
+        return f"{name} {description} {path} {prompt}"
+    
+    def _classify_text(self, full_text: str) -> PatternClassification:
+        hits = self.keyword_matcher.scan(full_text)
         
         # Start with base score
         score = 50.0
@@ -85,13 +260,13 @@ class AirlinePatternClassifier:
         category = "generic"
         
         # Check for high-value patterns
-        relationship_score = self._check_relationship_patterns(full_text)
-        combination_score = self._check_combination_patterns(full_text)
-        structural_score = self._check_structural_uniqueness(full_text)
+        relationship_score = self._check_relationship_patterns(hits)
+        combination_score = self._check_combination_patterns(hits)
+        structural_score = self._check_structural_uniqueness(hits)
         
         # Check for low-value/noise patterns
-        generic_penalty = self._check_generic_patterns(full_text)
-        noise_penalty = self._check_noise_patterns(full_text)
+        generic_penalty = self._check_generic_patterns(hits)
+        noise_penalty = self._check_noise_patterns(hits)
         
         # Calculate final score
         max_high_value = max(relationship_score, combination_score, structural_score)
@@ -130,91 +305,89 @@ class AirlinePatternClassifier:
             category=category
         )
     
-    def _check_relationship_patterns(self, text: str) -> float:
+    def _check_relationship_patterns(self, hits: KeywordHits) -> float:
         """Check for passenger relationship patterns"""
         score = 0.0
         
         for keyword in self.high_value_keywords['relationship']:
-            if re.search(keyword, text, re.IGNORECASE):
+            if hits.matches(keyword):
                 score += 15.0
         
         # Specific high-value relationship indicators
-        if 'paxrefid' in text and ('infant' in text or 'adult' in text):
+        if hits.contains('paxrefid') and (hits.contains('infant') or hits.contains('adult')):
             score += 25.0  # INF-ADT relationships are gold for airline ID
         
-        if 'reference' in text and 'pax' in text:
+        if hits.contains('reference') and hits.contains('pax'):
             score += 20.0
             
-        if re.search(r'parent.*child|child.*parent', text, re.IGNORECASE):
+        if any(hits.matches(keyword) for keyword in PARENT_CHILD_KEYWORDS):
             score += 20.0
             
         return min(50.0, score)
     
-    def _check_combination_patterns(self, text: str) -> float:
+    def _check_combination_patterns(self, hits: KeywordHits) -> float:
         """Check for passenger combination patterns"""
         score = 0.0
         
         for keyword in self.high_value_keywords['combination']:
-            if re.search(keyword, text, re.IGNORECASE):
+            if hits.matches(keyword):
                 score += 15.0
         
         # Look for passenger type combinations
-        passenger_types = ['adt', 'chd', 'inf', 'adult', 'child', 'infant']
-        type_count = sum(1 for ptype in passenger_types if ptype in text)
+        type_count = sum(1 for ptype in PASSENGER_TYPES if hits.contains(ptype))
         
         if type_count >= 2:
             score += 20.0  # Multiple passenger types = combination pattern
             
-        if 'mix' in text or 'combination' in text:
+        if hits.contains('mix') or hits.contains('combination'):
             score += 15.0
             
         return min(50.0, score)
     
-    def _check_structural_uniqueness(self, text: str) -> float:
+    def _check_structural_uniqueness(self, hits: KeywordHits) -> float:
         """Check for airline-specific structural patterns"""
         score = 0.0
         
         for keyword in self.high_value_keywords['structural_unique']:
-            if re.search(keyword, text, re.IGNORECASE):
+            if hits.matches(keyword):
                 score += 15.0
         
         # API-specific indicators
-        if re.search(r'api.*version|version.*\d+\.\d+', text, re.IGNORECASE):
+        if hits.matches(API_VERSION_KEYWORD) or (hits.matches('version') and _VERSION_NUMBER.search(hits.text)):
             score += 20.0
             
         # Airline-specific structure indicators
-        if 'unique' in text and ('structure' in text or 'pattern' in text):
+        if hits.contains('unique') and (hits.contains('structure') or hits.contains('pattern')):
             score += 20.0
             
         return min(50.0, score)
     
-    def _check_generic_patterns(self, text: str) -> float:
+    def _check_generic_patterns(self, hits: KeywordHits) -> float:
         """Check for generic, non-differentiating patterns"""
         penalty = 0.0
         
         for keyword in self.low_value_keywords:
-            if re.search(keyword, text, re.IGNORECASE):
+            if hits.matches(keyword):
                 penalty += 10.0
         
         # Heavy penalty for basic field patterns
-        basic_fields = ['name', 'birthdate', 'gender', 'title', 'surname', 'givenname']
-        field_count = sum(1 for field in basic_fields if field in text)
+        field_count = sum(1 for field in BASIC_FIELDS if hits.contains(field))
         
         if field_count >= 3:
             penalty += 30.0  # This is just basic passenger info, not airline-specific
             
         return min(50.0, penalty)
     
-    def _check_noise_patterns(self, text: str) -> float:
+    def _check_noise_patterns(self, hits: KeywordHits) -> float:
         """Check for noise patterns that don't help airline identification"""
         penalty = 0.0
         
         for keyword in self.noise_keywords:
-            if re.search(keyword, text, re.IGNORECASE):
+            if hits.matches(keyword):
                 penalty += 15.0
         
         # Patterns focused only on validation without business logic
-        if 'validation' in text and not any(x in text for x in ['relationship', 'combination', 'unique']):
+        if hits.contains('validation') and not any(hits.contains(x) for x in BUSINESS_LOGIC_TERMS):
             penalty += 20.0
             
         return min(50.0, penalty)
@@ -232,12 +405,9 @@ class AirlinePatternClassifier:
             Tuple of (filtered_patterns, classifications)
         """
         filtered_patterns = []
-        classifications = []
+        classifications = self.classify_patterns(patterns)
         
-        for pattern in patterns:
-            classification = self.classify_pattern(pattern)
-            classifications.append(classification)
-            
+        for pattern, classification in zip(patterns, classifications):
             if classification.score >= min_score:
                 # Add classification info to pattern
                 pattern_with_score = pattern.copy()
@@ -250,17 +420,20 @@ class AirlinePatternClassifier:
         
         return filtered_patterns, classifications
     
-    def get_pattern_recommendations(self, patterns: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def get_pattern_recommendations(self, patterns: List[Dict[str, Any]],
+                                    classifications: Optional[List[PatternClassification]] = None) -> Dict[str, Any]:
         """
         Provide recommendations for improving pattern extraction
         
         Args:
             patterns: List of extracted patterns
+            classifications: Their classifications, if already computed (e.g. by filter_patterns)
             
         Returns:
             Dictionary with recommendations and statistics
         """
-        classifications = [self.classify_pattern(p) for p in patterns]
+        if classifications is None:
+            classifications = self.classify_patterns(patterns)
         
         # Statistics
         total_patterns = len(patterns)
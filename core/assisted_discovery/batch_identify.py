@@ -0,0 +1,189 @@
+"""
+Headless batch pattern identification.
+
+Runs the same identification as the Identify page over a directory, glob or list of XML
+files against one discovery workspace, without Streamlit, and streams one JSON line per
+file with the matched airlines, per-rule results, latency and LLM cost.
+
+Usage:
+    python -m core.assisted_discovery.batch_identify captures/ --workspace demo > results.jsonl
+    python -m core.assisted_discovery.batch_identify "captures/**/*.xml" --workspace demo --workers 4
+    python -m core.assisted_discovery.batch_identify --list-workspaces
+"""
+
+import argparse
+import glob
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from core.common.constants import GPT_4O
+from core.common.logging_manager import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_FILE_WORKERS = 4
+
+
+def collect_xml_files(inputs: Iterable[str]) -> List[Path]:
+    """Expand directories (recursively), glob patterns and file paths into a sorted list of XML files"""
+    files = set()
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            files.update(p for p in path.rglob("*") if p.is_file() and p.suffix.lower() == ".xml")
+        elif path.is_file():
+            files.add(path)
+        else:
+            files.update(Path(p) for p in glob.glob(item, recursive=True) if Path(p).is_file())
+    return sorted(files)
+
+
+def _rule_results(gap_analysis: Dict) -> List[Dict]:
+    results = []
+    for section in gap_analysis.get("sections", []):
+        for rule in section.get("rules", []):
+            results.append({
+                "section": section.get("sectionName"),
+                "airline": rule.get("airline"),
+                "api_version": rule.get("apiVersion"),
+                "rule": rule.get("verificationRule"),
+                "matched": bool(rule.get("matched")),
+                "not_applicable": bool(rule.get("not_applicable")),
+                "llm_failed": bool(rule.get("llm_failed")),
+                "reason": rule.get("reason", ""),
+            })
+    return results
+
+
+def identify_file(manager, xml_path: Path, filter_info: Optional[Dict] = None,
+                  max_concurrency: Optional[int] = None, batch_patterns: Optional[bool] = None) -> Dict:
+    """Identify one XML file; never raises, errors are reported in the record"""
+    started = time.perf_counter()
+    record = {"file": str(xml_path)}
+    try:
+        xml_content = xml_path.read_text(encoding="utf-8")
+        gap_analysis = manager.verify_and_confirm_airline(
+            xml_content, filter_info, max_concurrency=max_concurrency, batch_patterns=batch_patterns
+        )
+        usage = gap_analysis.get("llm_usage")
+        record.update({
+            "status": "ok",
+            "matched_airlines": sorted(gap_analysis.get("matched_airlines", [])),
+            "rules": _rule_results(gap_analysis),
+            "skipped_llm_calls": gap_analysis.get("skipped_llm_calls", 0),
+            "llm_usage": asdict(usage) if usage else None,
+            "cost": usage.cost if usage else 0,
+        })
+    except Exception as e:
+        logger.error(f"Identification failed for {xml_path}: {e}")
+        record.update({"status": "error", "error": f"{type(e).__name__}: {e}"})
+    record["latency_seconds"] = round(time.perf_counter() - started, 3)
+    return record
+
+
+def run_batch(manager, files: List[Path], output, workers: int = DEFAULT_FILE_WORKERS,
+              filter_info: Optional[Dict] = None, max_concurrency: Optional[int] = None,
+              batch_patterns: Optional[bool] = None) -> Dict:
+    """
+    Identify files on a worker pool, writing each record to output as soon as it completes.
+
+    Returns:
+        dict: Run summary with file, error, LLM call and cost totals.
+    """
+    summary = {"files": len(files), "errors": 0, "llm_calls": 0, "cache_hits": 0, "skipped_llm_calls": 0, "cost": 0.0}
+    write_lock = threading.Lock()
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="batch-identify") as executor:
+        futures = [
+            executor.submit(identify_file, manager, path, filter_info, max_concurrency, batch_patterns)
+            for path in files
+        ]
+        for future in as_completed(futures):
+            record = future.result()
+            with write_lock:
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                output.flush()
+            if record["status"] != "ok":
+                summary["errors"] += 1
+                continue
+            usage = record.get("llm_usage") or {}
+            summary["llm_calls"] += usage.get("calls", 0)
+            summary["cache_hits"] += usage.get("cache_hits", 0)
+            summary["skipped_llm_calls"] += record.get("skipped_llm_calls", 0)
+            summary["cost"] += record.get("cost", 0)
+    return summary
+
+
+def _parse_list(value: Optional[str]) -> Optional[List[str]]:
+    if not value:
+        return None
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m core.assisted_discovery.batch_identify",
+        description="Identify airline patterns in a batch of XML files without the Streamlit UI."
+    )
+    parser.add_argument("inputs", nargs="*", help="XML files, directories (searched recursively) or glob patterns")
+    parser.add_argument("--workspace", help="Discovery workspace (use case) id whose patterns are used")
+    parser.add_argument("--model", default=GPT_4O, help=f"Model configuration prefix (default: {GPT_4O})")
+    parser.add_argument("--workers", type=int, default=DEFAULT_FILE_WORKERS, help="Files processed in parallel")
+    parser.add_argument("--max-concurrency", type=int, default=None, help="In-flight LLM calls per file")
+    parser.add_argument("--batch-patterns", action="store_true", default=None, help="Verify patterns sharing a section in one request")
+    parser.add_argument("--airlines", help="Comma-separated airline filter")
+    parser.add_argument("--versions", help="Comma-separated API version filter")
+    parser.add_argument("--output", "-o", help="Write JSON lines to this file instead of stdout")
+    parser.add_argument("--list-workspaces", action="store_true", help="List workspace ids and exit")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_arg_parser().parse_args(argv)
+
+    from core.common.usecase_manager import UseCaseManager
+    usecase_manager = UseCaseManager()
+
+    if args.list_workspaces:
+        for use_case in usecase_manager.get_available_use_cases():
+            print(f"{use_case.id}\t{use_case.name}")
+        return 0
+
+    if not args.workspace or not args.inputs:
+        print("error: inputs and --workspace are required (see --help)", file=sys.stderr)
+        return 2
+
+    db_utils = usecase_manager.get_db_utils_for_use_case(args.workspace)
+    if db_utils is None:
+        print(f"error: workspace '{args.workspace}' not found or its database could not be opened", file=sys.stderr)
+        return 2
+
+    files = collect_xml_files(args.inputs)
+    if not files:
+        print("error: no XML files matched the given inputs", file=sys.stderr)
+        return 2
+
+    from core.assisted_discovery.identify_pattern_manager import PatternIdentifyManager
+    manager = PatternIdentifyManager(args.model, db_utils, headless=True)
+    filter_info = {"airlines": _parse_list(args.airlines), "versions": _parse_list(args.versions)}
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        started = time.perf_counter()
+        summary = run_batch(manager, files, output, args.workers, filter_info, args.max_concurrency, args.batch_patterns)
+    finally:
+        if args.output:
+            output.close()
+
+    summary["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    print(json.dumps(summary), file=sys.stderr)
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""
+Token-budgeted planning of pattern extraction requests.
+
+Pattern extraction used to send every selected node (path -> XML) in a single prompt, so a
+large selection overflowed the model's context or was truncated. plan_extraction_requests
+measures each node with the model's tokenizer and bin-packs the nodes into as few requests
+as fit a content budget (first fit, largest nodes first, each request keeping document
+order). A node that does not fit on its own is split into its child subtrees with
+XMLNodeIndex, and the pieces are keyed by their full paths.
+
+merge_extraction_responses combines the responses of the requests, keeping the first
+pattern returned for each path.
+"""
+
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from lxml import etree
+
+from core.common.logging_manager import get_logger
+from core.xml_processing.xml_ingest import XMLNodeIndex
+
+logger = get_logger(__name__)
+
+# Headroom for the characters-per-token ratio varying inside a node that is split
+SPLIT_SAFETY_FACTOR = 0.9
+
+
+class ExtractionRequest(NamedTuple):
+    """Selected nodes sent together in one extraction request"""
+    nodes: Dict[str, str]
+    tokens: int
+
+
+def node_tokens(path: str, xml: str, count_tokens: Callable[[str], int]) -> int:
+    """Tokens of one node as it is rendered in the prompt (an entry of the nodes dict)"""
+    return count_tokens(f"{path!r}: {xml!r}, ")
+
+
+def _child_path(path: str, fragment_path: str) -> str:
+    """Full path of a node inside a fragment, given the fragment's own path"""
+    root_end = fragment_path.find("]/")
+    return path if root_end < 0 else path + fragment_path[root_end + 1:]
+
+
+def _split_node(path: str, xml: str, tokens: int, token_budget: int,
+                count_tokens: Callable[[str], int]) -> List[Tuple[str, str, int]]:
+    """Split a node over the budget into sibling subtrees that fit, where the XML allows it"""
+    try:
+        index = XMLNodeIndex(xml)
+    except etree.XMLSyntaxError as e:
+        logger.warning(f"Cannot split {path} ({tokens} tokens) to fit the extraction budget: {e}")
+        return [(path, xml, tokens)]
+
+    max_chars = max(1, int(len(xml) * token_budget / tokens * SPLIT_SAFETY_FACTOR))
+    pieces = []
+    for chunk in index.iter_chunks(max_chars):
+        piece_path = ", ".join(_child_path(path, chunk_path) for chunk_path in chunk.paths)
+        piece_tokens = node_tokens(piece_path, chunk.xml, count_tokens)
+        if piece_tokens <= token_budget:
+            pieces.append((piece_path, chunk.xml, piece_tokens))
+        elif len(chunk.paths) > 1:
+            # Packed siblings denser in tokens than the node as a whole: place each on its own
+            for chunk_path in chunk.paths:
+                sibling_path = _child_path(path, chunk_path)
+                sibling_xml = index.raw_xml(index.find(chunk_path))
+                sibling_tokens = node_tokens(sibling_path, sibling_xml, count_tokens)
+                if sibling_tokens > token_budget:
+                    pieces.extend(_split_node(sibling_path, sibling_xml, sibling_tokens, token_budget, count_tokens))
+                else:
+                    pieces.append((sibling_path, sibling_xml, sibling_tokens))
+        elif len(chunk.xml) < len(xml):
+            pieces.extend(_split_node(piece_path, chunk.xml, piece_tokens, token_budget, count_tokens))
+        else:
+            logger.warning(f"{piece_path} ({piece_tokens} tokens) exceeds the extraction budget on its own")
+            pieces.append((piece_path, chunk.xml, piece_tokens))
+    return pieces
+
+
+def plan_extraction_requests(nodes: Dict[str, str], count_tokens: Callable[[str], int],
+                             token_budget: int) -> List[ExtractionRequest]:
+    """
+    Pack the selected nodes into requests whose node content stays within token_budget.
+
+    Args:
+        nodes: Selected nodes, path -> XML, in document order.
+        count_tokens: Token counter of the model the requests are sent to.
+        token_budget: Tokens available for node content in one request (the prompt budget
+            minus the system prompt and insights; the completion is not counted).
+    """
+    entries = []
+    for path, xml in nodes.items():
+        tokens = node_tokens(path, xml, count_tokens)
+        if tokens > token_budget:
+            entries.extend(_split_node(path, xml, tokens, token_budget, count_tokens))
+        else:
+            entries.append((path, xml, tokens))
+
+    # First fit decreasing; bins hold entry positions so each request keeps document order
+    bins: List[List[int]] = []
+    bin_tokens: List[int] = []
+    for position in sorted(range(len(entries)), key=lambda i: entries[i][2], reverse=True):
+        tokens = entries[position][2]
+        for b, used in enumerate(bin_tokens):
+            if used + tokens <= token_budget:
+                bins[b].append(position)
+                bin_tokens[b] += tokens
+                break
+        else:
+            bins.append([position])
+            bin_tokens.append(tokens)
+
+    requests = []
+    for positions, tokens in sorted(zip(bins, bin_tokens), key=lambda packed: min(packed[0])):
+        positions.sort()
+        requests.append(ExtractionRequest({entries[p][0]: entries[p][1] for p in positions}, tokens))
+    return requests
+
+
+def merge_extraction_responses(responses: List[Optional[dict]]) -> Optional[dict]:
+    """
+    Combine extraction responses ({"reasoning_log": ..., "patterns": [{"pattern": {...}}]}),
+    keeping the first pattern for each path and skipping entries without a path string, as
+    the model does not always follow the schema. Returns None if no response could be parsed.
+    """
+    parsed = [response for response in responses if isinstance(response, dict)]
+    if not parsed:
+        return None
+
+    patterns = []
+    seen_paths = set()
+    for response in parsed:
+        for pattern in response.get("patterns") or []:
+            fields = pattern.get("pattern") if isinstance(pattern, dict) else None
+            path = fields.get("path") if isinstance(fields, dict) else None
+            if not isinstance(path, str) or path in seen_paths:
+                continue
+            seen_paths.add(path)
+            patterns.append(pattern)
+
+    reasoning_logs = [response["reasoning_log"] for response in parsed
+                      if isinstance(response.get("reasoning_log"), str) and response["reasoning_log"]]
+    return {"reasoning_log": "\n\n".join(reasoning_logs), "patterns": patterns}
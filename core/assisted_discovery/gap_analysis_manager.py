@@ -1,22 +1,119 @@
-import pandas as pd
+import os
+import time
+from dataclasses import dataclass
 from core.llm.LLMManager import LLMManager
+from core.llm.response_cache import get_response_cache
+from core.llm.completion_result import LLMCompletionError
+from core.llm.json_stream import JSONArrayStream
+from core.llm.telemetry import get_llm_telemetry
 import streamlit as st
 from core.common.ui_utils import render_custom_table
 
+
+@dataclass
+class LLMUsage:
+    """LLM usage gathered off the main thread and recorded into the session afterwards"""
+    cost: float = 0
+    calls: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+
+    def add(self, other: "LLMUsage") -> "LLMUsage":
+        self.cost += other.cost
+        self.calls += other.calls
+        self.cache_hits += other.cache_hits
+        self.cache_misses += other.cache_misses
+        return self
+
+
 class GapAnalysisManager(LLMManager):
     
-    def __init__(self, model_name):
-        super().__init__(model_name)
+    def __init__(self, model_name, headless=False):
+        super().__init__(model_name, headless)
     
     def _initiate_conversation(self):
         return self.run()
     
     def run(self):
-        cost, llm_response = self.agent.get_chat_completion()
-        st.session_state.number_of_calls_to_llm += 1
-        st.session_state.total_cost_per_tool += cost 
-        if llm_response:
-            return llm_response.choices[0].message.content
+        result = self.agent.get_chat_completion()
+        self._record_llm_usage(LLMUsage(cost=result.cost, calls=1))
+        if not result.ok:
+            st.error(f"LLM request failed ({result.error_type}): {result.message}")
+            return None
+        return result.content
+
+    def _complete(self, prompts, use_cache=False):
+        """
+        Runs a single completion for the given prompts without touching the shared agent
+        prompts or the session state, so it is safe to call from worker threads.
+
+        With use_cache, a previously stored response for the same model and messages is
+        returned without calling the LLM. Responses are not stored here; callers store them
+        with _cache_response once they have validated the content.
+
+        Returns:
+            tuple: (LLMUsage, response content)
+
+        Raises:
+            LLMCompletionError: If no completion could be obtained after retries.
+        """
+        cache = get_response_cache() if use_cache else None
+        if cache:
+            started = time.perf_counter()
+            cached_content = cache.get(self.agent.model_name, prompts)
+            if cached_content is not None:
+                get_llm_telemetry().record_cache_hit(self.agent.model_name, prompts, time.perf_counter() - started)
+                return LLMUsage(cache_hits=1), cached_content
+
+        result = self.agent.get_chat_completion(prompts)
+        if not result.ok:
+            raise LLMCompletionError(result)
+        return LLMUsage(cost=result.cost, calls=1, cache_misses=1 if cache else 0), result.content
+
+    def _stream_complete(self, prompts, paths, on_element):
+        """
+        Streamed counterpart of _complete: while the response is generated, every element of
+        the JSON arrays at paths (see JSONArrayStream) is passed to on_element(path, element)
+        as soon as it is complete. on_element runs on the calling thread, so this is as
+        thread-safe as the callback.
+
+        Returns:
+            tuple: (LLMUsage, complete response content)
+
+        Raises:
+            LLMCompletionError: If the stream could not be opened or broke off; elements
+            already passed to on_element stay delivered.
+        """
+        stream = self.agent.stream_chat_completion(prompts)
+        if not stream.ok:
+            raise LLMCompletionError(stream)
+        parser = JSONArrayStream(*paths)
+        for delta in stream:
+            for path, element in parser.feed(delta):
+                on_element(path, element)
+        if not stream.result.ok:
+            raise LLMCompletionError(stream.result)
+        return LLMUsage(cost=stream.result.cost, calls=1), stream.result.content
+
+    @staticmethod
+    def _resolve_int_setting(env_name, default):
+        try:
+            return max(1, int(os.getenv(env_name, default)))
+        except (TypeError, ValueError):
+            return default
+
+    def _cache_response(self, prompts, content):
+        cache = get_response_cache()
+        if cache and content is not None:
+            cache.put(self.agent.model_name, prompts, content)
+
+    def _record_llm_usage(self, usage):
+        if self.headless:
+            return
+        st.session_state.number_of_calls_to_llm += usage.calls
+        st.session_state.total_cost_per_tool += usage.cost
+        st.session_state.llm_cache_hits = st.session_state.get("llm_cache_hits", 0) + usage.cache_hits
+        st.session_state.llm_cache_misses = st.session_state.get("llm_cache_misses", 0) + usage.cache_misses
         
     def display_patterns(self):
         data = []
@@ -30,6 +127,7 @@ class GapAnalysisManager(LLMManager):
                     values.get('prompt', '')
                 ]) 
             if data:
+                import pandas as pd
                 df = pd.DataFrame(data, columns=['XPATH', 'Name', 'Description', 'Prompt'])
                 st.subheader(":blue[Here are the patterns identified for the given XML]")
                 from core.common.css_utils import get_css_path
@@ -1,35 +1,63 @@
 from asyncio import Server
 import streamlit as st
-import pandas as pd
 import os
 import sys
 import re
 import json
-from core.assisted_discovery.gap_analysis_manager import GapAnalysisManager
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import List, Optional
+from core.common.constants import (
+    DEFAULT_IDENTIFY_MAX_CONCURRENCY, DEFAULT_IDENTIFY_BATCH_TOKEN_BUDGET, DEFAULT_IDENTIFY_BATCH_MAX_PATTERNS
+)
+from core.assisted_discovery.gap_analysis_manager import GapAnalysisManager, LLMUsage
+from core.llm.completion_result import LLMCompletionError
+from core.llm.token_counter import get_token_counter
+from core.common.logging_manager import get_logger
 from core.common.ui_utils import render_custom_table
 from core.prompts_manager.gap_analysis_prompt_manager import GapAnalysisPromptManager
+from core.database.pattern_catalog_cache import get_pattern_catalog_cache
 from core.database.sql_db_utils import SQLDatabaseUtils
+from core.xml_processing.xml_slicer import XMLSlicer
 from core.assisted_discovery.intelligent_pattern_matcher import (
-    IntelligentPatternMatcher, PassengerCombination, RelationshipPattern, AirlineFingerprint
+    IntelligentPatternMatcher, PassengerCombination, RelationshipPattern, AirlineFingerprint, FingerprintIndex
 )
 
+logger = get_logger(__name__)
+
+
+@dataclass
+class IdentificationJob:
+    """A single pattern verification; rule is filled in place once the LLM call completes"""
+    rule: dict
+    airline: str
+    search_prompt: str
+    xpath: Optional[str] = None
+    use_intelligent: bool = False
+
 class PatternIdentifyManager(GapAnalysisManager, GapAnalysisPromptManager):
 
-    def __init__(self, model_name, db_utils=None):
-        super().__init__(model_name)
+    def __init__(self, model_name, db_utils=None, headless=False, default_patterns_manager=None):
+        super().__init__(model_name, headless)
         self.db_utils = db_utils if db_utils else SQLDatabaseUtils()
+        # Shared patterns source; the global default patterns database unless given
+        self.default_patterns_manager = default_patterns_manager
         self.intelligent_matcher = IntelligentPatternMatcher()
     
     def verify_and_confirm_airline1(self, unknown_source_xml_content, filter_info):
         
         return 
         
-    def verify_and_confirm_airline(self, unknown_source_xml_content, filter_info):
-        with st.spinner(":rainbow[Genie is analyzing the API, please wait...]"):
-            sections = self.db_utils.list_main_elements(unknown_source_xml_content)
+    def verify_and_confirm_airline(self, unknown_source_xml_content, filter_info, max_concurrency=None, batch_patterns=None):
+        with self._spinner(":rainbow[Genie is analyzing the API, please wait...]"):
+            # Sorted so the legacy section rules come back in the same order on every run
+            sections = sorted(self.db_utils.list_main_elements(unknown_source_xml_content))
             gap_analysis = {
                 "sections": [],
-                "matched_airlines": set()
+                "matched_airlines": set(),
+                "skipped_llm_calls": 0,
+                "llm_usage": LLMUsage()
             }
 
             # Extract filter criteria
@@ -44,6 +72,9 @@ class PatternIdentifyManager(GapAnalysisManager, GapAnalysisPromptManager):
             all_workspace_patterns = self.db_utils.get_all_patterns()
             # st.info(all_workspace_patterns)
             workspace_pattern_data = []
+            # Verifications are queued and run together once every section is in place,
+            # keeping the section order below intact
+            identification_jobs = []
             
             for pattern in all_workspace_patterns:
                 # Handle tuple format: (api_name, api_version, section_name, pattern_description, pattern_prompt)
@@ -112,15 +143,13 @@ class PatternIdentifyManager(GapAnalysisManager, GapAnalysisPromptManager):
                         "passenger" in pattern_data.get("verificationRule", "").lower()
                     ])
                     
-                    if is_passenger_pattern:
-                        response_obj_json = self.identify_patterns_in_unknown_source_xml_intelligent(unknown_source_xml_content, search_prompt)
-                    else:
-                        response_obj_json = self.identify_patterns_in_unknown_source_xml(unknown_source_xml_content, search_prompt)
-                    confirmation = response_obj_json.get('confirmation')
-                    section_data["rules"][0]["matched"] = confirmation == "YES"
-                    if section_data["rules"][0]["matched"]:
-                        gap_analysis["matched_airlines"].add(pattern_data["airline"])
-                    section_data["rules"][0]["reason"] = response_obj_json.get('reason', "")
+                    identification_jobs.append(IdentificationJob(
+                        rule=section_data["rules"][0],
+                        airline=pattern_data["airline"],
+                        search_prompt=search_prompt,
+                        xpath=pattern_data["xpath"],
+                        use_intelligent=is_passenger_pattern
+                    ))
                     
                     gap_analysis["sections"].append(section_data)
                 else:
@@ -160,12 +189,12 @@ class PatternIdentifyManager(GapAnalysisManager, GapAnalysisPromptManager):
                         }
 
                         search_prompt = item[3]
-                        response_obj_json = self.identify_patterns_in_unknown_source_xml(unknown_source_xml_content, search_prompt)
-                        confirmation = response_obj_json.get('confirmation')
-                        rule["matched"] = confirmation == "YES"
-                        if rule["matched"] == True:
-                            gap_analysis["matched_airlines"].add(item[0])
-                        rule["reason"] = response_obj_json.get('reason', "")
+                        identification_jobs.append(IdentificationJob(
+                            rule=rule,
+                            airline=item[0],
+                            search_prompt=search_prompt,
+                            xpath=f"//{section}"
+                        ))
 
                         section_data["rules"].append(rule)
 
@@ -196,19 +225,226 @@ class PatternIdentifyManager(GapAnalysisManager, GapAnalysisPromptManager):
                         "passenger" in pattern_data.get("description", "").lower()
                     ])
                     
-                    if is_passenger_pattern:
-                        response_obj_json = self.identify_patterns_in_unknown_source_xml_intelligent(unknown_source_xml_content, search_prompt)
-                    else:
-                        response_obj_json = self.identify_patterns_in_unknown_source_xml(unknown_source_xml_content, search_prompt)
-                    confirmation = response_obj_json.get('confirmation')
-                    section_data["rules"][0]["matched"] = confirmation == "YES"
-                    if section_data["rules"][0]["matched"]:
-                        gap_analysis["matched_airlines"].add(pattern_data["api"])
-                    section_data["rules"][0]["reason"] = response_obj_json.get('reason', "")
+                    identification_jobs.append(IdentificationJob(
+                        rule=section_data["rules"][0],
+                        airline=pattern_data["api"],
+                        search_prompt=search_prompt,
+                        xpath=pattern_data["xpath"],
+                        use_intelligent=is_passenger_pattern
+                    ))
                     
                     gap_analysis["sections"].append(section_data)
 
+            self._run_identification_jobs(unknown_source_xml_content, identification_jobs, gap_analysis, max_concurrency, batch_patterns)
+
             return gap_analysis
+
+    def _spinner(self, text):
+        return nullcontext() if self.headless else st.spinner(text)
+
+    def _resolve_max_concurrency(self, max_concurrency=None):
+        """Per-run limit on in-flight LLM calls, falling back to IDENTIFY_MAX_CONCURRENCY"""
+        if max_concurrency is None:
+            max_concurrency = os.getenv("IDENTIFY_MAX_CONCURRENCY", DEFAULT_IDENTIFY_MAX_CONCURRENCY)
+        try:
+            return max(1, int(max_concurrency))
+        except (TypeError, ValueError):
+            return DEFAULT_IDENTIFY_MAX_CONCURRENCY
+
+    @staticmethod
+    def _resolve_batch_patterns(batch_patterns=None):
+        """Per-run batching switch, falling back to IDENTIFY_BATCH_PATTERNS (off by default)"""
+        if batch_patterns is None:
+            return os.getenv("IDENTIFY_BATCH_PATTERNS", "false").lower() in ("1", "true", "yes")
+        return bool(batch_patterns)
+
+    def _run_identification_jobs(self, unknown_source_xml_content, jobs, gap_analysis, max_concurrency=None, batch_patterns=None):
+        """
+        Dispatches all queued pattern verifications to a bounded thread pool and applies
+        the results to their rules in submission order.
+
+        The XML is parsed once. Jobs whose section is absent from it are marked not
+        applicable without an LLM call; the others are sent only the section their xpath
+        refers to. With batching enabled, jobs sharing a section are verified together in as few
+        requests as the token budget allows.
+
+        Worker threads only talk to the LLM; slicing, usage accounting and result handling
+        stay on the calling thread because st.session_state is not available inside workers.
+        """
+        if not jobs:
+            return
+
+        slicer = XMLSlicer(unknown_source_xml_content)
+        jobs = self._skip_absent_sections(slicer, jobs, gap_analysis)
+        if not jobs:
+            return
+        job_xml = [slicer.get_xml_for_pattern(job.xpath) for job in jobs]
+        tasks = self._plan_identification_tasks(jobs, job_xml, self._resolve_batch_patterns(batch_patterns))
+
+        max_workers = min(self._resolve_max_concurrency(max_concurrency), len(tasks))
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pattern-identify") as executor:
+            futures = [
+                executor.submit(self._run_identification_task, [jobs[i] for i in indices], xml_content, is_excerpt)
+                for indices, xml_content, is_excerpt in tasks
+            ]
+            try:
+                outcomes = [future.result() for future in futures]
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        responses = [None] * len(jobs)
+        for (indices, _, _), (task_responses, usage) in zip(tasks, outcomes):
+            self._record_llm_usage(usage)
+            if "llm_usage" in gap_analysis:
+                gap_analysis["llm_usage"].add(usage)
+            for index, response_obj_json in zip(indices, task_responses):
+                responses[index] = response_obj_json
+
+        for job, response_obj_json in zip(jobs, responses):
+            confirmation = response_obj_json.get('confirmation')
+            job.rule["matched"] = confirmation == "YES"
+            if job.rule["matched"]:
+                gap_analysis["matched_airlines"].add(job.airline)
+            job.rule["reason"] = response_obj_json.get('reason', "")
+            if response_obj_json.get('llm_failed'):
+                job.rule["llm_failed"] = True
+
+    @staticmethod
+    def _skip_absent_sections(slicer, jobs, gap_analysis):
+        """Mark jobs whose section is not in the XML as not applicable; returns the jobs still to run"""
+        remaining = []
+        for job in jobs:
+            if slicer.has_section(job.xpath):
+                remaining.append(job)
+                continue
+            job.rule["matched"] = False
+            job.rule["not_applicable"] = True
+            job.rule["reason"] = f"Not applicable: {job.xpath} is not present in the input XML (LLM check skipped)"
+        gap_analysis["skipped_llm_calls"] = gap_analysis.get("skipped_llm_calls", 0) + len(jobs) - len(remaining)
+        return remaining
+
+    def _plan_identification_tasks(self, jobs, job_xml, batch_patterns=False):
+        """
+        Group jobs into LLM requests.
+
+        The token budget is counted with the model's tokenizer over the batch prompts
+        themselves: the system prompt and the XML once per request, plus each pattern's
+        instruction.
+
+        Returns:
+            list: (job_indices, xml_content, is_excerpt) per request. Without batching every
+            job is its own request; with batching, standard jobs sent the same XML are packed
+            together up to the token budget and pattern limit. Passenger jobs keep their
+            dedicated prompt and always run on their own.
+        """
+        if not batch_patterns:
+            return [([index], xml_content, is_excerpt) for index, (xml_content, is_excerpt) in enumerate(job_xml)]
+
+        token_budget = self._resolve_int_setting("IDENTIFY_BATCH_TOKEN_BUDGET", DEFAULT_IDENTIFY_BATCH_TOKEN_BUDGET)
+        max_patterns = self._resolve_int_setting("IDENTIFY_BATCH_MAX_PATTERNS", DEFAULT_IDENTIFY_BATCH_MAX_PATTERNS)
+
+        token_counter = get_token_counter(self.agent.model_name)
+
+        tasks = []
+        groups = {}
+        for index, (job, (xml_content, is_excerpt)) in enumerate(zip(jobs, job_xml)):
+            if job.use_intelligent:
+                tasks.append(([index], xml_content, is_excerpt))
+            else:
+                groups.setdefault((xml_content, is_excerpt), []).append(index)
+
+        for (xml_content, is_excerpt), indices in groups.items():
+            base_tokens = token_counter.count_messages(
+                self.build_prompts_for_batch_pattern_identification(xml_content, [], is_excerpt)
+            )
+            batch, batch_tokens = [], base_tokens
+            for index in indices:
+                # The instruction as it appears in the request, with its pattern id and separator
+                instruction = self._batch_pattern_instruction(f"P{len(batch) + 1}", jobs[index].search_prompt)
+                pattern_tokens = token_counter.count("\n\n" + instruction)
+                if batch and (batch_tokens + pattern_tokens > token_budget or len(batch) >= max_patterns):
+                    tasks.append((batch, xml_content, is_excerpt))
+                    batch, batch_tokens = [], base_tokens
+                batch.append(index)
+                batch_tokens += pattern_tokens
+            tasks.append((batch, xml_content, is_excerpt))
+        return tasks
+
+    def _run_identification_task(self, jobs: List[IdentificationJob], xml_content, is_excerpt):
+        """
+        Returns:
+            tuple: (list of response_obj_json aligned with jobs, LLMUsage)
+        """
+        if len(jobs) == 1:
+            response_obj_json, usage = self._identify_pattern(xml_content, jobs[0].search_prompt, jobs[0].use_intelligent, is_excerpt)
+            return [response_obj_json], usage
+        return self._identify_pattern_batch(xml_content, jobs, is_excerpt)
+
+    def _identify_pattern_batch(self, unknown_source_xml_content, jobs: List[IdentificationJob], xml_is_excerpt=False):
+        """
+        Thread-safe identification of several patterns in one request. Patterns the model
+        omits or answers malformed are verified again one at a time.
+
+        Returns:
+            tuple: (list of response_obj_json aligned with jobs, LLMUsage)
+        """
+        usage = LLMUsage()
+        pattern_ids = [f"P{position}" for position in range(1, len(jobs) + 1)]
+        prompts = self.build_prompts_for_batch_pattern_identification(
+            unknown_source_xml_content,
+            [(pattern_id, job.search_prompt) for pattern_id, job in zip(pattern_ids, jobs)],
+            xml_is_excerpt
+        )
+        try:
+            call_usage, response = self._complete(prompts, use_cache=True)
+        except LLMCompletionError as e:
+            # Retries are already exhausted; re-sending each pattern would only repeat the failure
+            return [self._failed_identification(e.failure) for _ in jobs], usage
+        usage.add(call_usage)
+        batch_results = self._parse_batch_identification_response(response, pattern_ids)
+        if len(batch_results) == len(pattern_ids) and not call_usage.cache_hits:
+            self._cache_response(prompts, response)
+
+        responses = []
+        for pattern_id, job in zip(pattern_ids, jobs):
+            if pattern_id in batch_results:
+                responses.append(batch_results[pattern_id])
+                continue
+            response_obj_json, fallback_usage = self._identify_pattern(
+                unknown_source_xml_content, job.search_prompt, job.use_intelligent, xml_is_excerpt
+            )
+            usage.add(fallback_usage)
+            responses.append(response_obj_json)
+        return responses, usage
+
+    @classmethod
+    def _parse_batch_identification_response(cls, response, pattern_ids):
+        """
+        Parse a batched response into {pattern_id: {"confirmation", "reason"}}, keeping only
+        well-formed entries for the requested pattern ids.
+        """
+        if not response:
+            return {}
+        try:
+            parsed = cls._parse_identification_response(response)
+        except (ValueError, TypeError):
+            return {}
+        if isinstance(parsed, dict):
+            parsed = parsed.get("results", [])
+        if not isinstance(parsed, list):
+            return {}
+
+        results = {}
+        for entry in parsed:
+            if not isinstance(entry, dict):
+                continue
+            pattern_id = str(entry.get("pattern_id", "")).strip()
+            confirmation = str(entry.get("confirmation", "")).strip().upper()
+            if pattern_id in pattern_ids and pattern_id not in results and confirmation in ("YES", "NO"):
+                results[pattern_id] = {"confirmation": confirmation, "reason": entry.get("reason", "")}
+        return results
     
     def intelligent_airline_identification(self, unknown_source_xml_content, filter_info=None):
         """
@@ -273,11 +509,11 @@ class PatternIdentifyManager(GapAnalysisManager, GapAnalysisPromptManager):
                 
                 # Perform intelligent matching
                 intelligent_matches = self.intelligent_matcher.intelligent_match(
-                    unknown_combination, unknown_relationship, similarity_threshold=0.6
+                    unknown_combination, unknown_relationship, similarity_threshold=0.6, top_k=5
                 )
                 
                 # Process intelligent matches
-                for airline_key, confidence in intelligent_matches[:5]:  # Top 5 matches
+                for airline_key, confidence in intelligent_matches:
                     parts = airline_key.split('_', 1)
                     airline_code = parts[0] if len(parts) > 0 else airline_key
                     api_version = parts[1] if len(parts) > 1 else "Unknown"
@@ -339,47 +575,70 @@ class PatternIdentifyManager(GapAnalysisManager, GapAnalysisPromptManager):
     def _load_known_airline_patterns(self):
         """Load known airline patterns from database for intelligent matching"""
         try:
-            # Get all patterns from workspace
-            all_patterns = self.db_utils.get_all_patterns()
-            
-            # Process patterns to extract airline fingerprints
-            for pattern in all_patterns:
-                if isinstance(pattern, tuple) and len(pattern) >= 5:
-                    api_name, api_version, section_name, pattern_description, pattern_prompt = pattern[:5]
-                    
-                    # Look for PaxList-related patterns
-                    if "paxlist" in section_name.lower() or "pax" in pattern_description.lower():
-                        # Try to extract pattern from description/prompt
-                        combo = self._extract_combination_from_text(pattern_description + " " + pattern_prompt)
-                        if combo:
-                            # Create a dummy relationship pattern (would be better to store this)
-                            rel_pattern = RelationshipPattern(
-                                direction="INF→ADT",  # Default assumption
-                                reference_structure="Standard PaxRefID structure", 
-                                linking_rules="Infant references adult",
-                                confidence=0.5
-                            )
-                            
-                            fingerprint = AirlineFingerprint(
-                                airline_code=api_name or "Unknown",
-                                api_version=api_version or "Unknown",
-                                passenger_combination=combo,
-                                relationship_pattern=rel_pattern,
-                                structural_signature=pattern_description,
-                                distinguishing_features=[],
-                                confidence_score=0.8
-                            )
-                            
-                            self.intelligent_matcher.learn_pattern(fingerprint)
-            
-            # Also load from default patterns if available
-            self._load_default_airline_patterns()
-            
+            # Shared while the workspace database is unchanged
+            self.intelligent_matcher.fingerprint_index = get_pattern_catalog_cache().get(
+                self.db_utils.db_path, ("fingerprint_index",), self._load_fingerprint_index
+            )
         except Exception as e:
             st.warning(f"Could not load airline patterns for intelligent matching: {e}")
     
-    def _load_default_airline_patterns(self):
-        """Load some default airline patterns for common scenarios"""
+    def _load_fingerprint_index(self):
+        """
+        The fingerprint index saved next to the workspace database, rebuilt and saved again
+        if the workspace patterns or the default patterns have changed since it was built
+        """
+        all_patterns = self.db_utils.get_all_patterns()
+        default_fingerprints = self._default_airline_fingerprints()
+        stamp = FingerprintIndex.stamp((all_patterns, default_fingerprints))
+        index_path = self.db_utils.db_path.with_name(f"{self.db_utils.db_path.stem}_fingerprints.npz")
+        
+        index = FingerprintIndex.load(index_path)
+        if index is not None and index.source_stamp == stamp:
+            return index
+        
+        index = FingerprintIndex(stamp)
+        for fingerprint in self._workspace_airline_fingerprints(all_patterns) + default_fingerprints:
+            index.add(fingerprint)
+        try:
+            index.save(index_path)
+        except OSError as e:
+            logger.warning(f"Could not save fingerprint index {index_path}: {e}")
+        return index
+    
+    def _workspace_airline_fingerprints(self, all_patterns):
+        """Airline fingerprints extracted from the workspace patterns"""
+        fingerprints = []
+        # Process patterns to extract airline fingerprints
+        for pattern in all_patterns:
+            if isinstance(pattern, tuple) and len(pattern) >= 5:
+                api_name, api_version, section_name, pattern_description, pattern_prompt = pattern[:5]
+                
+                # Look for PaxList-related patterns
+                if "paxlist" in section_name.lower() or "pax" in pattern_description.lower():
+                    # Try to extract pattern from description/prompt
+                    combo = self._extract_combination_from_text(pattern_description + " " + pattern_prompt)
+                    if combo:
+                        # Create a dummy relationship pattern (would be better to store this)
+                        rel_pattern = RelationshipPattern(
+                            direction="INF→ADT",  # Default assumption
+                            reference_structure="Standard PaxRefID structure", 
+                            linking_rules="Infant references adult",
+                            confidence=0.5
+                        )
+                        
+                        fingerprints.append(AirlineFingerprint(
+                            airline_code=api_name or "Unknown",
+                            api_version=api_version or "Unknown",
+                            passenger_combination=combo,
+                            relationship_pattern=rel_pattern,
+                            structural_signature=pattern_description,
+                            distinguishing_features=[],
+                            confidence_score=0.8
+                        ))
+        return fingerprints
+    
+    def _default_airline_fingerprints(self):
+        """Some default airline patterns for common scenarios"""
         # Common airline patterns - in real implementation, these would come from a database
         default_patterns = [
             {
@@ -399,8 +658,8 @@ class PatternIdentifyManager(GapAnalysisManager, GapAnalysisPromptManager):
             }
         ]
         
-        for pattern_data in default_patterns:
-            fingerprint = AirlineFingerprint(
+        return [
+            AirlineFingerprint(
                 airline_code=pattern_data["airline"],
                 api_version=pattern_data["version"],
                 passenger_combination=pattern_data["combo"],
@@ -409,7 +668,8 @@ class PatternIdentifyManager(GapAnalysisManager, GapAnalysisPromptManager):
                 distinguishing_features=["Default pattern"],
                 confidence_score=0.7
             )
-            self.intelligent_matcher.learn_pattern(fingerprint)
+            for pattern_data in default_patterns
+        ]
     
     def _extract_combination_from_text(self, text):
         """Extract passenger combination from description text"""
@@ -430,8 +690,10 @@ class PatternIdentifyManager(GapAnalysisManager, GapAnalysisPromptManager):
     def _get_shared_patterns_for_identification(self, xml_content, selected_airlines=None, selected_versions=None):
         """Get shared patterns that might match the XML content"""
         try:
-            from core.database.default_patterns_manager import DefaultPatternsManager
-            default_patterns_manager = DefaultPatternsManager()
+            default_patterns_manager = self.default_patterns_manager
+            if default_patterns_manager is None:
+                from core.database.default_patterns_manager import get_default_patterns_manager
+                default_patterns_manager = get_default_patterns_manager()
             shared_patterns = default_patterns_manager.get_all_patterns()
             
             # Convert to format expected by identification logic
@@ -462,32 +724,74 @@ class PatternIdentifyManager(GapAnalysisManager, GapAnalysisPromptManager):
             st.error(f"Error loading shared patterns: {e}")
             return []
 
-    def identify_patterns_in_unknown_source_xml(self, unknown_source_xml_content, search_prompt):
-        self.load_prompts_for_pattern_identification(unknown_source_xml_content, search_prompt)
-        response = self._initiate_conversation()
+    @staticmethod
+    def _parse_identification_response(response):
         response_obj = re.sub(r'[\x00-\x1F\x7F]', '', response)
-        response_obj_json = json.loads(response_obj)
+        return json.loads(response_obj)
+
+    def _identify_pattern(self, unknown_source_xml_content, search_prompt, use_intelligent=False, xml_is_excerpt=False):
+        """
+        Thread-safe identification of a single pattern. Identical XML and prompt pairs are
+        served from the response cache.
+
+        Returns:
+            tuple: (response_obj_json, LLMUsage)
+        """
+        usage = LLMUsage()
+        try:
+            if use_intelligent:
+                try:
+                    prompts = self.build_prompts_for_intelligent_pattern_identification(unknown_source_xml_content, search_prompt, xml_is_excerpt)
+                    return self._complete_identification(prompts, usage), usage
+                except LLMCompletionError:
+                    raise
+                except Exception:
+                    # Fallback to regular identification if enhanced method fails
+                    pass
+
+            prompts = self.build_prompts_for_pattern_identification(unknown_source_xml_content, search_prompt, xml_is_excerpt)
+            return self._complete_identification(prompts, usage), usage
+        except LLMCompletionError as e:
+            return self._failed_identification(e.failure), usage
+
+    @staticmethod
+    def _failed_identification(failure):
+        """Rule result for a pattern whose LLM request failed after retries"""
+        return {
+            "confirmation": "NO",
+            "reason": f"LLM request failed ({failure.error_type}): {failure.message}",
+            "llm_failed": True
+        }
+
+    def _complete_identification(self, prompts, usage):
+        call_usage, response = self._complete(prompts, use_cache=True)
+        usage.add(call_usage)
+        response_obj_json = self._parse_identification_response(response)
+        if not call_usage.cache_hits:
+            self._cache_response(prompts, response)
+        return response_obj_json
+
+    def identify_patterns_in_unknown_source_xml(self, unknown_source_xml_content, search_prompt, xpath=None):
+        xml_content, is_excerpt = XMLSlicer(unknown_source_xml_content).get_xml_for_pattern(xpath)
+        response_obj_json, usage = self._identify_pattern(xml_content, search_prompt, xml_is_excerpt=is_excerpt)
+        self._record_llm_usage(usage)
         return response_obj_json
     
-    def identify_patterns_in_unknown_source_xml_intelligent(self, unknown_source_xml_content, search_prompt):
+    def identify_patterns_in_unknown_source_xml_intelligent(self, unknown_source_xml_content, search_prompt, xpath=None):
         """
         Enhanced pattern identification using intelligent passenger combination analysis.
-        Uses the enhanced_paxlist_pattern_analysis.md prompt for deeper analysis.
+        Uses the enhanced_paxlist_pattern_analysis.md prompt for deeper analysis and falls
+        back to regular identification if the enhanced method fails.
         """
-        try:
-            self.load_prompts_for_intelligent_pattern_identification(unknown_source_xml_content, search_prompt)
-            response = self._initiate_conversation()
-            response_obj = re.sub(r'[\x00-\x1F\x7F]', '', response)
-            response_obj_json = json.loads(response_obj)
-            return response_obj_json
-        except Exception as e:
-            # Fallback to regular identification if enhanced method fails
-            # st.warning(f"Enhanced pattern identification failed: {e}. Using standard method.")
-            return self.identify_patterns_in_unknown_source_xml(unknown_source_xml_content, search_prompt)
+        xml_content, is_excerpt = XMLSlicer(unknown_source_xml_content).get_xml_for_pattern(xpath)
+        response_obj_json, usage = self._identify_pattern(xml_content, search_prompt, use_intelligent=True, xml_is_excerpt=is_excerpt)
+        self._record_llm_usage(usage)
+        return response_obj_json
 
     def display_api_analysis(self, data):
         sections = data.get('sections', [])
         matched_airlines = data.get('matched_airlines', [])
+        skipped_llm_calls = data.get('skipped_llm_calls', 0)
         combination_analysis = data.get('combination_analysis', {})
         confidence_scores = data.get('confidence_scores', {})
         intelligent_matches = data.get('intelligent_matches', [])
@@ -521,10 +825,11 @@ class PatternIdentifyManager(GapAnalysisManager, GapAnalysisPromptManager):
                     'API Version': api_version,
                     'Section': section_name,
                     'Validation Rule': rule.get('verificationRule'),
-                    'Verified': 'Yes' if rule.get('matched') else 'No',
+                    'Verified': 'Yes' if rule.get('matched') else ('N/A' if rule.get('not_applicable') else 'No'),
                     'Confidence': f"{confidence_score:.1%}" if match_type == "intelligent" else "100%",
                     'Reason': rule.get('reason')
                 })
+        import pandas as pd
         df = pd.DataFrame(rows)
         
         # Sort to show verified "Yes" entries first
@@ -556,6 +861,9 @@ class PatternIdentifyManager(GapAnalysisManager, GapAnalysisPromptManager):
             from core.common.css_utils import get_css_path
             css_path = get_css_path()
             render_custom_table(df, long_text_cols, css_path)
+
+        if skipped_llm_calls:
+            st.caption(f"⏭️ {skipped_llm_calls} pattern check(s) skipped without an LLM call: their section is not present in the XML.")
         
         st.subheader("Matched Airline(s):")
         if matched_airline_versions:
@@ -1,9 +1,29 @@
+import hashlib
+import io
+import os
 import re
 import json
-from typing import Dict, List, Any, Tuple, Optional
-from dataclasses import dataclass
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Any, Iterable, NamedTuple, Tuple, Optional, Union
+from dataclasses import asdict, dataclass
+
+import numpy as np
+from lxml import etree
+
 from core.common.logging_manager import get_logger
 
+logger = get_logger(__name__)
+
+# Elements describing one passenger: NDC 18.1+ <Pax> and NDC 17.2 <Passenger PassengerID="...">
+PASSENGER_RECORD_ELEMENTS = frozenset({"Pax", "Passenger"})
+PASSENGER_ID_ATTRIBUTE = "PassengerID"
+PASSENGER_DATA_ELEMENTS = PASSENGER_RECORD_ELEMENTS | {"PaxID", "PTC", "PaxRefID", "ContactInfoRef", "Birthdate"}
+# Any namespace or none; other elements are skipped inside lxml
+_PASSENGER_DATA_TAGS = sorted(f"{{*}}{name}" for name in PASSENGER_DATA_ELEMENTS)
+_BIRTHDATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
 @dataclass
 class PassengerCombination:
     """Represents a passenger type combination pattern"""
@@ -39,6 +59,317 @@ class AirlineFingerprint:
     distinguishing_features: List[str]
     confidence_score: float
 
+class PaxRecord(NamedTuple):
+    """One Pax or Passenger element"""
+    pax_id: str
+    ptc: str
+    ref_ids: Tuple[str, ...]
+    birthdate: Optional[str]
+
+
+class PassengerTable(NamedTuple):
+    """Passenger data of an XML document, extracted in a single parse"""
+    records: List[PaxRecord]
+    ptc_counts: Counter
+    birthdates: List[str]
+    pax_ref_count: int
+    contact_ref_count: int
+
+
+class _RecordBuilder:
+    __slots__ = ("pax_id", "ptc", "ref_ids", "birthdate")
+
+    def __init__(self, pax_id: Optional[str]):
+        self.pax_id = pax_id
+        self.ptc: Optional[str] = None
+        self.ref_ids: List[str] = []
+        self.birthdate: Optional[str] = None
+
+
+def _build_passenger_table(events: Iterable[Tuple[str, Any]], release: bool) -> PassengerTable:
+    """
+    Collect passenger data from the start and end events of PASSENGER_DATA_ELEMENTS in a
+    document. Values nested in a Pax or Passenger element belong to the innermost one; the
+    first PaxID, PTC and Birthdate of a record are kept. With release, elements are freed
+    once they have been read, along with the earlier siblings already passed.
+    """
+    records: List[PaxRecord] = []
+    ptc_counts: Counter = Counter()
+    birthdates: List[str] = []
+    pax_ref_count = contact_ref_count = 0
+    open_records: List[_RecordBuilder] = []
+
+    for event, element in events:
+        name = element.tag.rsplit("}", 1)[-1]
+        if event == "start":
+            if name in PASSENGER_RECORD_ELEMENTS:
+                open_records.append(_RecordBuilder(element.get(PASSENGER_ID_ATTRIBUTE)))
+            continue
+
+        text = element.text.strip() if element.text else ""
+        record = open_records[-1] if open_records else None
+        if name in PASSENGER_RECORD_ELEMENTS:
+            record = open_records.pop()
+            if record.pax_id and record.ptc:
+                records.append(PaxRecord(record.pax_id, record.ptc, tuple(record.ref_ids), record.birthdate))
+        elif name == "PTC":
+            if text:
+                ptc_counts[text] += 1
+                if record is not None and record.ptc is None:
+                    record.ptc = text
+        elif name == "PaxRefID":
+            if text:
+                pax_ref_count += 1
+                if record is not None:
+                    record.ref_ids.append(text)
+        elif name == "ContactInfoRef":
+            if text:
+                contact_ref_count += 1
+        elif name == "PaxID":
+            if text and record is not None and record.pax_id is None:
+                record.pax_id = text
+        elif name == "Birthdate":
+            if _BIRTHDATE.fullmatch(text):
+                birthdates.append(text)
+                if record is not None and record.birthdate is None:
+                    record.birthdate = text
+
+        if release:
+            # Free the element and any siblings already read
+            element.clear(keep_tail=True)
+            parent = element.getparent()
+            while parent is not None and element.getprevious() is not None:
+                del parent[0]
+
+    return PassengerTable(records, ptc_counts, birthdates, pax_ref_count, contact_ref_count)
+
+
+def extract_passenger_table(xml_content: Union[str, bytes]) -> PassengerTable:
+    """
+    Passenger records and reference counts of an XML document, matched on local names so
+    namespaced documents are handled. The document is read in one iterparse pass that
+    releases elements as it goes; malformed XML is parsed again in recovery mode.
+    """
+    data = xml_content.encode("utf-8") if isinstance(xml_content, str) else xml_content
+    try:
+        events = etree.iterparse(io.BytesIO(data), events=("start", "end"), tag=_PASSENGER_DATA_TAGS, huge_tree=True)
+        return _build_passenger_table(events, release=True)
+    except etree.XMLSyntaxError as e:
+        logger.warning(f"XML is not well-formed ({e}), reading passengers in recovery mode")
+
+    parser = etree.XMLParser(recover=True, huge_tree=True)
+    try:
+        root = etree.fromstring(data, parser)
+    except etree.XMLSyntaxError:
+        root = None
+    if root is None:
+        return PassengerTable([], Counter(), [], 0, 0)
+    return _build_passenger_table(etree.iterwalk(root, events=("start", "end"), tag=_PASSENGER_DATA_TAGS), release=False)
+
+
+FINGERPRINT_INDEX_VERSION = 1
+
+
+class FingerprintKey(NamedTuple):
+    """Identity of a fingerprint in the index; learning the same key again replaces it"""
+    airline_code: str
+    api_version: str
+    combination_signature: str
+    direction: str
+
+    @classmethod
+    def of(cls, fingerprint: AirlineFingerprint) -> "FingerprintKey":
+        return cls(
+            fingerprint.airline_code, fingerprint.api_version,
+            fingerprint.passenger_combination.pattern_signature, fingerprint.relationship_pattern.direction
+        )
+
+
+class _Vocabulary:
+    """Dense ids for the distinct values of a string feature"""
+
+    def __init__(self, values: Iterable[str] = ()):
+        self.values: List[str] = []
+        self._ids: Dict[str, int] = {}
+        for value in values:
+            self.add(value)
+
+    def add(self, value: str) -> int:
+        if value not in self._ids:
+            self._ids[value] = len(self.values)
+            self.values.append(value)
+        return self._ids[value]
+
+    def id(self, value: str) -> int:
+        """Id of a value, or -1 if it was never added"""
+        return self._ids.get(value, -1)
+
+
+class FingerprintIndex:
+    """
+    Airline fingerprints with their matching features in NumPy arrays, so an unknown
+    pattern is scored against every fingerprint at once. Passenger counts are stored as an
+    (n, 3) array and the relationship strings as ids into per-feature vocabularies.
+    Scores use the weights of IntelligentPatternMatcher._calculate_pattern_similarity.
+
+    The index is saved as a .npz file together with a stamp of the data it was built from,
+    so callers can reuse it across processes until that data changes.
+    """
+
+    def __init__(self, source_stamp: str = ""):
+        self.source_stamp = source_stamp
+        self.fingerprints: List[AirlineFingerprint] = []
+        self._positions: Dict[FingerprintKey, int] = {}
+        self._clear_features()
+
+    def _clear_features(self):
+        self._counts: Optional[np.ndarray] = None
+        self._direction_ids: Optional[np.ndarray] = None
+        self._structure_ids: Optional[np.ndarray] = None
+        self._rule_ids: Optional[np.ndarray] = None
+        self._directions = _Vocabulary()
+        self._structures = _Vocabulary()
+        self._rules = _Vocabulary()
+
+    def __len__(self) -> int:
+        return len(self.fingerprints)
+
+    def add(self, fingerprint: AirlineFingerprint) -> bool:
+        """Add a fingerprint, replacing the one with the same key. Returns whether it was new."""
+        key = FingerprintKey.of(fingerprint)
+        position = self._positions.get(key)
+        if position is None:
+            self._positions[key] = len(self.fingerprints)
+            self.fingerprints.append(fingerprint)
+        else:
+            self.fingerprints[position] = fingerprint
+        self._counts = None
+        return position is None
+
+    def _features(self):
+        """Build the feature arrays after fingerprints were added"""
+        if self._counts is not None:
+            return
+        self._clear_features()
+        self._counts = np.array(
+            [(fp.passenger_combination.adults, fp.passenger_combination.children, fp.passenger_combination.infants)
+             for fp in self.fingerprints],
+            dtype=np.int64
+        ).reshape(-1, 3)
+        self._direction_ids = np.array(
+            [self._directions.add(fp.relationship_pattern.direction) for fp in self.fingerprints], dtype=np.int32
+        )
+        self._structure_ids = np.array(
+            [self._structures.add(fp.relationship_pattern.reference_structure) for fp in self.fingerprints], dtype=np.int32
+        )
+        self._rule_ids = np.array(
+            [self._rules.add(fp.relationship_pattern.linking_rules) for fp in self.fingerprints], dtype=np.int32
+        )
+
+    def scores(self, combination: PassengerCombination, relationship: RelationshipPattern) -> np.ndarray:
+        """Similarity of the unknown pattern to every fingerprint, in insertion order"""
+        self._features()
+        unknown = np.array([combination.adults, combination.children, combination.infants], dtype=np.int64)
+        counts = self._counts
+
+        # Passenger combination: exact match, none when either side is empty, else per type
+        type_similarity = 1.0 - np.abs(counts - unknown) / np.maximum(np.maximum(counts, unknown), 1)
+        partial = (type_similarity[:, 0] * 0.3) + (type_similarity[:, 1] * 0.2) + (type_similarity[:, 2] * 0.5)
+        exact = (counts == unknown).all(axis=1)
+        empty = (counts.sum(axis=1) == 0) | (unknown.sum() == 0)
+        combo_score = np.where(exact, 1.0, np.where(empty, 0.0, partial))
+
+        # Relationship: direction, reference structure containment (per distinct structure) and rules
+        direction_score = np.where(self._direction_ids == self._directions.id(relationship.direction), 1.0, 0.3)
+        structure = relationship.reference_structure
+        contained = np.array(
+            [structure in known or known in structure for known in self._structures.values], dtype=bool
+        )
+        ref_score = np.where(contained[self._structure_ids], 0.5, 0.1)
+        rules_score = np.where(self._rule_ids == self._rules.id(relationship.linking_rules), 0.5, 0.2)
+        rel_score = (direction_score * 0.6) + (ref_score * 0.2) + (rules_score * 0.2)
+
+        return (combo_score * 0.4) + (rel_score * 0.6)
+
+    def search(self, combination: PassengerCombination, relationship: RelationshipPattern,
+               similarity_threshold: float = 0.7, top_k: Optional[int] = None) -> List[Tuple[AirlineFingerprint, float]]:
+        """Fingerprints scoring at least the threshold, best first (ties in insertion order)"""
+        if not self.fingerprints:
+            return []
+        scores = self.scores(combination, relationship)
+        candidates = np.flatnonzero(scores >= similarity_threshold)
+        if top_k is not None and len(candidates) > top_k:
+            if top_k <= 0:
+                return []
+            # Keep every candidate tied with the k-th best so ties resolve by insertion order
+            kth_score = np.partition(scores[candidates], len(candidates) - top_k)[len(candidates) - top_k]
+            candidates = candidates[scores[candidates] >= kth_score]
+        order = candidates[np.lexsort((candidates, -scores[candidates]))]
+        if top_k is not None:
+            order = order[:top_k]
+        return [(self.fingerprints[i], float(scores[i])) for i in order]
+
+    def save(self, path: Union[str, Path]):
+        """Write the index to a .npz file, replacing any previous one atomically"""
+        self._features()
+        metadata = {
+            "format_version": FINGERPRINT_INDEX_VERSION,
+            "source_stamp": self.source_stamp,
+            "fingerprints": [asdict(fp) for fp in self.fingerprints],
+            "directions": self._directions.values,
+            "structures": self._structures.values,
+            "rules": self._rules.values,
+        }
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as f:
+            np.savez(
+                f, counts=self._counts, direction_ids=self._direction_ids, structure_ids=self._structure_ids,
+                rule_ids=self._rule_ids, metadata=np.array(json.dumps(metadata))
+            )
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> Optional["FingerprintIndex"]:
+        """Read an index saved with save(), or None if it is missing, outdated or unreadable"""
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                metadata = json.loads(str(data["metadata"]))
+                if metadata.get("format_version") != FINGERPRINT_INDEX_VERSION:
+                    return None
+                index = cls(metadata["source_stamp"])
+                for fp in metadata["fingerprints"]:
+                    index.add(AirlineFingerprint(
+                        airline_code=fp["airline_code"],
+                        api_version=fp["api_version"],
+                        passenger_combination=PassengerCombination(**fp["passenger_combination"]),
+                        relationship_pattern=RelationshipPattern(**fp["relationship_pattern"]),
+                        structural_signature=fp["structural_signature"],
+                        distinguishing_features=fp["distinguishing_features"],
+                        confidence_score=fp["confidence_score"]
+                    ))
+                index._directions = _Vocabulary(metadata["directions"])
+                index._structures = _Vocabulary(metadata["structures"])
+                index._rules = _Vocabulary(metadata["rules"])
+                index._counts = data["counts"]
+                index._direction_ids = data["direction_ids"]
+                index._structure_ids = data["structure_ids"]
+                index._rule_ids = data["rule_ids"]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Could not load fingerprint index {path}: {e}")
+            return None
+        if len(index._counts) != len(index):
+            logger.warning(f"Fingerprint index {path} is inconsistent, ignoring it")
+            return None
+        return index
+
+    @staticmethod
+    def stamp(source: Any) -> str:
+        """Stamp of the data an index is built from (anything with a stable repr)"""
+        return hashlib.sha256(repr(source).encode("utf-8")).hexdigest()
+
+
 class IntelligentPatternMatcher:
     """
     Enhanced pattern matcher that can intelligently match passenger combinations
@@ -47,87 +378,61 @@ class IntelligentPatternMatcher:
     
     def __init__(self):
         self.logger = get_logger("intelligent_pattern_matcher")
-        self.known_patterns: Dict[str, List[AirlineFingerprint]] = {}
-        self.combination_patterns: Dict[str, List[PassengerCombination]] = {}
+        self.fingerprint_index = FingerprintIndex()
+        # (xml_content, table) of the last document read, shared by the analysis methods
+        self._last_passenger_table: Optional[Tuple[Union[str, bytes], PassengerTable]] = None
         
     def learn_pattern(self, airline_fingerprint: AirlineFingerprint):
         """Learn a new airline pattern"""
-        airline_key = f"{airline_fingerprint.airline_code}_{airline_fingerprint.api_version}"
-        
-        if airline_key not in self.known_patterns:
-            self.known_patterns[airline_key] = []
-        
-        self.known_patterns[airline_key].append(airline_fingerprint)
-        
-        # Also store by combination pattern for intelligent matching
-        combo_key = airline_fingerprint.passenger_combination.pattern_signature
-        if combo_key not in self.combination_patterns:
-            self.combination_patterns[combo_key] = []
-        
-        self.combination_patterns[combo_key].append(airline_fingerprint.passenger_combination)
-        self.logger.info(f"Learned new pattern for {airline_key}: {combo_key}")
+        if self.fingerprint_index.add(airline_fingerprint):
+            airline_key = f"{airline_fingerprint.airline_code}_{airline_fingerprint.api_version}"
+            combo_key = airline_fingerprint.passenger_combination.pattern_signature
+            self.logger.info(f"Learned new pattern for {airline_key}: {combo_key}")
     
+    def passenger_table(self, xml_content: Union[str, bytes]) -> PassengerTable:
+        """Passenger table of a document, reusing the last one for the same content"""
+        cached = self._last_passenger_table
+        if cached is not None and (cached[0] is xml_content or cached[0] == xml_content):
+            return cached[1]
+        table = extract_passenger_table(xml_content)
+        self._last_passenger_table = (xml_content, table)
+        return table
+
     def extract_passenger_combination(self, xml_content: str) -> PassengerCombination:
         """Extract passenger combination from XML content - handles multiple airline formats"""
-        # Handle both PTC and other passenger type formats
-        adults = len(re.findall(r'<PTC>ADT</PTC>', xml_content))
-        children = len(re.findall(r'<PTC>CHD</PTC>', xml_content))
-        infants = len(re.findall(r'<PTC>INF</PTC>', xml_content))
-        
-        # Handle alternative formats (e.g., some airlines use different elements)
-        # Also check for passenger elements without PTC but with age-based classification
-        if adults + children + infants == 0:
-            # Try alternative passenger detection methods
-            passenger_elements = re.findall(r'<Passenger[^>]*>', xml_content)
-            birthdate_pattern = r'<Birthdate>(\d{4}-\d{2}-\d{2})</Birthdate>'
-            birthdates = re.findall(birthdate_pattern, xml_content)
-            
-            # Basic age classification if we have birthdates
-            if birthdates:
-                from datetime import datetime
-                current_year = datetime.now().year
-                for birthdate in birthdates:
-                    birth_year = int(birthdate.split('-')[0])
-                    age = current_year - birth_year
-                    
-                    if age < 2:
-                        infants += 1
-                    elif age < 12:
-                        children += 1
-                    else:
-                        adults += 1
+        table = self.passenger_table(xml_content)
+        adults = table.ptc_counts["ADT"]
+        children = table.ptc_counts["CHD"]
+        infants = table.ptc_counts["INF"]
+        
+        # Without passenger type codes, classify passengers by age if birthdates are given
+        if adults + children + infants == 0 and table.birthdates:
+            from datetime import datetime
+            current_year = datetime.now().year
+            for birthdate in table.birthdates:
+                birth_year = int(birthdate.split('-')[0])
+                age = current_year - birth_year
+                
+                if age < 2:
+                    infants += 1
+                elif age < 12:
+                    children += 1
+                else:
+                    adults += 1
         
         return PassengerCombination(adults, children, infants, "")
     
     def analyze_relationships(self, xml_content: str) -> RelationshipPattern:
         """Analyze passenger relationship patterns in XML - handles multiple airline formats"""
-        # Find all reference patterns (both PaxRefID and other reference types)
-        pax_ref_pattern = r'<PaxRefID>([^<]+)</PaxRefID>'
-        pax_refs = re.findall(pax_ref_pattern, xml_content)
-        
-        # Also look for other reference patterns
-        contact_ref_pattern = r'<ContactInfoRef>([^<]+)</ContactInfoRef>'
-        contact_refs = re.findall(contact_ref_pattern, xml_content)
-        
-        # Find PTC patterns with context (handle both Pax and Passenger elements)
-        ptc_context_pattern = r'<Pax>.*?<PaxID>([^<]+)</PaxID>.*?<PTC>([^<]+)</PTC>(?:.*?<PaxRefID>([^<]+)</PaxRefID>)?.*?</Pax>'
-        pax_matches = re.findall(ptc_context_pattern, xml_content, re.DOTALL)
-        
-        # Handle PassengerList format (Iberia style)
-        passenger_context_pattern = r'<Passenger[^>]*PassengerID="([^"]+)"[^>]*>.*?<PTC>([^<]+)</PTC>(?:.*?<PaxRefID>([^<]+)</PaxRefID>)?.*?</Passenger>'
-        passenger_matches = re.findall(passenger_context_pattern, xml_content, re.DOTALL)
-        
-        # Combine matches from both formats
-        matches = pax_matches + passenger_matches
+        table = self.passenger_table(xml_content)
         
         # Analyze relationship direction
         infant_to_adult_refs = []
         adult_to_infant_refs = []
         
         pax_info = {}  # pax_id -> (ptc, ref_id)
-        for match in matches:
-            pax_id, ptc, ref_id = match
-            pax_info[pax_id] = (ptc, ref_id if ref_id else None)
+        for record in table.records:
+            pax_info[record.pax_id] = (record.ptc, record.ref_ids[0] if record.ref_ids else None)
         
         # Determine relationship direction
         for pax_id, (ptc, ref_id) in pax_info.items():
@@ -150,8 +455,7 @@ class IntelligentPatternMatcher:
             direction = "BIDIRECTIONAL"
         
         # Generate reference structure description
-        total_refs = len(pax_refs) + len(contact_refs)
-        ref_structure = f"Found {len(pax_refs)} PaxRefID elements, {len(contact_refs)} ContactInfoRef elements"
+        ref_structure = f"Found {table.pax_ref_count} PaxRefID elements, {table.contact_ref_count} ContactInfoRef elements"
         if infant_to_adult_refs:
             ref_structure += f", {len(infant_to_adult_refs)} INF→ADT links"
         if adult_to_infant_refs:
@@ -173,26 +477,16 @@ class IntelligentPatternMatcher:
     
     def intelligent_match(self, unknown_combination: PassengerCombination, 
                          unknown_relationship: RelationshipPattern,
-                         similarity_threshold: float = 0.7) -> List[Tuple[str, float]]:
+                         similarity_threshold: float = 0.7,
+                         top_k: Optional[int] = None) -> List[Tuple[str, float]]:
         """
         Intelligently match unknown patterns against known airline patterns.
-        Returns list of (airline_key, confidence_score) tuples.
+        Returns list of (airline_key, confidence_score) tuples, best first, at most top_k.
         """
-        matches = []
-        
-        for airline_key, fingerprints in self.known_patterns.items():
-            for fingerprint in fingerprints:
-                confidence = self._calculate_pattern_similarity(
-                    unknown_combination, unknown_relationship,
-                    fingerprint.passenger_combination, fingerprint.relationship_pattern
-                )
-                
-                if confidence >= similarity_threshold:
-                    matches.append((airline_key, confidence))
-        
-        # Sort by confidence score
-        matches.sort(key=lambda x: x[1], reverse=True)
-        return matches
+        matches = self.fingerprint_index.search(
+            unknown_combination, unknown_relationship, similarity_threshold, top_k
+        )
+        return [(f"{fp.airline_code}_{fp.api_version}", confidence) for fp, confidence in matches]
     
     def _calculate_pattern_similarity(self, 
                                     unknown_combo: PassengerCombination,
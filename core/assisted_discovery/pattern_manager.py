@@ -1,24 +1,38 @@
 import streamlit as st
 from lxml import etree
 import json
+import hashlib
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from streamlit_tree_select import tree_select
-from core.assisted_discovery.gap_analysis_manager import GapAnalysisManager
+from core.common.constants import DEFAULT_EXTRACTION_TOKEN_BUDGET, DEFAULT_EXTRACTION_MAX_CONCURRENCY
+from core.assisted_discovery.gap_analysis_manager import GapAnalysisManager, LLMUsage
+from core.assisted_discovery.extraction_planner import ExtractionRequest, merge_extraction_responses, plan_extraction_requests
+from core.llm.completion_result import LLMCompletionError
+from core.llm.token_counter import get_token_counter
 from core.prompts_manager.gap_analysis_prompt_manager import GapAnalysisPromptManager
-from .xml_tree_helper import XMLTreeHelper
-import pandas as pd
+from core.xml_processing.xml_ingest import XMLNodeIndex, outermost_paths
+from core.xml_processing.node_scorer import XMLNodeScorer
 from core.common.ui_utils import render_custom_table
 from core.common.logging_manager import get_logger, log_user_action, log_error, log_performance, PerformanceLogger
-from core.database.default_patterns_manager import DefaultPatternsManager
+from core.database.default_patterns_manager import get_default_patterns_manager
 from core.assisted_discovery.airline_pattern_classifier import AirlinePatternClassifier, PatternValueType
 
+# How often the page checks for patterns streamed by the extraction workers
+STREAM_POLL_SECONDS = 0.1
+# Lists of the insights response shown while it is being generated
+INSIGHT_PATHS = (("insights", "relations"), ("insights", "pattern_extraction_suggestions"))
+# Classifier score a pattern needs to be kept by the airline-focused extraction
+AIRLINE_FOCUSED_MIN_SCORE = 50.0
+
 
 class PatternManager(GapAnalysisManager, GapAnalysisPromptManager):
 
-    def __init__(self, model_name):
-        super().__init__(model_name)
+    def __init__(self, model_name, headless=False):
+        super().__init__(model_name, headless)
         self.logger = get_logger("pattern_manager")
-        self.default_patterns_manager = DefaultPatternsManager()
+        self.default_patterns_manager = get_default_patterns_manager()
         self.airline_classifier = AirlinePatternClassifier()
         
     def extract_patterns(self, uploaded_file):
@@ -95,7 +109,16 @@ class PatternManager(GapAnalysisManager, GapAnalysisPromptManager):
                         if getattr(st.session_state, "insights", None) is None:
                             progress_bar.progress(40)
                             status_text.text("🧠 Genie is analyzing node relationships and patterns...")
-                            insights = self._extract_insights(selected_nodes_map)
+                            insights_found = {path[-1]: 0 for path in INSIGHT_PATHS}
+
+                            def show_insight(path, item):
+                                insights_found[path[-1]] += 1
+                                status_text.text(
+                                    f"🧠 Genie is analyzing node relationships... {insights_found['relations']} relations, "
+                                    f"{insights_found['pattern_extraction_suggestions']} suggestions so far"
+                                )
+
+                            insights = self._extract_insights(selected_nodes_map, on_insight=show_insight)
                         else:
                             progress_bar.progress(40)
                             status_text.text("🧠 Using existing insights...")
@@ -103,7 +126,23 @@ class PatternManager(GapAnalysisManager, GapAnalysisPromptManager):
                     
                     progress_bar.progress(70)
                     status_text.text("🤖 Generating patterns with Genie...")
-                    response = self.generate_airline_focused_patterns(selected_nodes_map, insights)
+                    # Patterns are shown as the model writes them, already scored by the classifier
+                    live_patterns = st.empty()
+                    streamed_patterns = []
+
+                    def show_pattern(entry):
+                        pattern = entry.get("pattern") if isinstance(entry, dict) else None
+                        if not isinstance(pattern, dict):
+                            return
+                        score = self.airline_classifier.classify_pattern(pattern).score
+                        if score < AIRLINE_FOCUSED_MIN_SCORE:
+                            return
+                        streamed_patterns.append(f"- ✨ **{pattern.get('name', 'Pattern')}** `{pattern.get('path', '')}` ({score:.0f})")
+                        status_text.text(f"🤖 Generating patterns with Genie... {len(streamed_patterns)} high-value patterns so far")
+                        live_patterns.markdown("\n".join(streamed_patterns))
+
+                    response = self.generate_airline_focused_patterns(selected_nodes_map, insights, on_pattern=show_pattern)
+                    live_patterns.empty()
                     reasoning_log = response.get('reasoning_log', '') if response else ''
                     raw_patterns = response.get('patterns', []) if response else []
                     
@@ -111,16 +150,16 @@ class PatternManager(GapAnalysisManager, GapAnalysisPromptManager):
                     if raw_patterns:
                         progress_bar.progress(85)
                         status_text.text("🔍 Filtering for high-value patterns...")
-                        min_score = 50.0  # Higher threshold for airline-focused filtering
-                            
                         patterns, classifications = self.airline_classifier.filter_patterns(
-                            [p['pattern'] for p in raw_patterns], min_score=min_score
+                            [p['pattern'] for p in raw_patterns], min_score=AIRLINE_FOCUSED_MIN_SCORE
                         )
                         # Convert back to expected format
                         patterns = [{'pattern': p} for p in patterns]
                         
                         # Log classification results
-                        recommendations = self.airline_classifier.get_pattern_recommendations([p['pattern'] for p in raw_patterns])
+                        recommendations = self.airline_classifier.get_pattern_recommendations(
+                            [p['pattern'] for p in raw_patterns], classifications
+                        )
                         self.logger.info(f"Pattern extraction efficiency: {recommendations['efficiency_score']:.1f}%")
                         
                         # Show filtering results
@@ -283,73 +322,195 @@ class PatternManager(GapAnalysisManager, GapAnalysisPromptManager):
             st.warning("Could not parse pattern extraction response as JSON. Using default behavior.")
             return None
     
-    def generate_airline_focused_patterns(self, content, insights=None):
+    def generate_airline_focused_patterns(self, content, insights=None, max_concurrency=None, on_pattern=None):
         """
         Generate airline-focused patterns that help distinguish between carriers.
         Uses the enhanced airline_focused_pattern_extraction.md prompt.
         
+        The selected nodes are packed into as many requests as the prompt token budget
+        (EXTRACTION_TOKEN_BUDGET) requires, counted with the model's tokenizer. The requests
+        run concurrently (EXTRACTION_MAX_CONCURRENCY) and their patterns are merged by path.
+        
+        With on_pattern, the responses are streamed and on_pattern is called on the calling
+        thread with each pattern entry ({"pattern": {...}}) as soon as the model has written
+        it, long before the whole response is complete. The returned response is still the
+        authoritative result; entries seen through on_pattern may repeat a path.
+        
         Args:
-            content (str): The XML content
+            content (dict): The selected XML nodes, path -> XML
             insights (dict, optional): Insights about the XML structure and relationships
+            on_pattern (callable, optional): Called with each pattern entry as it arrives
         """
+        token_counter = get_token_counter(self.agent.model_name)
+        token_budget = self._resolve_int_setting("EXTRACTION_TOKEN_BUDGET", DEFAULT_EXTRACTION_TOKEN_BUDGET)
+        if isinstance(content, dict):
+            base_tokens = token_counter.count_messages(self.build_prompts_for_airline_focused_extraction({}, insights))
+            requests = plan_extraction_requests(content, token_counter.count, max(1, token_budget - base_tokens))
+        else:
+            requests = [ExtractionRequest(content, token_counter.count(str(content)))]
+        if not requests:
+            return None
+        self.logger.info(f"Airline-focused extraction in {len(requests)} request(s)")
+        
+        if max_concurrency is None:
+            max_concurrency = self._resolve_int_setting("EXTRACTION_MAX_CONCURRENCY", DEFAULT_EXTRACTION_MAX_CONCURRENCY)
+        max_workers = min(max(1, int(max_concurrency)), len(requests))
+        # Workers only talk to the LLM; usage, warnings and streamed patterns are handed over
+        # to this thread, where st.session_state is available
+        streamed = queue.Queue() if on_pattern else None
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pattern-extract") as executor:
+            futures = [
+                executor.submit(self._extract_airline_focused_patterns, request.nodes, insights,
+                                streamed.put if streamed else None)
+                for request in requests
+            ]
+            try:
+                if streamed:
+                    self._deliver_streamed_patterns(streamed, futures, on_pattern)
+                outcomes = [future.result() for future in futures]
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                raise
+        
+        responses = []
+        for response_json, usage, warnings in outcomes:
+            self._record_llm_usage(usage)
+            for warning in warnings:
+                if self.headless:
+                    self.logger.warning(warning)
+                else:
+                    st.warning(warning)
+            responses.append(response_json)
+        return merge_extraction_responses(responses)
+
+    @staticmethod
+    def _deliver_streamed_patterns(streamed, futures, on_pattern):
+        """Pass patterns queued by the extraction workers to on_pattern until all workers are done"""
+        while True:
+            try:
+                on_pattern(streamed.get(timeout=STREAM_POLL_SECONDS))
+            except queue.Empty:
+                if all(future.done() for future in futures):
+                    break
+        # Patterns queued between the last poll and the workers finishing
+        while not streamed.empty():
+            on_pattern(streamed.get_nowait())
+
+    def _extract_airline_focused_patterns(self, content, insights=None, on_pattern=None):
+        """
+        Thread-safe airline-focused extraction for one request, falling back to the standard
+        extraction prompt if the response cannot be parsed.
+        
+        With on_pattern, the response is streamed and each pattern entry is passed to
+        on_pattern (on this worker thread) as soon as it is complete. If the stream breaks off
+        or the full response cannot be parsed, the patterns received so far are kept instead
+        of repeating the request with the standard prompt.
+        
+        Returns:
+            tuple: (response JSON or None, LLMUsage, list of warnings to show)
+        """
+        usage = LLMUsage()
+        prompts = self.build_prompts_for_airline_focused_extraction(content, insights)
+        received = []
         try:
-            self.load_prompts_for_airline_focused_extraction(content, insights)
-            response = self._initiate_conversation()
-            
-            # Debug logging
-            self.logger.info(f"Airline-focused extraction response length: {len(response)}")
-            self.logger.debug(f"First 500 chars of response: {response[:500]}")
-            
-            # Try to clean the response first
-            response_cleaned = response.strip()
+            if on_pattern:
+                def on_element(path, entry):
+                    received.append(entry)
+                    on_pattern(entry)
+                call_usage, response = self._stream_complete(prompts, [("patterns",)], on_element)
+            else:
+                call_usage, response = self._complete(prompts)
+            usage.add(call_usage)
+        except LLMCompletionError as e:
+            # Retries are already exhausted; the standard prompt would only repeat the failure
+            self.logger.error(f"Airline-focused extraction failed: {e}")
+            if received:
+                return {"patterns": received}, usage, [
+                    f"Airline-focused extraction was interrupted ({e}); keeping the {len(received)} patterns received."
+                ]
+            return None, usage, [f"Airline-focused extraction failed: {e}"]
+        
+        # Debug logging
+        self.logger.info(f"Airline-focused extraction response length: {len(response)}")
+        self.logger.debug(f"First 500 chars of response: {response[:500]}")
+        response_json = self._parse_airline_focused_response(response)
+        if response_json is not None:
+            return response_json, usage, []
+        if received:
+            # Typically a response cut off at the completion token limit
+            self.logger.warning(f"Keeping {len(received)} streamed patterns of an unparseable response")
+            return {"patterns": received}, usage, []
+        
+        warnings = ["Could not parse airline-focused pattern extraction response. Using fallback."]
+        self.logger.warning("Falling back to standard extraction method")
+        try:
+            call_usage, response = self._complete(self.build_prompts_for_extracting_patterns(content, insights))
+            usage.add(call_usage)
+        except LLMCompletionError as e:
+            self.logger.error(f"Standard extraction failed: {e}")
+            return None, usage, warnings + [f"Standard extraction failed: {e}"]
+        try:
+            return json.loads(response), usage, warnings
+        except json.JSONDecodeError:
+            return None, usage, warnings + ["Could not parse pattern extraction response as JSON. Using default behavior."]
+
+    def _parse_airline_focused_response(self, response):
+        """The JSON object in an airline-focused extraction response, or None"""
+        # Try to clean the response first
+        response_cleaned = response.strip()
+        
+        # Remove common markdown formatting that might interfere
+        if response_cleaned.startswith('```json'):
+            response_cleaned = response_cleaned[7:]
+        if response_cleaned.startswith('```'):
+            response_cleaned = response_cleaned[3:]
+        if response_cleaned.endswith('```'):
+            response_cleaned = response_cleaned[:-3]
             
-            # Remove common markdown formatting that might interfere
-            if response_cleaned.startswith('```json'):
-                response_cleaned = response_cleaned[7:]
-            if response_cleaned.startswith('```'):
-                response_cleaned = response_cleaned[3:]
-            if response_cleaned.endswith('```'):
-                response_cleaned = response_cleaned[:-3]
-                
-            response_cleaned = response_cleaned.strip()
+        response_cleaned = response_cleaned.strip()
+        
+        try:
+            response_json = json.loads(response_cleaned)
+            self.logger.info("Successfully parsed airline-focused pattern extraction response")
+            return response_json
+        except json.JSONDecodeError as e:
+            self.logger.error(f"JSON decode error: {e}")
+            self.logger.error(f"Problematic response: {response_cleaned[:1000]}")
             
-            try:
-                response_json = json.loads(response_cleaned)
-                self.logger.info("Successfully parsed airline-focused pattern extraction response")
-                return response_json
-            except json.JSONDecodeError as e:
-                self.logger.error(f"JSON decode error: {e}")
-                self.logger.error(f"Problematic response: {response_cleaned[:1000]}")
-                
-                # Try to fix common JSON issues
-                if response_cleaned.startswith('{') and response_cleaned.endswith('}'):
-                    try:
-                        # Remove control characters that might cause issues
-                        import re
-                        cleaned_response = re.sub(r'[\x00-\x1F\x7F]', '', response_cleaned)
-                        response_json = json.loads(cleaned_response)
-                        return response_json
-                    except:
-                        pass
-                
-                st.warning("Could not parse airline-focused pattern extraction response. Using fallback.")
-                self.logger.warning("Falling back to standard extraction method")
-                return self.generate_prompt_from_xml_chunk(content, insights)
-                
-        except Exception as e:
-            self.logger.error(f"Airline-focused extraction failed with exception: {e}")
-            st.warning(f"Airline-focused extraction failed: {str(e)}. Using standard extraction.")
-            # Fallback to standard extraction
-            return self.generate_prompt_from_xml_chunk(content, insights)
+            # Try to fix common JSON issues
+            if response_cleaned.startswith('{') and response_cleaned.endswith('}'):
+                try:
+                    # Remove control characters that might cause issues
+                    import re
+                    cleaned_response = re.sub(r'[\x00-\x1F\x7F]', '', response_cleaned)
+                    return json.loads(cleaned_response)
+                except:
+                    pass
+            return None
 
-    def _extract_insights(self, selected_nodes_map):
+    def _extract_insights(self, selected_nodes_map, on_insight=None):
         """
         Extract insights for the given selected_nodes_map (dict of path to XML string).
         Handles prompt loading, conversation, response parsing, and updates session state.
+        With on_insight, the response is streamed and on_insight(path, item) is called with
+        each relation and extraction suggestion as soon as it is complete.
         Returns the insights dict or None if parsing fails.
         """
         self.load_prompts_for_insights(selected_nodes_map)
-        response = self._initiate_conversation()
+        if on_insight is None:
+            response = self._initiate_conversation()
+        else:
+            try:
+                usage, response = self._stream_complete(self.agent.get_all_prompts(), INSIGHT_PATHS, on_insight)
+                self._record_llm_usage(usage)
+            except LLMCompletionError as e:
+                self._record_llm_usage(LLMUsage(calls=1))
+                st.error(f"LLM request failed ({e.failure.error_type}): {e.failure.message}")
+                response = None
+        if response is None:
+            st.warning("Could not get insights. Please try again.")
+            return None
         try:
             response_json = json.loads(response)
             insights = response_json.get("insights")
@@ -397,9 +558,8 @@ class PatternManager(GapAnalysisManager, GapAnalysisPromptManager):
         selected_nodes_map = {}
         if uploaded_file:
             try:
-                # Try to parse the XML with proper error handling
-                xml_tree = etree.parse(uploaded_file)
-                root = xml_tree.getroot()
+                # Index the XML in one streaming pass instead of holding a full element tree
+                node_index = self._get_node_index(uploaded_file)
             except etree.XMLSyntaxError as e:
                 st.error(f"❌ **XML Parsing Error**: {str(e)}")
                 st.markdown("""
@@ -425,7 +585,7 @@ class PatternManager(GapAnalysisManager, GapAnalysisPromptManager):
                 return {}
             
             # If parsing succeeded, continue with tree processing
-            tree_data = [XMLTreeHelper.xml_to_tree(root)]
+            tree_data = [node_index.to_tree()]
 
             # Enhanced tree layout with modern styling
             
@@ -440,14 +600,8 @@ class PatternManager(GapAnalysisManager, GapAnalysisPromptManager):
                     
                     # Selection status and insights button
                     if selected and 'checked' in selected:
-                        checked_paths = selected['checked']
-                        
-                        # Apply the same filtering logic used for extraction
-                        checked_paths_sorted = sorted(checked_paths, key=len)
-                        filtered_paths = []
-                        for path in checked_paths_sorted:
-                            if not any(path.startswith(parent + '/') for parent in filtered_paths):
-                                filtered_paths.append(path)
+                        # Children of a checked node are part of it; shortest (highest) first
+                        filtered_paths = outermost_paths(selected['checked'])
                                                 
                         st.metric("Selected", len(filtered_paths), "nodes")
                         # Don't automatically extract insights - wait for manual extraction
@@ -461,19 +615,12 @@ class PatternManager(GapAnalysisManager, GapAnalysisPromptManager):
                 st.markdown("#### 📄 Selected Node Preview")
                 
                 if selected and 'checked' in selected:
-                    # Filter out children if parent is selected
-                    checked_paths = selected['checked']
-                    checked_paths = sorted(checked_paths, key=len)  # shortest (highest) first
-                    filtered_paths = []
-                    for path in checked_paths:
-                        if not any(path.startswith(parent + '/') for parent in filtered_paths):
-                            filtered_paths.append(path)
-
                     # Enhanced XML display
                     for i, path in enumerate(filtered_paths):
-                        elem = XMLTreeHelper.find_elem_by_path(root, path)
-                        if elem is not None:
-                            xml_str = etree.tostring(elem, pretty_print=True, encoding='unicode')
+                        node_id = node_index.find(path)
+                        if node_id is not None:
+                            node = node_index.node(node_id)
+                            xml_str = node_index.raw_xml(node_id)
                             selected_nodes_map[path] = xml_str
                             
                             # Enhanced expander with better styling
@@ -481,9 +628,9 @@ class PatternManager(GapAnalysisManager, GapAnalysisPromptManager):
                                 # Add node metadata
                                 node_info_col1, node_info_col2 = st.columns(2)
                                 with node_info_col1:
-                                    st.metric("Attributes", len(elem.attrib))
+                                    st.metric("Attributes", node.attribute_count)
                                 with node_info_col2:
-                                    st.metric("Children", len(list(elem)))
+                                    st.metric("Children", node.child_count)
                                 
                                 # XML content with syntax highlighting
                                 st.code(xml_str, language='xml', line_numbers=True)
@@ -507,6 +654,19 @@ class PatternManager(GapAnalysisManager, GapAnalysisPromptManager):
 
         return selected_nodes_map
 
+    @staticmethod
+    def _get_node_index(uploaded_file):
+        """Node index for the uploaded XML, reused across reruns while the content is unchanged"""
+        uploaded_file.seek(0)
+        content = uploaded_file.read()
+        digest = hashlib.sha1(content).hexdigest()
+        cached = st.session_state.get("xml_node_index")
+        if cached and cached[0] == digest:
+            return cached[1]
+        node_index = XMLNodeIndex(content)
+        st.session_state.xml_node_index = (digest, node_index)
+        return node_index
+
     def reveal_insights(self):
         """Enhanced insights display with modern styling and better organization"""
         
@@ -768,6 +928,7 @@ class PatternManager(GapAnalysisManager, GapAnalysisPromptManager):
             ])
         
         if all_data:
+            import pandas as pd
             df = pd.DataFrame(all_data, columns=['Name', 'XPATH', 'Description', 'Example', 'Category', 'Source'])
             
             # Enhanced table display
@@ -836,6 +997,7 @@ class PatternManager(GapAnalysisManager, GapAnalysisPromptManager):
             
             st.markdown("")
             
+            import pandas as pd
             df = pd.DataFrame(data, columns=['Name', 'XPATH', 'Description', 'Example'])
             
             
@@ -879,121 +1041,15 @@ class PatternManager(GapAnalysisManager, GapAnalysisPromptManager):
         """
         Automatically select suitable nodes for pattern extraction based on size and complexity.
         """
-        from lxml import etree
-        
-        # Configuration constants
-        MAX_NODE_SIZE = 5000  # characters
-        MIN_NODE_SIZE = 50    # minimum useful size
-        MAX_NODES_PER_BATCH = 15  # prevent overwhelming the LLM
-        MAX_RECURSION_DEPTH = 3
-        
         try:
             uploaded_file.seek(0)
             xml_tree = etree.parse(uploaded_file)
-            root = xml_tree.getroot()
-            
-            suitable_nodes = {}
-            
-            def calculate_node_size(node):
-                """Calculate node complexity based on multiple factors"""
-                xml_string = etree.tostring(node, pretty_print=True, encoding='unicode')
-                char_count = len(xml_string)
-                child_count = len(list(node))
-                depth = self._get_max_depth(node)
-                attr_count = len(node.attrib)
-                
-                # Weighted complexity score
-                complexity_score = (
-                    char_count * 0.4 +
-                    child_count * 100 +
-                    depth * 50 +
-                    attr_count * 10
-                )
-                return complexity_score
-            
-            def calculate_usefulness_score(node):
-                """Calculate how useful a node is for pattern extraction"""
-                score = 0
-                
-                # Has text content
-                if node.text and node.text.strip():
-                    score += 50
-                
-                # Has attributes
-                if node.attrib:
-                    score += len(node.attrib) * 20
-                
-                # Has children but not too many
-                child_count = len(list(node))
-                if 1 <= child_count <= 10:
-                    score += 30
-                elif child_count > 10:
-                    score -= 10  # too complex
-                
-                # Prefer nodes that aren't purely structural
-                if node.tag and not node.tag.lower() in ['root', 'document', 'wrapper']:
-                    score += 20
-                
-                return score
-            
-            def analyze_node_recursive(node, path="", depth=0):
-                """Recursively analyze nodes and select suitable ones"""
-                if depth > MAX_RECURSION_DEPTH:
-                    return
-                
-                tag = str(node.tag)
-                current_path = f"{path}/{tag}[0]" if not path else f"{path}/{tag}[{len([p for p in suitable_nodes.keys() if p.startswith(f'{path}/{tag}')])}]"
-                
-                node_size = calculate_node_size(node)
-                usefulness = calculate_usefulness_score(node)
-                
-                if MIN_NODE_SIZE <= node_size <= MAX_NODE_SIZE and usefulness >= 30:
-                    # Node is suitable - add it
-                    xml_string = etree.tostring(node, pretty_print=True, encoding='unicode')
-                    suitable_nodes[current_path] = xml_string
-                elif node_size > MAX_NODE_SIZE:
-                    # Node too big - analyze children
-                    for child in list(node):
-                        analyze_node_recursive(child, current_path, depth + 1)
-                else:
-                    # Node might be too small but check if it has useful children
-                    children = list(node)
-                    if children and depth < MAX_RECURSION_DEPTH - 1:
-                        for child in children[:5]:  # Limit to first 5 children
-                            analyze_node_recursive(child, current_path, depth + 1)
-            
-            # Start analysis from root
-            analyze_node_recursive(root)
-            
-            # If we have too many nodes, select the most useful ones
-            if len(suitable_nodes) > MAX_NODES_PER_BATCH:
-                # Score nodes again and take top ones
-                scored_nodes = []
-                for path, xml_content in suitable_nodes.items():
-                    # Parse the XML content to get the node for scoring
-                    try:
-                        temp_node = etree.fromstring(xml_content)
-                        score = calculate_usefulness_score(temp_node)
-                        scored_nodes.append((path, xml_content, score))
-                    except:
-                        scored_nodes.append((path, xml_content, 0))
-                
-                # Sort by score and take top nodes
-                scored_nodes.sort(key=lambda x: x[2], reverse=True)
-                suitable_nodes = {path: content for path, content, score in scored_nodes[:MAX_NODES_PER_BATCH]}
-            
-            return suitable_nodes
-            
+            return XMLNodeScorer(xml_tree.getroot()).select_nodes()
+
         except Exception as e:
             st.error(f"Error in auto node selection: {e}")
             return {}
-    
-    def _get_max_depth(self, node):
-        """Calculate maximum depth of XML node"""
-        if len(list(node)) == 0:
-            return 1
-        return 1 + max(self._get_max_depth(child) for child in node)
-    
+
     def _analyze_pattern_relationships(self, patterns):
         """
         Analyze extracted patterns to categorize them as individual or linked.
@@ -1,7 +1,7 @@
 import streamlit as st
 from core.assisted_discovery.gap_analysis_manager import GapAnalysisManager
-from core.database.sql_db_utils import SQLDatabaseUtils
-from core.database.default_patterns_manager import DefaultPatternsManager
+from core.database.sql_db_utils import PatternRecord, SQLDatabaseUtils
+from core.database.default_patterns_manager import get_default_patterns_manager
 
 
 
@@ -9,40 +9,23 @@ class PatternSaver(GapAnalysisManager):
     def __init__(self, model_name, db_utils=None):
         super().__init__(model_name)
         self.db_utils = db_utils if db_utils else SQLDatabaseUtils()
-        self.default_patterns_manager = DefaultPatternsManager()
+        self.default_patterns_manager = get_default_patterns_manager()
         
     def save_patterns_to_database(self, selected_api_id):
         try:
-            saved_count = 0
-            
-            for tag, pattern_data in st.session_state.pattern_responses.items():
-                # Extract pattern data
-                pattern_name = pattern_data['name']
-                pattern_description = pattern_data['description']
-                pattern_prompt = pattern_data['prompt']
-                
-                # Insert into api_section table
-                api_section_last_inserted_id = self.db_utils.insert_data(
-                    "api_section",
-                    (selected_api_id, tag, tag),
-                    columns=["api_id", "section_name", "section_display_name"]
-                )
-                
-                # Insert into pattern_details table
-                pattern_details_last_inserted_id = self.db_utils.insert_data(
-                    "pattern_details",
-                    (pattern_name, pattern_description, pattern_prompt),
-                    columns=["pattern_name", "pattern_description", "pattern_prompt"]
+            patterns = [
+                PatternRecord(
+                    section_name=tag,
+                    pattern_name=pattern_data['name'],
+                    pattern_description=pattern_data['description'],
+                    pattern_prompt=pattern_data['prompt']
                 )
-                
-                # Insert into section_pattern_mapping table
-                self.db_utils.insert_data(
-                    "section_pattern_mapping",
-                    (pattern_details_last_inserted_id, api_section_last_inserted_id, selected_api_id),
-                    columns=["pattern_id", "section_id", "api_id"]
-                )
-                
-                saved_count += 1
+                for tag, pattern_data in st.session_state.pattern_responses.items()
+            ]
+
+            # api_section, pattern_details and section_pattern_mapping rows in one transaction
+            saved_patterns = self.db_utils.save_patterns(selected_api_id, patterns)
+            saved_count = len(saved_patterns)
 
             # Enhanced success message with metrics
             st.markdown("""
@@ -59,6 +42,7 @@ class PatternSaver(GapAnalysisManager):
                 </div>
             </div>
             """.format(saved_count, saved_count, saved_count, saved_count), unsafe_allow_html=True)
+            return saved_patterns
             
         except Exception as e:
             st.markdown("""
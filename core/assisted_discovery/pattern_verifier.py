@@ -1,6 +1,7 @@
 import json
 import streamlit as st
 from core.assisted_discovery.gap_analysis_manager import GapAnalysisManager
+from core.llm.completion_result import LLMCompletionError
 from core.prompts_manager.gap_analysis_prompt_manager import GapAnalysisPromptManager
 
 class PatternVerifier(GapAnalysisManager, GapAnalysisPromptManager):
@@ -199,20 +200,26 @@ class PatternVerifier(GapAnalysisManager, GapAnalysisPromptManager):
                 "xml_content": xml_content,
                 "selected_prompt": selected_prompt,
             }
-            self.load_prompts_for_pattern_verfication(conversational_params)
+            prompts = self.build_prompts_for_pattern_verification(conversational_params)
 
             # Use a spinner to indicate processing
             with st.spinner("Verifying the XML with the given prompt..."):
-                # Get the response from the agent
-                raw_content = self._initiate_conversation()
+                # Get the response from the agent, reusing a cached answer for the same XML and prompt
+                usage, raw_content = self._complete(prompts, use_cache=True)
+                self._record_llm_usage(usage)
 
                 # Handle cases where the response starts with "json" or is wrapped in code blocks
                 if raw_content.startswith("json\n") or raw_content.startswith("```json\n"):
                     raw_content = raw_content[raw_content.index("{"):]
                 raw_content = raw_content.rstrip("```")
 
+                if not usage.cache_hits and self._is_json(raw_content):
+                    self._cache_response(prompts, raw_content)
                 return raw_content
 
+        except LLMCompletionError as e:
+            st.error(f"LLM request failed: {e}")
+            raise
         except FileNotFoundError as e:
             st.error(f"File error: {e}")
             raise
@@ -226,6 +233,14 @@ class PatternVerifier(GapAnalysisManager, GapAnalysisPromptManager):
             st.error(f"An unexpected error occurred: {e}")
             raise
 
+    @staticmethod
+    def _is_json(content):
+        try:
+            json.loads(content)
+            return True
+        except (TypeError, ValueError):
+            return False
+
     def improve_or_overwrite_prompt(self, selected_tag, pattern_name, pattern_description, pattern_prompt):
         with st.expander("🔧 Advanced: Improve Pattern Prompt", expanded=False):
             st.markdown("""
@@ -266,20 +266,7 @@ class SpecificationFileManager:
                     return result[0]
             
             # Fallback to pattern mapping query
-            query = """
-                SELECT a.api_name, COALESCE(av.version_number, 'N/A') as api_version, 
-                       pd.pattern_description, pd.pattern_prompt, aps.section_display_name
-                FROM api a
-                LEFT JOIN apiversion av ON a.api_id = av.api_id
-                JOIN api_section aps ON a.api_id = aps.api_id
-                JOIN section_pattern_mapping spm ON aps.section_id = spm.section_id AND aps.api_id = spm.api_id
-                JOIN pattern_details pd ON spm.pattern_id = pd.pattern_id
-                WHERE a.api_name = ? AND aps.section_display_name = ?
-                ORDER BY pd.pattern_id LIMIT 1
-            """
-            
-            result = self.db_utils.execute_query(query, (airline, section_name))
-            return result[0] if result else None
+            return self.db_utils.get_section_pattern(airline, section_name)
             
         except Exception as e:
             logger.error(f"Database specification retrieval failed: {e}")
@@ -1,48 +1,45 @@
+from itertools import islice
+
 import streamlit as st
+from lxml import etree
 from streamlit_tree_select import tree_select
 
+from core.xml_processing.xml_ingest import split_path
+
+
 class XMLTreeHelper:
     """
     Helper class for converting XML to tree structure and finding elements by unique path.
     """
     @staticmethod
     def xml_to_tree(elem, path=""):
-        # Generate a unique path for each node using index among all children
-        def get_path(e):
-            parent = e.getparent()
-            if parent is None:
-                return f"/{e.tag}[0]"
-            idx = list(parent).index(e)
-            return f"{get_path(parent)}/{e.tag}[{idx}]"
-        # If root, start path
-        if not path:
-            path = f"/{elem.tag}[0]"
-        node = {
-            "label": elem.tag,
-            "value": path,
-        }
-        if len(elem) > 0:
-            node["children"] = [XMLTreeHelper.xml_to_tree(child, f"{path}/{child.tag}[{i}]") for i, child in enumerate(elem)]
-        return node
+        # Each node's value is its unique path, using its index among the element children
+        tree = {"label": elem.tag, "value": path or f"/{elem.tag}[0]"}
+        stack = [(elem, tree)]
+        while stack:
+            current, node = stack.pop()
+            children = [
+                {"label": child.tag, "value": f"{node['value']}/{child.tag}[{i}]"}
+                for i, child in enumerate(current.iterchildren(etree.Element))
+            ]
+            if children:
+                node["children"] = children
+                stack.extend(zip(current.iterchildren(etree.Element), children))
+        return tree
 
     @staticmethod
     def find_elem_by_path(elem, path):
-        # path is like /root[0]/child[0]/subchild[0], so split and walk
-        import re
-        parts = re.findall(r'/([^/\[]+)\[(\d+)\]', path)
-        current = elem
-        if not parts:
+        # path is like /root[0]/child[0]/subchild[0]; each step skips to the index-th element
+        # child, comments and processing instructions not counted, without listing the children
+        try:
+            steps = split_path(path)
+        except ValueError:
             return None
-        # The first part should match the root
-        root_tag, root_idx = parts[0]
-        if current.tag != root_tag or int(root_idx) != 0:
+        if not steps or steps[0] != (elem.tag, 0):
             return None
-        for tag, idx in parts[1:]:
-            idx = int(idx)
-            # Get the idx-th child (regardless of tag)
-            children = list(current)
-            if len(children) > idx and children[idx].tag == tag:
-                current = children[idx]
-            else:
+        current = elem
+        for tag, index in steps[1:]:
+            current = next(islice(current.iterchildren(etree.Element), index, None), None)
+            if current is None or current.tag != tag:
                 return None
         return current
@@ -1,38 +1,45 @@
 import os
 from dotenv import load_dotenv, find_dotenv
-from atlassian import Confluence
 
 _ = load_dotenv(find_dotenv())
 ATLASSIAN_USER = os.getenv('ATLASSIAN_USER', '')
 ATLASSIAN_TOKEN = os.getenv('ATLASSIAN_TOKEN', '')
 
-confluence = Confluence(
-    url='https://amadeus.atlassian.net',
-    username=ATLASSIAN_USER,
-    password=ATLASSIAN_TOKEN,
-    cloud=True,
-    api_version='cloud')
+# Global Confluence client, created on first use
+_confluence = None
+
+def get_confluence():
+    global _confluence
+    if _confluence is None:
+        from atlassian import Confluence
+        _confluence = Confluence(
+            url='https://amadeus.atlassian.net',
+            username=ATLASSIAN_USER,
+            password=ATLASSIAN_TOKEN,
+            cloud=True,
+            api_version='cloud')
+    return _confluence
 
 def get_page_id_by_title(space, title):
-    if confluence.page_exists(space, title):
-        return confluence.get_page_id(space, title)
+    if get_confluence().page_exists(space, title):
+        return get_confluence().get_page_id(space, title)
     
     return None
 
 def get_body(space, title):
     page_id = get_page_id_by_title(space, title)
     if page_id is not None:
-        page_content = confluence.get_page_by_id(page_id, expand="body.view", status=None, version=None)
+        page_content = get_confluence().get_page_by_id(page_id, expand="body.view", status=None, version=None)
         return page_content["body"]["view"]["value"]
     return None
 
 def delete_page(space, title):
     page_id = get_page_id_by_title(space, title)
     if page_id is not None:
-        confluence.remove_page(page_id)
+        get_confluence().remove_page(page_id)
 
 def get_parent_id(page_id):
-    ancestors = confluence.get_page_ancestors(page_id)
+    ancestors = get_confluence().get_page_ancestors(page_id)
     if ancestors is not None:
         return ancestors[-1]["id"]
     return None
@@ -41,20 +48,20 @@ def reupload_page(space, title, body):
     page_id = get_page_id_by_title(space, title)
     if page_id is not None:
         parent_id = get_parent_id(space, title)
-        confluence.remove_page(page_id)
-        confluence.create_page(space, title, body, parent_id=parent_id)
+        get_confluence().remove_page(page_id)
+        get_confluence().create_page(space, title, body, parent_id=parent_id)
 
-# confluence.update_page(2315732224, title="Update Page API Test", body="<i><b>page successfully updated!</b></i>")
+# get_confluence().update_page(2315732224, title="Update Page API Test", body="<i><b>page successfully updated!</b></i>")
 
 def publish_content(space, title, body):
     page_id = get_page_id_by_title(space, title)
     if page_id:
         # Update existing page
-        confluence.update_page(page_id, title=title, body=body)
+        get_confluence().update_page(page_id, title=title, body=body)
         print(f"Page '{title}' updated successfully.")
     else:
         # Create new page
-        confluence.create_page(space, title, body)
+        get_confluence().create_page(space, title, body)
         print(f"Page '{title}' created successfully.")
 
 # Example usage
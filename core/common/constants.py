@@ -2,4 +2,17 @@ GPT_4O = "GPT4O"
 GPT_4_32K = "GPT4_32K"
 GPT_o3_mini = "o3_mini"
 GPT_o1 = "o1"
-PROJECT_ROOT="genie"
\ No newline at end of file
+PROJECT_ROOT="genie"
+
+# Upper bound on in-flight LLM calls during pattern identification (override with IDENTIFY_MAX_CONCURRENCY)
+DEFAULT_IDENTIFY_MAX_CONCURRENCY = 8
+
+# Batched identification: prompt tokens per request and patterns per request
+# (override with IDENTIFY_BATCH_TOKEN_BUDGET / IDENTIFY_BATCH_MAX_PATTERNS)
+DEFAULT_IDENTIFY_BATCH_TOKEN_BUDGET = 60000
+DEFAULT_IDENTIFY_BATCH_MAX_PATTERNS = 20
+
+# Pattern extraction: prompt tokens per request (content is split across requests to fit)
+# and requests in flight (override with EXTRACTION_TOKEN_BUDGET / EXTRACTION_MAX_CONCURRENCY)
+DEFAULT_EXTRACTION_TOKEN_BUDGET = 60000
+DEFAULT_EXTRACTION_MAX_CONCURRENCY = 4
@@ -103,6 +103,42 @@ class CostDisplayManager:
             </style>
             """, unsafe_allow_html=True)
     @staticmethod
+    def render_llm_diagnostics():
+        """Latency percentiles per prompt template for all LLM calls made by this process"""
+        from core.llm.telemetry import get_llm_telemetry
+
+        rows = get_llm_telemetry().summary()
+        with st.expander("🩺 LLM Diagnostics", expanded=False):
+            if not rows:
+                st.caption("No LLM calls recorded yet.")
+                return
+
+            def ms(seconds):
+                return None if seconds is None else round(seconds * 1000)
+
+            st.dataframe(
+                [
+                    {
+                        "Prompt": row["prompt_type"],
+                        "Model": row["model"],
+                        "Calls": row["calls"],
+                        "Cache hits": row["cache_hits"],
+                        "Retries": row["retries"],
+                        "Errors": row["errors"],
+                        "p50 ms": ms(row["latency_p50"]),
+                        "p95 ms": ms(row["latency_p95"]),
+                        "TTFB p50 ms": ms(row["time_to_first_byte_p50"]),
+                        "Queue p95 ms": ms(row["queue_wait_p95"]),
+                        "Tokens in/out": f"{row['prompt_tokens']}/{row['completion_tokens']}",
+                    }
+                    for row in rows
+                ],
+                hide_index=True,
+                use_container_width=True,
+            )
+            st.caption("Latencies are estimated from histogram buckets and cover every session of this server process.")
+
+    @staticmethod
     def render_cost_metrics():
         try:
             # Load CSS for styling
@@ -142,6 +178,24 @@ class CostDisplayManager:
                         label="💸 Cost (INR)",
                         value=f"{cost_inr}"
                     )
+                
+                # Response cache metrics
+                col5, col6 = st.columns([1, 1])
+                
+                with col5:
+                    st.metric(
+                        label="⚡ Cache Hits",
+                        value=getattr(st.session_state, 'llm_cache_hits', 0),
+                        help="Genie responses reused from the local response cache (no tokens spent)"
+                    )
+                    
+                with col6:
+                    st.metric(
+                        label="🔄 Cache Misses",
+                        value=getattr(st.session_state, 'llm_cache_misses', 0)
+                    )
+
+                CostDisplayManager.render_llm_diagnostics()
         except Exception as e:
             # Fallback elegant error display
             CostDisplayManager.load_css()
@@ -1,6 +1,5 @@
 import streamlit as st
 import os
-import pandas as pd
 
 def render_custom_table(df, long_text_cols=None, css_rel_path=None):
     """
@@ -14,6 +14,7 @@ from datetime import datetime
 import tempfile
 
 from core.database.sql_db_utils import SQLDatabaseUtils
+from core.database.connection_pool import remove_database_file
 from core.database.schema_migration import SchemaMigration
 from core.common.logging_manager import get_logger, log_user_action, log_error, get_logging_manager, reset_logging_manager
 
@@ -241,7 +242,7 @@ class UseCaseManager:
                 # Delete associated database
                 db_path = self.base_db_dir / use_case.database_name
                 if db_path.exists():
-                    os.remove(db_path)
+                    remove_database_file(db_path)
                     logger.info(f"Deleted database: {db_path}")
                 
                 # Clear session state if this was the current use case
@@ -314,6 +315,17 @@ class UseCaseManager:
             log_error(f"Failed to set use case {use_case_id}: {str(e)}")
             return False
     
+    def get_db_utils_for_use_case(self, use_case_id: str) -> Optional[SQLDatabaseUtils]:
+        """
+        Get database utils for a use case without selecting it in the session
+        (for headless runs such as the batch identification CLI)
+        """
+        use_case = self.get_use_case_by_id(use_case_id)
+        if not use_case:
+            log_error(f"Use case not found: {use_case_id}")
+            return None
+        return self._initialize_use_case_database(use_case)
+
     def get_current_db_utils(self) -> Optional[SQLDatabaseUtils]:
         """Get database utils for current use case"""
         if self.DB_UTILS_KEY in st.session_state:
@@ -344,11 +356,13 @@ class UseCaseManager:
                 
                 # Verify schema is valid
                 if self._verify_database_schema(db_utils):
+                    # Bring databases created by earlier versions up to date
+                    self._migrate_database_schema(use_case)
                     return db_utils
                 else:
                     logger.warning(f"Database schema invalid for {use_case.database_name}, recreating...")
                     # Remove invalid database and recreate
-                    os.remove(db_path)
+                    remove_database_file(db_path)
             
             # Create new database
             logger.info(f"Creating new database: {db_path}")
@@ -487,13 +501,7 @@ class UseCaseManager:
         """Setup database with use case specific data"""
         try:
             # Run schema migration to latest version
-            try:
-                migration = SchemaMigration(db_path=str(self.base_db_dir / use_case.database_name))
-                migration.migrate_to_specification_support()
-                logger.info(f"Schema migration completed for {use_case.name}")
-            except Exception as migration_error:
-                # Log but don't fail - database is still functional
-                logger.warning(f"Schema migration failed for {use_case.name}: {str(migration_error)}")
+            self._migrate_database_schema(use_case)
             
             # Add use case specific initial data if needed
             try:
@@ -505,6 +513,18 @@ class UseCaseManager:
         except Exception as e:
             log_error(f"Failed to setup database for {use_case.name}: {str(e)}")
     
+    def _migrate_database_schema(self, use_case: UseCase):
+        """Run pending schema migrations (indexes, pattern catalog) on a use case database"""
+        try:
+            migration = SchemaMigration(db_path=str(self.base_db_dir / use_case.database_name))
+            if migration.migrate_to_latest():
+                logger.info(f"Schema migration completed for {use_case.name}")
+            else:
+                logger.warning(f"Schema migration incomplete for {use_case.name}")
+        except Exception as migration_error:
+            # Log but don't fail - database is still functional
+            logger.warning(f"Schema migration failed for {use_case.name}: {str(migration_error)}")
+    
     def _add_initial_data_for_use_case(self, db_utils: SQLDatabaseUtils, use_case: UseCase):
         """Add initial data specific to the use case"""
         try:
@@ -763,7 +783,7 @@ class UseCaseManager:
             
             # Remove existing database if it exists
             if db_path.exists():
-                os.remove(db_path)
+                remove_database_file(db_path)
                 logger.info(f"Removed corrupted database: {db_path}")
             
             # Create new database
@@ -85,6 +85,8 @@ class userInteraction:
             "gpt_model_used": None,
             "number_of_calls_to_llm": 0,
             "total_cost_per_tool": 0,
+            "llm_cache_hits": 0,
+            "llm_cache_misses": 0,
             "tags_to_select": {},
             "pattern_responses": {},
             "insights": None,
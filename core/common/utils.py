@@ -1,14 +1,12 @@
 import streamlit as st
 import os
 import sys
-import pandas as pd
 import difflib
 import re
 from lxml import etree
 import html2text
 from bs4 import BeautifulSoup
 from io import StringIO
-from llama_index.core import Document
 import html
 sys.path.append(os.path.abspath(os.path.join(os.getcwd(), '../..')))
 from core.common.confluence_utils import *
@@ -199,12 +197,14 @@ def refine_and_display_markdown(markdown_content):
         else:
             modified_content.append(line)
 
+    from llama_index.core import Document
     VectorDocument = [Document(text=doc) for doc in modified_content]
     refined_markdown_content = '\n'.join(modified_content)
     return refined_markdown_content,VectorDocument
 
 def convert_html_to_csv(html_content):
     # Importing the required modules 
+    import pandas as pd
 
     # empty list
     data = []
@@ -0,0 +1,188 @@
+"""
+Persistent SQLite connections shared by everything that uses a database file.
+
+SQLDatabaseUtils used to open a new connection for every statement and retry writes after
+sleeping on "database is locked". Each database now gets one SQLiteConnectionPool for the
+process: every thread reads through its own long-lived connection, all writes go through a
+single writer connection serialized by a lock, and the database runs in WAL mode with
+synchronous=NORMAL so readers never wait for the writer and commits do not fsync the main
+file. Long-lived connections also keep their compiled statements, so repeated queries skip
+SQL parsing.
+
+Writes are grouped with transaction(); statements issued on the same thread while it is
+open join it and are committed or rolled back together.
+"""
+
+import os
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Union
+
+from core.common.logging_manager import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_BUSY_TIMEOUT_MS = 30000
+DEFAULT_STATEMENT_CACHE_SIZE = 256
+
+
+class SQLiteConnectionPool:
+    """Thread-local reader connections and one serialized writer connection for a database"""
+
+    def __init__(self, db_path: Union[str, Path]):
+        self.db_path = str(db_path)
+        self.busy_timeout_ms = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", DEFAULT_BUSY_TIMEOUT_MS))
+        self.statement_cache_size = int(os.getenv("SQLITE_STATEMENT_CACHE_SIZE", DEFAULT_STATEMENT_CACHE_SIZE))
+
+        self._lock = threading.Lock()
+        # A reader is closed when its thread goes away (Streamlit runs reruns on new threads)
+        self._readers: "weakref.WeakKeyDictionary[threading.Thread, sqlite3.Connection]" = weakref.WeakKeyDictionary()
+        self._writer_lock = threading.RLock()
+        self._writer: sqlite3.Connection = None
+        self._watcher: sqlite3.Connection = None
+        self._local = threading.local()
+        self._closed = False
+
+        self._enable_wal()
+
+    def _open(self) -> sqlite3.Connection:
+        # Autocommit: transactions are only ever opened explicitly by transaction()
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            timeout=self.busy_timeout_ms / 1000,
+            isolation_level=None,
+            cached_statements=self.statement_cache_size,
+        )
+        conn.execute(f"PRAGMA busy_timeout = {self.busy_timeout_ms}")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def _enable_wal(self):
+        conn = self._open()
+        try:
+            mode = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+            if str(mode).lower() != "wal":
+                logger.warning(f"Could not enable WAL for {self.db_path} (journal_mode={mode})")
+        except sqlite3.DatabaseError as e:
+            logger.warning(f"Could not enable WAL for {self.db_path}: {e}")
+        finally:
+            conn.close()
+
+    def _check_open(self):
+        if self._closed:
+            raise sqlite3.ProgrammingError(f"Connection pool for {self.db_path} is closed")
+
+    @property
+    def in_transaction(self) -> bool:
+        """Whether the calling thread is inside transaction()"""
+        return getattr(self._local, "depth", 0) > 0
+
+    def reader(self) -> sqlite3.Connection:
+        """
+        The calling thread's read connection, or the writer while the thread is inside a
+        transaction (so it sees its own uncommitted writes).
+        """
+        if self.in_transaction:
+            return self._writer
+        self._check_open()
+        thread = threading.current_thread()
+        with self._lock:
+            conn = self._readers.get(thread)
+            if conn is None:
+                conn = self._open()
+                self._readers[thread] = conn
+            return conn
+
+    def data_version(self) -> int:
+        """
+        PRAGMA data_version of a connection that never writes, so it changes whenever any
+        connection, in this process or another, commits to the database
+        """
+        with self._lock:
+            self._check_open()
+            if self._watcher is None:
+                self._watcher = self._open()
+            return self._watcher.execute("PRAGMA data_version").fetchone()[0]
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Run a block of writes in one IMMEDIATE transaction on the writer connection,
+        committed when the block exits and rolled back if it raises. Nested calls on the
+        same thread join the outer transaction.
+        """
+        with self._writer_lock:
+            self._check_open()
+            if self.in_transaction:
+                self._local.depth += 1
+                try:
+                    yield self._writer
+                finally:
+                    self._local.depth -= 1
+                return
+
+            if self._writer is None:
+                self._writer = self._open()
+            conn = self._writer
+            conn.execute("BEGIN IMMEDIATE")
+            self._local.depth = 1
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            else:
+                conn.commit()
+            finally:
+                self._local.depth = 0
+
+    def close(self):
+        """Close every connection; the pool cannot be used afterwards"""
+        with self._writer_lock, self._lock:
+            self._closed = True
+            for conn in list(self._readers.values()):
+                conn.close()
+            self._readers.clear()
+            if self._watcher is not None:
+                self._watcher.close()
+                self._watcher = None
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+
+# Global pools, one per database file
+_connection_pools: Dict[str, SQLiteConnectionPool] = {}
+_connection_pools_lock = threading.Lock()
+
+def get_connection_pool(db_path: Union[str, Path]) -> SQLiteConnectionPool:
+    """Get the shared connection pool for a database file"""
+    key = os.path.abspath(str(db_path))
+    with _connection_pools_lock:
+        pool = _connection_pools.get(key)
+        if pool is None:
+            pool = SQLiteConnectionPool(key)
+            _connection_pools[key] = pool
+        return pool
+
+
+def close_connection_pool(db_path: Union[str, Path]):
+    """Close and forget the pool of a database file, e.g. before the file is deleted"""
+    key = os.path.abspath(str(db_path))
+    with _connection_pools_lock:
+        pool = _connection_pools.pop(key, None)
+    if pool is not None:
+        pool.close()
+
+
+def remove_database_file(db_path: Union[str, Path]):
+    """Delete a database file along with its WAL and shared-memory files"""
+    close_connection_pool(db_path)
+    for suffix in ("", "-wal", "-shm"):
+        path = f"{db_path}{suffix}"
+        if os.path.exists(path):
+            os.remove(path)
@@ -20,10 +20,11 @@ CREATE TABLE api_section (
     section_id INTEGER PRIMARY KEY AUTOINCREMENT,
     api_id INTEGER NOT NULL,
     section_name TEXT NOT NULL,
-    section_display_name TEXT NOT NULL UNIQUE,
+    section_display_name TEXT NOT NULL,
     created_at TEXT DEFAULT CURRENT_TIMESTAMP,
     updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (api_id) REFERENCES api(api_id)
+    FOREIGN KEY (api_id) REFERENCES api(api_id),
+    UNIQUE(api_id, section_display_name)
 );
 
 
@@ -1,13 +1,11 @@
 import json
-import chromadb
-from chromadb.utils import embedding_functions
 import streamlit as st
 from typing import List
 from dotenv import load_dotenv, find_dotenv
-from core.database.configure_llama_chroma_database import DatabaseConfigurator
 from core.common.user_interaction import userInteraction
-from core.data_processing.cleanup import cleanup_process
-from llama_index.core import Document
+
+# chromadb, llama_index and pandas (through core.data_processing.cleanup) take seconds to
+# import, so they are imported by the functions that use them rather than with this module
 
 DEFAULT_DIR = "../../config/prompts/NDC"
 configurator = None 
@@ -15,6 +13,8 @@ configurator = None
 _ = load_dotenv(find_dotenv())
 
 def chromadb_setup(specs):
+    from llama_index.core import Document
+    from core.data_processing.cleanup import cleanup_process
 
     # Let's assume the column containing text is named "content"
     # You can concatenate other columns if
@@ -61,6 +61,9 @@ def configure_database(qna_file):
     Returns:
     chromadb.Collection: Configured ChromaDB collection, or None if an error occurs.
     """
+    import chromadb
+    from chromadb.utils import embedding_functions
+
     try:
         questions, answers = load_qna_from_file(qna_file)
         ids = ["q" + str(i) for i in range(1, len(questions) + 1)]
@@ -205,6 +208,7 @@ def retreive_answers(question, directory = DEFAULT_DIR):
     answers_list = ""
     
     if configurator is None:
+        from core.database.configure_llama_chroma_database import DatabaseConfigurator
         configurator = DatabaseConfigurator(directory)
     
     answers_list += configurator.get_answer_from_db(question)
@@ -1,12 +1,26 @@
 import sqlite3
 import json
 import os
+import threading
 from pathlib import Path
 from typing import Dict, List, Optional, Any
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, replace
 from datetime import datetime
 import logging
+import re
 from core.common.logging_manager import get_logger
+from core.database.pattern_catalog_cache import get_pattern_catalog_cache
+
+# Full-text index over the searchable columns, kept in sync with default_patterns by triggers
+FTS_TABLE = "default_patterns_fts"
+FTS_COLUMNS = ("name", "description", "xpath", "category", "prompt")
+# bm25 weight per FTS_COLUMNS entry: a hit in the name counts most
+FTS_COLUMN_WEIGHTS = (10.0, 5.0, 5.0, 2.0, 1.0)
+_SEARCH_TERM = re.compile(r"\w+")
+# Selected by name, in the order rows are read: api and api_version come after the other
+# columns only in databases where the migration added them
+PATTERN_COLUMNS = ("pattern_id", "name", "description", "prompt", "example", "xpath", "category",
+                   "created_at", "updated_at", "is_active", "api", "api_version")
 
 
 @dataclass
@@ -29,6 +43,10 @@ class DefaultPattern:
 class DefaultPatternsManager:
     """Manager for default patterns with filesystem and database storage"""
     
+    # Databases already created and migrated in this process
+    _initialized_databases = set()
+    _initialized_databases_lock = threading.Lock()
+    
     def __init__(self, db_path: str = None, patterns_dir: str = None):
         self.logger = get_logger("default_patterns_manager")
         
@@ -41,8 +59,13 @@ class DefaultPatternsManager:
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
         os.makedirs(self.patterns_dir, exist_ok=True)
         
-        self._initialize_database()
-        self._load_default_patterns()
+        # Schema setup only runs for the first manager of a database in this process
+        db_key = os.path.abspath(self.db_path)
+        with self._initialized_databases_lock:
+            if db_key not in self._initialized_databases or not os.path.exists(db_key):
+                self._initialize_database()
+                self._load_default_patterns()
+                self._initialized_databases.add(db_key)
     
     def _initialize_database(self):
         """Initialize the default patterns database"""
@@ -77,6 +100,8 @@ class DefaultPatternsManager:
                 # Migration: Add new columns if they don't exist
                 self._migrate_database(cursor)
                 
+                self._create_search_index(cursor)
+                
                 conn.commit()
                 self.logger.info(f"Database initialized at {self.db_path}")
                 
@@ -103,6 +128,49 @@ class DefaultPatternsManager:
             self.logger.error(f"Failed to migrate database: {e}")
             # Don't raise here as this is a migration, we want the app to continue
     
+    def _create_search_index(self, cursor):
+        """Create the FTS5 search index and its sync triggers, filling it on first creation"""
+        try:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,))
+            exists = cursor.fetchone() is not None
+            
+            columns = ", ".join(FTS_COLUMNS)
+            new_values = ", ".join(f"new.{column}" for column in FTS_COLUMNS)
+            old_values = ", ".join(f"old.{column}" for column in FTS_COLUMNS)
+            cursor.execute(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+                    {columns}, content='default_patterns', content_rowid='rowid',
+                    tokenize='unicode61 remove_diacritics 2'
+                )
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON default_patterns
+                BEGIN
+                    INSERT INTO {FTS_TABLE} (rowid, {columns}) VALUES (new.rowid, {new_values});
+                END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON default_patterns
+                BEGIN
+                    INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.rowid, {old_values});
+                END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE ON default_patterns
+                BEGIN
+                    INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.rowid, {old_values});
+                    INSERT INTO {FTS_TABLE} (rowid, {columns}) VALUES (new.rowid, {new_values});
+                END
+            """)
+            
+            if not exists:
+                cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+                self.logger.info(f"Created full-text search index {FTS_TABLE}")
+                
+        except sqlite3.OperationalError as e:
+            # SQLite built without FTS5: search_patterns falls back to LIKE matching
+            self.logger.warning(f"Full-text search unavailable, using LIKE search: {e}")
+    
     def _load_default_patterns(self):
         """Check default patterns status without auto-creating any"""
         try:
@@ -181,56 +249,64 @@ class DefaultPatternsManager:
     def get_all_patterns(self, category: str = None, active_only: bool = True) -> List[DefaultPattern]:
         """Get all default patterns, optionally filtered by category"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                query = "SELECT * FROM default_patterns"
-                params = []
-                
-                conditions = []
-                if active_only:
-                    conditions.append("is_active = ?")
-                    params.append(1)
-                
-                if category:
-                    conditions.append("category = ?")
-                    params.append(category)
-                
-                if conditions:
-                    query += " WHERE " + " AND ".join(conditions)
-                
-                query += " ORDER BY category, name"
-                
-                cursor.execute(query, params)
-                rows = cursor.fetchall()
-                
-                patterns = []
-                for row in rows:
-                    # Handle cases where api/api_version columns might not exist in older records
-                    api = row[10] if len(row) > 10 else None
-                    api_version = row[11] if len(row) > 11 else None
-                    
-                    pattern = DefaultPattern(
-                        pattern_id=row[0], name=row[1], description=row[2],
-                        prompt=row[3], example=row[4], xpath=row[5],
-                        category=row[6], created_at=row[7], updated_at=row[8],
-                        is_active=bool(row[9]), api=api, api_version=api_version
-                    )
-                    patterns.append(pattern)
-                
-                return patterns
+            patterns = get_pattern_catalog_cache().get(
+                self.db_path, ("get_all_patterns", category, active_only),
+                lambda: self._query_patterns(category, active_only)
+            )
+            # Copies, as callers may modify the patterns they get
+            return [replace(pattern) for pattern in patterns]
                 
         except Exception as e:
             self.logger.error(f"Failed to get patterns: {e}")
             return []
     
+    def _query_patterns(self, category: str = None, active_only: bool = True) -> List[DefaultPattern]:
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            
+            query = f"SELECT {', '.join(PATTERN_COLUMNS)} FROM default_patterns"
+            params = []
+            
+            conditions = []
+            if active_only:
+                conditions.append("is_active = ?")
+                params.append(1)
+            
+            if category:
+                conditions.append("category = ?")
+                params.append(category)
+            
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
+            
+            query += " ORDER BY category, name"
+            
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+            
+            patterns = []
+            for row in rows:
+                # Handle cases where api/api_version columns might not exist in older records
+                api = row[10] if len(row) > 10 else None
+                api_version = row[11] if len(row) > 11 else None
+                
+                pattern = DefaultPattern(
+                    pattern_id=row[0], name=row[1], description=row[2],
+                    prompt=row[3], example=row[4], xpath=row[5],
+                    category=row[6], created_at=row[7], updated_at=row[8],
+                    is_active=bool(row[9]), api=api, api_version=api_version
+                )
+                patterns.append(pattern)
+            
+            return patterns
+    
     def get_pattern_by_id(self, pattern_id: str) -> Optional[DefaultPattern]:
         """Get a specific pattern by ID"""
         try:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
                 cursor.execute(
-                    "SELECT * FROM default_patterns WHERE pattern_id = ? AND is_active = 1",
+                    f"SELECT {', '.join(PATTERN_COLUMNS)} FROM default_patterns WHERE pattern_id = ? AND is_active = 1",
                     (pattern_id,)
                 )
                 row = cursor.fetchone()
@@ -264,10 +340,19 @@ class DefaultPatternsManager:
             # Save to database
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
+                # An upsert rather than INSERT OR REPLACE, which would delete the old row
+                # without firing the triggers that keep the search index in sync
                 cursor.execute("""
-                    INSERT OR REPLACE INTO default_patterns 
+                    INSERT INTO default_patterns 
                     (pattern_id, name, description, prompt, example, xpath, category, api, api_version, created_at, updated_at, is_active)
                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(pattern_id) DO UPDATE SET
+                        name = excluded.name, description = excluded.description,
+                        prompt = excluded.prompt, example = excluded.example,
+                        xpath = excluded.xpath, category = excluded.category,
+                        api = excluded.api, api_version = excluded.api_version,
+                        created_at = excluded.created_at, updated_at = excluded.updated_at,
+                        is_active = excluded.is_active
                 """, (
                     pattern.pattern_id, pattern.name, pattern.description,
                     pattern.prompt, pattern.example, pattern.xpath,
@@ -314,27 +399,29 @@ class DefaultPatternsManager:
         """Get patterns filtered by category"""
         return self.get_all_patterns(category=category)
     
-    def search_patterns(self, query: str) -> List[DefaultPattern]:
-        """Search patterns by name, description, or xpath"""
+    def search_patterns(self, query: str, limit: int = None) -> List[DefaultPattern]:
+        """
+        Search active patterns by name, description, xpath, category and prompt, best
+        matches first. Every word of the query must match the start of a word in one of
+        these fields (so "fli seg" finds "Flight Segment"); ranked by bm25 with name hits
+        weighted highest. Patterns containing the query as a substring of their name,
+        description, xpath or category (so "SegmentRefID" finds //PaxSegmentRefID) follow.
+        """
+        terms = _SEARCH_TERM.findall(query or "")
+        if not terms:
+            return []
+        match = " ".join(f'"{term}"*' for term in terms)
+        weights = ", ".join(str(weight) for weight in FTS_COLUMN_WEIGHTS)
         try:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT * FROM default_patterns 
-                    WHERE is_active = 1 AND (
-                        name LIKE ? OR 
-                        description LIKE ? OR 
-                        xpath LIKE ? OR
-                        category LIKE ?
-                    )
-                    ORDER BY 
-                        CASE 
-                            WHEN name LIKE ? THEN 1
-                            WHEN description LIKE ? THEN 2
-                            ELSE 3
-                        END,
-                        name
-                """, [f"%{query}%" for _ in range(6)])
+                cursor.execute(f"""
+                    SELECT {", ".join("p." + column for column in PATTERN_COLUMNS)} FROM {FTS_TABLE} f
+                    JOIN default_patterns p ON p.rowid = f.rowid
+                    WHERE {FTS_TABLE} MATCH ? AND p.is_active = 1
+                    ORDER BY bm25({FTS_TABLE}, {weights}), p.name
+                    LIMIT ?
+                """, (match, limit if limit is not None else -1))
                 
                 rows = cursor.fetchall()
                 patterns = []
@@ -352,11 +439,34 @@ class DefaultPatternsManager:
                     )
                     patterns.append(pattern)
                 
-                return patterns
-                
+        except sqlite3.OperationalError as e:
+            self.logger.warning(f"Full-text search failed, using LIKE search: {e}")
+            patterns = []
         except Exception as e:
             self.logger.error(f"Failed to search patterns: {e}")
             return []
+        
+        # The index keeps an xpath step such as PaxSegmentRefID as one token, which prefix
+        # terms cannot match inside, so substring matches are added after the ranked hits
+        found = {pattern.pattern_id for pattern in patterns}
+        patterns.extend(pattern for pattern in self._search_patterns_like(query) if pattern.pattern_id not in found)
+        return patterns[:limit] if limit is not None else patterns
+    
+    def _search_patterns_like(self, query: str) -> List[DefaultPattern]:
+        """Substring search without the full-text index"""
+        query_lower = query.strip().lower()
+        matches = [
+            pattern for pattern in self.get_all_patterns()
+            if any(query_lower in (value or "").lower() for value in (
+                pattern.name, pattern.description, pattern.xpath, pattern.category
+            ))
+        ]
+        # Name matches first, then description matches
+        return sorted(matches, key=lambda pattern: (
+            query_lower not in pattern.name.lower(),
+            query_lower not in (pattern.description or "").lower(),
+            pattern.name
+        ))
     
     def export_patterns(self, file_path: str = None, category: str = None) -> str:
         """Export patterns to JSON file"""
@@ -417,13 +527,33 @@ class DefaultPatternsManager:
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 backup_path = f"{self.db_path}.backup_{timestamp}"
             
-            # Copy database file
-            import shutil
-            shutil.copy2(self.db_path, backup_path)
+            # The pattern cache reads this database through a WAL-mode pool, so committed
+            # pages may still be in the -wal file; the backup API copies a consistent snapshot
+            source = sqlite3.connect(self.db_path)
+            target = sqlite3.connect(backup_path)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+                source.close()
             
             self.logger.info(f"Database backed up to {backup_path}")
             return backup_path
             
         except Exception as e:
             self.logger.error(f"Failed to backup database: {e}")
-            raise
\ No newline at end of file
+            raise
+
+
+# Global default patterns manager instance
+_default_patterns_manager = None
+_default_patterns_manager_lock = threading.Lock()
+
+def get_default_patterns_manager() -> DefaultPatternsManager:
+    """Get the shared manager of the default patterns database"""
+    global _default_patterns_manager
+    if _default_patterns_manager is None:
+        with _default_patterns_manager_lock:
+            if _default_patterns_manager is None:
+                _default_patterns_manager = DefaultPatternsManager()
+    return _default_patterns_manager
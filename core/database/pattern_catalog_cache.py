@@ -0,0 +1,92 @@
+"""
+In-process cache of pattern lists read from SQLite databases.
+
+Every identification run reads all workspace patterns and all shared patterns, and the
+pages re-read them on each rerun. PatternCatalogCache keeps the loaded pattern objects per
+database file and reuses them until the database changes.
+
+Changes are detected with ``PRAGMA data_version`` on a connection of the database's pool
+that never writes: the value moves whenever any connection, in this process or another,
+commits to the file, so saves, deletes, imports and edits made elsewhere all invalidate
+the cached lists, while an unchanged database is checked without reading any pages.
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Optional, Union
+
+from core.common.logging_manager import get_logger
+from core.database.connection_pool import SQLiteConnectionPool, get_connection_pool
+
+logger = get_logger(__name__)
+
+
+class _CacheEntry(NamedTuple):
+    pool: SQLiteConnectionPool
+    data_version: int
+    values: Dict[Hashable, Any]
+
+
+class PatternCatalogCache:
+    """Loaded pattern lists by database file, dropped when the database changes"""
+
+    def __init__(self):
+        self._entries: Dict[str, _CacheEntry] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, db_path: Union[str, Path], key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        The value cached for key in the database at db_path, calling loader() to read it
+        if it is missing or the database has changed since it was read. The cached value
+        is shared between callers and must not be modified.
+        """
+        path = os.path.abspath(str(db_path))
+        if not os.path.exists(path):
+            return loader()
+
+        # Captured before loading, so a commit made while loading invalidates the result
+        pool = get_connection_pool(path)
+        if pool.in_transaction:
+            # The thread's uncommitted writes are not visible to other connections yet
+            return loader()
+        data_version = pool.data_version()
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry.pool is not pool or entry.data_version != data_version:
+                entry = _CacheEntry(pool, data_version, {})
+                self._entries[path] = entry
+            if key in entry.values:
+                self.hits += 1
+                return entry.values[key]
+            self.misses += 1
+
+        value = loader()
+        with self._lock:
+            if self._entries.get(path) is entry:
+                entry.values[key] = value
+        return value
+
+    def invalidate(self, db_path: Optional[Union[str, Path]] = None):
+        """Drop the values cached for one database, or for all of them"""
+        with self._lock:
+            if db_path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(str(db_path)), None)
+
+
+# Global pattern catalog cache instance
+_pattern_catalog_cache = None
+_pattern_catalog_cache_lock = threading.Lock()
+
+def get_pattern_catalog_cache() -> PatternCatalogCache:
+    """Get the global pattern catalog cache"""
+    global _pattern_catalog_cache
+    if _pattern_catalog_cache is None:
+        with _pattern_catalog_cache_lock:
+            if _pattern_catalog_cache is None:
+                _pattern_catalog_cache = PatternCatalogCache()
+    return _pattern_catalog_cache
@@ -6,7 +6,9 @@ This module handles the migration of the existing database schema to support
 specification template storage and management.
 
 New Features:
-- specification_templates table for storing template data
+- specification_templates table for storing template data (version 1)
+- Query indexes and the trigger-maintained pattern_catalog table (version 2)
+- api_section display names unique per API instead of across all APIs (version 3)
 - Extended functionality in SQLDatabaseUtils
 - Migration rollback capabilities
 - Data integrity validation
@@ -15,18 +17,116 @@ Usage:
     from core.database.schema_migration import SchemaMigration
     
     migration = SchemaMigration()
-    migration.migrate_to_specification_support()
+    migration.migrate_to_latest()
 """
 
 import sqlite3
 import logging
 import json
+import re
 from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+LATEST_SCHEMA_VERSION = 3
+
+# Secondary indexes for the section -> pattern joins
+QUERY_INDEXES = {
+    "idx_api_section_display_api": "api_section(section_display_name, api_id)",
+    "idx_section_pattern_mapping_section_api": "section_pattern_mapping(section_id, api_id)",
+    "idx_section_pattern_mapping_pattern": "section_pattern_mapping(pattern_id)",
+    "idx_apiversion_api": "apiversion(api_id)",
+}
+
+# pattern_catalog: one row per section_pattern_mapping with everything the pattern
+# lookups need, so they read a single index instead of joining four tables
+PATTERN_CATALOG_TABLE = """
+    CREATE TABLE IF NOT EXISTS pattern_catalog (
+        mapping_id INTEGER PRIMARY KEY,
+        api_id INTEGER NOT NULL,
+        api_name TEXT NOT NULL,
+        section_id INTEGER NOT NULL,
+        section_name TEXT,
+        section_display_name TEXT,
+        pattern_id INTEGER NOT NULL,
+        pattern_name TEXT,
+        pattern_description TEXT,
+        pattern_prompt TEXT
+    )
+"""
+
+PATTERN_CATALOG_INDEXES = {
+    "idx_pattern_catalog_section": "pattern_catalog(section_display_name, api_name, pattern_id)",
+    "idx_pattern_catalog_api": "pattern_catalog(api_name, section_display_name, pattern_id)",
+    "idx_pattern_catalog_api_id": "pattern_catalog(api_id)",
+    "idx_pattern_catalog_section_id": "pattern_catalog(section_id)",
+    "idx_pattern_catalog_pattern": "pattern_catalog(pattern_id)",
+}
+
+# Catalog rows as the joins produce them, restricted by a condition on the source tables
+PATTERN_CATALOG_SELECT = """
+    SELECT spm.mapping_id, a.api_id, a.api_name, aps.section_id, aps.section_name,
+           aps.section_display_name, pd.pattern_id, pd.pattern_name,
+           pd.pattern_description, pd.pattern_prompt
+    FROM section_pattern_mapping spm
+    JOIN api_section aps ON aps.section_id = spm.section_id AND aps.api_id = spm.api_id
+    JOIN api a ON a.api_id = aps.api_id
+    JOIN pattern_details pd ON pd.pattern_id = spm.pattern_id
+"""
+
+# (source table, key column, alias of the table in PATTERN_CATALOG_SELECT)
+_PATTERN_CATALOG_SOURCES = [
+    ("section_pattern_mapping", "mapping_id", "spm"),
+    ("api_section", "section_id", "aps"),
+    ("api", "api_id", "a"),
+    ("pattern_details", "pattern_id", "pd"),
+]
+
+
+def _pattern_catalog_triggers() -> Dict[str, str]:
+    """
+    Triggers that keep pattern_catalog in step with its source tables: a changed row has
+    the catalog rows built from it deleted and rebuilt from the joins.
+    """
+    triggers = {}
+    for table, key, alias in _PATTERN_CATALOG_SOURCES:
+        refresh = (
+            f"INSERT OR REPLACE INTO pattern_catalog {PATTERN_CATALOG_SELECT} "
+            f"WHERE {alias}.{key} = NEW.{key};"
+        )
+        triggers[f"trg_pattern_catalog_{table}_insert"] = f"""
+            CREATE TRIGGER IF NOT EXISTS trg_pattern_catalog_{table}_insert
+            AFTER INSERT ON {table}
+            BEGIN
+                {refresh}
+            END
+        """
+        triggers[f"trg_pattern_catalog_{table}_update"] = f"""
+            CREATE TRIGGER IF NOT EXISTS trg_pattern_catalog_{table}_update
+            AFTER UPDATE ON {table}
+            BEGIN
+                DELETE FROM pattern_catalog WHERE {key} IN (OLD.{key}, NEW.{key});
+                {refresh}
+            END
+        """
+        triggers[f"trg_pattern_catalog_{table}_delete"] = f"""
+            CREATE TRIGGER IF NOT EXISTS trg_pattern_catalog_{table}_delete
+            AFTER DELETE ON {table}
+            BEGIN
+                DELETE FROM pattern_catalog WHERE {key} = OLD.{key};
+            END
+        """
+    return triggers
+
+
+PATTERN_CATALOG_TRIGGERS = _pattern_catalog_triggers()
+
+# Column constraint of the original schema making a display name unique across all APIs
+_GLOBAL_SECTION_UNIQUE = re.compile(r"(section_display_name\s+TEXT[^,]*?)\s+UNIQUE", re.IGNORECASE)
+API_SECTION_UNIQUE = "UNIQUE(api_id, section_display_name)"
+
 class SchemaMigration:
     """
     Database schema migration manager for specification template support
@@ -103,6 +203,15 @@ class SchemaMigration:
             logger.error(f"Failed to get schema version: {e}")
             return 0
     
+    def migrate_to_latest(self) -> bool:
+        """
+        Apply every pending migration in order
+        
+        Returns:
+            bool: True if the schema is at LATEST_SCHEMA_VERSION, False otherwise
+        """
+        return self.migrate_to_api_scoped_sections()
+    
     def migrate_to_specification_support(self) -> bool:
         """
         Migrate database to support specification templates (version 1)
@@ -306,6 +415,163 @@ Based on pattern: {pattern_prompt}
             }
         ]
     
+    def migrate_to_pattern_catalog(self) -> bool:
+        """
+        Add the query indexes and the pattern_catalog table with its triggers (version 2)
+        
+        Returns:
+            bool: True if migration successful, False otherwise
+        """
+        current_version = self.get_current_schema_version()
+        
+        if current_version >= 2:
+            logger.info("Database already has the pattern catalog")
+            return True
+        
+        if current_version < 1 and not self.migrate_to_specification_support():
+            return False
+        
+        logger.info("Starting migration to pattern catalog...")
+        
+        try:
+            conn = self.connect()
+            cursor = conn.cursor()
+            
+            logger.info("Creating query indexes...")
+            for name, columns in QUERY_INDEXES.items():
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {columns}")
+            
+            logger.info("Creating pattern_catalog table...")
+            cursor.execute(PATTERN_CATALOG_TABLE)
+            for name, columns in PATTERN_CATALOG_INDEXES.items():
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {columns}")
+            cursor.execute("DELETE FROM pattern_catalog")
+            cursor.execute(f"INSERT INTO pattern_catalog {PATTERN_CATALOG_SELECT}")
+            
+            logger.info("Creating pattern_catalog triggers...")
+            for trigger in PATTERN_CATALOG_TRIGGERS.values():
+                cursor.execute(trigger)
+            
+            # Fresh statistics so the planner picks the new indexes
+            cursor.execute("ANALYZE")
+            
+            cursor.execute("""
+                INSERT INTO schema_version (version, description) 
+                VALUES (2, 'Added query indexes and pattern catalog')
+            """)
+            
+            conn.commit()
+            conn.close()
+            
+            logger.info("✓ Migration to pattern catalog completed successfully!")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Migration failed: {e}")
+            return False
+    
+    def migrate_to_api_scoped_sections(self) -> bool:
+        """
+        Make section display names unique per API rather than across all APIs (version 3).
+        
+        The original schema declared api_section.section_display_name UNIQUE, so two APIs
+        could not have a pattern for the same section path. SQLite cannot drop a column
+        constraint, so the table is rebuilt with UNIQUE(api_id, section_display_name);
+        tables created without the constraint are left as they are.
+        
+        Returns:
+            bool: True if migration successful, False otherwise
+        """
+        current_version = self.get_current_schema_version()
+        
+        if current_version >= 3:
+            logger.info("Database already has API-scoped sections")
+            return True
+        
+        if current_version < 2 and not self.migrate_to_pattern_catalog():
+            return False
+        
+        logger.info("Starting migration to API-scoped sections...")
+        
+        try:
+            conn = self.connect()
+            # Rows keep their ids, so the mappings stay valid while the table is replaced
+            conn.execute("PRAGMA foreign_keys = OFF")
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='api_section'")
+            table_sql = cursor.fetchone()[0]
+            if _GLOBAL_SECTION_UNIQUE.search(table_sql):
+                logger.info("Rebuilding api_section...")
+                columns = ", ".join(row[1] for row in cursor.execute("PRAGMA table_info(api_section)").fetchall())
+                new_table_sql = _GLOBAL_SECTION_UNIQUE.sub(r"\1", table_sql, count=1)
+                new_table_sql = new_table_sql[:new_table_sql.rindex(")")].rstrip() + f",\n    {API_SECTION_UNIQUE}\n)"
+                new_table_sql = re.sub(r"^CREATE TABLE\s+\"?api_section\"?", "CREATE TABLE api_section_new", new_table_sql)
+                
+                # The catalog triggers refer to api_section; they are recreated below
+                for name in PATTERN_CATALOG_TRIGGERS:
+                    cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+                cursor.execute(new_table_sql)
+                cursor.execute(f"INSERT INTO api_section_new ({columns}) SELECT {columns} FROM api_section")
+                cursor.execute("DROP TABLE api_section")
+                cursor.execute("ALTER TABLE api_section_new RENAME TO api_section")
+                for name, index_columns in QUERY_INDEXES.items():
+                    cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {index_columns}")
+                for trigger in PATTERN_CATALOG_TRIGGERS.values():
+                    cursor.execute(trigger)
+            
+            cursor.execute("""
+                INSERT INTO schema_version (version, description) 
+                VALUES (3, 'Section display names unique per API')
+            """)
+            
+            conn.commit()
+            conn.close()
+            
+            logger.info("✓ Migration to API-scoped sections completed successfully!")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Migration failed: {e}")
+            return False
+    
+    def rollback_pattern_catalog(self) -> bool:
+        """
+        Remove the pattern catalog and query indexes (downgrade to version 1)
+        
+        Returns:
+            bool: True if rollback successful, False otherwise
+        """
+        current_version = self.get_current_schema_version()
+        
+        if current_version < 2:
+            logger.info("No pattern catalog to rollback")
+            return True
+        
+        logger.warning("Rolling back pattern catalog...")
+        
+        try:
+            conn = self.connect()
+            cursor = conn.cursor()
+            
+            for name in PATTERN_CATALOG_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute("DROP TABLE IF EXISTS pattern_catalog")
+            for name in QUERY_INDEXES:
+                cursor.execute(f"DROP INDEX IF EXISTS {name}")
+            
+            cursor.execute("DELETE FROM schema_version WHERE version = 2")
+            
+            conn.commit()
+            conn.close()
+            
+            logger.info("✓ Rollback completed successfully")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Rollback failed: {e}")
+            return False
+    
     def rollback_specification_support(self) -> bool:
         """
         Rollback specification template support (downgrade to version 0)
@@ -378,6 +644,8 @@ Based on pattern: {pattern_prompt}
             
             if validation_results["schema_version"] >= 1:
                 required_tables.append("specification_templates")
+            if validation_results["schema_version"] >= 2:
+                required_tables.append("pattern_catalog")
             
             for table in required_tables:
                 cursor.execute("""
@@ -401,6 +669,15 @@ Based on pattern: {pattern_prompt}
                     """, (index,))
                     validation_results["indexes_exist"][index] = cursor.fetchone() is not None
             
+            # Check indexes (for v2+)
+            if validation_results["schema_version"] >= 2:
+                for index in [*QUERY_INDEXES, *PATTERN_CATALOG_INDEXES]:
+                    cursor.execute("""
+                        SELECT name FROM sqlite_master 
+                        WHERE type='index' AND name=?
+                    """, (index,))
+                    validation_results["indexes_exist"][index] = cursor.fetchone() is not None
+            
             # Check triggers (for v1+)
             if validation_results["schema_version"] >= 1:
                 cursor.execute("""
@@ -409,6 +686,15 @@ Based on pattern: {pattern_prompt}
                 """)
                 validation_results["triggers_exist"]["update_spec_template_timestamp"] = cursor.fetchone() is not None
             
+            # Check triggers (for v2+)
+            if validation_results["schema_version"] >= 2:
+                for trigger in PATTERN_CATALOG_TRIGGERS:
+                    cursor.execute("""
+                        SELECT name FROM sqlite_master 
+                        WHERE type='trigger' AND name=?
+                    """, (trigger,))
+                    validation_results["triggers_exist"][trigger] = cursor.fetchone() is not None
+            
             # Check data integrity
             cursor.execute("SELECT COUNT(*) FROM api")
             validation_results["data_integrity"]["api_count"] = cursor.fetchone()[0]
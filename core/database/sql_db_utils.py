@@ -1,12 +1,50 @@
 import sqlite3
 import os
 from dotenv import load_dotenv, find_dotenv
-from openai import AzureOpenAI as OpenAIAzureOpenAI
-import httpx
 import streamlit as st
 from pathlib import Path
 import time
 import re
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, NamedTuple
+
+from core.database.connection_pool import get_connection_pool
+from core.database.pattern_catalog_cache import get_pattern_catalog_cache
+
+# Statements that only read, served by the calling thread's reader connection
+_READ_ONLY_STATEMENT = re.compile(r"^\s*(SELECT|EXPLAIN|WITH)\b", re.IGNORECASE)
+# Below SQLite's default limit on host parameters per statement
+MAX_QUERY_PARAMETERS = 500
+
+
+class PatternRecord(NamedTuple):
+    """A pattern to save for one section of an API"""
+    section_name: str
+    pattern_name: str
+    pattern_description: str
+    pattern_prompt: str
+
+
+class WorkspacePattern(NamedTuple):
+    """A pattern saved in a workspace, as returned by get_all_patterns"""
+    api_name: str
+    api_version: str
+    section_name: str
+    pattern_description: str
+    pattern_prompt: str
+
+
+class SavedPattern(NamedTuple):
+    """Row ids a pattern was saved under"""
+    pattern_name: str
+    pattern_id: int
+    section_id: int
+
+
+def _batches(values: List, size: int = MAX_QUERY_PARAMETERS) -> Iterable[List]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
 
 class SQLDatabaseUtils:
     def __init__(self, db_name="api_analysis.db", base_dir=None):
@@ -22,12 +60,14 @@ class SQLDatabaseUtils:
         else:
             self.base_dir = Path(base_dir)
         self.db_path = self.base_dir / self.db_name
+        self._has_pattern_catalog = None
+        self._pattern_details_columns = None
 
     def connect(self):
         """
         Connects to the SQLite database.
         Returns:
-            sqlite3.Connection: SQLite connection object.
+            sqlite3.Connection: A new SQLite connection object (not pooled).
         """
         if not self.db_path.exists():
             raise FileNotFoundError(f"Database file not found: {self.db_path}")
@@ -35,33 +75,144 @@ class SQLDatabaseUtils:
         conn.execute("PRAGMA busy_timeout = 5000;")
         return conn
 
+    @property
+    def pool(self):
+        """The process-wide connection pool of this database"""
+        if not self.db_path.exists():
+            raise FileNotFoundError(f"Database file not found: {self.db_path}")
+        return get_connection_pool(self.db_path)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Group writes into one transaction, committed when the block exits and rolled back
+        if it raises. execute_query and insert_data calls made inside the block on the same
+        thread join it.
+
+        Yields:
+            sqlite3.Connection: The writer connection.
+        """
+        with self.pool.transaction() as conn:
+            yield conn
+
     def insert_data(self, table_name, values, columns=None, retries=2, delay=2):
+        """
+        Inserts one row and returns its rowid. Waiting for other writers is left to
+        SQLite's busy timeout; the insert is retried after `delay` seconds only if the
+        database is still locked once that has expired.
+        """
+        if columns:
+            columns_str = ", ".join(columns)
+            placeholders = ", ".join(["?"] * len(values))
+            query = f"INSERT INTO {table_name} ({columns_str}) VALUES ({placeholders})"
+        else:
+            placeholders = ", ".join(["?"] * len(values))
+            query = f"INSERT INTO {table_name} VALUES ({placeholders})"
+
         last_inserted_id = None
         for attempt in range(retries):
             try:
-                conn = self.connect()
-                cursor = conn.cursor()
-                if columns:
-                    columns_str = ", ".join(columns)
-                    placeholders = ", ".join(["?"] * len(values))
-                    query = f"INSERT INTO {table_name} ({columns_str}) VALUES ({placeholders})"
-                else:
-                    placeholders = ", ".join(["?"] * len(values))
-                    query = f"INSERT INTO {table_name} VALUES ({placeholders})"
-                cursor.execute(query, values)
-                conn.commit()
-                last_inserted_id = cursor.lastrowid
+                with self.transaction() as conn:
+                    cursor = conn.execute(query, values)
+                    last_inserted_id = cursor.lastrowid
                 break  # Exit the loop if successful
             except sqlite3.OperationalError as e:
-                if "database is locked" in str(e):
-                    time.sleep(delay)
+                if "database is locked" in str(e) and not self.pool.in_transaction:
+                    if attempt + 1 < retries:
+                        time.sleep(delay)
                 else:
                     raise  # Raise other exceptions
-            finally:
-                cursor.close()
-                conn.close()
         return last_inserted_id
 
+    def save_patterns(self, api_id, patterns: Iterable[PatternRecord]) -> Dict[str, SavedPattern]:
+        """
+        Saves patterns with their api_section and section_pattern_mapping rows in a single
+        transaction, so either all of them are stored or none.
+
+        Saving is idempotent: a pattern_name that already exists has its description,
+        prompt and updated_at updated, the API's existing section of the same name is
+        reused and a mapping is only added once. Sections belong to one API, so another
+        API's section of the same name is left alone (see
+        SchemaMigration.migrate_to_api_scoped_sections for databases whose schema made
+        display names unique across APIs).
+
+        Args:
+            api_id (int): The API the sections belong to.
+            patterns (iterable of PatternRecord): The patterns to save.
+        Returns:
+            dict: SavedPattern by section name.
+        """
+        patterns = list(patterns)
+        if not patterns:
+            return {}
+        section_names = list(dict.fromkeys(pattern.section_name for pattern in patterns))
+        pattern_names = list(dict.fromkeys(pattern.pattern_name for pattern in patterns))
+        # Workspaces created from the minimal schema have no timestamp columns
+        touch_updated_at = (
+            ",\n                    updated_at = CURRENT_TIMESTAMP" if "updated_at" in self.pattern_details_columns else ""
+        )
+
+        with self.transaction() as conn:
+            section_ids = self._section_ids(conn, api_id, section_names)
+            conn.executemany(
+                "INSERT INTO api_section (api_id, section_name, section_display_name) VALUES (?, ?, ?)",
+                [(api_id, name, name) for name in section_names if name not in section_ids]
+            )
+            if len(section_ids) < len(section_names):
+                section_ids = self._section_ids(conn, api_id, section_names)
+
+            conn.executemany(
+                f"""
+                INSERT INTO pattern_details (pattern_name, pattern_description, pattern_prompt)
+                VALUES (?, ?, ?)
+                ON CONFLICT(pattern_name) DO UPDATE SET
+                    pattern_description = excluded.pattern_description,
+                    pattern_prompt = excluded.pattern_prompt{touch_updated_at}
+                """,
+                [(p.pattern_name, p.pattern_description, p.pattern_prompt) for p in patterns]
+            )
+            pattern_ids = {}
+            for batch in _batches(pattern_names):
+                rows = conn.execute(
+                    f"SELECT pattern_name, pattern_id FROM pattern_details "
+                    f"WHERE pattern_name IN ({', '.join(['?'] * len(batch))})",
+                    batch
+                )
+                pattern_ids.update(rows)
+
+            saved = {
+                pattern.section_name: SavedPattern(
+                    pattern.pattern_name, pattern_ids[pattern.pattern_name], section_ids[pattern.section_name]
+                )
+                for pattern in patterns
+            }
+            conn.executemany(
+                """
+                INSERT INTO section_pattern_mapping (pattern_id, section_id, api_id)
+                SELECT ?1, ?2, ?3
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM section_pattern_mapping
+                    WHERE pattern_id = ?1 AND section_id = ?2 AND api_id = ?3
+                )
+                """,
+                [(p.pattern_id, p.section_id, api_id) for p in saved.values()]
+            )
+        return saved
+
+    @staticmethod
+    def _section_ids(conn, api_id, section_names: List[str]) -> Dict[str, int]:
+        """Ids of the API's existing sections among section_names (the first of duplicates)"""
+        section_ids = {}
+        for batch in _batches(section_names):
+            rows = conn.execute(
+                f"SELECT section_display_name, MIN(section_id) FROM api_section "
+                f"WHERE api_id = ? AND section_display_name IN ({', '.join(['?'] * len(batch))}) "
+                f"GROUP BY section_display_name",
+                [api_id, *batch]
+            )
+            section_ids.update(rows)
+        return section_ids
+
     def execute_query(self, query, params=None):
         """
         Executes a query on the SQLite database.
@@ -71,17 +222,12 @@ class SQLDatabaseUtils:
         Returns:
             list: Query results as a list of tuples.
         """
-        conn = self.connect()
-        cursor = conn.cursor()
-        if params:
-            cursor.execute(query, params)
-        else:
-            cursor.execute(query)
-        results = cursor.fetchall()
-        conn.commit()
-        cursor.close()
-        conn.close()
-        return results
+        pool = self.pool
+        if _READ_ONLY_STATEMENT.match(query) or pool.in_transaction:
+            cursor = pool.reader().execute(query, params or ())
+            return cursor.fetchall()
+        with pool.transaction() as conn:
+            return conn.execute(query, params or ()).fetchall()
 
     def run_query(self, query, params=None):
         """
@@ -100,33 +246,107 @@ class SQLDatabaseUtils:
             for row in results:
                 print(row)
 
-    def search_in_database(self, element, selected_airlines=None):
-        query = """
-            SELECT a.api_name, COALESCE(av.version_number, 'N/A') as api_version, pd.pattern_description, pd.pattern_prompt
-            FROM api a
-            LEFT JOIN apiversion av ON a.api_id = av.api_id
-            JOIN api_section aps ON a.api_id = aps.api_id
-            JOIN section_pattern_mapping spm ON aps.section_id = spm.section_id AND aps.api_id = spm.api_id
-            JOIN pattern_details pd ON spm.pattern_id = pd.pattern_id
-            WHERE aps.section_display_name = ?
-            GROUP BY a.api_name, av.version_number, pd.pattern_prompt
+    @property
+    def has_pattern_catalog(self):
+        """
+        Whether the schema has the trigger-maintained pattern_catalog table (schema version 2),
+        checked once per instance.
         """
+        if self._has_pattern_catalog is None:
+            rows = self.execute_query(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'pattern_catalog'"
+            )
+            self._has_pattern_catalog = bool(rows)
+        return self._has_pattern_catalog
+
+    @property
+    def pattern_details_columns(self) -> List[str]:
+        """Column names of pattern_details (read once)"""
+        if self._pattern_details_columns is None:
+            rows = self.pool.reader().execute("PRAGMA table_info(pattern_details)").fetchall()
+            self._pattern_details_columns = [row[1] for row in rows]
+        return self._pattern_details_columns
+
+    def search_in_database(self, element, selected_airlines=None):
+        if self.has_pattern_catalog:
+            query = """
+                SELECT pc.api_name, COALESCE(av.version_number, 'N/A') as api_version, pc.pattern_description, pc.pattern_prompt
+                FROM pattern_catalog pc
+                LEFT JOIN apiversion av ON pc.api_id = av.api_id
+                WHERE pc.section_display_name = ?
+                GROUP BY pc.api_name, av.version_number, pc.pattern_prompt
+            """
+        else:
+            query = """
+                SELECT a.api_name, COALESCE(av.version_number, 'N/A') as api_version, pd.pattern_description, pd.pattern_prompt
+                FROM api a
+                LEFT JOIN apiversion av ON a.api_id = av.api_id
+                JOIN api_section aps ON a.api_id = aps.api_id
+                JOIN section_pattern_mapping spm ON aps.section_id = spm.section_id AND aps.api_id = spm.api_id
+                JOIN pattern_details pd ON spm.pattern_id = pd.pattern_id
+                WHERE aps.section_display_name = ?
+                GROUP BY a.api_name, av.version_number, pd.pattern_prompt
+            """
         section_display_name = element
-        results = self.run_query(query, (section_display_name,))
-        return results
+        results = get_pattern_catalog_cache().get(
+            self.db_path, ("search_in_database", section_display_name),
+            lambda: self.run_query(query, (section_display_name,))
+        )
+        return list(results)
 
     def get_all_patterns(self):
-        query = """
-            SELECT a.api_name, COALESCE(av.version_number, 'N/A') as api_version, aps.section_name, pd.pattern_description, pd.pattern_prompt
-            FROM api a
-            LEFT JOIN apiversion av ON a.api_id = av.api_id
-            JOIN api_section aps ON a.api_id = aps.api_id
-            JOIN section_pattern_mapping spm ON aps.section_id = spm.section_id AND aps.api_id = spm.api_id
-            JOIN pattern_details pd ON spm.pattern_id = pd.pattern_id
-            GROUP BY a.api_name, av.version_number, pd.pattern_prompt
+        if self.has_pattern_catalog:
+            query = """
+                SELECT pc.api_name, COALESCE(av.version_number, 'N/A') as api_version, pc.section_name, pc.pattern_description, pc.pattern_prompt
+                FROM pattern_catalog pc
+                LEFT JOIN apiversion av ON pc.api_id = av.api_id
+                GROUP BY pc.api_name, av.version_number, pc.pattern_prompt
+            """
+        else:
+            query = """
+                SELECT a.api_name, COALESCE(av.version_number, 'N/A') as api_version, aps.section_name, pd.pattern_description, pd.pattern_prompt
+                FROM api a
+                LEFT JOIN apiversion av ON a.api_id = av.api_id
+                JOIN api_section aps ON a.api_id = aps.api_id
+                JOIN section_pattern_mapping spm ON aps.section_id = spm.section_id AND aps.api_id = spm.api_id
+                JOIN pattern_details pd ON spm.pattern_id = pd.pattern_id
+                GROUP BY a.api_name, av.version_number, pd.pattern_prompt
+            """
+        results = get_pattern_catalog_cache().get(
+            self.db_path, ("get_all_patterns",),
+            lambda: [WorkspacePattern(*row) for row in self.run_query(query)]
+        )
+        return list(results)
+
+    def get_section_pattern(self, api_name, section_display_name):
         """
-        results = self.run_query(query)
-        return results
+        The first pattern mapped to a section of an API.
+        Returns:
+            tuple: (api_name, api_version, pattern_description, pattern_prompt, section_display_name), or None
+        """
+        if self.has_pattern_catalog:
+            query = """
+                SELECT pc.api_name, COALESCE(av.version_number, 'N/A') as api_version,
+                       pc.pattern_description, pc.pattern_prompt, pc.section_display_name
+                FROM pattern_catalog pc
+                LEFT JOIN apiversion av ON pc.api_id = av.api_id
+                WHERE pc.api_name = ? AND pc.section_display_name = ?
+                ORDER BY pc.pattern_id LIMIT 1
+            """
+        else:
+            query = """
+                SELECT a.api_name, COALESCE(av.version_number, 'N/A') as api_version, 
+                       pd.pattern_description, pd.pattern_prompt, aps.section_display_name
+                FROM api a
+                LEFT JOIN apiversion av ON a.api_id = av.api_id
+                JOIN api_section aps ON a.api_id = aps.api_id
+                JOIN section_pattern_mapping spm ON aps.section_id = spm.section_id AND aps.api_id = spm.api_id
+                JOIN pattern_details pd ON spm.pattern_id = pd.pattern_id
+                WHERE a.api_name = ? AND aps.section_display_name = ?
+                ORDER BY pd.pattern_id LIMIT 1
+            """
+        results = self.run_query(query, (api_name, section_display_name))
+        return results[0] if results else None
 
     @staticmethod
     def list_main_elements(xml_text):
@@ -142,11 +362,7 @@ class SQLDatabaseUtils:
         return elements
 
     def print_table_data(self, table_name):
-        conn = self.connect()
-        cursor = conn.cursor()
-        cursor.execute(f"SELECT * FROM {table_name}")
-        rows = cursor.fetchall()
-        conn.close()
+        rows = self.execute_query(f"SELECT * FROM {table_name}")
         print(f"Data from {table_name}:")
         for row in rows:
             print(row)
@@ -165,12 +381,7 @@ class SQLDatabaseUtils:
             )
         """
         try:
-            conn = self.connect()
-            cursor = conn.cursor()
-            cursor.execute(query)
-            conn.commit()
-            cursor.close()
-            conn.close()
+            self.execute_query(query)
             return True
         except Exception as e:
             print(f"Error creating apiversion table: {e}")
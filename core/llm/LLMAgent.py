@@ -1,13 +1,101 @@
-import streamlit as st
+import time
+from types import SimpleNamespace
 
 from core.llm.TokenCostCalculator import TokenCostCalculator
+from core.llm.completion_result import CompletionFailure, CompletionResult, UNEXPECTED_ERROR
+from core.llm.rate_limiter import RetryScheduler, classify_error, get_rate_limiter, estimate_prompt_tokens
+from core.llm.telemetry import get_llm_telemetry
+from core.llm.token_counter import get_token_counter
+
+
+class CompletionStream:
+    """
+    A streamed chat completion: iterating yields the content deltas as they arrive.
+
+    Once iteration ends, result holds a CompletionResult whose response carries the full
+    content and the usage reported by the service (estimated with the tokenizer if the
+    service did not report it), or a CompletionFailure if the stream broke off. Requests are
+    only retried until the stream is open, never after content has been delivered.
+    time_to_first_byte is the time to the first content delta.
+    """
+
+    ok = True
+
+    def __init__(self, agent, messages, opened: CompletionResult, started: float):
+        self.agent = agent
+        self.messages = messages
+        self.opened = opened
+        self.started = started
+        self.result = None
+
+    def __iter__(self):
+        if self.result is not None:
+            return
+        parts = []
+        usage = None
+        first_content_at = None
+        try:
+            for chunk in self.opened.response:
+                if getattr(chunk, "usage", None) is not None:
+                    usage = chunk.usage
+                if chunk.choices:
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        if first_content_at is None:
+                            first_content_at = time.perf_counter()
+                        parts.append(delta)
+                        yield delta
+        except GeneratorExit:
+            # The caller stopped reading: release the connection instead of draining it
+            self.opened.response.close()
+            self.result = self._failure(UNEXPECTED_ERROR, "Stream closed before the completion ended")
+            raise
+        except Exception as e:
+            info = classify_error(e)
+            self.result = self._failure(info.error_type, str(e), info.status_code)
+        finally:
+            self._finish("".join(parts), usage, first_content_at)
+
+    def _failure(self, error_type, message, status_code=None):
+        return CompletionFailure(
+            error_type=error_type, message=message, attempts=self.opened.attempts,
+            status_code=status_code, queue_wait=self.opened.queue_wait,
+        )
+
+    def _finish(self, content, usage, first_content_at):
+        if self.result is None:
+            if usage is None:
+                counter = get_token_counter(self.agent.model_name)
+                prompt_tokens = counter.count_messages(self.messages)
+                completion_tokens = counter.count(content)
+                usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                                        total_tokens=prompt_tokens + completion_tokens)
+            response = SimpleNamespace(
+                choices=[SimpleNamespace(message=SimpleNamespace(role="assistant", content=content))], usage=usage
+            )
+            self.result = CompletionResult(
+                cost=self.agent._calculate_cost(response), response=response, attempts=self.opened.attempts,
+                queue_wait=self.opened.queue_wait,
+            )
+            # Usage only arrives with the last chunk, after the scheduler reserved the estimate
+            get_rate_limiter(self.agent.model_name).record_usage(
+                estimate_prompt_tokens(self.messages), getattr(usage, "total_tokens", None)
+            )
+        if first_content_at is not None:
+            self.result.time_to_first_byte = first_content_at - self.started - self.result.queue_wait
+        get_llm_telemetry().record_completion(
+            self.agent.model_name, self.messages, self.result, time.perf_counter() - self.started
+        )
+
 
 class LLMAgent:
-    def __init__(self, prompts, gpt_client, model_name):
+    def __init__(self, prompts, gpt_client, model_name, async_client_provider=None):
         self.prompts = prompts
         self.gpt_client = gpt_client
         self.model_name = model_name
         self.temperature = 0
+        # Callable returning the shared async client (see LLMClient.get_async_client)
+        self.async_client_provider = async_client_provider
 
     def add_message(self, prompt):
         self.prompts.append(prompt)
@@ -24,20 +112,83 @@ class LLMAgent:
     def set_prompts(self, prompts):
         self.prompts = prompts
 
-    def get_chat_completion(self):
-        try:
-            response = self.gpt_client.chat.completions.create(
+    def _retry_scheduler(self):
+        return RetryScheduler(get_rate_limiter(self.model_name))
+
+    def get_chat_completion(self, prompts=None):
+        """
+        Rate-limited, retried chat completion.
+
+        Returns:
+            CompletionResult, or CompletionFailure once retries are exhausted or the error
+            is not retryable. Both unpack as (cost, response).
+        """
+        # Passing prompts explicitly leaves self.prompts untouched, so one agent can serve concurrent callers
+        messages = prompts if prompts is not None else self.get_all_prompts()
+        started = time.perf_counter()
+        result = self._retry_scheduler().call(
+            lambda: self.gpt_client.chat.completions.create(
                 model=self.model_name,
-                messages=self.get_all_prompts(),
+                messages=messages,
                 temperature=self.temperature,
                 top_p=0.9,
-            )
-            prompt_tokens = response.usage.prompt_tokens
-            completion_tokens = response.usage.completion_tokens
-            calculator = TokenCostCalculator(self.model_name)
-            cost_eur = calculator.calculate_cost(prompt_tokens, completion_tokens)
-            return cost_eur, response
-        except Exception as e:
-            st.error(f"Error in get_chat_completion: {e}")
-            st.error(e.with_traceback)
-            return None
\ No newline at end of file
+            ),
+            estimate_prompt_tokens(messages)
+        )
+        if result.ok:
+            result.cost = self._calculate_cost(result.response)
+        get_llm_telemetry().record_completion(self.model_name, messages, result, time.perf_counter() - started)
+        return result
+
+    def stream_chat_completion(self, prompts=None):
+        """
+        Rate-limited chat completion streamed as it is generated.
+
+        Returns:
+            CompletionStream to iterate for the content deltas, or CompletionFailure if the
+            stream could not be opened.
+        """
+        messages = prompts if prompts is not None else self.get_all_prompts()
+        started = time.perf_counter()
+        opened = self._retry_scheduler().call(
+            lambda: self.gpt_client.chat.completions.create(
+                model=self.model_name,
+                messages=messages,
+                temperature=self.temperature,
+                top_p=0.9,
+                stream=True,
+                stream_options={"include_usage": True},
+            ),
+            estimate_prompt_tokens(messages)
+        )
+        if not opened.ok:
+            get_llm_telemetry().record_completion(self.model_name, messages, opened, time.perf_counter() - started)
+            return opened
+        return CompletionStream(self, messages, opened, started)
+
+    async def aget_chat_completion(self, prompts=None):
+        """Async counterpart of get_chat_completion, using the pooled async client"""
+        messages = prompts if prompts is not None else self.get_all_prompts()
+        async_client = self.async_client_provider() if self.async_client_provider else None
+        if async_client is None:
+            return CompletionFailure(error_type=UNEXPECTED_ERROR, message="No async client configured for this agent")
+        started = time.perf_counter()
+        result = await self._retry_scheduler().acall(
+            lambda: async_client.chat.completions.create(
+                model=self.model_name,
+                messages=messages,
+                temperature=self.temperature,
+                top_p=0.9,
+            ),
+            estimate_prompt_tokens(messages)
+        )
+        if result.ok:
+            result.cost = self._calculate_cost(result.response)
+        get_llm_telemetry().record_completion(self.model_name, messages, result, time.perf_counter() - started)
+        return result
+
+    def _calculate_cost(self, response):
+        prompt_tokens = response.usage.prompt_tokens
+        completion_tokens = response.usage.completion_tokens
+        calculator = TokenCostCalculator(self.model_name)
+        return calculator.calculate_cost(prompt_tokens, completion_tokens)
\ No newline at end of file
@@ -1,38 +1,36 @@
-import os
-import httpx
 import streamlit as st
-from openai import AzureOpenAI
-from dotenv import load_dotenv, find_dotenv
+from core.llm.client_registry import ModelConfig, get_client_registry
 
 class LLMClient:
     def __init__(self, model_name):
-        _ = load_dotenv(find_dotenv())
         self.model_name = model_name
-        self.azure_endpoint = os.getenv(f"{model_name}_AZURE_OPENAI_ENDPOINT")
-        self.api_key = os.getenv(f"{model_name}_AZURE_OPENAI_KEY")
-        self.api_version = os.getenv(f"{model_name}_AZURE_API_VERSION")
-        self.deployment_model = os.getenv(f"{model_name}_MODEL_DEPLOYMENT_NAME")
-        self.http_client = httpx.Client(verify=False)
+        self.config = ModelConfig.from_env(model_name)
+        self.azure_endpoint = self.config.azure_endpoint
+        self.api_key = self.config.api_key
+        self.api_version = self.config.api_version
+        self.deployment_model = self.config.deployment_model
         self.client = self._initialize_client()
 
     def _initialize_client(self):
-        if not self.azure_endpoint or not self.api_key or not self.api_version:
+        if not self.config.is_complete:
             st.info(f"self.azure_endpoint: {self.azure_endpoint}")
             st.info(f"self.api_key: {self.api_key}")
             st.info(f"self.api_version: {self.api_version}")
             st.error(f"Configuration for {self.model_name} is incomplete. Please check your environment variables.")
             return None
-        return AzureOpenAI(
-            azure_endpoint=self.azure_endpoint,
-            api_key=self.api_key,
-            api_version=self.api_version,
-            http_client=self.http_client
-        )
+        # Shared across managers and reruns so connections are reused
+        return get_client_registry().get_client(self.config)
 
     def get_client(self):
         return self.client
-    
+
+    def get_async_client(self):
+        """Shared async client of this configuration; see LLMClientRegistry.aclose for its lifecycle"""
+        if not self.config.is_complete:
+            return None
+        return get_client_registry().get_async_client(self.config)
+
     def get_deployment_model(self):
         return self.deployment_model
-    
-    
\ No newline at end of file
+
+
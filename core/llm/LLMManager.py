@@ -7,12 +7,24 @@ from abc import ABC, abstractmethod
 
 class LLMManager(ABC):
     model_name = None
+    headless = False
     
-    def __init__(self, model_name):
+    def __init__(self, model_name, headless=False):
+        """
+        Args:
+            model_name (str): Model configuration prefix, e.g. GPT4O.
+            headless (bool): Run without a Streamlit session (CLI and batch jobs). No session
+                state is touched and a missing configuration raises instead of stopping the page.
+        """
         self.client = LLMClient(model_name)
         self.model_name = model_name
+        self.headless = headless
         self.agent = self._setup_agent()
-        self.init_session_state()
+        if headless:
+            if not self.agent:
+                raise RuntimeError(f"Agent for {model_name} could not be initialized. Please check your environment variables.")
+        else:
+            self.init_session_state()
 
     def init_session_state(self):
         """
@@ -44,7 +56,7 @@ class LLMManager(ABC):
         gpt_client = self.client.get_client()
         deployment_model = self.client.get_deployment_model()
         if gpt_client and deployment_model:
-            return LLMAgent([], gpt_client, deployment_model)
+            return LLMAgent([], gpt_client, deployment_model, async_client_provider=self.client.get_async_client)
         return None
     
     @abstractmethod
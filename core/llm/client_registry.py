@@ -0,0 +1,209 @@
+"""
+Process-wide registry of pooled Azure OpenAI clients.
+
+Streamlit reruns a page script on every interaction and each manager used to build its
+own AzureOpenAI client over a fresh httpx connection pool, paying a TLS handshake per
+rerun. The registry keeps one sync client and one async client per model configuration
+(endpoint, key and API version) for the lifetime of the process, backed by keep-alive
+connection pools that use HTTP/2 when the optional ``h2`` package is installed. The SDK's
+own retries are disabled; retries are scheduled by core.llm.rate_limiter.
+
+An httpx async pool belongs to the event loop it is used on, so the async clients are
+meant for one long-lived loop and are closed with ``await registry.aclose()`` on it;
+close() closes them on a new loop when none is running.
+
+Pool limits are tunable with LLM_HTTP_MAX_CONNECTIONS, LLM_HTTP_MAX_KEEPALIVE and
+LLM_HTTP_KEEPALIVE_EXPIRY; LLM_HTTP2_ENABLED=false forces HTTP/1.1. A response hook
+timestamps the arrival of response headers for the time-to-first-byte telemetry.
+
+The openai SDK and httpx are imported when the first client is created: importing the SDK
+takes over half a second, which every page would otherwise pay before rendering.
+"""
+
+import asyncio
+import os
+import threading
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Optional
+
+from dotenv import load_dotenv, find_dotenv
+
+from core.common.logging_manager import get_logger
+from core.llm.telemetry import arecord_first_byte, record_first_byte
+
+if TYPE_CHECKING:
+    import httpx
+    from openai import AsyncAzureOpenAI, AzureOpenAI
+
+logger = get_logger(__name__)
+
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 10
+DEFAULT_KEEPALIVE_EXPIRY_SECONDS = 30.0
+
+
+@dataclass(frozen=True)
+class ModelConfig:
+    """Connection settings for one model, read from the {model_name}_* environment variables"""
+    azure_endpoint: Optional[str]
+    api_key: Optional[str]
+    api_version: Optional[str]
+    deployment_model: Optional[str] = None
+
+    @classmethod
+    def from_env(cls, model_name: str) -> "ModelConfig":
+        _ = load_dotenv(find_dotenv())
+        return cls(
+            azure_endpoint=os.getenv(f"{model_name}_AZURE_OPENAI_ENDPOINT"),
+            api_key=os.getenv(f"{model_name}_AZURE_OPENAI_KEY"),
+            api_version=os.getenv(f"{model_name}_AZURE_API_VERSION"),
+            deployment_model=os.getenv(f"{model_name}_MODEL_DEPLOYMENT_NAME"),
+        )
+
+    @property
+    def is_complete(self) -> bool:
+        return bool(self.azure_endpoint and self.api_key and self.api_version)
+
+    @property
+    def client_key(self):
+        # The deployment is chosen per request, so models sharing an endpoint share a pool
+        return (self.azure_endpoint, self.api_key, self.api_version)
+
+
+def _http2_available() -> bool:
+    if os.getenv("LLM_HTTP2_ENABLED", "true").lower() in ("0", "false", "no"):
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _pool_limits() -> "httpx.Limits":
+    import httpx
+    return httpx.Limits(
+        max_connections=int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS)),
+        max_keepalive_connections=int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", DEFAULT_MAX_KEEPALIVE_CONNECTIONS)),
+        keepalive_expiry=float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", DEFAULT_KEEPALIVE_EXPIRY_SECONDS)),
+    )
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class LLMClientRegistry:
+    """Hands out shared AzureOpenAI and AsyncAzureOpenAI clients keyed by model configuration"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients: Dict[tuple, "AzureOpenAI"] = {}
+        self._async_clients: Dict[tuple, "AsyncAzureOpenAI"] = {}
+
+    @staticmethod
+    def _check_config(config: ModelConfig):
+        if not config.is_complete:
+            raise ValueError("Model configuration is incomplete: endpoint, key and API version are required")
+
+    def get_client(self, config: ModelConfig) -> "AzureOpenAI":
+        """Return the shared sync client for this configuration, creating it on first use"""
+        self._check_config(config)
+        key = config.client_key
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        with self._lock:
+            if key not in self._clients:
+                import httpx
+                from openai import AsyncAzureOpenAI, AzureOpenAI
+                http2 = _http2_available()
+                self._clients[key] = AzureOpenAI(
+                    azure_endpoint=config.azure_endpoint,
+                    api_key=config.api_key,
+                    api_version=config.api_version,
+                    max_retries=0,
+                    http_client=httpx.Client(
+                        verify=False, http2=http2, limits=_pool_limits(),
+                        event_hooks={"response": [record_first_byte]},
+                    ),
+                )
+                logger.info(f"Created pooled LLM client for {config.azure_endpoint} (http2={http2})")
+            return self._clients[key]
+
+    def get_async_client(self, config: ModelConfig) -> "AsyncAzureOpenAI":
+        """Return the shared async client for this configuration, creating it on first use"""
+        self._check_config(config)
+        key = config.client_key
+        client = self._async_clients.get(key)
+        if client is not None:
+            return client
+        with self._lock:
+            if key not in self._async_clients:
+                import httpx
+                from openai import AsyncAzureOpenAI
+                http2 = _http2_available()
+                self._async_clients[key] = AsyncAzureOpenAI(
+                    azure_endpoint=config.azure_endpoint,
+                    api_key=config.api_key,
+                    api_version=config.api_version,
+                    max_retries=0,
+                    http_client=httpx.AsyncClient(
+                        verify=False, http2=http2, limits=_pool_limits(),
+                        event_hooks={"response": [arecord_first_byte]},
+                    ),
+                )
+                logger.info(f"Created pooled async LLM client for {config.azure_endpoint} (http2={http2})")
+            return self._async_clients[key]
+
+    def _take_clients(self):
+        with self._lock:
+            clients, async_clients = list(self._clients.values()), list(self._async_clients.values())
+            self._clients.clear()
+            self._async_clients.clear()
+        return clients, async_clients
+
+    @staticmethod
+    async def _close_async_clients(async_clients):
+        for client in async_clients:
+            try:
+                await client.close()
+            except Exception as e:
+                logger.warning(f"Could not close async LLM client: {e}")
+
+    def close(self):
+        """
+        Close the connection pools; clients requested afterwards get new ones. Async pools
+        are closed on a new event loop, so from a coroutine use aclose() instead.
+        """
+        if self._async_clients and _running_loop() is not None:
+            raise RuntimeError("close() cannot close async clients inside an event loop; await aclose()")
+        clients, async_clients = self._take_clients()
+        for client in clients:
+            client.close()
+        if async_clients:
+            asyncio.run(self._close_async_clients(async_clients))
+
+    async def aclose(self):
+        """Close the connection pools, the async ones on the running event loop"""
+        clients, async_clients = self._take_clients()
+        for client in clients:
+            client.close()
+        await self._close_async_clients(async_clients)
+
+
+# Global client registry instance
+_client_registry = None
+_client_registry_lock = threading.Lock()
+
+def get_client_registry() -> LLMClientRegistry:
+    """Get the process-wide client registry"""
+    global _client_registry
+    if _client_registry is None:
+        with _client_registry_lock:
+            if _client_registry is None:
+                _client_registry = LLMClientRegistry()
+    return _client_registry
@@ -0,0 +1,75 @@
+"""
+Typed outcomes of a chat completion request.
+
+LLMAgent.get_chat_completion returns a CompletionResult on success and a CompletionFailure
+once retries are exhausted or the error is not retryable. Both unpack as (cost, response),
+with a failure unpacking to (0.0, None), so existing ``cost, response = ...`` callers keep
+working and can check ``result.ok`` for the details.
+
+queue_wait is the time spent waiting for rate limit capacity and retry backoff, and
+time_to_first_byte the time from sending the last attempt to its response headers
+(None when the transport did not report it).
+"""
+
+from dataclasses import dataclass
+from typing import Any, Optional
+
+# Failure categories
+RATE_LIMITED = "rate_limited"
+TIMEOUT = "timeout"
+CONNECTION_ERROR = "connection_error"
+SERVER_ERROR = "server_error"
+CLIENT_ERROR = "client_error"
+UNEXPECTED_ERROR = "unexpected_error"
+
+
+@dataclass
+class CompletionResult:
+    """A successful completion"""
+    cost: float
+    response: Any
+    attempts: int = 1
+    queue_wait: float = 0.0
+    time_to_first_byte: Optional[float] = None
+
+    ok = True
+
+    @property
+    def content(self) -> Optional[str]:
+        return self.response.choices[0].message.content
+
+    def __iter__(self):
+        yield self.cost
+        yield self.response
+
+
+@dataclass
+class CompletionFailure:
+    """A completion that could not be obtained"""
+    error_type: str
+    message: str
+    attempts: int = 1
+    status_code: Optional[int] = None
+    retryable: bool = False
+    queue_wait: float = 0.0
+    time_to_first_byte: Optional[float] = None
+
+    ok = False
+    cost = 0.0
+    response = None
+    content = None
+
+    def __iter__(self):
+        yield self.cost
+        yield self.response
+
+    def __bool__(self):
+        return False
+
+
+class LLMCompletionError(Exception):
+    """Raised by callers that need a completion and cannot continue without one"""
+
+    def __init__(self, failure: CompletionFailure):
+        super().__init__(f"{failure.error_type}: {failure.message}")
+        self.failure = failure
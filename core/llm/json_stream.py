@@ -0,0 +1,186 @@
+"""
+Incremental parsing of JSON documents received in pieces.
+
+A streamed completion arrives as many small text deltas, but the JSON it contains can only
+be loaded once it is complete. JSONArrayStream scans the deltas as they arrive and returns
+each element of the selected arrays (objects and nested arrays; scalar elements are
+skipped) as soon as its closing bracket has been received, so callers can act on the first
+patterns of a long response while the model is still writing the rest:
+
+    stream = JSONArrayStream(("patterns",))
+    for delta in completion:
+        for path, pattern in stream.feed(delta):
+            ...
+
+Arrays are selected by the object keys leading to them from the top-level object, e.g.
+("insights", "relations") for {"insights": {"relations": [...]}}. Text before the
+top-level value (such as a markdown code fence) is ignored, brackets in it included: a
+candidate top-level value that cannot open a document with the selected arrays (an array
+unless the top-level array itself is selected, or an object whose first character is not
+a key), or that closes without returning any element and is not valid JSON, is dropped and
+the scan resumes just after its opening bracket. The complete document is still parsed by
+the caller once the response has ended; elements are only a preview of it.
+"""
+
+import json
+from dataclasses import dataclass
+from typing import Any, List, Optional, Sequence, Tuple
+
+from core.common.logging_manager import get_logger
+
+logger = get_logger(__name__)
+
+JSONPath = Tuple[str, ...]
+
+# Characters that can follow the opening bracket of a JSON array
+_ARRAY_START = '{["-0123456789tfn]'
+
+
+@dataclass
+class _Container:
+    is_object: bool
+    path: Tuple[Optional[str], ...]
+    key: Optional[str] = None
+    expecting_key: bool = True
+
+
+class JSONArrayStream:
+    """Returns the elements of the arrays at the given key paths as their text completes"""
+
+    def __init__(self, *paths: Sequence[str]):
+        self.paths = {tuple(path) for path in paths}
+        self._pending = ""
+        self._position = 0
+        self._stack: List[_Container] = []
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        # (stack depth of the element, start offset in _pending, path of its array)
+        self._element: Optional[Tuple[int, int, JSONPath]] = None
+        # Text of the candidate top-level value already dropped from _pending, its start
+        # offset in _pending, and whether its first character still has to be checked
+        self._root_chunks: List[str] = []
+        self._root_start = 0
+        self._root_unchecked = False
+        self._root_elements = 0
+        self._finished = False
+
+    def feed(self, text: str) -> List[Tuple[JSONPath, Any]]:
+        """Scan the next piece of the document; returns the (array path, element) pairs completed by it"""
+        if self._finished or not text:
+            return []
+        self._pending += text
+        pending = self._pending
+        stack = self._stack
+        completed = []
+
+        position = self._position
+        while position < len(pending):
+            char = pending[position]
+            if self._root_unchecked and not char.isspace():
+                self._root_unchecked = False
+                if char not in ('"}' if stack[0].is_object else _ARRAY_START):
+                    pending = self._reject_root()
+                    position = 0
+                    continue
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    top = stack[-1] if stack else None
+                    if top is not None and top.is_object and top.expecting_key:
+                        top.key = json.loads(pending[self._string_start:position + 1])
+                        top.expecting_key = False
+            elif char == '"':
+                if stack:
+                    self._in_string = True
+                    self._string_start = position
+            elif char == "{" or char == "[":
+                parent = stack[-1] if stack else None
+                if parent is None:
+                    if char == "[" and () not in self.paths:
+                        position += 1
+                        continue
+                    path = ()
+                    self._root_chunks = []
+                    self._root_start = position
+                    self._root_unchecked = True
+                    self._root_elements = 0
+                elif parent.is_object:
+                    path = parent.path + (parent.key,)
+                else:
+                    path = parent.path + (None,)
+                stack.append(_Container(char == "{", path))
+                if (self._element is None and parent is not None and not parent.is_object
+                        and parent.path in self.paths):
+                    self._element = (len(stack), position, parent.path)
+            elif char == "}" or char == "]":
+                if stack:
+                    stack.pop()
+                    if self._element is not None and len(stack) + 1 == self._element[0]:
+                        _, start, path = self._element
+                        self._element = None
+                        try:
+                            completed.append((path, json.loads(pending[start:position + 1])))
+                            self._root_elements += 1
+                        except json.JSONDecodeError as e:
+                            logger.debug(f"Skipping malformed element of {path}: {e}")
+                    if not stack:
+                        if self._root_elements == 0 and not self._is_json(position):
+                            pending = self._reject_root()
+                            position = 0
+                            continue
+                        self._finished = True
+                        break
+            elif char == "," and stack and stack[-1].is_object:
+                stack[-1].expecting_key = True
+            position += 1
+
+        self._discard_scanned(position)
+        return completed
+
+    def _root_text(self, end: int) -> str:
+        """Text of the candidate top-level value up to offset end of _pending"""
+        return "".join(self._root_chunks) + self._pending[self._root_start:end]
+
+    def _is_json(self, position: int) -> bool:
+        """Whether the top-level value closed at offset position of _pending is valid JSON"""
+        try:
+            json.loads(self._root_text(position + 1))
+            return True
+        except json.JSONDecodeError:
+            return False
+
+    def _reject_root(self) -> str:
+        """Forget the candidate top-level value; returns the text to scan again, after its opening bracket"""
+        text = self._root_text(len(self._pending))
+        logger.debug(f"Ignoring text that does not start the JSON document: {text[:40]!r}")
+        self._stack.clear()
+        self._in_string = False
+        self._escaped = False
+        self._element = None
+        self._root_chunks = []
+        self._root_start = 0
+        self._root_unchecked = False
+        self._pending = text[1:]
+        return self._pending
+
+    def _discard_scanned(self, position: int):
+        """Drop text that no pending key or element refers to any more"""
+        keep_from = position
+        if self._in_string:
+            keep_from = min(keep_from, self._string_start)
+        if self._element is not None:
+            depth, start, path = self._element
+            keep_from = min(keep_from, start)
+            self._element = (depth, start - keep_from, path)
+        if self._stack and not self._root_elements:
+            # Kept aside in case the candidate top-level value turns out not to be JSON
+            self._root_chunks.append(self._pending[self._root_start:keep_from])
+            self._root_start = 0
+        self._pending = self._pending[keep_from:]
+        self._position = position - keep_from
+        self._string_start -= keep_from
@@ -1,27 +1,20 @@
 import os
 import json
-import pandas as pd
 import streamlit as st
 import re
-import numpy as np
-import chromadb
-from openai import AzureOpenAI
+from functools import lru_cache
 from dotenv import load_dotenv, find_dotenv
 from core.llm import TokenCostCalculator
 from core.llm.TokenCostCalculator import TokenCostCalculator
+from core.llm.client_registry import ModelConfig, get_client_registry
 from core.prompts_manager.prompt_utils import *
-from core.common.confluence_utils import publish_content
 from core.database.database_utils import parse_questions_and_retreive_answers
 from core.llm.llm_response_handler_utils import get_answer, get_answer_md, get_answer_html, consolidating_questions
 from core.common.user_interaction import userInteraction
 from core.common.utils import extract_space_and_page_name,get_body,refine_and_display_markdown,convert_html_to_csv, convert_html_to_markdown, refine_and_display_markdown_update, markdown_to_html_table
-from core.database.llamaIndex import query_eng_setup,get_answer_llm
 from core.xml_processing.xml_utils import verify_prerequisite
-from core.data_processing.cleanup import row_extraction
-import httpx
-pd.set_option('display.max_colwidth', None)
-pd.set_option('display.max_columns', None)
-httpx_client = httpx.Client(verify=False)
+# chromadb, llama_index, numpy and pandas are imported where they are used, and the Azure
+# OpenAI clients are created on first use, so importing this module stays cheap
 _ = load_dotenv(find_dotenv())
 
 global model_name_used
@@ -30,33 +23,60 @@ gpt4o_model_name = os.getenv("GPT4O_MODEL_DEPLOYMENT_NAME")
 o1_model_name = os.getenv("o1_MODEL_DEPLOYMENT_NAME")
 o3_mini_model_name = os.getenv("o3_mini_MODEL_DEPLOYMENT_NAME")
 
-o1client = AzureOpenAI(
-  azure_endpoint = os.getenv("o1_AZURE_OPENAI_ENDPOINT"), 
-  api_key=os.getenv("o1_AZURE_OPENAI_KEY"),  
-  api_version=os.getenv("o1_AZURE_API_VERSION"),
-  http_client=httpx_client
-)
-
-o3client = AzureOpenAI(
-  azure_endpoint = os.getenv("o3_mini_AZURE_OPENAI_ENDPOINT"), 
-  api_key=os.getenv("o3_mini_AZURE_OPENAI_KEY"),  
-  api_version=os.getenv("o3_mini_AZURE_API_VERSION"),
-  http_client=httpx_client
-)
-
-gpt4oclient = AzureOpenAI(
-  azure_endpoint = os.getenv("GPT4O_AZURE_OPENAI_ENDPOINT"), 
-  api_key=os.getenv("GPT4O_AZURE_OPENAI_KEY"),  
-  api_version=os.getenv("GPT4O_AZURE_API_VERSION"),
-  http_client=httpx_client
-)
-
-text_embd_client = AzureOpenAI(
- azure_endpoint = os.getenv("ADA_EMBD_AZURE_OPENAI_ENDPOINT"), 
- api_key=os.getenv("ADA_EMBD_AZURE_OPENAI_KEY"),  
- api_version=os.getenv("ADA_EMBD_AZURE_API_VERSION"),
- http_client=httpx_client
-)
+
+@lru_cache(maxsize=None)
+def _http_client():
+    import httpx
+    return httpx.Client(verify=False)
+
+
+@lru_cache(maxsize=None)
+def _azure_client(model_prefix):
+    """AzureOpenAI client for the {model_prefix}_* settings, shared by all callers"""
+    from openai import AzureOpenAI
+    return AzureOpenAI(
+        azure_endpoint=os.getenv(f"{model_prefix}_AZURE_OPENAI_ENDPOINT"),
+        api_key=os.getenv(f"{model_prefix}_AZURE_OPENAI_KEY"),
+        api_version=os.getenv(f"{model_prefix}_AZURE_API_VERSION"),
+        http_client=_http_client()
+    )
+
+
+def get_o1_client():
+    return _azure_client("o1")
+
+
+def get_o3_client():
+    return _azure_client("o3_mini")
+
+
+def get_gpt4o_client():
+    return _azure_client("GPT4O")
+
+
+def get_text_embedding_client():
+    return _azure_client("ADA_EMBD")
+
+
+_CLIENT_FACTORIES = {
+    "o1client": get_o1_client,
+    "o3client": get_o3_client,
+    "gpt4oclient": get_gpt4o_client,
+    "text_embd_client": get_text_embedding_client,
+}
+
+
+def __getattr__(name):
+    # The clients used to be module attributes; keep them reachable without creating them at import
+    if name in _CLIENT_FACTORIES:
+        return _CLIENT_FACTORIES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _set_pandas_display_options():
+    import pandas as pd
+    pd.set_option('display.max_colwidth', None)
+    pd.set_option('display.max_columns', None)
 
 def generate_embedding(client, text, deployment_name="text-embedding-ada-002"):
     response = client.embeddings.create(
@@ -137,12 +157,7 @@ def setup_agent(model_name):
     print("api_key: ", api_key)
     print("api_version:", api_version)
 
-    gpt_client = AzureOpenAI(
-        azure_endpoint=azure_endpoint,
-        api_key=api_key,
-        api_version=api_version,
-        http_client=httpx.Client(verify=False)
-    )
+    gpt_client = get_client_registry().get_client(ModelConfig.from_env(model_name))
 
     agent = Agent([], gpt_client, deployment_model)
     return agent
@@ -151,7 +166,7 @@ def get_chat_completion(input_messages, model_name=o3_mini_model_name):
     try:
         if model_name == gpt4o_model_name:
             print(f"Model Used: {model_name}")
-            response = gpt4oclient.chat.completions.create(
+            response = get_gpt4o_client().chat.completions.create(
                 model=model_name,
                 messages=input_messages,
                 temperature=0,
@@ -160,13 +175,13 @@ def get_chat_completion(input_messages, model_name=o3_mini_model_name):
 
         elif model_name == o1_model_name:
             print(f"Model Used: {o1_model_name}")
-            response = o1client.chat.completions.create(
+            response = get_o1_client().chat.completions.create(
                 model=model_name,
                 messages=input_messages)
             
         else:
             print(f"Model Used: {o3_mini_model_name}")
-            response = o3client.chat.completions.create(
+            response = get_o3_client().chat.completions.create(
                 model=model_name,
                 messages=input_messages
             )
@@ -525,6 +540,9 @@ def question_from_user(context, message, input_xml_1, output_xml_1):
 
 def compare_text(specs_text, user_text):
 
+    import numpy as np
+
+    text_embd_client = get_text_embedding_client()
     embedding1 = generate_embedding(text_embd_client, specs_text)
     embedding2 = generate_embedding(text_embd_client, user_text)
     # Calculate similarity
@@ -782,6 +800,8 @@ def process_user_response(message, chat_history, input_xml, transformed_xml, mai
                         bot_message = "What needs to be refined here?"
 
                     elif previous_message_from_bot.find("What needs to be refined here?") != -1:
+                        import chromadb
+                        from core.database.llamaIndex import query_eng_setup, get_answer_llm
                         chromadb.api.client.SharedSystemClient.clear_system_cache()
                         with st.spinner('Refining XSLT, Thanks for your patience'):
                             #document = chromadb_setup(specs)
@@ -836,6 +856,8 @@ def process_user_response(message, chat_history, input_xml, transformed_xml, mai
                             print("User Response : " , message)
                             batch_size = 8
                             batch_size_c = 4
+                            from core.data_processing.cleanup import row_extraction
+                            _set_pandas_display_options()
                             s_rows,c_rows =  row_extraction(dataFrame)
                             with st.spinner('Generating XSLT, Thanks for your patience'):
                                 for i in range(0,len(c_rows),batch_size_c):
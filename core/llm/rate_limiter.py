@@ -0,0 +1,286 @@
+"""
+Client-side rate limiting and retry scheduling for Azure OpenAI deployments.
+
+Every deployment gets a shared DeploymentRateLimiter holding two token buckets, one for
+requests per minute and one for tokens per minute. Callers reserve capacity before a
+request and sleep for the returned delay, so concurrent workers spread their calls over
+the quota instead of bursting into 429s. A 429 pauses the whole deployment for its
+retry-after period, and failed calls are retried with jittered exponential backoff.
+
+Limits are configured with LLM_RATE_LIMIT_RPM and LLM_RATE_LIMIT_TPM (0 = unlimited,
+which still honours retry-after), retries with LLM_MAX_RETRIES, LLM_RETRY_BASE_DELAY and
+LLM_RETRY_MAX_DELAY.
+"""
+
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional, Tuple
+
+from core.common.logging_manager import get_logger
+from core.llm.completion_result import (
+    CompletionResult, CompletionFailure,
+    RATE_LIMITED, TIMEOUT, CONNECTION_ERROR, SERVER_ERROR, CLIENT_ERROR, UNEXPECTED_ERROR
+)
+from core.llm.telemetry import start_request_timing, time_to_first_byte
+
+logger = get_logger(__name__)
+
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_RETRY_BASE_DELAY = 1.0
+DEFAULT_RETRY_MAX_DELAY = 60.0
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at capacity per minute.
+
+    reserve() takes the tokens immediately, letting the balance go negative, and returns
+    how long the caller has to wait before the reservation is covered. This works the
+    same for threads (time.sleep) and coroutines (asyncio.sleep).
+    """
+
+    def __init__(self, capacity_per_minute: float):
+        self.capacity = float(capacity_per_minute)
+        self.refill_per_second = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+
+    def reserve(self, amount: float) -> float:
+        if self.unlimited:
+            return 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            # A single request larger than the bucket still goes through once it is full
+            self.tokens -= min(amount, self.capacity)
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.refill_per_second
+
+    def refund(self, amount: float):
+        """Give back (or take, if negative) tokens once the real cost of a request is known"""
+        if self.unlimited:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class DeploymentRateLimiter:
+    """Requests-per-minute and tokens-per-minute budget shared by all callers of one deployment"""
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, estimated_tokens: int) -> float:
+        """Reserve one request and the estimated tokens; returns the seconds to wait before sending"""
+        delay = max(self.requests.reserve(1), self.tokens.reserve(estimated_tokens))
+        with self._lock:
+            return max(delay, self._paused_until - time.monotonic())
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        if actual_tokens is not None:
+            self.tokens.refund(estimated_tokens - actual_tokens)
+
+    def pause(self, seconds: float):
+        """Hold every caller of this deployment back, e.g. for a 429 retry-after period"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+@dataclass
+class RetryPolicy:
+    max_retries: int = DEFAULT_MAX_RETRIES
+    base_delay: float = DEFAULT_RETRY_BASE_DELAY
+    max_delay: float = DEFAULT_RETRY_MAX_DELAY
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        return cls(
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", DEFAULT_MAX_RETRIES)),
+            base_delay=float(os.getenv("LLM_RETRY_BASE_DELAY", DEFAULT_RETRY_BASE_DELAY)),
+            max_delay=float(os.getenv("LLM_RETRY_MAX_DELAY", DEFAULT_RETRY_MAX_DELAY)),
+        )
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Delay before retry number `attempt` (1-based)"""
+        if retry_after is not None:
+            # Small jitter so callers released by the same retry-after do not collide again
+            return min(self.max_delay, retry_after) + random.uniform(0, self.base_delay)
+        # Full jitter exponential backoff
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+
+@dataclass
+class ErrorInfo:
+    error_type: str
+    retryable: bool
+    status_code: Optional[int] = None
+    retry_after: Optional[float] = None
+
+
+def _parse_retry_after(error) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000)
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(error: Exception) -> ErrorInfo:
+    """Map an OpenAI client exception to a failure category and whether to retry it"""
+    # Imported here so the SDK is only loaded by callers that made a request
+    import openai
+
+    if isinstance(error, openai.RateLimitError):
+        return ErrorInfo(RATE_LIMITED, True, 429, _parse_retry_after(error))
+    if isinstance(error, openai.APITimeoutError):
+        return ErrorInfo(TIMEOUT, True)
+    if isinstance(error, openai.APIConnectionError):
+        return ErrorInfo(CONNECTION_ERROR, True)
+    if isinstance(error, openai.APIStatusError):
+        status_code = getattr(error, "status_code", None)
+        if status_code is not None and (status_code >= 500 or status_code in (408, 409)):
+            return ErrorInfo(SERVER_ERROR, True, status_code, _parse_retry_after(error))
+        return ErrorInfo(CLIENT_ERROR, False, status_code)
+    return ErrorInfo(UNEXPECTED_ERROR, False)
+
+
+def estimate_prompt_tokens(messages) -> int:
+    # Rough estimate (~4 characters per token); corrected from the response usage afterwards
+    return len(json.dumps(messages, ensure_ascii=False)) // 4 + 1
+
+
+def _total_tokens(response) -> Optional[int]:
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", None)
+
+
+class RetryScheduler:
+    """Runs a completion call under a deployment's rate limiter with retries"""
+
+    def __init__(self, limiter: DeploymentRateLimiter, policy: Optional[RetryPolicy] = None):
+        self.limiter = limiter
+        self.policy = policy or RetryPolicy.from_env()
+
+    def _on_error(self, error: Exception, attempt: int) -> Tuple[Optional[float], ErrorInfo]:
+        """Returns (delay before the next attempt or None to give up, error info)"""
+        info = classify_error(error)
+        if not info.retryable or attempt > self.policy.max_retries:
+            return None, info
+        delay = self.policy.backoff(attempt, info.retry_after)
+        if info.error_type == RATE_LIMITED:
+            self.limiter.pause(delay)
+        logger.warning(f"LLM call failed ({info.error_type}: {error}); retry {attempt}/{self.policy.max_retries} in {delay:.1f}s")
+        return delay, info
+
+    @staticmethod
+    def _failure(error: Exception, info: ErrorInfo, attempts: int, queue_wait: float, timing) -> CompletionFailure:
+        logger.error(f"LLM call failed after {attempts} attempt(s) ({info.error_type}): {error}")
+        return CompletionFailure(
+            error_type=info.error_type,
+            message=str(error),
+            attempts=attempts,
+            status_code=info.status_code,
+            retryable=info.retryable,
+            queue_wait=queue_wait,
+            time_to_first_byte=time_to_first_byte(timing),
+        )
+
+    def call(self, request: Callable, estimated_tokens: int):
+        """Run request() until it succeeds; returns CompletionResult (cost 0) or CompletionFailure"""
+        attempt = 0
+        queue_wait = 0.0
+        while True:
+            attempt += 1
+            wait = self.limiter.reserve(estimated_tokens)
+            if wait > 0:
+                time.sleep(wait)
+                queue_wait += wait
+            timing = start_request_timing()
+            try:
+                response = request()
+            except Exception as e:
+                delay, info = self._on_error(e, attempt)
+                if delay is None:
+                    return self._failure(e, info, attempt, queue_wait, timing)
+                time.sleep(delay)
+                queue_wait += delay
+                continue
+            self.limiter.record_usage(estimated_tokens, _total_tokens(response))
+            return CompletionResult(cost=0.0, response=response, attempts=attempt,
+                                    queue_wait=queue_wait, time_to_first_byte=time_to_first_byte(timing))
+
+    async def acall(self, request: Callable, estimated_tokens: int):
+        """Async counterpart of call(); request() must return an awaitable"""
+        attempt = 0
+        queue_wait = 0.0
+        while True:
+            attempt += 1
+            wait = self.limiter.reserve(estimated_tokens)
+            if wait > 0:
+                await asyncio.sleep(wait)
+                queue_wait += wait
+            timing = start_request_timing()
+            try:
+                response = await request()
+            except Exception as e:
+                delay, info = self._on_error(e, attempt)
+                if delay is None:
+                    return self._failure(e, info, attempt, queue_wait, timing)
+                await asyncio.sleep(delay)
+                queue_wait += delay
+                continue
+            self.limiter.record_usage(estimated_tokens, _total_tokens(response))
+            return CompletionResult(cost=0.0, response=response, attempts=attempt,
+                                    queue_wait=queue_wait, time_to_first_byte=time_to_first_byte(timing))
+
+
+# Global per-deployment limiters
+_rate_limiters: Dict[str, DeploymentRateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+def get_rate_limiter(deployment: str) -> DeploymentRateLimiter:
+    """Get the shared rate limiter for a deployment"""
+    with _rate_limiters_lock:
+        if deployment not in _rate_limiters:
+            _rate_limiters[deployment] = DeploymentRateLimiter(
+                requests_per_minute=float(os.getenv("LLM_RATE_LIMIT_RPM", 0)),
+                tokens_per_minute=float(os.getenv("LLM_RATE_LIMIT_TPM", 0)),
+            )
+        return _rate_limiters[deployment]
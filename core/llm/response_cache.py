@@ -0,0 +1,165 @@
+"""
+Content-addressed cache for LLM responses.
+
+Responses are keyed by a SHA-256 of the model deployment and the exact messages sent
+(system prompt file content, XML content and pattern prompt), so re-running an analysis
+on the same XML returns the stored answer without another chat completion.
+
+Entries expire after a TTL and the store is trimmed in least-recently-used order once it
+exceeds the configured entry count or total size.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import List, Dict, Optional
+
+from core.common.logging_manager import get_logger
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MAX_SIZE_MB = 100
+
+
+class LLMResponseCache:
+    """SQLite-backed LRU cache of chat completion contents"""
+
+    def __init__(self, db_path: str = None, ttl_seconds: int = None, max_entries: int = None, max_size_mb: float = None):
+        self.logger = get_logger("llm_response_cache")
+        self.db_path = db_path or str(Path(__file__).parent.parent / "database" / "data" / "llm_response_cache.db")
+        self.ttl_seconds = int(ttl_seconds if ttl_seconds is not None else os.getenv("LLM_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+        self.max_entries = int(max_entries if max_entries is not None else os.getenv("LLM_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+        max_size_mb = float(max_size_mb if max_size_mb is not None else os.getenv("LLM_CACHE_MAX_SIZE_MB", DEFAULT_MAX_SIZE_MB))
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._initialize_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA busy_timeout = 5000")
+        return conn
+
+    def _initialize_database(self):
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_response_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    model_name TEXT,
+                    response TEXT NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_accessed REAL NOT NULL,
+                    hit_count INTEGER DEFAULT 0
+                )
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_llm_cache_last_accessed
+                ON llm_response_cache (last_accessed)
+            """)
+
+    @staticmethod
+    def make_key(model_name: str, prompts: List[Dict]) -> str:
+        """Hash of the model and the exact messages that would be sent to it"""
+        payload = json.dumps({"model": model_name, "messages": prompts}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, model_name: str, prompts: List[Dict]) -> Optional[str]:
+        """Return the cached response content, or None on a miss or an expired entry"""
+        key = self.make_key(model_name, prompts)
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT response, created_at FROM llm_response_cache WHERE cache_key = ?", (key,)
+                ).fetchone()
+                if not row:
+                    return None
+                response, created_at = row
+                if self.ttl_seconds > 0 and now - created_at > self.ttl_seconds:
+                    conn.execute("DELETE FROM llm_response_cache WHERE cache_key = ?", (key,))
+                    return None
+                conn.execute(
+                    "UPDATE llm_response_cache SET last_accessed = ?, hit_count = hit_count + 1 WHERE cache_key = ?",
+                    (now, key)
+                )
+                return response
+        except sqlite3.Error as e:
+            self.logger.warning(f"LLM cache lookup failed: {e}")
+            return None
+
+    def put(self, model_name: str, prompts: List[Dict], response: str):
+        """Store a response and trim the cache back under its limits"""
+        if response is None:
+            return
+        key = self.make_key(model_name, prompts)
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute("""
+                    INSERT OR REPLACE INTO llm_response_cache
+                    (cache_key, model_name, response, size_bytes, created_at, last_accessed, hit_count)
+                    VALUES (?, ?, ?, ?, ?, ?, 0)
+                """, (key, model_name, response, len(response.encode("utf-8")), now, now))
+                self._evict(conn, now)
+        except sqlite3.Error as e:
+            self.logger.warning(f"LLM cache store failed: {e}")
+
+    def delete(self, model_name: str, prompts: List[Dict]):
+        key = self.make_key(model_name, prompts)
+        try:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM llm_response_cache WHERE cache_key = ?", (key,))
+        except sqlite3.Error as e:
+            self.logger.warning(f"LLM cache delete failed: {e}")
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        if self.ttl_seconds > 0:
+            conn.execute("DELETE FROM llm_response_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+        # Keep the most recently used entries that fit within both the entry and size budgets
+        conn.execute("""
+            DELETE FROM llm_response_cache WHERE cache_key IN (
+                SELECT cache_key FROM (
+                    SELECT cache_key,
+                           ROW_NUMBER() OVER (ORDER BY last_accessed DESC) AS position,
+                           SUM(size_bytes) OVER (ORDER BY last_accessed DESC ROWS UNBOUNDED PRECEDING) AS running_size
+                    FROM llm_response_cache
+                )
+                WHERE position > ? OR running_size > ?
+            )
+        """, (self.max_entries, self.max_size_bytes))
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM llm_response_cache")
+        self.logger.info("LLM response cache cleared")
+
+    def stats(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            entries, size_bytes, hits = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0), COALESCE(SUM(hit_count), 0) FROM llm_response_cache"
+            ).fetchone()
+        return {"entries": entries, "size_bytes": size_bytes, "hits": hits}
+
+
+# Global response cache instance
+_response_cache = None
+
+def is_response_cache_enabled() -> bool:
+    return os.getenv("LLM_RESPONSE_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+
+def get_response_cache() -> Optional[LLMResponseCache]:
+    """Get the global response cache, or None when caching is disabled or unavailable"""
+    global _response_cache
+    if not is_response_cache_enabled():
+        return None
+    if _response_cache is None:
+        try:
+            _response_cache = LLMResponseCache()
+        except Exception as e:
+            get_logger("llm_response_cache").error(f"Failed to initialize LLM response cache: {e}")
+            return None
+    return _response_cache
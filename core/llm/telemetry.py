@@ -0,0 +1,358 @@
+"""
+Structured telemetry of LLM calls.
+
+Every chat completion (and every response served from the response cache) is recorded as
+an LLMCallEvent with the model, the prompt template it was built from, token counts,
+queue wait (rate limiter and retry backoff), time to first byte, total latency, cache hit
+and retry count. Events are written to the log as one JSON line each and aggregated into
+in-process counters and latency histograms per model and prompt template.
+
+The aggregates are exposed in the Prometheus text format (render_prometheus) on
+http://<LLM_METRICS_HOST>:<LLM_METRICS_PORT>/metrics when LLM_METRICS_PORT is set, and
+summarized with p50/p95 per prompt template for the Streamlit diagnostics panel.
+
+Prompt templates are recognised by their text: prompt managers read them with
+read_prompt_template, which registers the file name, and a request whose first message is
+a registered template is labelled with that name.
+"""
+
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Deque, Dict, List, Optional, Tuple, Union
+
+from core.common.logging_manager import get_logger
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+logger = get_logger(__name__)
+
+METRIC_PREFIX = "genie_llm"
+UNKNOWN_PROMPT_TYPE = "other"
+DEFAULT_METRICS_HOST = "127.0.0.1"
+RECENT_EVENTS = 500
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+
+
+@dataclass
+class LLMCallEvent:
+    """One LLM call, or one response served from the response cache"""
+    model: str
+    prompt_type: str
+    status: str = "ok"
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    queue_wait_seconds: float = 0.0
+    time_to_first_byte_seconds: Optional[float] = None
+    latency_seconds: float = 0.0
+    cache_hit: bool = False
+    retries: int = 0
+    cost: float = 0.0
+    timestamp: float = field(default_factory=time.time)
+
+
+class Histogram:
+    """Cumulative-bucket histogram as Prometheus exposes it, with interpolated quantiles"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate of the q-quantile, interpolated within its bucket as histogram_quantile does"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            if cumulative + count >= rank and count:
+                if index == len(self.buckets):
+                    # Above the last bound: the best estimate is that bound
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def cumulative_counts(self) -> List[Tuple[str, int]]:
+        result = []
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            result.append((repr(float(bound)), running))
+        result.append(("+Inf", self.count))
+        return result
+
+
+# Timing of the HTTP request in flight in the current thread or task, filled in by the
+# httpx response hook so time to first byte does not depend on how the SDK reads the body
+_request_timing: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("llm_request_timing", default=None)
+
+
+def start_request_timing() -> Dict[str, float]:
+    """Mark an attempt as sent; returns the timing record the response hook completes"""
+    timing = {"sent_at": time.perf_counter()}
+    _request_timing.set(timing)
+    return timing
+
+
+def time_to_first_byte(timing: Optional[Dict[str, float]]) -> Optional[float]:
+    if not timing or "first_byte_at" not in timing:
+        return None
+    return timing["first_byte_at"] - timing["sent_at"]
+
+
+def _mark_first_byte():
+    timing = _request_timing.get()
+    if timing is not None and "first_byte_at" not in timing:
+        timing["first_byte_at"] = time.perf_counter()
+
+
+def record_first_byte(response):
+    """httpx response hook (sync clients): called once the response headers have arrived"""
+    _mark_first_byte()
+
+
+async def arecord_first_byte(response):
+    """httpx response hook (async clients)"""
+    _mark_first_byte()
+
+
+# Prompt template texts, mapped to their names
+_prompt_templates: Dict[str, str] = {}
+
+
+def register_prompt_template(name: str, text: str):
+    _prompt_templates[text] = name
+
+
+def read_prompt_template(path: Union[str, Path]) -> str:
+    """Read a prompt template file and register it under its file name (without extension)"""
+    path = Path(path)
+    with path.open() as f:
+        text = f.read()
+    register_prompt_template(path.stem, text)
+    return text
+
+
+def prompt_template_name(messages) -> str:
+    """Name of the registered template the request's first message was built from"""
+    if not messages:
+        return UNKNOWN_PROMPT_TYPE
+    content = messages[0].get("content") if isinstance(messages[0], dict) else None
+    if not isinstance(content, str):
+        return UNKNOWN_PROMPT_TYPE
+    return _prompt_templates.get(content, UNKNOWN_PROMPT_TYPE)
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{name}="{_escape_label(value)}"' for name, value in labels.items()) + "}"
+
+
+class LLMTelemetry:
+    """Thread-safe aggregation of LLMCallEvents"""
+
+    LATENCY_METRICS = (
+        ("latency_seconds", "Total latency of LLM calls, including queue wait and retries"),
+        ("queue_wait_seconds", "Time LLM calls waited for rate limit capacity and retry backoff"),
+        ("time_to_first_byte_seconds", "Time from sending the final attempt to the first response byte"),
+    )
+
+    def __init__(self, log_events: bool = True):
+        self.log_events = log_events
+        self._lock = threading.Lock()
+        self._calls: Dict[Tuple[str, str, str, str], int] = defaultdict(int)
+        self._totals: Dict[Tuple[str, str], Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self._histograms: Dict[Tuple[str, str, str], Histogram] = {}
+        self.recent_events: Deque[LLMCallEvent] = deque(maxlen=RECENT_EVENTS)
+
+    def record(self, event: LLMCallEvent):
+        if self.log_events:
+            logger.info(f"LLM_CALL: {json.dumps(asdict(event))}")
+        key = (event.model, event.prompt_type)
+        observations = [("latency_seconds", event.latency_seconds)]
+        if not event.cache_hit:
+            observations.append(("queue_wait_seconds", event.queue_wait_seconds))
+            if event.time_to_first_byte_seconds is not None:
+                observations.append(("time_to_first_byte_seconds", event.time_to_first_byte_seconds))
+        with self._lock:
+            self._calls[key + (event.status, "hit" if event.cache_hit else "miss")] += 1
+            totals = self._totals[key]
+            totals["retries"] += event.retries
+            totals["prompt_tokens"] += event.prompt_tokens
+            totals["completion_tokens"] += event.completion_tokens
+            totals["cost"] += event.cost
+            for metric, value in observations:
+                histogram = self._histograms.get(key + (metric,))
+                if histogram is None:
+                    histogram = self._histograms[key + (metric,)] = Histogram()
+                histogram.observe(value)
+            self.recent_events.append(event)
+
+    def record_completion(self, model: str, messages, result, elapsed: float):
+        """Record a CompletionResult or CompletionFailure returned by LLMAgent"""
+        usage = getattr(result.response, "usage", None)
+        self.record(LLMCallEvent(
+            model=model,
+            prompt_type=prompt_template_name(messages),
+            status="ok" if result.ok else result.error_type,
+            prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+            queue_wait_seconds=round(result.queue_wait, 6),
+            time_to_first_byte_seconds=None if result.time_to_first_byte is None else round(result.time_to_first_byte, 6),
+            latency_seconds=round(elapsed, 6),
+            retries=max(0, result.attempts - 1),
+            cost=result.cost or 0.0,
+        ))
+
+    def record_cache_hit(self, model: str, messages, elapsed: float):
+        self.record(LLMCallEvent(
+            model=model, prompt_type=prompt_template_name(messages), latency_seconds=round(elapsed, 6), cache_hit=True
+        ))
+
+    def reset(self):
+        with self._lock:
+            self._calls.clear()
+            self._totals.clear()
+            self._histograms.clear()
+            self.recent_events.clear()
+
+    def summary(self) -> List[Dict]:
+        """Per model and prompt template: call counts, tokens and p50/p95 latencies (seconds)"""
+        with self._lock:
+            rows = {}
+            for (model, prompt_type, status, cache), count in self._calls.items():
+                row = rows.setdefault((model, prompt_type), {
+                    "model": model, "prompt_type": prompt_type, "calls": 0, "cache_hits": 0, "errors": 0
+                })
+                row["calls"] += count
+                row["cache_hits"] += count if cache == "hit" else 0
+                row["errors"] += count if status != "ok" else 0
+            for key, row in rows.items():
+                totals = self._totals[key]
+                row["retries"] = int(totals["retries"])
+                row["prompt_tokens"] = int(totals["prompt_tokens"])
+                row["completion_tokens"] = int(totals["completion_tokens"])
+                row["cost"] = totals["cost"]
+                for metric, _ in self.LATENCY_METRICS:
+                    histogram = self._histograms.get(key + (metric,))
+                    name = metric[:-len("_seconds")]
+                    row[f"{name}_p50"] = histogram.quantile(0.5) if histogram else None
+                    row[f"{name}_p95"] = histogram.quantile(0.95) if histogram else None
+        return sorted(rows.values(), key=lambda row: (row["model"], row["prompt_type"]))
+
+    def render_prometheus(self) -> str:
+        """All aggregates in the Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            lines.append(f"# HELP {METRIC_PREFIX}_calls_total LLM calls by outcome and response cache use")
+            lines.append(f"# TYPE {METRIC_PREFIX}_calls_total counter")
+            for (model, prompt_type, status, cache), count in sorted(self._calls.items()):
+                lines.append(f"{METRIC_PREFIX}_calls_total"
+                             f"{_labels(model=model, prompt_type=prompt_type, status=status, cache=cache)} {count}")
+
+            for total, help_text in (
+                ("retries", "Retried LLM requests"),
+                ("prompt_tokens", "Prompt tokens sent"),
+                ("completion_tokens", "Completion tokens received"),
+                ("cost", "Cost of LLM calls in EUR"),
+            ):
+                name = f"{METRIC_PREFIX}_{total}_total" if total != "cost" else f"{METRIC_PREFIX}_cost_eur_total"
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for (model, prompt_type), totals in sorted(self._totals.items()):
+                    lines.append(f"{name}{_labels(model=model, prompt_type=prompt_type)} {totals[total]:g}")
+
+            for metric, help_text in self.LATENCY_METRICS:
+                name = f"{METRIC_PREFIX}_{metric}"
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for (model, prompt_type, histogram_metric), histogram in sorted(self._histograms.items()):
+                    if histogram_metric != metric:
+                        continue
+                    for bound, count in histogram.cumulative_counts():
+                        lines.append(f"{name}_bucket{_labels(model=model, prompt_type=prompt_type, le=bound)} {count}")
+                    lines.append(f"{name}_sum{_labels(model=model, prompt_type=prompt_type)} {histogram.sum:.6f}")
+                    lines.append(f"{name}_count{_labels(model=model, prompt_type=prompt_type)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _serve_metrics(handler):
+    if handler.path.split("?")[0] != "/metrics":
+        handler.send_error(404)
+        return
+    body = get_llm_telemetry().render_prometheus().encode("utf-8")
+    handler.send_response(200)
+    handler.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+    handler.send_header("Content-Length", str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+_metrics_server: Optional["ThreadingHTTPServer"] = None
+_metrics_server_lock = threading.Lock()
+
+def start_metrics_server(port: int, host: str = DEFAULT_METRICS_HOST) -> Optional["ThreadingHTTPServer"]:
+    """Serve /metrics on a daemon thread; only one server is started per process"""
+    global _metrics_server
+    # http.server is only needed when the endpoint is enabled
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    
+    class MetricsHandler(BaseHTTPRequestHandler):
+        do_GET = _serve_metrics
+
+        def log_message(self, format, *args):
+            pass
+
+    with _metrics_server_lock:
+        if _metrics_server is None:
+            try:
+                _metrics_server = ThreadingHTTPServer((host, port), MetricsHandler)
+            except OSError as e:
+                # Another process (e.g. a second Streamlit worker) may already serve this port
+                logger.warning(f"LLM metrics endpoint not started on {host}:{port}: {e}")
+                return None
+            _metrics_server.daemon_threads = True
+            threading.Thread(target=_metrics_server.serve_forever, name="llm-metrics", daemon=True).start()
+            logger.info(f"LLM metrics served on http://{host}:{_metrics_server.server_address[1]}/metrics")
+        return _metrics_server
+
+
+# Global telemetry instance
+_llm_telemetry = None
+_llm_telemetry_lock = threading.Lock()
+
+def get_llm_telemetry() -> LLMTelemetry:
+    """Get the process-wide LLM telemetry, starting the metrics endpoint if LLM_METRICS_PORT is set"""
+    global _llm_telemetry
+    if _llm_telemetry is None:
+        with _llm_telemetry_lock:
+            if _llm_telemetry is None:
+                _llm_telemetry = LLMTelemetry()
+                port = os.getenv("LLM_METRICS_PORT")
+                if port:
+                    try:
+                        start_metrics_server(int(port), os.getenv("LLM_METRICS_HOST", DEFAULT_METRICS_HOST))
+                    except ValueError:
+                        logger.warning(f"Invalid LLM_METRICS_PORT: {port}")
+    return _llm_telemetry
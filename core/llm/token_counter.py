@@ -0,0 +1,84 @@
+"""
+Token counting for sizing LLM requests.
+
+Counts use the model's tiktoken encoding. tiktoken loads its BPE files from the
+TIKTOKEN_CACHE_DIR cache (or downloads them once), so offline installs need the cache
+populated; when tiktoken or its encoding is unavailable, counts fall back to the rough
+~4 characters per token estimate used elsewhere.
+
+The encoding is chosen from the deployment name when tiktoken knows it (deployment names
+usually match the model, e.g. gpt-4o) and otherwise from LLM_TOKENIZER_ENCODING.
+"""
+
+import os
+import threading
+from typing import Dict, List
+
+from core.common.logging_manager import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_TOKENIZER_ENCODING = "o200k_base"
+# Tokens added per chat message and to prime the reply (OpenAI chat format)
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+
+def _load_encoding(model_name: str):
+    try:
+        import tiktoken
+    except ImportError:
+        logger.warning("tiktoken is not installed, estimating tokens from character counts")
+        return None
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        pass
+    except Exception as e:
+        logger.warning(f"Could not load the tiktoken encoding for {model_name}: {e}")
+        return None
+    encoding_name = os.getenv("LLM_TOKENIZER_ENCODING", DEFAULT_TOKENIZER_ENCODING)
+    try:
+        return tiktoken.get_encoding(encoding_name)
+    except Exception as e:
+        logger.warning(f"Could not load the tiktoken encoding {encoding_name}, estimating tokens from character counts: {e}")
+        return None
+
+
+class TokenCounter:
+    """Counts tokens as a model's tokenizer does"""
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.encoding = _load_encoding(model_name)
+
+    @property
+    def is_exact(self) -> bool:
+        """Whether counts come from the tokenizer rather than the character estimate"""
+        return self.encoding is not None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.encoding is None:
+            return len(text) // 4 + 1
+        # Prompts are data here, so special-token text is counted like any other text
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def count_messages(self, messages: List[Dict[str, str]]) -> int:
+        """Prompt tokens of a chat completion request"""
+        return sum(TOKENS_PER_MESSAGE + self.count(message.get("content") or "") for message in messages) + TOKENS_PER_REPLY
+
+
+# Global token counters, one per model
+_token_counters: Dict[str, TokenCounter] = {}
+_token_counters_lock = threading.Lock()
+
+def get_token_counter(model_name: str) -> TokenCounter:
+    """Get the shared token counter for a model or deployment name"""
+    with _token_counters_lock:
+        counter = _token_counters.get(model_name)
+        if counter is None:
+            counter = TokenCounter(model_name)
+            _token_counters[model_name] = counter
+        return counter
@@ -1,6 +1,7 @@
 import os
 from pathlib import Path
 from core.common.constants import PROJECT_ROOT
+from core.llm.telemetry import read_prompt_template
 from core.prompts_manager.prompt_manager import promptManager
 import streamlit as st
 
@@ -22,58 +23,95 @@ class GapAnalysisPromptManager(promptManager):
     def get_default_system_prompt(self):
         pass
     
-    def load_prompts_for_pattern_identification(self, unknown_source_xml_content, search_prompt):
+    @staticmethod
+    def _xml_intro(xml_is_excerpt, intro):
+        if xml_is_excerpt:
+            return intro.replace("the input XML file", "the relevant section of the input XML file (other sections omitted)")
+        return intro
+
+    def build_prompts_for_pattern_identification(self, unknown_source_xml_content, search_prompt, xml_is_excerpt=False):
         current_dir = Path(__file__).resolve().parent
         file_path = current_dir / "../config/prompts/generic/default_system_prompt_for_gap_analysis.md"
-        with file_path.open() as f:
-            pattern_identifier_prompt = f.read()
-        prompts = [
+        pattern_identifier_prompt = read_prompt_template(file_path)
+        return [
             {"role": "system", "content": pattern_identifier_prompt},
-            {"role": "user", "content": "Here is the input XML file." + "\n" + "```" + unknown_source_xml_content + "```" },
+            {"role": "user", "content": self._xml_intro(xml_is_excerpt, "Here is the input XML file.") + "\n" + "```" + unknown_source_xml_content + "```" },
             {"role": "user", "content": search_prompt }
         ]
+
+    def load_prompts_for_pattern_identification(self, unknown_source_xml_content, search_prompt, xml_is_excerpt=False):
+        prompts = self.build_prompts_for_pattern_identification(unknown_source_xml_content, search_prompt, xml_is_excerpt)
         self.agent.set_prompts(prompts)
     
-    def load_prompts_for_intelligent_pattern_identification(self, unknown_source_xml_content, search_prompt):
+    @staticmethod
+    def _batch_pattern_instruction(pattern_id, search_prompt):
+        return f"pattern_id: {pattern_id}\ninstruction: {search_prompt}"
+
+    def build_prompts_for_batch_pattern_identification(self, unknown_source_xml_content, patterns, xml_is_excerpt=False):
         """
-        Load enhanced prompts for intelligent pattern identification that can handle
+        Build prompts that verify several patterns against the same XML in one request.
+
+        Args:
+            patterns: list of (pattern_id, search_prompt) tuples
+        """
+        current_dir = Path(__file__).resolve().parent
+        file_path = current_dir / "../config/prompts/generic/default_system_prompt_for_batch_gap_analysis.md"
+        batch_identifier_prompt = read_prompt_template(file_path)
+        instructions = "\n\n".join(
+            self._batch_pattern_instruction(pattern_id, search_prompt) for pattern_id, search_prompt in patterns
+        )
+        return [
+            {"role": "system", "content": batch_identifier_prompt},
+            {"role": "user", "content": self._xml_intro(xml_is_excerpt, "Here is the input XML file.") + "\n" + "```" + unknown_source_xml_content + "```" },
+            {"role": "user", "content": "Verify each of the following instructions:\n\n" + instructions}
+        ]
+
+    def build_prompts_for_intelligent_pattern_identification(self, unknown_source_xml_content, search_prompt, xml_is_excerpt=False):
+        """
+        Build enhanced prompts for intelligent pattern identification that can handle
         passenger combinations and airline-specific relationship patterns.
+
+        Raises:
+            FileNotFoundError: If the enhanced prompt file is missing.
         """
         current_dir = Path(__file__).resolve().parent
         file_path = current_dir / "../config/prompts/generic/enhanced_paxlist_pattern_analysis.md"
-        
+        intelligent_pattern_prompt = read_prompt_template(file_path)
+        return [
+            {"role": "system", "content": intelligent_pattern_prompt},
+            {"role": "user", "content": self._xml_intro(xml_is_excerpt, "Here is the input XML file to analyze for passenger patterns:") + "\n" + "```" + unknown_source_xml_content + "```"},
+            {"role": "user", "content": f"Pattern to match against: {search_prompt}"}
+        ]
+
+    def load_prompts_for_intelligent_pattern_identification(self, unknown_source_xml_content, search_prompt):
+        """
+        Load enhanced prompts for intelligent pattern identification that can handle
+        passenger combinations and airline-specific relationship patterns.
+        """
         try:
-            with file_path.open() as f:
-                intelligent_pattern_prompt = f.read()
+            prompts = self.build_prompts_for_intelligent_pattern_identification(unknown_source_xml_content, search_prompt)
         except FileNotFoundError:
             # Fallback to regular prompt if enhanced prompt not found
             st.warning("Enhanced pattern analysis prompt not found. Using standard prompt.")
             return self.load_prompts_for_pattern_identification(unknown_source_xml_content, search_prompt)
-        
-        prompts = [
-            {"role": "system", "content": intelligent_pattern_prompt},
-            {"role": "user", "content": "Here is the input XML file to analyze for passenger patterns:" + "\n" + "```" + unknown_source_xml_content + "```"},
-            {"role": "user", "content": f"Pattern to match against: {search_prompt}"}
-        ]
         self.agent.set_prompts(prompts)
     
-    def load_prompts_for_extracting_patterns(self, content, insights=None):
+    def build_prompts_for_extracting_patterns(self, content, insights=None):
         current_dir = Path(__file__).resolve().parent
         file_path = current_dir / "../config/prompts/generic/default_system_prompt_for_pattern_extraction.md"
-        with file_path.open() as f:
-            pattern_identifier_prompt = f.read()
-        prompts = [
+        pattern_identifier_prompt = read_prompt_template(file_path)
+        return [
             {"role": "system", "content": pattern_identifier_prompt},
             {"role": "user", "content": f"Here is the combined XML content - {content}"},
             {"role": "user", "content": f"Here are the insights - {insights}"}
         ]
+
+    def load_prompts_for_extracting_patterns(self, content, insights=None):
+        prompts = self.build_prompts_for_extracting_patterns(content, insights)
         self.agent.set_prompts(prompts)
     
-    def load_prompts_for_airline_focused_extraction(self, content, insights=None):
-        """
-        Load enhanced prompts for airline-focused pattern extraction that avoids 
-        generic patterns and focuses on airline-differentiating patterns.
-        """
+    def _read_airline_focused_extraction_prompt(self):
+        """The airline-focused extraction system prompt, or None if no prompt file is found"""
         current_dir = Path(__file__).resolve().parent
         
         # Try simplified prompt first (more reliable)
@@ -82,30 +120,43 @@ class GapAnalysisPromptManager(promptManager):
         
         try:
             # Use simplified prompt for better reliability
-            with simplified_file_path.open() as f:
-                airline_focused_prompt = f.read()
+            return read_prompt_template(simplified_file_path)
         except FileNotFoundError:
             try:
                 # Fallback to detailed prompt
-                with detailed_file_path.open() as f:
-                    airline_focused_prompt = f.read()
+                return read_prompt_template(detailed_file_path)
             except FileNotFoundError:
-                # Final fallback to regular prompt
-                st.warning("Airline-focused pattern extraction prompt not found. Using standard prompt.")
-                return self.load_prompts_for_extracting_patterns(content, insights)
-        
-        prompts = [
+                return None
+
+    def build_prompts_for_airline_focused_extraction(self, content, insights=None):
+        """
+        Build enhanced prompts for airline-focused pattern extraction that avoids 
+        generic patterns and focuses on airline-differentiating patterns.
+        Falls back to the standard extraction prompts if the airline-focused prompt is missing.
+        """
+        airline_focused_prompt = self._read_airline_focused_extraction_prompt()
+        if airline_focused_prompt is None:
+            return self.build_prompts_for_extracting_patterns(content, insights)
+        return [
             {"role": "system", "content": airline_focused_prompt},
             {"role": "user", "content": f"XML content to analyze for airline fingerprints:\n{content}"},
             {"role": "user", "content": f"Additional insights: {insights}" if insights else "No additional insights provided."}
         ]
-        self.agent.set_prompts(prompts)
+
+    def load_prompts_for_airline_focused_extraction(self, content, insights=None):
+        """
+        Load enhanced prompts for airline-focused pattern extraction that avoids 
+        generic patterns and focuses on airline-differentiating patterns.
+        """
+        if self._read_airline_focused_extraction_prompt() is None:
+            # Final fallback to regular prompt
+            st.warning("Airline-focused pattern extraction prompt not found. Using standard prompt.")
+        self.agent.set_prompts(self.build_prompts_for_airline_focused_extraction(content, insights))
     
     def load_prompts_for_manual_addition(self, conversational_params):
         current_dir = Path(__file__).resolve().parent
         file_path = current_dir / "../config/prompts/generic/default_system_prompt_for_manual_pattern_addition.md"
-        with file_path.open() as f:
-            pattern_identifier_prompt = f.read()
+        pattern_identifier_prompt = read_prompt_template(file_path)
         
         xml_chunk = conversational_params.get('xml_chunk')
         tag = conversational_params.get('tag')
@@ -119,30 +170,31 @@ class GapAnalysisPromptManager(promptManager):
         ]
         self.agent.set_prompts(prompts)
     
-    def load_prompts_for_pattern_verfication(self, conversational_params):
+    def build_prompts_for_pattern_verification(self, conversational_params):
         current_dir = Path(__file__).resolve().parent
         file_path = current_dir / "../config/prompts/generic/default_system_prompt_for_pattern_verification.md"
 
-        with file_path.open() as f:
-            pattern_verifier_prompt = f.read()
+        pattern_verifier_prompt = read_prompt_template(file_path)
 
         # Prepare the prompts for the agent
         xml_content = conversational_params.get('xml_content')
         selected_prompt = conversational_params.get('selected_prompt')
         
-        prompts = [
+        return [
             {"role": "user", "content": pattern_verifier_prompt},
             {"role": "user", "content": f"Here is the XML content - {xml_content}"},
             {"role": "user", "content": f"Here is the prompt - {selected_prompt}"}
         ]
+
+    def load_prompts_for_pattern_verfication(self, conversational_params):
+        prompts = self.build_prompts_for_pattern_verification(conversational_params)
         self.agent.set_prompts(prompts)
 
     def load_prompts_for_insights(self, selected_nodes_map):
         current_dir = Path(__file__).resolve().parent
         file_path = current_dir / "../config/prompts/generic/default_system_prompt_for_pattern_insights.md"
 
-        with file_path.open() as f:
-            pattern_verifier_prompt = f.read()
+        pattern_verifier_prompt = read_prompt_template(file_path)
 
         # Prepare the prompts for the agent
         prompts = [
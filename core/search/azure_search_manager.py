@@ -1,10 +1,5 @@
 import os
 import json
-from azure.search.documents import SearchClient
-from azure.core.credentials import AzureKeyCredential
-from azure.identity import ClientSecretCredential
-from azure.search.documents.indexes import SearchIndexClient
-from azure.search.documents.models import VectorizedQuery
 import streamlit as st
 import logging
 
@@ -27,6 +22,12 @@ class AzureSearchManager:
         self.client_id = os.environ.get('AZURE_CLIENT_ID', '')
         self.client_secret = os.environ.get('AZURE_CLIENT_SECRET', '')
 
+        # The Azure SDKs are imported here so importing this module stays cheap
+        from azure.core.credentials import AzureKeyCredential
+        from azure.identity import ClientSecretCredential
+        from azure.search.documents import SearchClient
+        from azure.search.documents.indexes import SearchIndexClient
+
         # Initialize clients
         self.credential = None
         self.search_client = None
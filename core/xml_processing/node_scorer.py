@@ -0,0 +1,151 @@
+"""
+Scoring of XML elements for automatic node selection.
+
+Automatic pattern extraction picks the elements to send to the LLM by a complexity score
+built from each element's pretty-printed size, subtree depth, child and attribute counts,
+and a usefulness score. Only the elements the selection walk visits are scored (a few
+levels below the root), and the pretty-printed XML of a selected element is the one
+serialized to score it.
+"""
+
+from itertools import islice
+from typing import Dict, NamedTuple, Tuple
+
+from lxml import etree
+
+from core.common.logging_manager import get_logger
+
+logger = get_logger(__name__)
+
+# Selection limits
+MAX_NODE_SIZE = 5000  # characters
+MIN_NODE_SIZE = 50    # minimum useful size
+MAX_NODES_PER_BATCH = 15  # prevent overwhelming the LLM
+MAX_RECURSION_DEPTH = 3
+MIN_USEFULNESS = 30
+STRUCTURAL_TAGS = ("root", "document", "wrapper")
+
+
+class NodeScore(NamedTuple):
+    serialized_size: int
+    max_depth: int
+    child_count: int
+    attribute_count: int
+    usefulness: int
+
+    @property
+    def complexity(self) -> float:
+        """Weighted complexity score used to decide whether a node fits in one batch"""
+        return (
+            self.serialized_size * 0.4 +
+            self.child_count * 100 +
+            self.max_depth * 50 +
+            self.attribute_count * 10
+        )
+
+
+def usefulness_score(element) -> int:
+    """How useful an element is for pattern extraction"""
+    score = 0
+
+    # Has text content
+    if element.text and element.text.strip():
+        score += 50
+
+    # Has attributes
+    if element.attrib:
+        score += len(element.attrib) * 20
+
+    # Has children but not too many
+    child_count = len(element)
+    if 1 <= child_count <= 10:
+        score += 30
+    elif child_count > 10:
+        score -= 10  # too complex
+
+    # Prefer nodes that aren't purely structural
+    if element.tag and element.tag.lower() not in STRUCTURAL_TAGS:
+        score += 20
+
+    return score
+
+
+def max_depth(element) -> int:
+    """Levels in the element's subtree, counting the element itself (1 for a leaf)"""
+    if not len(element):
+        return 1
+    return 1 + max(max_depth(child) for child in element)
+
+
+class XMLNodeScorer:
+    """Selects the elements of a tree to extract patterns from"""
+
+    def __init__(self, root):
+        self.root = root
+
+    @staticmethod
+    def score(element) -> Tuple[NodeScore, str]:
+        """(NodeScore, pretty-printed XML) of an element"""
+        xml = etree.tostring(element, pretty_print=True, encoding="unicode")
+        return NodeScore(
+            serialized_size=len(xml),
+            max_depth=max_depth(element),
+            child_count=len(element),
+            attribute_count=len(element.attrib),
+            usefulness=usefulness_score(element),
+        ), xml
+
+    @staticmethod
+    def _children(element):
+        """Child elements, skipping comments and processing instructions"""
+        return (child for child in element.iterchildren() if isinstance(child.tag, str))
+
+    def select_nodes(self) -> Dict[str, str]:
+        """
+        Pick the elements to extract patterns from, as {path: pretty-printed XML}.
+
+        Walks down from the root: an element whose complexity is within bounds and that is
+        useful enough is selected; a larger one is split into its children; a smaller one
+        near the top is searched through its first five children. At most
+        MAX_NODES_PER_BATCH of the most useful selections are kept.
+        """
+        selected: Dict[str, Tuple[str, int]] = {}
+        # Number of selected paths starting with each prefix, for the path indexes
+        prefix_counts: Dict[str, int] = {}
+
+        def visit(element, path: str = "", depth: int = 0):
+            if depth > MAX_RECURSION_DEPTH:
+                return
+            tag = str(element.tag)
+            # Indexed by the number of selections so far under this prefix
+            current_path = f"{path}/{tag}[{prefix_counts.get(f'{path}/{tag}', 0) if path else 0}]"
+
+            score, xml = self.score(element)
+            complexity = score.complexity
+            if MIN_NODE_SIZE <= complexity <= MAX_NODE_SIZE and score.usefulness >= MIN_USEFULNESS:
+                if current_path not in selected:
+                    for end in range(1, len(current_path) + 1):
+                        prefix = current_path[:end]
+                        prefix_counts[prefix] = prefix_counts.get(prefix, 0) + 1
+                selected[current_path] = (xml, score.usefulness)
+                return
+
+            if complexity > MAX_NODE_SIZE:
+                # Too big - analyze children
+                children = self._children(element)
+            elif score.child_count and depth < MAX_RECURSION_DEPTH - 1:
+                # Might be too small but check its first children
+                children = islice(self._children(element), 5)
+            else:
+                return
+            for child in children:
+                visit(child, current_path, depth + 1)
+
+        visit(self.root)
+
+        chosen = list(selected.items())
+        if len(chosen) > MAX_NODES_PER_BATCH:
+            # Stable sort keeps document order among equally useful nodes
+            chosen.sort(key=lambda item: item[1][1], reverse=True)
+            chosen = chosen[:MAX_NODES_PER_BATCH]
+        return {path: xml for path, (xml, _) in chosen}
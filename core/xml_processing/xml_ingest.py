@@ -0,0 +1,333 @@
+"""
+Streaming XML ingestion into a compact node index.
+
+XMLNodeIndex makes one pass over a document with ``lxml.etree.iterparse`` (huge_tree,
+clearing each element once it has been indexed), so memory stays bounded by the raw bytes
+and the index rather than a full element tree. For every element it records the tag,
+depth, parent, position among its siblings, attribute and child counts, text length and
+the byte offsets of the element in the source.
+
+Paths use the same ``/Tag[child_index]`` form as XMLTreeHelper, child_index counting
+element children only (comments and processing instructions are skipped), so the index
+can drive the tree view directly, and any subtree can be cut from the source bytes by its offsets
+(raw_xml) to view or chunk multi-megabyte payloads without re-parsing them.
+"""
+
+import io
+import os
+import re
+from array import array
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from lxml import etree
+
+from core.common.logging_manager import get_logger
+
+logger = get_logger(__name__)
+
+# Markup tokens in document order; quoted attribute values may contain '>'
+_MARKUP_TOKEN = re.compile(rb"""
+      <!--.*?-->
+    | <!\[CDATA\[.*?\]\]>
+    | <\?.*?\?>
+    | <!DOCTYPE(?:[^>\[]|\[.*?\])*>
+    | </[^>]*>
+    | <[^\s/>!?][^>"']*(?:(?:"[^"]*"|'[^']*')[^>"']*)*>
+""", re.S | re.X)
+_TAG_NAME = re.compile(rb"<[^\s/>]+")
+# Between two /Tag[child_index] steps of a path (namespace URIs may contain '/')
+_STEP_BOUNDARY = re.compile(r"\]/")
+_ENCODING_DECLARATION = re.compile(rb"""^\s*<\?xml[^>]*encoding=["']([A-Za-z0-9._-]+)["']""")
+
+
+class XMLNode(NamedTuple):
+    index: int
+    path: str
+    tag: str
+    depth: int
+    parent: int
+    child_count: int
+    attribute_count: int
+    text_length: int
+    start_offset: int
+    end_offset: int
+
+    @property
+    def size(self) -> int:
+        """Size of the element's source in bytes (-1 if offsets are unknown)"""
+        if self.start_offset < 0 or self.end_offset < 0:
+            return -1
+        return self.end_offset - self.start_offset
+
+    @property
+    def local_name(self) -> str:
+        return self.tag.split("}", 1)[1] if "}" in self.tag else self.tag
+
+
+class XMLChunk(NamedTuple):
+    """One or more consecutive sibling subtrees"""
+    paths: List[str]
+    xml: str
+
+
+def _tag_tokens(data: bytes) -> Iterator[Tuple[str, int, int]]:
+    """Yield ("start" | "empty" | "end", start, end) for each element tag in the source"""
+    for match in _MARKUP_TOKEN.finditer(data):
+        token = match.group()
+        if token.startswith(b"</"):
+            yield "end", match.start(), match.end()
+        elif token.startswith((b"<!", b"<?")):
+            continue
+        elif token.endswith(b"/>"):
+            yield "empty", match.start(), match.end()
+        else:
+            yield "start", match.start(), match.end()
+
+
+class XMLNodeIndex:
+    """One-pass index of every element in an XML document"""
+
+    def __init__(self, source: Union[bytes, str]):
+        if isinstance(source, str):
+            source = source.encode("utf-8")
+        self.source = source
+        encoding = _ENCODING_DECLARATION.match(source)
+        self.encoding = encoding.group(1).decode("ascii") if encoding else "utf-8"
+
+        self._tags: List[str] = []
+        self._parents = array("i")
+        self._positions = array("i")
+        self._depths = array("i")
+        self._child_counts = array("i")
+        self._attribute_counts = array("i")
+        self._text_lengths = array("i")
+        self._start_offsets = array("q")
+        self._end_offsets = array("q")
+        self._children: Dict[int, List[int]] = defaultdict(list)
+        self._ns_declarations: Dict[int, List[Tuple[str, str]]] = {}
+        self._paths: Optional[List[str]] = None
+        self._path_lookup: Optional[Dict[str, int]] = None
+
+        self._build()
+
+    @classmethod
+    def from_file(cls, file_obj) -> "XMLNodeIndex":
+        """Build from a path or a binary file object (such as a Streamlit upload)"""
+        if isinstance(file_obj, (str, os.PathLike)):
+            with open(file_obj, "rb") as f:
+                return cls(f.read())
+        if hasattr(file_obj, "seek"):
+            file_obj.seek(0)
+        return cls(file_obj.read())
+
+    def _build(self):
+        tokens = _tag_tokens(self.source)
+        open_nodes: List[Tuple[int, bool]] = []  # (index, self-closing)
+        tag_intern: Dict[str, str] = {}
+        pending_ns: List[Tuple[str, str]] = []
+
+        context = etree.iterparse(
+            io.BytesIO(self.source), events=("start-ns", "start", "end"),
+            huge_tree=True, remove_comments=True, remove_pis=True
+        )
+        for event, item in context:
+            if event == "start-ns":
+                pending_ns.append(item)
+                continue
+
+            if event == "start":
+                index = len(self._tags)
+                parent = open_nodes[-1][0] if open_nodes else -1
+                tag = tag_intern.setdefault(item.tag, item.tag)
+                self._tags.append(tag)
+                self._parents.append(parent)
+                self._positions.append(self._child_counts[parent] if parent >= 0 else 0)
+                self._depths.append(len(open_nodes))
+                self._child_counts.append(0)
+                self._attribute_counts.append(len(item.attrib))
+                self._text_lengths.append(0)
+                if parent >= 0:
+                    self._child_counts[parent] += 1
+                    self._children[parent].append(index)
+                if pending_ns:
+                    self._ns_declarations[index] = pending_ns
+                    pending_ns = []
+
+                kind, start, end = next(tokens, (None, -1, -1))
+                self._start_offsets.append(start)
+                self._end_offsets.append(end if kind == "empty" else -1)
+                open_nodes.append((index, kind == "empty"))
+                continue
+
+            # end
+            index, self_closing = open_nodes.pop()
+            text = item.text
+            self._text_lengths[index] = len(text.strip()) if text else 0
+            if not self_closing:
+                kind, _, end = next(tokens, (None, -1, -1))
+                self._end_offsets[index] = end if kind == "end" else -1
+
+            # Release the element and any already indexed siblings
+            item.clear(keep_tail=True)
+            while item.getprevious() is not None:
+                del item.getparent()[0]
+        del context
+
+    def __len__(self) -> int:
+        return len(self._tags)
+
+    @property
+    def paths(self) -> List[str]:
+        """Paths of all nodes, in document order (computed on first use)"""
+        if self._paths is None:
+            paths = []
+            for index, tag in enumerate(self._tags):
+                parent = self._parents[index]
+                prefix = paths[parent] if parent >= 0 else ""
+                paths.append(f"{prefix}/{tag}[{self._positions[index]}]")
+            self._paths = paths
+        return self._paths
+
+    def node(self, index: int) -> XMLNode:
+        return XMLNode(
+            index=index,
+            path=self.paths[index],
+            tag=self._tags[index],
+            depth=self._depths[index],
+            parent=self._parents[index],
+            child_count=self._child_counts[index],
+            attribute_count=self._attribute_counts[index],
+            text_length=self._text_lengths[index],
+            start_offset=self._start_offsets[index],
+            end_offset=self._end_offsets[index],
+        )
+
+    def __iter__(self) -> Iterator[XMLNode]:
+        for index in range(len(self)):
+            yield self.node(index)
+
+    def children(self, index: int) -> List[int]:
+        return self._children.get(index, [])
+
+    def find(self, path: str) -> Optional[int]:
+        """Index of the node at a /Tag[child_index] path, or None"""
+        if self._path_lookup is None:
+            self._path_lookup = {path: index for index, path in enumerate(self.paths)}
+        return self._path_lookup.get(path)
+
+    def _in_scope_namespaces(self, index: int) -> Dict[str, str]:
+        """Namespace declarations inherited from ancestors (not declared on the node itself)"""
+        declared_here = {prefix for prefix, _ in self._ns_declarations.get(index, [])}
+        namespaces = {}
+        ancestor = self._parents[index]
+        while ancestor >= 0:
+            for prefix, uri in self._ns_declarations.get(ancestor, []):
+                if prefix not in namespaces and prefix not in declared_here:
+                    namespaces[prefix] = uri
+            ancestor = self._parents[ancestor]
+        return namespaces
+
+    def raw_xml(self, index: int) -> Optional[str]:
+        """
+        The element's source text cut from the document, with inherited namespace
+        declarations added to its start tag so it stays well-formed on its own.
+        """
+        start, end = self._start_offsets[index], self._end_offsets[index]
+        if start < 0 or end < 0:
+            return None
+        fragment = self.source[start:end]
+        namespaces = self._in_scope_namespaces(index)
+        if namespaces:
+            name_end = _TAG_NAME.match(fragment).end()
+            declarations = "".join(
+                f' xmlns:{prefix}="{uri}"' if prefix else f' xmlns="{uri}"' for prefix, uri in namespaces.items()
+            ).encode(self.encoding)
+            fragment = fragment[:name_end] + declarations + fragment[name_end:]
+        return fragment.decode(self.encoding)
+
+    def to_tree(self) -> Dict:
+        """Tree data for streamlit_tree_select, equivalent to XMLTreeHelper.xml_to_tree"""
+        if not len(self):
+            return {}
+        paths = self.paths
+        nodes = []
+        for index, tag in enumerate(self._tags):
+            node = {"label": tag, "value": paths[index]}
+            nodes.append(node)
+            parent = self._parents[index]
+            if parent >= 0:
+                nodes[parent].setdefault("children", []).append(node)
+        return nodes[0]
+
+    def iter_chunks(self, max_chars: int) -> Iterator[XMLChunk]:
+        """
+        Split the document top-down into chunks of at most max_chars characters: a subtree
+        that fits is kept whole and consecutive small siblings are packed together; a subtree
+        that does not fit is split into its children. Leaf elements larger than max_chars
+        are emitted on their own.
+        """
+        if not len(self):
+            return
+        yield from self._chunk_nodes([0], max_chars)
+
+    def _chunk_nodes(self, indexes: List[int], max_chars: int) -> Iterator[XMLChunk]:
+        packed: List[Tuple[int, str]] = []
+        packed_size = 0
+        for index in indexes:
+            source_size = self._end_offsets[index] - self._start_offsets[index]
+            if source_size > max_chars and self.children(index):
+                if packed:
+                    yield self._make_chunk(packed)
+                    packed, packed_size = [], 0
+                yield from self._chunk_nodes(self.children(index), max_chars)
+                continue
+            fragment = self.raw_xml(index)
+            if fragment is None:
+                continue
+            # Measured on the fragment, which includes any inherited namespace declarations
+            size = len(fragment) + 1
+            if packed and packed_size + size > max_chars:
+                yield self._make_chunk(packed)
+                packed, packed_size = [], 0
+            packed.append((index, fragment))
+            packed_size += size
+        if packed:
+            yield self._make_chunk(packed)
+
+    def _make_chunk(self, packed: List[Tuple[int, str]]) -> XMLChunk:
+        return XMLChunk(
+            paths=[self.paths[index] for index, _ in packed],
+            xml="\n".join(fragment for _, fragment in packed)
+        )
+
+
+def outermost_paths(paths: Iterable[str]) -> List[str]:
+    """
+    The given /Tag[child_index] paths without those inside another one of them, shortest
+    first (a checked parent in the tree already includes its checked children).
+    """
+    unique_paths = list(dict.fromkeys(paths))
+    path_set = set(unique_paths)
+    outermost = []
+    for path in sorted(unique_paths, key=len):
+        ancestors = (path[:boundary.start() + 1] for boundary in _STEP_BOUNDARY.finditer(path))
+        if not any(ancestor in path_set for ancestor in ancestors):
+            outermost.append(path)
+    return outermost
+
+
+def split_path(path: str) -> List[Tuple[str, int]]:
+    """The (tag, child_index) steps of a /Tag[child_index] path; ValueError if malformed"""
+    steps = []
+    for step in _STEP_BOUNDARY.split(path[1:] if path.startswith("/") else path):
+        tag, separator, index = step.rstrip("]").rpartition("[")
+        if not separator or not tag:
+            raise ValueError(f"Invalid path step {step!r} in {path}")
+        steps.append((tag, int(index)))
+    return steps
+
+
+def build_node_index(source: Union[bytes, str]) -> XMLNodeIndex:
+    """Index an XML document given as bytes or text"""
+    return XMLNodeIndex(source)
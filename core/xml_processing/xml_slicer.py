@@ -0,0 +1,237 @@
+"""
+XPath-scoped slicing of XML documents for per-pattern LLM prompts.
+
+Stored patterns carry the path of the section they were extracted from, e.g.
+``/OrderViewRS[0]/Response[1]/DataLists[0]/PaxList[4]`` or relationship paths joined
+with ``->``. XMLSlicer parses the document once and, for each pattern path, returns only
+the matching subtrees wrapped in their ancestor elements, so the prompt carries the
+relevant section instead of the whole message.
+
+Paths are matched on local names only: namespace prefixes and the positional indices
+recorded at extraction time are ignored, since they differ between messages. Absolute
+paths must match the whole parent chain, except that the root element may be renamed or
+wrapped in further elements.
+"""
+
+import copy
+import os
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from lxml import etree
+
+from core.common.logging_manager import get_logger
+
+logger = get_logger(__name__)
+
+# Separators used in stored pattern paths: relationships, multi-section patterns and unions
+_RELATIONSHIP_SEPARATOR = re.compile(r"\s*->\s*")
+_SECTION_SEPARATOR = re.compile(r"\s+and\s+|\s*\|\s*")
+_PREDICATE = re.compile(r"\[[^\]]*\]")
+
+FALLBACK_FULL_DOCUMENT = "full"
+FALLBACK_EMPTY = "empty"
+
+
+def local_name(tag) -> str:
+    """Strip the namespace URI or prefix from a tag name"""
+    if not isinstance(tag, str):
+        return ""
+    if "}" in tag:
+        tag = tag.split("}", 1)[1]
+    if ":" in tag:
+        tag = tag.split(":", 1)[1]
+    return tag
+
+
+def is_slicing_enabled() -> bool:
+    return os.getenv("XML_SLICING_ENABLED", "true").lower() not in ("0", "false", "no")
+
+
+class XMLSlicer:
+    """
+    Parses an XML document once and serves the subtree(s) referenced by pattern paths.
+    """
+
+    def __init__(self, xml_content: str, fallback: Optional[str] = None):
+        """
+        Args:
+            xml_content: The full XML document.
+            fallback: What to send when a path does not resolve - "full" (the whole
+                document) or "empty" (a placeholder stating the section is absent).
+                Defaults to XML_SLICE_FALLBACK, or "full" if unset.
+        """
+        self.xml_content = xml_content
+        self.fallback = (fallback or os.getenv("XML_SLICE_FALLBACK", FALLBACK_FULL_DOCUMENT)).lower()
+        self.root = None
+        self._elements_by_name: Dict[str, List] = defaultdict(list)
+        self._document_order: Dict = {}
+        self._slices: Dict[str, Tuple[str, bool]] = {}
+        self._resolved: Dict[str, List] = {}
+
+        try:
+            parser = etree.XMLParser(huge_tree=True)
+            self.root = etree.fromstring(xml_content.encode("utf-8"), parser)
+        except (etree.XMLSyntaxError, ValueError) as e:
+            logger.warning(f"XML slicing disabled, document could not be parsed: {e}")
+            return
+
+        for position, elem in enumerate(self.root.iter()):
+            name = local_name(elem.tag)
+            if name:
+                self._elements_by_name[name].append(elem)
+                self._document_order[elem] = position
+
+    @property
+    def is_parsed(self) -> bool:
+        return self.root is not None
+
+    @staticmethod
+    def _split_steps(path: str) -> Tuple[bool, List[str]]:
+        """Turn one location path into (match_anywhere, [local names])"""
+        path = path.strip()
+        anywhere = path.startswith("//") or not path.startswith("/")
+        steps = []
+        for step in _PREDICATE.sub("", path).split("/"):
+            step = step.strip()
+            # Attribute and text() steps select within their parent element
+            if not step or step.startswith("@") or step.endswith("()"):
+                continue
+            steps.append(local_name(step))
+        return anywhere, steps
+
+    @classmethod
+    def parse_pattern_path(cls, xpath: str) -> List[Tuple[bool, List[str]]]:
+        """
+        Split a stored pattern path into the location paths to slice.
+
+        Relationship paths ("A/B -> A/C") resolve to their common ancestor so both ends of
+        the relationship stay together; "and" / "|" joined paths are sliced separately.
+        """
+        location_paths = []
+        for section in _SECTION_SEPARATOR.split(xpath or ""):
+            ends = [end for end in _RELATIONSHIP_SEPARATOR.split(section) if end.strip()]
+            if not ends:
+                continue
+            if len(ends) > 1:
+                split_ends = [end.strip().split("/") for end in ends]
+                common = []
+                for parts in zip(*split_ends):
+                    if len(set(parts)) != 1:
+                        break
+                    common.append(parts[0])
+                if any(common):
+                    ends = ["/".join(common)]
+            for end in ends:
+                anywhere, steps = cls._split_steps(end)
+                if steps:
+                    location_paths.append((anywhere, steps))
+        return location_paths
+
+    def _ancestor_names(self, elem) -> List[str]:
+        names = []
+        parent = elem.getparent()
+        while parent is not None:
+            names.append(local_name(parent.tag))
+            parent = parent.getparent()
+        names.reverse()
+        return names
+
+    def _resolve_steps(self, anywhere: bool, steps: List[str]) -> List:
+        candidates = self._elements_by_name.get(steps[-1], [])
+        if not candidates:
+            return []
+        parents = steps[:-1]
+        chains = [(elem, self._ancestor_names(elem)) for elem in candidates]
+
+        if anywhere:
+            # "//A/B" and relative paths: the parent chain ends with the given steps
+            return [elem for elem, ancestors in chains if not parents or ancestors[-len(parents):] == parents]
+
+        exact = [elem for elem, ancestors in chains if ancestors == parents]
+        if exact:
+            return exact
+        # Messages with a different root or extra wrapper elements still resolve to the
+        # same section, as long as the rest of the parent chain matches exactly; a path
+        # that does not match returns nothing rather than a same-named element elsewhere
+        return [
+            elem for elem, ancestors in chains
+            if (len(ancestors) > len(parents) and (not parents or ancestors[-len(parents):] == parents))
+            or (len(parents) > 1 and ancestors[1:] == parents[1:])
+        ]
+
+    def resolve(self, xpath: str) -> List:
+        """Return the top-most elements matched by a stored pattern path, in document order"""
+        if not self.is_parsed:
+            return []
+        if xpath in self._resolved:
+            return self._resolved[xpath]
+        matched = []
+        for anywhere, steps in self.parse_pattern_path(xpath):
+            matched.extend(self._resolve_steps(anywhere, steps))
+
+        # Drop duplicates and elements already contained in another match
+        matched_set = set(matched)
+        selected = [
+            elem for elem in matched_set
+            if not any(ancestor in matched_set for ancestor in elem.iterancestors())
+        ]
+        self._resolved[xpath] = sorted(selected, key=lambda elem: self._document_order.get(elem, 0))
+        return self._resolved[xpath]
+
+    def has_section(self, xpath: Optional[str]) -> bool:
+        """
+        Whether the section a pattern path refers to is present in the document. Returns
+        True when there is no path or the document could not be parsed, since absence
+        cannot be established then.
+        """
+        if not xpath or not self.is_parsed or not self.parse_pattern_path(xpath):
+            return True
+        return bool(self.resolve(xpath))
+
+    def _render(self, elements: List) -> str:
+        """Serialize elements inside bare copies of their ancestors (no attributes or siblings)"""
+        copies = {}
+
+        def ancestor_copy(ancestor):
+            if ancestor not in copies:
+                node = etree.Element(ancestor.tag, nsmap=ancestor.nsmap)
+                parent = ancestor.getparent()
+                if parent is not None:
+                    ancestor_copy(parent).append(node)
+                copies[ancestor] = node
+            return copies[ancestor]
+
+        for elem in elements:
+            clone = copy.deepcopy(elem)
+            clone.tail = None
+            ancestor_copy(elem.getparent()).append(clone)
+
+        return etree.tostring(copies[self.root], encoding="unicode")
+
+    def get_xml_for_pattern(self, xpath: Optional[str]) -> Tuple[str, bool]:
+        """
+        Return the XML to send for a pattern.
+
+        Returns:
+            tuple: (xml_text, is_excerpt) - is_excerpt is False when the whole document is sent.
+        """
+        if not xpath or not self.is_parsed or not is_slicing_enabled():
+            return self.xml_content, False
+        if xpath in self._slices:
+            return self._slices[xpath]
+
+        elements = self.resolve(xpath)
+        if not elements:
+            if self.fallback == FALLBACK_EMPTY:
+                result = (f"<!-- No element matching {xpath} was found in the input XML -->", True)
+            else:
+                result = (self.xml_content, False)
+        elif any(elem is self.root for elem in elements):
+            result = (self.xml_content, False)
+        else:
+            result = (self._render(elements), True)
+
+        self._slices[xpath] = result
+        return result
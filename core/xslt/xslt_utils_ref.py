@@ -1,6 +1,5 @@
 import re
 import json
-import saxonche
 from difflib import Differ
 from core.llm.llm_utils import setup_agent, show_stats
 from pathlib import Path
@@ -11,6 +10,7 @@ class XSLTUtils:
     def apply_xslt(xslt, xml, parameters=None):
         if parameters is not None:
             xslt = XSLTUtils.replace_parameters(xslt, parameters)
+        import saxonche
         try:
             processor = saxonche.PySaxonProcessor(license=False)
             document = processor.parse_xml(xml_text=xml)
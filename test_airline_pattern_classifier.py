@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Golden test for AirlinePatternClassifier.
+
+A synthetic corpus of patterns is generated from a fixed seed out of the classifier's own
+keywords and terms, near misses, separators, line breaks, version numbers and characters
+that only match ASCII letters under IGNORECASE. The expected classification of every
+pattern (score, value type, category and reasons) is stored in
+core/config/test_data/airline_pattern_classifier_golden.json, recorded with the
+classifier's original one-regex-per-keyword implementation, so the compiled keyword engine
+must reproduce it exactly.
+Run from the project root with pytest, or directly.
+"""
+
+import json
+import os
+import random
+import sys
+from pathlib import Path
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.assisted_discovery.airline_pattern_classifier import (
+    AirlinePatternClassifier, KeywordMatcher, SUBSTRING_TERMS
+)
+
+GOLDEN_FILE = Path(__file__).parent / "core" / "config" / "test_data" / "airline_pattern_classifier_golden.json"
+CORPUS_SEED = 20240601
+CORPUS_SIZE = 1500
+
+FILLER_WORDS = [
+    "the", "element", "node", "xml", "list", "of", "and", "with", "for", "segment", "order",
+    "offer", "service", "baggage", "fare", "journey", "ref", "id", "type", "code",
+    "passeng", "adul", "infan", "refere", "uniq", "valid", "versio", "struct", "spec",
+]
+SEPARATORS = [" ", " ", " ", "", "\n", "-", ".", "/", "_", ": "]
+SPECIAL_WORDS = [
+    "version 17.2", "Version 21.3", "v18.1", "api", "API", "ſurname", "tıtle", "İnfant",
+    "KELVIN", "ndc", "PaxRefID", "PassengerList", "ParentChild", "AIRFRANCE",
+]
+
+
+def synthetic_corpus(seed=CORPUS_SEED, size=CORPUS_SIZE):
+    """Deterministic patterns built from the classifier's vocabulary"""
+    classifier = AirlinePatternClassifier()
+    vocabulary = set(SUBSTRING_TERMS)
+    keywords = [k for ks in classifier.high_value_keywords.values() for k in ks]
+    keywords += classifier.low_value_keywords + classifier.noise_keywords
+    for keyword in keywords:
+        vocabulary.update(keyword.split(".*"))
+    vocabulary = sorted(vocabulary) + FILLER_WORDS + SPECIAL_WORDS
+
+    rng = random.Random(seed)
+
+    def text(max_words):
+        words = []
+        for _ in range(rng.randint(0, max_words)):
+            word = rng.choice(vocabulary)
+            if rng.random() < 0.2:
+                word = word.upper() if rng.random() < 0.5 else word.title()
+            words.append(word)
+            words.append(rng.choice(SEPARATORS))
+        return "".join(words)
+
+    corpus = []
+    for _ in range(size):
+        pattern = {
+            "name": text(4),
+            "description": text(12),
+            "path": "/" + "/".join(rng.choice(vocabulary).title() for _ in range(rng.randint(1, 4))),
+            "prompt": text(30),
+        }
+        if rng.random() < 0.05:
+            del pattern[rng.choice(list(pattern))]
+        corpus.append(pattern)
+    return corpus
+
+
+def classification_record(classification):
+    return [classification.score, classification.value_type.value, classification.category, classification.reasons]
+
+
+def test_classifications_match_golden():
+    golden = json.loads(GOLDEN_FILE.read_text(encoding="utf-8"))
+    corpus = synthetic_corpus()
+    assert len(golden) == len(corpus)
+
+    classifier = AirlinePatternClassifier()
+    for pattern, expected in zip(corpus, golden):
+        assert classification_record(classifier.classify_pattern(pattern)) == expected, pattern
+
+    # The batch API gives the same results
+    batch = classifier.classify_patterns(corpus + corpus[:100])
+    assert [classification_record(c) for c in batch] == golden + golden[:100]
+
+
+def test_filter_patterns_uses_scores():
+    classifier = AirlinePatternClassifier()
+    corpus = synthetic_corpus(size=300)
+    golden = json.loads(GOLDEN_FILE.read_text(encoding="utf-8"))[:300]
+    filtered, classifications = classifier.filter_patterns(corpus, min_score=60.0)
+    assert [classification_record(c) for c in classifications] == golden
+    assert [p["airline_value_score"] for p in filtered] == [score for score, *_ in golden if score >= 60.0]
+
+
+def test_keyword_matcher_rejects_regex_syntax():
+    try:
+        KeywordMatcher([r"version.*\d+"])
+    except ValueError:
+        return
+    raise AssertionError("Expected ValueError for a keyword that is not literal.*literal")
+
+
+if __name__ == "__main__":
+    for test in (test_classifications_match_golden, test_filter_patterns_uses_scores,
+                 test_keyword_matcher_rejects_regex_syntax):
+        test()
+        print(f"✓ {test.__name__}")
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared SQLite connection pool.
+
+transaction() must commit a block of writes together or roll all of it back, nested
+calls must join the outer transaction, other threads must not see writes before they are
+committed, data_version() must move when any connection commits, and
+remove_database_file must delete the database with its -wal and -shm files.
+Run from the project root with pytest, or directly.
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.database.connection_pool import SQLiteConnectionPool, get_connection_pool, remove_database_file
+
+
+class Failure(Exception):
+    pass
+
+
+def new_pool(directory):
+    pool = SQLiteConnectionPool(os.path.join(directory, "pool.db"))
+    with pool.transaction() as conn:
+        conn.execute("CREATE TABLE item (name TEXT)")
+    return pool
+
+
+def names(conn):
+    return [row[0] for row in conn.execute("SELECT name FROM item ORDER BY name")]
+
+
+def read_in_thread(pool):
+    """Rows seen by the reader connection of another thread"""
+    seen = []
+    thread = threading.Thread(target=lambda: seen.extend(names(pool.reader())))
+    thread.start()
+    thread.join()
+    return seen
+
+
+def test_exception_rolls_back_transaction():
+    with tempfile.TemporaryDirectory() as directory:
+        pool = new_pool(directory)
+        try:
+            with pool.transaction() as conn:
+                conn.execute("INSERT INTO item VALUES ('a')")
+                raise Failure()
+        except Failure:
+            pass
+        assert not pool.in_transaction
+        assert names(pool.reader()) == []
+
+        with pool.transaction() as conn:
+            conn.execute("INSERT INTO item VALUES ('b')")
+        assert names(pool.reader()) == ["b"]
+        pool.close()
+
+
+def test_nested_transactions_join_the_outer_one():
+    with tempfile.TemporaryDirectory() as directory:
+        pool = new_pool(directory)
+        with pool.transaction() as outer:
+            outer.execute("INSERT INTO item VALUES ('a')")
+            with pool.transaction() as inner:
+                assert inner is outer
+                inner.execute("INSERT INTO item VALUES ('b')")
+            # Leaving the inner block does not commit
+            assert pool.in_transaction and read_in_thread(pool) == []
+        assert read_in_thread(pool) == ["a", "b"]
+
+        try:
+            with pool.transaction() as outer:
+                outer.execute("INSERT INTO item VALUES ('c')")
+                with pool.transaction() as inner:
+                    inner.execute("INSERT INTO item VALUES ('d')")
+                raise Failure()
+        except Failure:
+            pass
+        assert names(pool.reader()) == ["a", "b"]
+        pool.close()
+
+
+def test_other_threads_do_not_see_uncommitted_writes():
+    with tempfile.TemporaryDirectory() as directory:
+        pool = new_pool(directory)
+        main_reader = pool.reader()
+        assert names(main_reader) == []
+        with pool.transaction() as conn:
+            conn.execute("INSERT INTO item VALUES ('a')")
+            # The writing thread reads its own writes through the writer
+            assert pool.reader() is conn and names(pool.reader()) == ["a"]
+            assert read_in_thread(pool) == []
+        assert pool.reader() is main_reader
+        assert names(main_reader) == ["a"] and read_in_thread(pool) == ["a"]
+        pool.close()
+
+
+def test_data_version_moves_on_commits_from_other_connections():
+    with tempfile.TemporaryDirectory() as directory:
+        pool = new_pool(directory)
+        version = pool.data_version()
+        assert pool.data_version() == version
+
+        other = sqlite3.connect(pool.db_path)
+        other.execute("INSERT INTO item VALUES ('a')")
+        assert pool.data_version() == version  # not committed yet
+        other.commit()
+        other.close()
+        changed = pool.data_version()
+        assert changed != version
+
+        with pool.transaction() as conn:
+            conn.execute("INSERT INTO item VALUES ('b')")
+        assert pool.data_version() != changed
+        pool.close()
+
+        try:
+            pool.data_version()
+            assert False, "a closed pool must not be used"
+        except sqlite3.ProgrammingError:
+            pass
+
+
+def test_remove_database_file_deletes_wal_files():
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "shared.db")
+        pool = get_connection_pool(db_path)
+        with pool.transaction() as conn:
+            conn.execute("CREATE TABLE item (name TEXT)")
+            conn.execute("INSERT INTO item VALUES ('a')")
+        assert names(pool.reader()) == ["a"]
+        assert os.path.exists(db_path + "-wal") and os.path.exists(db_path + "-shm")
+
+        remove_database_file(db_path)
+        assert os.listdir(directory) == []
+        # The pool was closed and forgotten; a new file gets a new one
+        assert get_connection_pool(db_path) is not pool
+        remove_database_file(db_path)
+
+
+if __name__ == "__main__":
+    for test in (test_exception_rolls_back_transaction, test_nested_transactions_join_the_outer_one,
+                 test_other_threads_do_not_see_uncommitted_writes,
+                 test_data_version_moves_on_commits_from_other_connections,
+                 test_remove_database_file_deletes_wal_files):
+        test()
+        print(f"✓ {test.__name__}")
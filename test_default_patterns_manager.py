@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Tests for the default patterns database.
+
+The full-text index must follow every insert, update and delete of default_patterns, and
+search must rank name hits first while still finding queries inside xpath steps, as the
+substring search it replaced did, for the shipped default patterns. Patterns must read
+back with their api and api_version in a newly created database.
+The pattern cache reads default_patterns.db through a WAL-mode connection pool, so a
+backup must contain the patterns committed since the last checkpoint, which are still in
+the -wal file rather than in the database file itself.
+Run from the project root with pytest, or directly.
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+from contextlib import contextmanager
+from dataclasses import replace
+from pathlib import Path
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.database.connection_pool import remove_database_file
+from core.database.default_patterns_manager import FTS_TABLE, DefaultPattern, DefaultPatternsManager
+
+PATTERNS_DIR = Path(__file__).parent / "core" / "database" / "data" / "default_patterns"
+
+
+@contextmanager
+def temporary_manager():
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "default_patterns.db")
+        try:
+            yield DefaultPatternsManager(db_path, os.path.join(directory, "patterns"))
+        finally:
+            remove_database_file(db_path)
+
+
+def fts_matches(manager, query):
+    conn = sqlite3.connect(manager.db_path)
+    try:
+        # Raises if the index does not match the rows of default_patterns
+        conn.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('integrity-check')")
+        return sorted(row[0] for row in conn.execute(f"""
+            SELECT p.pattern_id FROM {FTS_TABLE} f JOIN default_patterns p ON p.rowid = f.rowid
+            WHERE {FTS_TABLE} MATCH ?
+        """, (query,)))
+    finally:
+        conn.close()
+
+
+def test_search_index_follows_inserts_updates_and_deletes():
+    with temporary_manager() as manager:
+        fare = DefaultPattern("fare_basis", "Fare basis", "Fare basis codes", "Extract the fare basis codes",
+                              "Y26", "//FareBasisCode")
+        seat = DefaultPattern("seat_map", "Seat map", "Cabin seat availability", "Extract the seats", "",
+                              "//SeatMap/Cabin")
+        assert manager.save_pattern(replace(fare, api="SQ", api_version="21.3")) and manager.save_pattern(seat)
+        # Read by column name: a new database has api and api_version before created_at
+        for found in (manager.get_pattern_by_id("fare_basis"), manager.get_all_patterns()[0],
+                      manager.search_patterns("fare")[0]):
+            assert (found.pattern_id, found.api, found.api_version, found.is_active) == ("fare_basis", "SQ", "21.3", True)
+        assert fts_matches(manager, "fare") == ["fare_basis"]
+        assert fts_matches(manager, "cabin") == ["seat_map"]
+
+        assert manager.save_pattern(replace(fare, name="Fare family", description="Branded fares"))
+        assert fts_matches(manager, "basis") == ["fare_basis"]  # still in the prompt
+        assert fts_matches(manager, "name:basis") == []
+        assert fts_matches(manager, "name:family") == ["fare_basis"]
+
+        # delete_pattern only deactivates the row, which search leaves out
+        assert manager.delete_pattern("seat_map")
+        assert fts_matches(manager, "cabin") == ["seat_map"]
+        assert manager.search_patterns("seat") == []
+
+        conn = sqlite3.connect(manager.db_path)
+        with conn:
+            conn.execute("DELETE FROM default_patterns WHERE pattern_id = 'seat_map'")
+        conn.close()
+        assert fts_matches(manager, "cabin OR seat*") == [] and fts_matches(manager, "fare*") == ["fare_basis"]
+
+
+def test_search_ranks_names_first_and_finds_infixes():
+    with temporary_manager() as manager:
+        for pattern_file in sorted(PATTERNS_DIR.glob("*.json")):
+            assert manager.save_pattern(DefaultPattern(**json.loads(pattern_file.read_text(encoding="utf-8"))))
+        manager.save_pattern(DefaultPattern("baggage_by_name", "Baggage allowance", "Checked bags",
+                                            "Extract the allowance", "", "//BaggageAllowance"))
+        manager.save_pattern(DefaultPattern("baggage_in_text", "Service list", "Baggage, baggage and baggage",
+                                            "Extract baggage services", "", "//ServiceList"))
+
+        assert [p.pattern_id for p in manager.search_patterns("baggage")][:2] == ["baggage_by_name", "baggage_in_text"]
+        assert [p.pattern_id for p in manager.search_patterns("bag allow")][0] == "baggage_by_name"
+
+        # Found by substring only: inside xpath steps such as //PaxSegmentRefID
+        for query in ("SegmentRefID", "ID", "RefID"):
+            found = [p.pattern_id for p in manager.search_patterns(query)]
+            substring = [p.pattern_id for p in manager._search_patterns_like(query)]
+            assert set(substring) <= set(found) and len(found) == len(set(found)), query
+        assert len(manager.search_patterns("SegmentRefID")) == 12
+        assert len(manager.search_patterns("ID")) >= 23
+        assert len(manager.search_patterns("ID", limit=5)) == 5
+
+
+def test_backup_includes_uncheckpointed_patterns():
+    with temporary_manager() as manager:
+        # Opens the pool, which keeps the database in WAL mode
+        initial = manager.get_all_patterns()
+        pattern = DefaultPattern("fare_basis", "Fare basis", "Fare basis codes",
+                                 "Extract the fare basis codes", "Y26", "//FareBasisCode")
+        assert manager.save_pattern(pattern)
+        assert os.path.getsize(manager.db_path + "-wal") > 0
+
+        backup_path = manager.backup_database(os.path.join(os.path.dirname(manager.db_path), "backup.db"))
+        conn = sqlite3.connect(backup_path)
+        try:
+            rows = conn.execute("SELECT pattern_id FROM default_patterns").fetchall()
+            assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+        finally:
+            conn.close()
+        assert ("fare_basis",) in rows
+        assert len(rows) == len(initial) + 1
+
+
+if __name__ == "__main__":
+    for test in (test_search_index_follows_inserts_updates_and_deletes, test_search_ranks_names_first_and_finds_infixes,
+                 test_backup_includes_uncheckpointed_patterns):
+        test()
+        print(f"✓ {test.__name__}")
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for the token-budgeted pattern extraction planner.
+
+Nodes selected from a real OrderViewRS sample are packed under a small budget: every
+request must fit, all XML must be sent exactly once in document order, and a node too
+large for one request must be split into subtrees keyed by their full paths.
+Run from the project root with pytest, or directly.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.assisted_discovery.extraction_planner import (
+    merge_extraction_responses, node_tokens, plan_extraction_requests
+)
+from core.xml_processing.xml_ingest import XMLNodeIndex
+
+SAMPLE_FILE = Path(__file__).parent / "core" / "config" / "test_data" / "LATAM" / "OVRS_Singapore_Airlines_21_3.xml"
+
+
+def count_tokens(text):
+    return len(text) // 4 + 1
+
+
+def selected_nodes(depth=3):
+    """All nodes at one depth of the sample, as the tree selection returns them"""
+    index = XMLNodeIndex.from_file(str(SAMPLE_FILE))
+    return {node.path: index.raw_xml(node.index) for node in index if node.depth == depth}
+
+
+def test_requests_fit_budget_and_keep_every_node():
+    nodes = selected_nodes()
+    budget = 1500
+    requests = plan_extraction_requests(nodes, count_tokens, budget)
+    assert len(requests) > 1
+
+    sent = {}
+    for request in requests:
+        assert request.tokens == sum(node_tokens(path, xml, count_tokens) for path, xml in request.nodes.items())
+        if len(request.nodes) > 1:
+            assert request.tokens <= budget
+        sent.update(request.nodes)
+
+    # Nodes that fit are sent whole; the others are replaced by their subtrees
+    for path, xml in nodes.items():
+        if node_tokens(path, xml, count_tokens) <= budget:
+            assert sent[path] == xml
+        else:
+            assert path not in sent
+            pieces = [piece_path for piece_path in sent if piece_path.startswith(path + "/")]
+            assert pieces, path
+
+
+def test_split_nodes_use_full_paths():
+    index = XMLNodeIndex.from_file(str(SAMPLE_FILE))
+    nodes = {index.paths[0]: index.raw_xml(0)}
+    requests = plan_extraction_requests(nodes, count_tokens, 2000)
+    assert len(requests) > 1
+    for request in requests:
+        for piece_paths, xml in request.nodes.items():
+            first_path = piece_paths.split(", ")[0]
+            piece = index.find(first_path)
+            assert piece is not None, first_path
+            assert xml.startswith(index.raw_xml(piece))
+
+
+def test_merge_keeps_first_pattern_per_path():
+    merged = merge_extraction_responses([
+        {"reasoning_log": "first", "patterns": [{"pattern": {"path": "/A", "name": "A1"}}, {"pattern": {"path": "/B"}}]},
+        None,
+        {"reasoning_log": "", "patterns": [{"pattern": {"path": "/A", "name": "A2"}}, {"pattern": {"path": "/C"}}]},
+    ])
+    assert [p["pattern"]["path"] for p in merged["patterns"]] == ["/A", "/B", "/C"]
+    assert merged["patterns"][0]["pattern"]["name"] == "A1"
+    assert merged["reasoning_log"] == "first"
+    assert merge_extraction_responses([None]) is None
+
+
+def test_merge_skips_malformed_patterns():
+    merged = merge_extraction_responses([
+        {"patterns": ["/A", {"pattern": "/A"}, {"pattern": ["/A"]}, {"pattern": {"path": ["/A"]}},
+                      {"pattern": {"name": "no path"}}, {"pattern": {"path": "/A"}}]},
+        {"reasoning_log": ["not", "text"], "patterns": {"pattern": {"path": "/B"}}},
+    ])
+    assert merged["patterns"] == [{"pattern": {"path": "/A"}}]
+
+
+if __name__ == "__main__":
+    for test in (test_requests_fit_budget_and_keep_every_node, test_split_nodes_use_full_paths,
+                 test_merge_keeps_first_pattern_per_path, test_merge_skips_malformed_patterns):
+        test()
+        print(f"✓ {test.__name__}")
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Tests for the FingerprintIndex behind IntelligentPatternMatcher.intelligent_match.
+
+Vectorized scores are compared with the scalar _calculate_pattern_similarity on random
+fingerprints, and the index is checked for deduplication, top-k ordering and a lossless
+save/load round trip.
+Run from the project root with pytest, or directly.
+"""
+
+import os
+import random
+import sys
+import tempfile
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.assisted_discovery.intelligent_pattern_matcher import (
+    AirlineFingerprint, FingerprintIndex, IntelligentPatternMatcher, PassengerCombination, RelationshipPattern
+)
+
+DIRECTIONS = ["INF→ADT", "ADT→INF", "BIDIRECTIONAL", "NONE"]
+STRUCTURES = ["PaxRefID links infant to adult", "PaxRefID", "Standard PaxRefID structure", "Found 2 PaxRefID elements"]
+RULES = ["Each infant references one adult", "Each adult references associated infant", ""]
+
+
+def random_pattern(rng):
+    combination = PassengerCombination(rng.randint(0, 3), rng.randint(0, 2), rng.randint(0, 2), "")
+    relationship = RelationshipPattern(rng.choice(DIRECTIONS), rng.choice(STRUCTURES), rng.choice(RULES), 0.5)
+    return combination, relationship
+
+
+def random_fingerprints(rng, count):
+    fingerprints = []
+    for i in range(count):
+        combination, relationship = random_pattern(rng)
+        fingerprints.append(AirlineFingerprint(
+            airline_code=rng.choice(["LH", "BA", "AF", "SQ"]), api_version=rng.choice(["17.2", "18.1", "21.3"]),
+            passenger_combination=combination, relationship_pattern=relationship,
+            structural_signature=f"pattern {i}", distinguishing_features=[], confidence_score=0.8
+        ))
+    return fingerprints
+
+
+def test_scores_match_scalar_similarity():
+    rng = random.Random(7)
+    matcher = IntelligentPatternMatcher()
+    for fingerprint in random_fingerprints(rng, 300):
+        matcher.learn_pattern(fingerprint)
+    index = matcher.fingerprint_index
+
+    for _ in range(50):
+        combination, relationship = random_pattern(rng)
+        scores = index.scores(combination, relationship)
+        expected = [
+            matcher._calculate_pattern_similarity(
+                combination, relationship, fp.passenger_combination, fp.relationship_pattern
+            )
+            for fp in index.fingerprints
+        ]
+        assert scores.tolist() == expected
+
+        # Same matches as sorting every score above the threshold
+        ranked = sorted(
+            ((f"{fp.airline_code}_{fp.api_version}", score) for fp, score in zip(index.fingerprints, expected)
+             if score >= 0.6),
+            key=lambda match: match[1], reverse=True
+        )
+        assert matcher.intelligent_match(combination, relationship, 0.6) == ranked
+        assert matcher.intelligent_match(combination, relationship, 0.6, top_k=5) == ranked[:5]
+
+
+def test_learning_again_replaces_fingerprint():
+    rng = random.Random(11)
+    fingerprints = random_fingerprints(rng, 100)
+    index = FingerprintIndex()
+    for fingerprint in fingerprints + fingerprints:
+        index.add(fingerprint)
+    keys = {
+        (fp.airline_code, fp.api_version, fp.passenger_combination.pattern_signature, fp.relationship_pattern.direction)
+        for fp in fingerprints
+    }
+    assert len(index) == len(keys)
+
+
+def test_save_and_load_round_trip():
+    rng = random.Random(13)
+    index = FingerprintIndex(FingerprintIndex.stamp("source"))
+    for fingerprint in random_fingerprints(rng, 200):
+        index.add(fingerprint)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "workspace_fingerprints.npz")
+        index.save(path)
+        loaded = FingerprintIndex.load(path)
+
+    assert loaded is not None
+    assert loaded.source_stamp == index.source_stamp
+    assert loaded.fingerprints == index.fingerprints
+    for _ in range(20):
+        combination, relationship = random_pattern(rng)
+        assert loaded.search(combination, relationship, 0.5, top_k=10) == index.search(combination, relationship, 0.5, top_k=10)
+    assert FingerprintIndex.load(os.path.join(directory, "missing.npz")) is None
+
+
+if __name__ == "__main__":
+    for test in (test_scores_match_scalar_similarity, test_learning_again_replaces_fingerprint,
+                 test_save_and_load_round_trip):
+        test()
+        print(f"✓ {test.__name__}")
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Tests for batched pattern identification.
+
+With batching on, standard patterns sent the same XML must be packed into requests whose
+prompts, counted with the model's tokenizer including the batch system prompt, fit the
+token budget and pattern limit, while passenger patterns keep their own request. Patterns
+a batched answer leaves out or answers malformed must be verified again one at a time,
+and only complete batched answers may be cached.
+Run from the project root with pytest, or directly.
+"""
+
+import json
+import os
+import re
+import sys
+from types import SimpleNamespace
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from benchmarks.llm_replay import mock_llm_environment
+from core.assisted_discovery.gap_analysis_manager import LLMUsage
+from core.assisted_discovery.identify_pattern_manager import IdentificationJob, PatternIdentifyManager
+from core.common.constants import GPT_4O
+from core.llm.completion_result import SERVER_ERROR, CompletionFailure, LLMCompletionError
+from core.llm.token_counter import get_token_counter
+
+ORDER = """<OrderViewRS>
+  <DataLists>
+    <PaxList><Pax><PaxID>PAX1</PaxID><PTC>ADT</PTC></Pax><Pax><PaxID>PAX2</PaxID><PTC>INF</PTC></Pax></PaxList>
+    <FareList><FareGroup><FareBasisCode>Y26</FareBasisCode></FareGroup></FareList>
+  </DataLists>
+</OrderViewRS>"""
+BATCH_REQUEST = "Verify each of the following instructions"
+
+
+class FakeLLM:
+    """Stands in for _complete: answers batches with answer(pattern_id, instruction), single patterns with YES"""
+
+    def __init__(self, answer=None, error=None):
+        self.answer = answer or (lambda pattern_id, instruction: {"pattern_id": pattern_id, "confirmation": "YES"})
+        self.error = error
+        self.requests = []
+        self.cached = []
+
+    def complete(self, prompts, use_cache=False):
+        self.requests.append(prompts)
+        if self.error is not None:
+            raise LLMCompletionError(self.error)
+        if BATCH_REQUEST in prompts[-1]["content"]:
+            instructions = re.findall(r"pattern_id: (\S+)\ninstruction: (.*)", prompts[-1]["content"])
+            answers = [self.answer(pattern_id, instruction) for pattern_id, instruction in instructions]
+            return LLMUsage(calls=1), json.dumps([answer for answer in answers if answer is not None])
+        return LLMUsage(calls=1), json.dumps({"confirmation": "YES", "reason": "verified alone"})
+
+    def cache(self, prompts, content):
+        self.cached.append(prompts)
+
+
+def new_manager(llm=None):
+    with mock_llm_environment("http://127.0.0.1:9", GPT_4O):
+        manager = PatternIdentifyManager(GPT_4O, SimpleNamespace(), headless=True)
+    if llm:
+        manager._complete = llm.complete
+        manager._cache_response = llm.cache
+    return manager
+
+
+def with_settings(settings, run):
+    previous = {name: os.environ.get(name) for name in settings}
+    os.environ.update(settings)
+    try:
+        return run()
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def standard_job(number):
+    return IdentificationJob({}, "SQ", f"Verify that fare group {number} carries a fare basis code", "//FareList")
+
+
+def batch_prompt_tokens(manager, jobs, xml_content):
+    prompts = manager.build_prompts_for_batch_pattern_identification(
+        xml_content, [(f"P{position}", job.search_prompt) for position, job in enumerate(jobs, 1)], xml_is_excerpt=True
+    )
+    return get_token_counter(GPT_4O).count_messages(prompts)
+
+
+def test_batches_fit_token_budget_and_pattern_limit():
+    manager = new_manager()
+    fares = "<FareList>" + "<FareGroup><FareBasisCode>Y26</FareBasisCode></FareGroup>" * 50 + "</FareList>"
+    jobs = [standard_job(number) for number in range(10)]
+    job_xml = [(fares, True)] * len(jobs)
+    counter = get_token_counter(GPT_4O)
+    base_tokens = batch_prompt_tokens(manager, [], fares)
+    # The batch system prompt is part of every request, not only the XML
+    assert base_tokens > counter.count(fares) + 100
+
+    assert manager._plan_identification_tasks(jobs, job_xml) == [([index], fares, True) for index in range(10)]
+
+    tasks = with_settings({"IDENTIFY_BATCH_MAX_PATTERNS": "4", "IDENTIFY_BATCH_TOKEN_BUDGET": "100000"},
+                          lambda: manager._plan_identification_tasks(jobs, job_xml, batch_patterns=True))
+    assert [indices for indices, _, _ in tasks] == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+
+    # Room for three instructions next to the system prompt and XML (the parts are counted
+    # separately, which may come to a few tokens more than the joined prompt)
+    budget = batch_prompt_tokens(manager, jobs[:3], fares) + 5
+    assert batch_prompt_tokens(manager, jobs[:4], fares) > budget
+    tasks = with_settings({"IDENTIFY_BATCH_MAX_PATTERNS": "20", "IDENTIFY_BATCH_TOKEN_BUDGET": str(budget)},
+                          lambda: manager._plan_identification_tasks(jobs, job_xml, batch_patterns=True))
+    assert [indices for indices, _, _ in tasks] == [[0, 1, 2], [3, 4, 5], [6, 7, 8], [9]]
+    for indices, xml_content, is_excerpt in tasks:
+        assert (xml_content, is_excerpt) == (fares, True)
+        assert batch_prompt_tokens(manager, [jobs[index] for index in indices], fares) <= budget
+
+    # A budget the XML fits but the system prompt does not leaves every pattern on its own
+    tasks = with_settings({"IDENTIFY_BATCH_TOKEN_BUDGET": str(base_tokens - 50)},
+                          lambda: manager._plan_identification_tasks(jobs, job_xml, batch_patterns=True))
+    assert [indices for indices, _, _ in tasks] == [[index] for index in range(10)]
+
+
+def test_passenger_patterns_run_on_their_own():
+    llm = FakeLLM()
+    manager = new_manager(llm)
+    rules = [{"matched": False, "reason": ""} for _ in range(5)]
+    jobs = [
+        IdentificationJob(rules[0], "SQ", "Verify the fare basis codes", "//FareList"),
+        IdentificationJob(rules[1], "SQ", "Verify the passenger types", "//PaxList", use_intelligent=True),
+        IdentificationJob(rules[2], "LA", "Verify the fare groups", "//FareList"),
+        IdentificationJob(rules[3], "LA", "Verify the infant passengers", "//PaxList", use_intelligent=True),
+        IdentificationJob(rules[4], "AF", "Verify the journey list", "//PaxJourneyList"),
+    ]
+    gap_analysis = {"sections": [], "matched_airlines": set(), "llm_usage": LLMUsage()}
+    manager._run_identification_jobs(ORDER, jobs, gap_analysis, max_concurrency=2, batch_patterns=True)
+
+    batches = [prompts for prompts in llm.requests if BATCH_REQUEST in prompts[-1]["content"]]
+    singles = [prompts for prompts in llm.requests if BATCH_REQUEST not in prompts[-1]["content"]]
+    assert len(batches) == 1 and "P1" in batches[0][-1]["content"] and "P3" not in batches[0][-1]["content"]
+    assert "<FareList>" in batches[0][1]["content"] and "<PaxList>" not in batches[0][1]["content"]
+    assert sorted(prompts[-1]["content"] for prompts in singles) == [
+        "Pattern to match against: Verify the infant passengers",
+        "Pattern to match against: Verify the passenger types",
+    ]
+    assert all(rule["matched"] for rule in rules[:4])
+    assert rules[4]["not_applicable"] and gap_analysis["skipped_llm_calls"] == 1
+    assert gap_analysis["matched_airlines"] == {"SQ", "LA"} and gap_analysis["llm_usage"].calls == 3
+
+
+def test_missing_and_malformed_answers_fall_back_to_single_requests():
+    def answer(pattern_id, instruction):
+        if pattern_id == "P2":
+            return None
+        if pattern_id == "P3":
+            return {"pattern_id": pattern_id, "confirmation": "MAYBE"}
+        return {"pattern_id": pattern_id, "confirmation": "NO", "reason": "batched"}
+
+    llm = FakeLLM(answer)
+    manager = new_manager(llm)
+    jobs = [standard_job(number) for number in range(4)]
+    responses, usage = manager._identify_pattern_batch(ORDER, jobs)
+    assert [response["confirmation"] for response in responses] == ["NO", "YES", "YES", "NO"]
+    assert [response["reason"] for response in responses] == ["batched", "verified alone", "verified alone", "batched"]
+    assert [prompts[-1]["content"] for prompts in llm.requests[1:]] == [jobs[1].search_prompt, jobs[2].search_prompt]
+    assert usage.calls == 3
+    # Only the single answers are cached, not the incomplete batch
+    assert llm.cached == llm.requests[1:]
+
+    llm = FakeLLM()
+    manager = new_manager(llm)
+    responses, usage = manager._identify_pattern_batch(ORDER, jobs)
+    assert all(response["confirmation"] == "YES" for response in responses)
+    assert len(llm.requests) == 1 and llm.cached == llm.requests and usage.calls == 1
+
+
+def test_failed_batch_is_not_retried_per_pattern():
+    llm = FakeLLM(error=CompletionFailure(SERVER_ERROR, "overloaded", attempts=4, status_code=503, retryable=True))
+    manager = new_manager(llm)
+    responses, usage = manager._identify_pattern_batch(ORDER, [standard_job(number) for number in range(3)])
+    assert len(llm.requests) == 1 and not llm.cached and usage.calls == 0
+    assert all(response["llm_failed"] and response["confirmation"] == "NO" for response in responses)
+    assert "overloaded" in responses[0]["reason"]
+
+
+if __name__ == "__main__":
+    for test in (test_batches_fit_token_budget_and_pattern_limit, test_passenger_patterns_run_on_their_own,
+                 test_missing_and_malformed_answers_fall_back_to_single_requests,
+                 test_failed_batch_is_not_retried_per_pattern):
+        test()
+        print(f"✓ {test.__name__}")
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Import-time budget for the Streamlit pages.
+
+The core modules each page imports are read from the page scripts and imported in a
+fresh interpreter under ``python -X importtime``. The cold import must stay within
+IMPORT_TIME_BUDGET_MS (default 2000 ms) and must not pull in the SDKs that are only
+needed once a request is made or a legacy feature is used (openai, chromadb,
+llama_index, saxonche, Azure Search, Confluence). Modules that used to import those
+eagerly are checked for the same.
+Run from the project root with pytest, or directly.
+"""
+
+import ast
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+PROJECT_ROOT = Path(__file__).resolve().parent
+PAGE_SCRIPTS = [PROJECT_ROOT / "app" / "Assisted_Discovery.py", *sorted((PROJECT_ROOT / "app" / "pages").glob("*.py"))]
+DEFAULT_BUDGET_MS = 2000
+LAZY_DEPENDENCIES = ("openai", "chromadb", "llama_index", "saxonche", "azure.search", "atlassian")
+# Modules whose heavy dependencies are imported by the functions that need them
+LAZY_MODULES = ("core.database.database_utils", "core.search.azure_search_manager", "core.common.confluence_utils")
+
+
+def page_core_modules():
+    """core.* modules imported at the top level of the page scripts (not inside functions)"""
+    modules = set()
+
+    def visit(node):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)):
+            return
+        if isinstance(node, ast.Import):
+            modules.update(alias.name for alias in node.names if alias.name.startswith("core."))
+        elif isinstance(node, ast.ImportFrom) and node.module and node.module.startswith("core.") and not node.level:
+            modules.add(node.module)
+        for child in ast.iter_child_nodes(node):
+            visit(child)
+
+    for script in PAGE_SCRIPTS:
+        visit(ast.parse(script.read_text(encoding="utf-8"), filename=str(script)))
+    return sorted(modules)
+
+
+def profile_import(modules):
+    """Import modules in a fresh interpreter; returns (total milliseconds, names of all modules imported)"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(PROJECT_ROOT), env.get("PYTHONPATH")]))
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True, timeout=300
+    )
+    assert completed.returncode == 0, completed.stderr[-2000:]
+
+    total_us = 0
+    imported = set()
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  "):
+            # One level below the interpreter: the cumulative times add up to the whole import
+            total_us += int(cumulative)
+        imported.add(name.strip())
+    return total_us / 1000, imported
+
+
+def lazy_dependencies_in(imported):
+    return sorted(name for name in imported
+                  if any(name == dependency or name.startswith(dependency + ".") for dependency in LAZY_DEPENDENCIES))
+
+
+def test_page_imports_within_budget():
+    modules = page_core_modules()
+    assert "core.assisted_discovery.pattern_manager" in modules
+
+    total_ms, imported = profile_import(modules)
+    assert not lazy_dependencies_in(imported), f"Pages import {lazy_dependencies_in(imported)}"
+    budget_ms = float(os.getenv("IMPORT_TIME_BUDGET_MS", DEFAULT_BUDGET_MS))
+    assert total_ms <= budget_ms, f"Cold import of the pages took {total_ms:.0f} ms (budget {budget_ms:.0f} ms)"
+
+
+def test_legacy_modules_import_dependencies_lazily():
+    _, imported = profile_import(LAZY_MODULES)
+    assert not lazy_dependencies_in(imported), f"{LAZY_MODULES} import {lazy_dependencies_in(imported)}"
+
+
+if __name__ == "__main__":
+    for test in (test_page_imports_within_budget, test_legacy_modules_import_dependencies_lazily):
+        test()
+        print(f"✓ {test.__name__}")
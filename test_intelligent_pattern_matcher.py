@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Tests for the passenger data read by the intelligent pattern matcher.
+
+extract_passenger_table must count the passenger types of the sample messages and keep
+each passenger's references, so analyze_relationships finds the infant to adult link in
+messages where the infant references its adult and in those where the adult references
+its infant, whatever the namespace prefixes and the order of PTC and PaxRefID.
+Run from the project root with pytest, or directly.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.assisted_discovery.intelligent_pattern_matcher import IntelligentPatternMatcher, extract_passenger_table
+
+SAMPLE_DIR = Path(__file__).parent / "core" / "config" / "test_data" / "LATAM"
+
+
+def test_infant_references_adult():
+    xml_content = (SAMPLE_DIR / "OVRS_Singapore_Airlines_21_3.xml").read_text(encoding="utf-8")
+    table = extract_passenger_table(xml_content)
+    assert dict(table.ptc_counts) == {"ADT": 2, "CHD": 1, "INF": 1}
+    infant = next(record for record in table.records if record.ptc == "INF")
+    assert (infant.pax_id, infant.ref_ids) == ("PAX3", ("PAX2",))
+
+    matcher = IntelligentPatternMatcher()
+    assert matcher.extract_passenger_combination(xml_content).pattern_signature == "2ADT+1CHD+1INF"
+    relationship = matcher.analyze_relationships(xml_content)
+    assert relationship.direction == "INF→ADT"
+    assert "1 INF→ADT links" in relationship.reference_structure
+
+
+def test_adult_references_infant():
+    xml_content = (SAMPLE_DIR / "AFKL" / "AFKL_Pax_INF.xml").read_text(encoding="utf-8")
+    table = extract_passenger_table(xml_content)
+    assert dict(table.ptc_counts) == {"ADT": 1, "INF": 1}
+    assert [(record.pax_id, record.ptc, record.ref_ids) for record in table.records] == [
+        ("PAX1", "ADT", ("PAX4",)), ("PAX4", "INF", ())
+    ]
+
+    relationship = IntelligentPatternMatcher().analyze_relationships(xml_content)
+    assert relationship.direction == "ADT→INF"
+    assert "1 ADT→INF links" in relationship.reference_structure
+
+
+def test_prefixed_tags_and_reference_before_type():
+    xml_content = """<ns:PaxList xmlns:ns="http://www.iata.org/IATA/2015/00/2018.2/OrderViewRS">
+      <ns:Pax><ns:PaxID>PAX1</ns:PaxID><ns:PTC>ADT</ns:PTC></ns:Pax>
+      <ns:Pax><ns:PaxID>PAX2</ns:PaxID><ns:PaxRefID>PAX1</ns:PaxRefID><ns:PTC>INF</ns:PTC></ns:Pax>
+    </ns:PaxList>"""
+    table = extract_passenger_table(xml_content)
+    assert dict(table.ptc_counts) == {"ADT": 1, "INF": 1} and table.pax_ref_count == 1
+    assert IntelligentPatternMatcher().analyze_relationships(xml_content).direction == "INF→ADT"
+
+
+if __name__ == "__main__":
+    for test in (test_infant_references_adult, test_adult_references_infant,
+                 test_prefixed_tags_and_reference_before_type):
+        test()
+        print(f"✓ {test.__name__}")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Tests for the pooled LLM clients and the async completion path.
+
+The registry must hand out one sync and one async client per model configuration, and
+LLMAgent.aget_chat_completion must go through the deployment's rate limiter and return a
+typed CompletionResult (or CompletionFailure) when run against the mock OpenAI server.
+aclose() and close() must close the async pools, leaving the registry ready to create new
+clients.
+Run from the project root with pytest, or directly.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from benchmarks.mock_openai_server import MockOpenAIServer, Recording, ReplayStore, request_key
+from core.llm.LLMAgent import LLMAgent
+from core.llm.client_registry import LLMClientRegistry, ModelConfig
+from core.llm.completion_result import CLIENT_ERROR, CompletionFailure, CompletionResult
+from core.llm.rate_limiter import get_rate_limiter
+
+DEPLOYMENT = "async-test-deployment"
+MESSAGES = [{"role": "system", "content": "Extract patterns"}, {"role": "user", "content": "<Order/>"}]
+REQUEST = {"model": DEPLOYMENT, "messages": MESSAGES, "temperature": 0, "top_p": 0.9}
+USAGE = {"prompt_tokens": 20, "completion_tokens": 7, "total_tokens": 27}
+
+
+def recorded_store(directory):
+    store = ReplayStore(os.path.join(directory, "store.jsonl"))
+    store.add(Recording(request_key(DEPLOYMENT, REQUEST), DEPLOYMENT,
+                        {"role": "assistant", "content": '{"patterns": []}'}, usage=USAGE))
+    return store
+
+
+def mock_config(server):
+    return ModelConfig(server.url, "mock-key", "2024-08-01-preview", DEPLOYMENT)
+
+
+def test_async_completion_against_mock_server():
+    with tempfile.TemporaryDirectory() as directory:
+        with MockOpenAIServer(recorded_store(directory)) as server:
+            registry = LLMClientRegistry()
+            config = mock_config(server)
+            agent = LLMAgent([], registry.get_client(config), DEPLOYMENT,
+                             async_client_provider=lambda: registry.get_async_client(config))
+
+            async def run():
+                client = registry.get_async_client(config)
+                assert registry.get_async_client(config) is client
+                assert registry.get_async_client(ModelConfig(server.url, "mock-key", "2024-08-01-preview")) is client
+
+                results = await asyncio.gather(*(agent.aget_chat_completion(MESSAGES) for _ in range(3)))
+                missing = await agent.aget_chat_completion(MESSAGES[:1])
+                # A paused deployment holds async callers back too
+                get_rate_limiter(DEPLOYMENT).pause(0.2)
+                paused = await agent.aget_chat_completion(MESSAGES)
+                await registry.aclose()
+                return client, results, missing, paused
+
+            client, results, missing, paused = asyncio.run(run())
+
+    for result in results:
+        assert isinstance(result, CompletionResult) and result.ok
+        assert result.content == '{"patterns": []}'
+        assert result.response.usage.total_tokens == 27 and result.attempts == 1
+        assert result.time_to_first_byte is not None
+    assert isinstance(missing, CompletionFailure)
+    assert missing.error_type == CLIENT_ERROR and missing.status_code == 404
+    assert server.stats()["hits"] == 4
+    assert all(result.queue_wait == 0 for result in results)
+    assert paused.ok and paused.queue_wait > 0.1
+
+    assert client.is_closed()
+    assert not registry._async_clients and not registry._clients
+
+
+def test_close_outside_event_loop():
+    config = ModelConfig("http://127.0.0.1:9", "mock-key", "2024-08-01-preview", DEPLOYMENT)
+    registry = LLMClientRegistry()
+
+    async def create():
+        return registry.get_async_client(config)
+
+    client = asyncio.run(create())
+    sync_client = registry.get_client(config)
+    registry.close()
+    assert client.is_closed() and sync_client.is_closed()
+    assert asyncio.run(create()) is not client
+
+    async def close_inside_loop():
+        try:
+            registry.close()
+        except RuntimeError:
+            return True
+        return False
+
+    # The pools are left for aclose() rather than dropped unclosed
+    assert asyncio.run(close_inside_loop()) and registry._async_clients
+    registry.close()
+    assert not registry._async_clients
+
+    # Without an async client, an agent reports a failure instead of raising
+    result = asyncio.run(LLMAgent([], None, DEPLOYMENT).aget_chat_completion(MESSAGES))
+    assert not result.ok and tuple(result) == (0.0, None)
+
+
+if __name__ == "__main__":
+    for test in (test_async_completion_against_mock_server, test_close_outside_event_loop):
+        test()
+        print(f"✓ {test.__name__}")
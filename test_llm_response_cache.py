@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Tests for the LLM response cache.
+
+Entries must expire after their TTL and the store must drop the least recently used
+entries once it is over its entry or size limit. Pattern identification must only cache
+answers it could use: a batched answer missing patterns or a failed request must not be
+stored, so the next run asks the LLM again. Every cache lives in a temporary directory.
+Run from the project root with pytest, or directly.
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import core.llm.response_cache as response_cache
+from benchmarks.llm_replay import mock_llm_environment
+from core.assisted_discovery.identify_pattern_manager import IdentificationJob, PatternIdentifyManager
+from core.common.constants import GPT_4O
+from core.llm.completion_result import SERVER_ERROR, CompletionFailure, CompletionResult
+from core.llm.response_cache import LLMResponseCache
+
+ORDER = "<OrderViewRS><FareList><FareGroup><FareBasisCode>Y26</FareBasisCode></FareGroup></FareList></OrderViewRS>"
+
+
+def messages(text):
+    return [{"role": "system", "content": "Verify the pattern"}, {"role": "user", "content": text}]
+
+
+@contextmanager
+def temporary_cache(**limits):
+    """A cache in a temporary directory, installed as the global response cache"""
+    previous_cache, previous_setting = response_cache._response_cache, os.environ.get("LLM_RESPONSE_CACHE_ENABLED")
+    with tempfile.TemporaryDirectory() as directory:
+        cache = LLMResponseCache(os.path.join(directory, "llm_response_cache.db"), **limits)
+        response_cache._response_cache = cache
+        os.environ["LLM_RESPONSE_CACHE_ENABLED"] = "true"
+        try:
+            yield cache
+        finally:
+            response_cache._response_cache = previous_cache
+            if previous_setting is None:
+                os.environ.pop("LLM_RESPONSE_CACHE_ENABLED", None)
+            else:
+                os.environ["LLM_RESPONSE_CACHE_ENABLED"] = previous_setting
+
+
+def age_entries(cache, seconds):
+    conn = sqlite3.connect(cache.db_path)
+    with conn:
+        conn.execute("UPDATE llm_response_cache SET created_at = created_at - ?", (seconds,))
+    conn.close()
+
+
+def test_entries_expire_after_ttl():
+    with temporary_cache(ttl_seconds=60) as cache:
+        cache.put(GPT_4O, messages("a"), "answer a")
+        cache.put(GPT_4O, messages("b"), "answer b")
+        assert cache.get(GPT_4O, messages("a")) == "answer a"
+        # Keyed by model and messages
+        assert cache.get("other-deployment", messages("a")) is None
+        assert cache.get(GPT_4O, messages("c")) is None
+
+        age_entries(cache, 61)
+        assert cache.get(GPT_4O, messages("a")) is None
+        assert cache.stats()["entries"] == 1
+        # Storing a new entry also drops the expired ones
+        cache.put(GPT_4O, messages("c"), "answer c")
+        assert cache.stats() == {"entries": 1, "size_bytes": len("answer c"), "hits": 0}
+
+    with temporary_cache(ttl_seconds=0) as cache:
+        cache.put(GPT_4O, messages("a"), "answer a")
+        age_entries(cache, 10 ** 6)
+        assert cache.get(GPT_4O, messages("a")) == "answer a"
+
+
+def test_least_recently_used_entries_are_evicted():
+    with temporary_cache(max_entries=3) as cache:
+        for text in "abc":
+            cache.put(GPT_4O, messages(text), f"answer {text}")
+            time.sleep(0.01)
+        assert cache.get(GPT_4O, messages("a")) == "answer a"
+        time.sleep(0.01)
+        cache.put(GPT_4O, messages("d"), "answer d")
+        assert cache.get(GPT_4O, messages("b")) is None
+        assert [cache.get(GPT_4O, messages(text)) for text in "acd"] == ["answer a", "answer c", "answer d"]
+        assert cache.stats()["entries"] == 3 and cache.stats()["hits"] == 4
+
+    # 2 KB budget: the newest entries that fit are kept
+    with temporary_cache(max_size_mb=2 / 1024) as cache:
+        for text in "abc":
+            cache.put(GPT_4O, messages(text), text * 900)
+            time.sleep(0.01)
+        assert cache.get(GPT_4O, messages("a")) is None
+        assert cache.get(GPT_4O, messages("b")) == "b" * 900 and cache.get(GPT_4O, messages("c")) == "c" * 900
+        cache.put(GPT_4O, messages("large"), "x" * 4096)
+        assert cache.stats()["entries"] == 0
+
+
+class FakeAgent:
+    """Answers batched requests with batch(pattern_ids) and single ones with a confirmation"""
+
+    def __init__(self, batch):
+        self.model_name = GPT_4O
+        self.batch = batch
+        self.requests = []
+
+    def get_chat_completion(self, prompts):
+        self.requests.append(prompts)
+        if "pattern_id: P1" in prompts[-1]["content"]:
+            content = self.batch(["P1", "P2"])
+            if isinstance(content, CompletionFailure):
+                return content
+        else:
+            content = json.dumps({"confirmation": "YES", "reason": "verified alone"})
+        message = SimpleNamespace(content=content)
+        return CompletionResult(0.01, SimpleNamespace(choices=[SimpleNamespace(message=message)]))
+
+
+def identify(agent):
+    with mock_llm_environment("http://127.0.0.1:9", GPT_4O):
+        manager = PatternIdentifyManager(GPT_4O, SimpleNamespace(), headless=True)
+    manager.agent = agent
+    jobs = [IdentificationJob({}, "SQ", f"Verify fare basis code {number}", "//FareList") for number in range(2)]
+    return manager._identify_pattern_batch(ORDER, jobs, xml_is_excerpt=True)
+
+
+def test_only_complete_batch_answers_are_cached():
+    with temporary_cache() as cache:
+        # P2 is missing, so it is verified again on its own; only that answer is stored
+        incomplete = FakeAgent(lambda ids: json.dumps([{"pattern_id": "P1", "confirmation": "NO", "reason": ""}]))
+        responses, usage = identify(incomplete)
+        assert [response["confirmation"] for response in responses] == ["NO", "YES"]
+        assert len(incomplete.requests) == 2 and usage.cache_misses == 2 and cache.stats()["entries"] == 1
+        responses, usage = identify(incomplete)
+        assert len(incomplete.requests) == 3 and (usage.cache_misses, usage.cache_hits) == (1, 1)
+
+    with temporary_cache() as cache:
+        failed = FakeAgent(lambda ids: CompletionFailure(SERVER_ERROR, "overloaded", attempts=4, status_code=503))
+        responses, usage = identify(failed)
+        assert all(response["llm_failed"] for response in responses)
+        assert len(failed.requests) == 1 and cache.stats()["entries"] == 0
+
+        unreadable = FakeAgent(lambda ids: "The patterns look fine")
+        responses, usage = identify(unreadable)
+        assert len(unreadable.requests) == 3 and cache.stats()["entries"] == 2
+
+        complete = FakeAgent(lambda ids: json.dumps([{"pattern_id": i, "confirmation": "YES"} for i in ids]))
+        identify(complete)
+        assert cache.stats()["entries"] == 3
+        responses, usage = identify(complete)
+        assert len(complete.requests) == 1 and (usage.calls, usage.cache_hits) == (0, 1)
+        assert all(response["confirmation"] == "YES" for response in responses)
+
+
+if __name__ == "__main__":
+    for test in (test_entries_expire_after_ttl, test_least_recently_used_entries_are_evicted,
+                 test_only_complete_batch_answers_are_cached):
+        test()
+        print(f"✓ {test.__name__}")
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Tests for the structured LLM call telemetry.
+
+Histogram quantiles must interpolate within buckets the way Prometheus does, calls made
+through LLMAgent must be recorded with their prompt template, tokens, retries and time
+to first byte, and the aggregates must be served in the Prometheus text format.
+Run from the project root with pytest, or directly.
+"""
+
+import os
+import sys
+import tempfile
+import urllib.request
+from types import SimpleNamespace
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.common.constants import GPT_4O
+from core.llm.LLMAgent import LLMAgent
+from core.llm.completion_result import CompletionFailure, CompletionResult, TIMEOUT
+from core.llm.telemetry import (
+    Histogram, LLMCallEvent, LLMTelemetry, UNKNOWN_PROMPT_TYPE, get_llm_telemetry, prompt_template_name,
+    read_prompt_template, record_first_byte, start_metrics_server
+)
+
+
+class FakeCompletions:
+    def create(self, **kwargs):
+        # The pooled httpx client calls this hook once the response headers arrive
+        record_first_byte(None)
+        return SimpleNamespace(
+            usage=SimpleNamespace(prompt_tokens=120, completion_tokens=30, total_tokens=150),
+            choices=[SimpleNamespace(message=SimpleNamespace(content='{"patterns": []}'))],
+        )
+
+
+def test_histogram_quantiles():
+    histogram = Histogram(buckets=(1.0, 2.0, 4.0))
+    assert histogram.quantile(0.5) is None
+    for value in (0.5, 1.5, 1.5, 3.0):
+        histogram.observe(value)
+    assert histogram.quantile(0.5) == 1.5
+    assert abs(histogram.quantile(0.95) - 3.6) < 1e-9
+    assert histogram.cumulative_counts() == [("1.0", 1), ("2.0", 3), ("4.0", 4), ("+Inf", 4)]
+    histogram.observe(10.0)
+    assert histogram.quantile(1.0) == 4.0
+
+
+def test_agent_calls_are_recorded_per_prompt_template():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "pattern_probe.md")
+        with open(path, "w") as f:
+            f.write("Find the pattern.")
+        messages = [{"role": "system", "content": read_prompt_template(path)}, {"role": "user", "content": "<Order/>"}]
+    assert prompt_template_name(messages) == "pattern_probe"
+    assert prompt_template_name([{"role": "user", "content": "ad hoc"}]) == UNKNOWN_PROMPT_TYPE
+
+    telemetry = get_llm_telemetry()
+    telemetry.reset()
+    agent = LLMAgent([], SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions())), GPT_4O)
+    result = agent.get_chat_completion(messages)
+    assert result.ok and result.time_to_first_byte is not None
+
+    event = telemetry.recent_events[-1]
+    assert (event.model, event.prompt_type, event.status) == (GPT_4O, "pattern_probe", "ok")
+    assert (event.prompt_tokens, event.completion_tokens, event.retries) == (120, 30, 0)
+    assert event.latency_seconds >= event.time_to_first_byte_seconds
+    telemetry.reset()
+
+
+def test_summary_and_prometheus_text():
+    telemetry = LLMTelemetry(log_events=False)
+    for latency in (0.3, 0.4, 0.7):
+        telemetry.record(LLMCallEvent(GPT_4O, "default_system_prompt_for_gap_analysis", prompt_tokens=100,
+                                      completion_tokens=10, latency_seconds=latency, queue_wait_seconds=0.02))
+    telemetry.record_completion(GPT_4O, [], CompletionResult(0.01, None, attempts=3, queue_wait=2.5), 3.2)
+    telemetry.record_completion(GPT_4O, [], CompletionFailure(TIMEOUT, "timed out", attempts=6), 40.0)
+    telemetry.record_cache_hit(GPT_4O, [], 0.001)
+
+    rows = {row["prompt_type"]: row for row in telemetry.summary()}
+    gap = rows["default_system_prompt_for_gap_analysis"]
+    assert gap["calls"] == 3 and gap["prompt_tokens"] == 300
+    assert 0.25 < gap["latency_p50"] <= 0.5 and gap["latency_p95"] <= 1.0
+    other = rows[UNKNOWN_PROMPT_TYPE]
+    assert (other["calls"], other["cache_hits"], other["errors"], other["retries"]) == (3, 1, 1, 7)
+    assert other["time_to_first_byte_p50"] is None
+
+    text = telemetry.render_prometheus()
+    assert "# TYPE genie_llm_latency_seconds histogram" in text
+    assert f'genie_llm_calls_total{{model="{GPT_4O}",prompt_type="other",status="timeout",cache="miss"}} 1' in text
+    assert f'genie_llm_latency_seconds_bucket{{model="{GPT_4O}",prompt_type="other",le="+Inf"}} 3' in text
+    # Cache hits do not wait in the queue
+    assert f'genie_llm_queue_wait_seconds_count{{model="{GPT_4O}",prompt_type="other"}} 2' in text
+
+
+def test_metrics_endpoint():
+    telemetry = get_llm_telemetry()
+    telemetry.reset()
+    telemetry.record(LLMCallEvent(GPT_4O, "probe", latency_seconds=0.2))
+    server = start_metrics_server(0)
+    try:
+        port = server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=10) as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            body = response.read().decode("utf-8")
+    finally:
+        telemetry.reset()
+    assert f'genie_llm_latency_seconds_count{{model="{GPT_4O}",prompt_type="probe"}} 1' in body
+
+
+if __name__ == "__main__":
+    for test in (test_histogram_quantiles, test_agent_calls_are_recorded_per_prompt_template,
+                 test_summary_and_prometheus_text, test_metrics_endpoint):
+        test()
+        print(f"✓ {test.__name__}")
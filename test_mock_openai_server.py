@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Tests for the mock OpenAI server used by the offline benchmarks.
+
+A server is started on a free port with a temporary replay store and called over HTTP
+the way the Azure OpenAI client calls it: recorded completions are replayed with their
+usage, unrecorded requests get a 404, injected 429s carry retry-after headers and
+streamed responses arrive as server-sent events ending with [DONE].
+Run from the project root with pytest, or directly.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import urllib.error
+import urllib.request
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from benchmarks.mock_openai_server import (
+    LatencyModel, MockOpenAIServer, Recording, ReplayStore, ThrottlePolicy, request_key
+)
+
+DEPLOYMENT = "gpt-4o"
+MESSAGES = [{"role": "system", "content": "Extract patterns"}, {"role": "user", "content": "<Order/>"}]
+REQUEST = {"model": DEPLOYMENT, "messages": MESSAGES, "temperature": 0, "top_p": 0.9}
+USAGE = {"prompt_tokens": 20, "completion_tokens": 7, "total_tokens": 27}
+
+
+def post(server, body):
+    request = urllib.request.Request(
+        f"{server.url}/openai/deployments/{DEPLOYMENT}/chat/completions?api-version=2024-08-01-preview",
+        data=json.dumps(body).encode("utf-8"), headers={"Content-Type": "application/json"}, method="POST"
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, dict(response.headers), response.read().decode("utf-8")
+    except urllib.error.HTTPError as e:
+        return e.code, dict(e.headers), e.read().decode("utf-8")
+
+
+def recorded_store(directory):
+    store = ReplayStore(os.path.join(directory, "store.jsonl"))
+    store.add(Recording(request_key(DEPLOYMENT, REQUEST), DEPLOYMENT,
+                        {"role": "assistant", "content": '{"patterns": []}'}, usage=USAGE, latency_ms=1200))
+    # Reloaded from disk, as a CI run would
+    return ReplayStore(store.path)
+
+
+def test_replays_recorded_completion():
+    with tempfile.TemporaryDirectory() as directory:
+        with MockOpenAIServer(recorded_store(directory), latency=LatencyModel("recorded:0.001")) as server:
+            status, _, body = post(server, REQUEST)
+            assert status == 200
+            completion = json.loads(body)
+            assert completion["choices"][0]["message"]["content"] == '{"patterns": []}'
+            assert completion["usage"] == USAGE
+
+            status, _, body = post(server, {**REQUEST, "messages": MESSAGES[:1]})
+            assert status == 404
+            assert json.loads(body)["error"]["code"] == "RecordingNotFound"
+            assert server.stats() == {"requests": 2, "hits": 1, "misses": 1, "prompt_tokens": 20, "completion_tokens": 7}
+
+
+def test_injects_rate_limits():
+    with tempfile.TemporaryDirectory() as directory:
+        throttle = ThrottlePolicy(every=2, retry_after_ms=250)
+        with MockOpenAIServer(recorded_store(directory), throttle=throttle) as server:
+            statuses = []
+            for _ in range(4):
+                status, headers, _ = post(server, REQUEST)
+                statuses.append(status)
+                if status == 429:
+                    assert headers["retry-after-ms"] == "250"
+                    assert headers["retry-after"] == "1"
+            assert statuses == [200, 429, 200, 429]
+            assert server.stats()["throttled"] == 2
+
+
+def test_streams_recorded_completion():
+    with tempfile.TemporaryDirectory() as directory:
+        with MockOpenAIServer(recorded_store(directory)) as server:
+            status, headers, body = post(server, {**REQUEST, "stream": True, "stream_options": {"include_usage": True}})
+    assert status == 200
+    assert headers["Content-Type"] == "text/event-stream"
+    events = [line[len("data: "):] for line in body.split("\n\n") if line]
+    assert events[-1] == "[DONE]"
+    chunks = [json.loads(event) for event in events[:-1]]
+    content = "".join(chunk["choices"][0]["delta"].get("content", "") for chunk in chunks if chunk["choices"])
+    assert content == '{"patterns": []}'
+    assert chunks[-1]["usage"] == USAGE
+
+
+if __name__ == "__main__":
+    for test in (test_replays_recorded_completion, test_injects_rate_limits, test_streams_recorded_completion):
+        test()
+        print(f"✓ {test.__name__}")
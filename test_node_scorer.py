@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Tests for the automatic node selection.
+
+XMLNodeScorer must select exactly the nodes, paths and XML that the previous
+implementation of PatternManager.auto_select_nodes selected, on every sample XML file
+that parses, and skip comment children instead of failing on them.
+Run from the project root with pytest, or directly.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+from lxml import etree
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from benchmarks.auto_select_nodes_benchmark import reference_select_nodes, scale_document
+from core.xml_processing.node_scorer import XMLNodeScorer, max_depth
+
+SAMPLE_DIR = Path(__file__).parent / "core" / "config" / "test_data"
+
+
+def sample_roots():
+    for path in sorted(SAMPLE_DIR.rglob("*.xml")):
+        try:
+            yield path, etree.parse(str(path)).getroot()
+        except etree.XMLSyntaxError:
+            # Some samples are deliberately truncated or malformed
+            continue
+
+
+def test_selection_matches_previous_implementation():
+    compared = 0
+    for path, root in sample_roots():
+        assert XMLNodeScorer(root).select_nodes() == reference_select_nodes(root), path.name
+        compared += 1
+    assert compared >= 10
+
+    # More than MAX_NODES_PER_BATCH candidates, so the most useful ones are kept
+    _, root = next(sample_roots())
+    scaled = scale_document(root, 20)
+    assert XMLNodeScorer(scaled).select_nodes() == reference_select_nodes(scaled)
+
+
+def test_comments_are_skipped():
+    # Too large to select whole, so the walk goes through the comment children
+    pax = "<!-- pax --><Pax><Name>ANNA</Name><Type>ADT</Type></Pax><?pi x?>"
+    root = etree.fromstring(f"<Order>{pax * 60}</Order>")
+    selected = XMLNodeScorer(root).select_nodes()
+    assert list(selected) == [f"/Order[0]/Pax[{i}]" for i in range(15)]
+    assert max_depth(root) == 3
+
+
+if __name__ == "__main__":
+    for test in (test_selection_matches_previous_implementation, test_comments_are_skipped):
+        test()
+        print(f"✓ {test.__name__}")
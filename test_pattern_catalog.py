@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Regression tests for the workspace query indexes and the pattern_catalog table.
+
+Checks that the catalog stays identical to the five-table join it replaces as rows are
+inserted, updated and deleted, that two APIs can save patterns for the same section path
+(also after migrating a database whose schema made section names unique across APIs), and
+that the pattern lookups are answered from indexes
+(EXPLAIN QUERY PLAN) rather than table scans.
+Run from the project root with pytest, or directly.
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.database.connection_pool import remove_database_file
+from core.database.schema_migration import API_SECTION_UNIQUE, PATTERN_CATALOG_SELECT, SchemaMigration
+from core.database.sql_db_utils import PatternRecord, SQLDatabaseUtils
+
+SCHEMA_FILE = Path(__file__).parent / "core" / "database" / "data" / "API table.sql"
+
+
+def legacy_schema() -> str:
+    """The schema before section display names were scoped to their API"""
+    schema = SCHEMA_FILE.read_text()
+    legacy = schema.replace("section_display_name TEXT NOT NULL,", "section_display_name TEXT NOT NULL UNIQUE,")
+    legacy = legacy.replace(",\n    UNIQUE(api_id, section_display_name)", "")
+    assert legacy.count("UNIQUE") == schema.count("UNIQUE")
+    return legacy
+
+
+def create_workspace_database(directory: str, schema: str = None) -> SQLDatabaseUtils:
+    """A workspace database as UseCaseManager creates it, migrated to the latest schema"""
+    db_path = Path(directory) / "workspace.db"
+    conn = sqlite3.connect(str(db_path))
+    conn.executescript(schema or SCHEMA_FILE.read_text())
+    conn.close()
+    assert SchemaMigration(str(db_path)).migrate_to_latest()
+    return SQLDatabaseUtils("workspace.db", directory)
+
+
+def add_sample_patterns(db_utils: SQLDatabaseUtils):
+    for api_name, versions in (("LATAM", ["17.2", "18.1"]), ("LH", ["21.3"]), ("AFKL", [])):
+        db_utils.execute_query("INSERT INTO api (api_name) VALUES (?)", (api_name,))
+        api_id = db_utils.execute_query("SELECT api_id FROM api WHERE api_name = ?", (api_name,))[0][0]
+        for version in versions:
+            db_utils.insert_api_version(api_id, version)
+        db_utils.save_patterns(api_id, [
+            PatternRecord(f"{api_name}_{section}", f"{api_name}_{section}_pattern", f"{section} of {api_name}", "prompt")
+            for section in ("PaxList", "OrderItem", "ContactInfo")
+        ])
+
+
+def catalog_rows(db_utils: SQLDatabaseUtils):
+    return sorted(db_utils.execute_query("SELECT * FROM pattern_catalog"))
+
+
+def joined_rows(db_utils: SQLDatabaseUtils):
+    return sorted(db_utils.execute_query(PATTERN_CATALOG_SELECT))
+
+
+def query_plan(db_utils: SQLDatabaseUtils, method, *args) -> str:
+    """EXPLAIN QUERY PLAN of the query a SQLDatabaseUtils method runs"""
+    queries = []
+    run_query = db_utils.run_query
+
+    def recording_run_query(query, params=None):
+        queries.append((query, params))
+        return run_query(query, params)
+
+    db_utils.run_query = recording_run_query
+    try:
+        method(*args)
+    finally:
+        db_utils.run_query = run_query
+    query, params = queries[-1]
+    plan = db_utils.execute_query(f"EXPLAIN QUERY PLAN {query}", params)
+    return "\n".join(row[-1] for row in plan)
+
+
+def with_database(test):
+    def run():
+        with tempfile.TemporaryDirectory() as directory:
+            db_utils = create_workspace_database(directory)
+            try:
+                add_sample_patterns(db_utils)
+                test(db_utils)
+            finally:
+                remove_database_file(db_utils.db_path)
+    run.__name__ = test.__name__
+    return run
+
+
+@with_database
+def test_catalog_matches_joins(db_utils):
+    assert len(catalog_rows(db_utils)) == 9
+    assert catalog_rows(db_utils) == joined_rows(db_utils)
+
+    # Upsert of an existing pattern and a new section for it
+    api_id = db_utils.execute_query("SELECT api_id FROM api WHERE api_name = 'LH'")[0][0]
+    db_utils.save_patterns(api_id, [
+        PatternRecord("LH_PaxList", "LH_PaxList_pattern", "updated", "new prompt"),
+        PatternRecord("LH_Baggage", "LH_PaxList_pattern", "updated", "new prompt"),
+    ])
+    assert catalog_rows(db_utils) == joined_rows(db_utils)
+
+    db_utils.execute_query("UPDATE api SET api_name = 'LHG' WHERE api_name = 'LH'")
+    db_utils.execute_query("UPDATE api_section SET section_display_name = 'Pax' WHERE section_name = 'LATAM_PaxList'")
+    db_utils.execute_query("DELETE FROM section_pattern_mapping WHERE mapping_id = 2")
+    db_utils.execute_query("DELETE FROM pattern_details WHERE pattern_name = 'AFKL_OrderItem_pattern'")
+    assert catalog_rows(db_utils) == joined_rows(db_utils)
+    assert db_utils.search_in_database("Pax")
+
+
+def api_id_of(db_utils, api_name):
+    return db_utils.execute_query("SELECT api_id FROM api WHERE api_name = ?", (api_name,))[0][0]
+
+
+def check_same_section_for_two_apis(db_utils):
+    shared = "/OrderViewRS[0]/Response[1]/DataLists[0]/PaxList[4]"
+    for api_name in ("LATAM", "LH"):
+        db_utils.save_patterns(api_id_of(db_utils, api_name), [
+            PatternRecord(shared, f"{api_name}_shared_pattern", f"PaxList of {api_name}", "prompt")
+        ])
+    assert sorted(row[0] for row in db_utils.search_in_database(shared)) == ["LATAM", "LATAM", "LH"]
+    assert catalog_rows(db_utils) == joined_rows(db_utils)
+
+    # Saving again reuses the section and mapping and refreshes the pattern
+    db_utils.execute_query("UPDATE pattern_details SET updated_at = '2000-01-01 00:00:00'")
+    saved = db_utils.save_patterns(api_id_of(db_utils, "LH"), [
+        PatternRecord(shared, "LH_shared_pattern", "PaxList of LH, revised", "prompt")
+    ])
+    assert db_utils.execute_query(
+        "SELECT COUNT(*) FROM section_pattern_mapping WHERE section_id = ?", (saved[shared].section_id,)
+    ) == [(1,)]
+    assert db_utils.execute_query(
+        "SELECT pattern_description, updated_at > '2000-01-01 00:00:00' FROM pattern_details "
+        "WHERE pattern_name = 'LH_shared_pattern'"
+    ) == [("PaxList of LH, revised", 1)]
+
+
+@with_database
+def test_same_section_for_two_apis(db_utils):
+    check_same_section_for_two_apis(db_utils)
+
+
+def test_migration_scopes_section_names_to_api():
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = Path(directory) / "workspace.db"
+        conn = sqlite3.connect(str(db_path))
+        conn.executescript(legacy_schema())
+        conn.close()
+        migration = SchemaMigration(str(db_path))
+        assert migration.migrate_to_pattern_catalog()
+        db_utils = SQLDatabaseUtils("workspace.db", directory)
+        try:
+            add_sample_patterns(db_utils)
+            before = catalog_rows(db_utils)
+            assert migration.migrate_to_latest()
+            assert migration.get_current_schema_version() == 3
+            table_sql = db_utils.execute_query("SELECT sql FROM sqlite_master WHERE name = 'api_section'")[0][0]
+            assert API_SECTION_UNIQUE in table_sql and "NOT NULL UNIQUE" not in table_sql
+            # Ids, mappings and the catalog with its triggers survive the rebuild
+            assert catalog_rows(db_utils) == before == joined_rows(db_utils)
+            assert not migration.validate_schema()["errors"]
+            check_same_section_for_two_apis(db_utils)
+        finally:
+            remove_database_file(db_utils.db_path)
+
+
+@with_database
+def test_lookups_read_indexes(db_utils):
+    assert db_utils.has_pattern_catalog
+
+    plan = query_plan(db_utils, db_utils.search_in_database, "LATAM_PaxList")
+    assert "SEARCH pc USING COVERING INDEX idx_pattern_catalog_section" in plan or \
+        "SEARCH pc USING INDEX idx_pattern_catalog_section" in plan, plan
+    assert "idx_apiversion_api" in plan, plan
+    assert "SCAN pc" not in plan and "SCAN av" not in plan, plan
+
+    plan = query_plan(db_utils, db_utils.get_section_pattern, "LATAM", "LATAM_PaxList")
+    assert "USING INDEX idx_pattern_catalog_api" in plan or \
+        "USING COVERING INDEX idx_pattern_catalog_api" in plan, plan
+    assert "SCAN" not in plan, plan
+
+    plan = query_plan(db_utils, db_utils.get_all_patterns)
+    assert "SCAN av" not in plan, plan
+
+
+@with_database
+def test_joins_use_query_indexes(db_utils):
+    # Without the catalog (e.g. a database not yet migrated) the joins use the new indexes
+    db_utils._has_pattern_catalog = False
+    plan = query_plan(db_utils, db_utils.search_in_database, "LATAM_PaxList")
+    assert "idx_api_section_display_api" in plan, plan
+    assert "idx_section_pattern_mapping_section_api" in plan, plan
+    assert "idx_apiversion_api" in plan, plan
+    assert "SCAN" not in plan, plan
+
+
+if __name__ == "__main__":
+    for test in (test_catalog_matches_joins, test_same_section_for_two_apis, test_migration_scopes_section_names_to_api,
+                 test_lookups_read_indexes, test_joins_use_query_indexes):
+        test()
+        print(f"✓ {test.__name__}")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Tests for the pipeline benchmark suite.
+
+Synthetic payloads must reach the requested size while keeping the template's structure,
+the benchmark workspace must serve its patterns through get_all_patterns, and results
+must be compared with the latest earlier run of the same case and input.
+Run from the project root with pytest, or directly.
+"""
+
+import os
+import sys
+import tempfile
+
+from lxml import etree
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from benchmarks.pipeline_benchmark import (
+    BENCHMARK_VERSIONS, CASES, DEFAULT_TEMPLATE, BenchmarkContext, BenchmarkInput, compare,
+    create_workspace, previous_timings, run_suite, synthetic_document
+)
+from core.database.connection_pool import close_connection_pool
+
+
+def test_synthetic_document_reaches_target_size():
+    template = DEFAULT_TEMPLATE.read_bytes()
+    target = 2 * 1024 * 1024
+    document = synthetic_document(template, target)
+    assert abs(len(document) - target) < len(template)
+
+    root = etree.fromstring(document)
+    template_root = etree.fromstring(template)
+    assert root.tag == template_root.tag
+    pax = "{*}Response/{*}DataLists/{*}PaxList/{*}Pax"
+    assert len(root.findall(pax)) > 20 * len(template_root.findall(pax))
+
+
+def test_workspace_cases_and_history_comparison():
+    cases = [case for case in CASES if case.name in ("list_main_elements", "get_all_patterns_cold", "get_all_patterns_warm")]
+    document = BenchmarkInput("template", DEFAULT_TEMPLATE.read_bytes())
+    with tempfile.TemporaryDirectory() as directory:
+        db_utils = create_workspace(directory, DEFAULT_TEMPLATE, 200)
+        try:
+            patterns = db_utils.get_all_patterns()
+            assert len(patterns) == 200
+            assert {p.api_version for p in patterns} == set(BENCHMARK_VERSIONS)
+            context = BenchmarkContext(db_utils, [], "GPT4O")
+
+            previous_run = {"commit": "abc1234", "results": [
+                {"case": "list_main_elements", "input": "template", "min_seconds": 1e-6},
+            ]}
+            results = run_suite(cases, [document], context, 2, [previous_run], threshold=0.2)
+        finally:
+            close_connection_pool(db_utils.db_path)
+
+    assert [(r["case"], r["input"]) for r in results] == [
+        ("list_main_elements", "template"),
+        ("get_all_patterns_cold", "workspace_0_patterns"),
+        ("get_all_patterns_warm", "workspace_0_patterns"),
+    ]
+    assert all(r["min_seconds"] <= r["median_seconds"] for r in results)
+    assert results[0]["previous_commit"] == "abc1234"
+    assert results[0]["change_vs_previous"] > 0.2
+    assert "change_vs_previous" not in results[1]
+
+    result = {"min_seconds": 0.5}
+    assert compare(result, {"min_seconds": 0.2, "commit": "def5678"}, 0.2) > 1
+    assert result["regression"]
+    # Far slower relatively, but by less than the noise floor
+    result = {"min_seconds": 0.0004}
+    assert compare(result, {"min_seconds": 0.0001}, 0.2) > 1
+    assert not result["regression"]
+    latest = previous_timings([previous_run, {"commit": "fff0000", "results": [
+        {"case": "list_main_elements", "input": "template", "min_seconds": 2.0}
+    ]}])
+    assert latest[("list_main_elements", "template")]["commit"] == "fff0000"
+
+
+if __name__ == "__main__":
+    for test in (test_synthetic_document_reaches_target_size, test_workspace_cases_and_history_comparison):
+        test()
+        print(f"✓ {test.__name__}")
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Tests for the client-side rate limiting and retry scheduling of LLM calls.
+
+Token buckets must delay callers once their per-minute capacity is reserved and give
+back what a request did not use; 429s and server errors must be retried after their
+retry-after period (retry-after-ms, seconds or an HTTP date) or a jittered exponential
+backoff, and client errors returned at once as a CompletionFailure. An LLMAgent call
+against the mock OpenAI server must get through injected 429s.
+Run from the project root with pytest, or directly.
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from types import SimpleNamespace
+
+import httpx
+import openai
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from benchmarks.mock_openai_server import MockOpenAIServer, Recording, ReplayStore, ThrottlePolicy, request_key
+from core.llm.LLMAgent import LLMAgent
+from core.llm.client_registry import LLMClientRegistry, ModelConfig
+from core.llm.completion_result import (
+    CLIENT_ERROR, CONNECTION_ERROR, RATE_LIMITED, SERVER_ERROR, TIMEOUT, UNEXPECTED_ERROR
+)
+from core.llm.rate_limiter import (
+    DeploymentRateLimiter, RetryPolicy, RetryScheduler, TokenBucket, classify_error, get_rate_limiter
+)
+
+REQUEST = httpx.Request("POST", "https://example.openai.azure.com/openai/deployments/gpt-4o/chat/completions")
+
+
+def status_error(error_class, status_code, headers=None):
+    response = httpx.Response(status_code, headers=headers or {}, request=REQUEST)
+    return error_class(f"HTTP {status_code}", response=response, body=None)
+
+
+def completion(total_tokens):
+    return SimpleNamespace(usage=SimpleNamespace(total_tokens=total_tokens))
+
+
+def test_token_bucket_delays_and_refunds():
+    bucket = TokenBucket(60)  # one token per second
+    assert bucket.reserve(60) == 0
+    assert abs(bucket.reserve(2) - 2.0) < 0.05
+    assert abs(bucket.reserve(1) - 3.0) < 0.05
+
+    # Tokens given back shorten the wait of the next caller
+    bucket.refund(3)
+    assert abs(bucket.reserve(1) - 1.0) < 0.05
+    # A request larger than the bucket waits for a full bucket, not forever
+    assert abs(TokenBucket(60).reserve(500) - 0.0) < 0.05
+    assert TokenBucket(0).reserve(10 ** 6) == 0 and TokenBucket(0).unlimited
+
+    limiter = DeploymentRateLimiter(requests_per_minute=0, tokens_per_minute=600)
+    assert limiter.reserve(600) == 0
+    limiter.record_usage(estimated_tokens=600, actual_tokens=100)
+    assert limiter.reserve(500) < 0.1
+    limiter.pause(0.5)
+    assert 0.4 < limiter.reserve(0) <= 0.5
+
+
+def test_retry_after_headers():
+    info = classify_error(status_error(openai.RateLimitError, 429, {"retry-after-ms": "250", "retry-after": "1"}))
+    assert (info.error_type, info.retryable, info.status_code, info.retry_after) == (RATE_LIMITED, True, 429, 0.25)
+    assert classify_error(status_error(openai.RateLimitError, 429, {"retry-after": "3"})).retry_after == 3.0
+
+    retry_at = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    retry_after = classify_error(status_error(openai.RateLimitError, 429, {"retry-after": retry_at})).retry_after
+    assert 28 <= retry_after <= 30
+
+    past = format_datetime(datetime.now(timezone.utc) - timedelta(seconds=30), usegmt=True)
+    assert classify_error(status_error(openai.RateLimitError, 429, {"retry-after": past})).retry_after == 0
+    assert classify_error(status_error(openai.RateLimitError, 429, {"retry-after": "soon"})).retry_after is None
+    assert classify_error(status_error(openai.RateLimitError, 429)).retry_after is None
+
+
+def test_error_classification():
+    assert classify_error(status_error(openai.BadRequestError, 400)).error_type == CLIENT_ERROR
+    assert not classify_error(status_error(openai.BadRequestError, 400)).retryable
+    assert not classify_error(status_error(openai.AuthenticationError, 401)).retryable
+
+    server = classify_error(status_error(openai.InternalServerError, 503, {"retry-after": "2"}))
+    assert (server.error_type, server.retryable, server.status_code, server.retry_after) == (SERVER_ERROR, True, 503, 2.0)
+    assert classify_error(status_error(openai.APIStatusError, 408)).retryable
+    assert classify_error(openai.APITimeoutError(REQUEST)).error_type == TIMEOUT
+    assert classify_error(openai.APIConnectionError(request=REQUEST)).error_type == CONNECTION_ERROR
+    unexpected = classify_error(ValueError("bad"))
+    assert (unexpected.error_type, unexpected.retryable) == (UNEXPECTED_ERROR, False)
+
+
+def test_backoff_is_jittered():
+    random.seed(11)
+    policy = RetryPolicy(max_retries=5, base_delay=0.5, max_delay=3.0)
+    for attempt in range(1, 8):
+        delays = [policy.backoff(attempt) for _ in range(200)]
+        limit = min(3.0, 0.5 * 2 ** (attempt - 1))
+        assert all(0 <= delay <= limit for delay in delays)
+        assert max(delays) - min(delays) > limit / 2
+    # retry-after is honoured, capped by max_delay, with up to base_delay of jitter
+    assert all(2.0 <= policy.backoff(1, 2.0) <= 2.5 for _ in range(50))
+    assert all(3.0 <= policy.backoff(1, 60.0) <= 3.5 for _ in range(50))
+
+
+def test_scheduler_retries_and_gives_up():
+    limiter = DeploymentRateLimiter()
+    scheduler = RetryScheduler(limiter, RetryPolicy(max_retries=3, base_delay=0.001, max_delay=0.05))
+    outcomes = [status_error(openai.RateLimitError, 429, {"retry-after-ms": "20"}),
+                status_error(openai.InternalServerError, 500), completion(30)]
+
+    def request():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    started = time.monotonic()
+    result = scheduler.call(request, estimated_tokens=50)
+    assert result.ok and result.attempts == 3 and result.response.usage.total_tokens == 30
+    assert result.queue_wait >= 0.02 and time.monotonic() - started >= 0.02
+    # The 429 paused the deployment for every caller
+    assert limiter._paused_until > 0
+
+    calls = []
+
+    def bad_request():
+        calls.append(1)
+        raise status_error(openai.BadRequestError, 400)
+
+    failure = scheduler.call(bad_request, estimated_tokens=50)
+    assert not failure.ok and len(calls) == 1
+    assert (failure.error_type, failure.status_code, failure.retryable, failure.attempts) == (CLIENT_ERROR, 400, False, 1)
+    assert tuple(failure) == (0.0, None)
+
+    def overloaded():
+        calls.append(1)
+        raise status_error(openai.InternalServerError, 503)
+
+    calls.clear()
+    failure = scheduler.call(overloaded, estimated_tokens=50)
+    assert failure.error_type == SERVER_ERROR and failure.retryable and failure.attempts == 4 and len(calls) == 4
+
+
+def test_agent_gets_through_injected_rate_limits():
+    deployment = "rate-limit-test-deployment"
+    messages = [{"role": "user", "content": "<Order/>"}]
+    body = {"model": deployment, "messages": messages, "temperature": 0, "top_p": 0.9}
+    previous = os.environ.get("LLM_RETRY_BASE_DELAY")
+    os.environ["LLM_RETRY_BASE_DELAY"] = "0.01"
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            store = ReplayStore(os.path.join(directory, "store.jsonl"))
+            store.add(Recording(request_key(deployment, body), deployment, {"role": "assistant", "content": "{}"},
+                                usage={"prompt_tokens": 9, "completion_tokens": 1, "total_tokens": 10}))
+            throttle = ThrottlePolicy(every=2, retry_after_ms=50)
+            with MockOpenAIServer(store, throttle=throttle) as server:
+                registry = LLMClientRegistry()
+                config = ModelConfig(server.url, "mock-key", "2024-08-01-preview", deployment)
+                agent = LLMAgent([], registry.get_client(config), deployment)
+                results = [agent.get_chat_completion(messages) for _ in range(3)]
+                registry.close()
+    finally:
+        if previous is None:
+            os.environ.pop("LLM_RETRY_BASE_DELAY", None)
+        else:
+            os.environ["LLM_RETRY_BASE_DELAY"] = previous
+
+    assert all(result.ok and result.content == "{}" for result in results)
+    # Requests 2 and 4 are throttled, so the second and third calls each retry once
+    assert [result.attempts for result in results] == [1, 2, 2]
+    assert all(result.queue_wait >= 0.05 for result in results[1:])
+    assert server.stats()["throttled"] == 2 and server.stats()["hits"] == 3
+    assert get_rate_limiter(deployment)._paused_until > 0
+
+
+if __name__ == "__main__":
+    for test in (test_token_bucket_delays_and_refunds, test_retry_after_headers, test_error_classification,
+                 test_backoff_is_jittered, test_scheduler_retries_and_gives_up,
+                 test_agent_gets_through_injected_rate_limits):
+        test()
+        print(f"✓ {test.__name__}")
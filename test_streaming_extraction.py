@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Tests for streamed completions and the incremental JSON parser behind them.
+
+Elements of the selected arrays must be returned as soon as they close, however the
+response is cut into deltas (code fences, escaped quotes and brackets inside strings
+included) and whatever brackets the text before the JSON contains, and a streamed LLMAgent completion must deliver its deltas, then carry the
+full content and usage, or a failure if the stream broke off after some content.
+Run from the project root with pytest, or directly.
+"""
+
+import json
+import os
+import random
+import sys
+from types import SimpleNamespace
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.common.constants import GPT_4O
+from core.llm.LLMAgent import LLMAgent
+from core.llm.json_stream import JSONArrayStream
+
+PATTERNS = [
+    {"pattern": {"name": "Fare basis", "path": "/Order/Fare", "regex": "^[A-Z]{1,8}$"}},
+    {"pattern": {"name": 'Quoted "} ] text', "path": "/Order/Remark", "values": [[1, 2], {"a": "\\"}]}},
+]
+DOCUMENT = {
+    "reasoning_log": "Looked at [brackets] and {braces}",
+    "nested": {"patterns": [{"ignored": True}]},
+    "patterns": PATTERNS + [42],
+}
+RESPONSE = "```json\n" + json.dumps(DOCUMENT, indent=2) + "\n```"
+
+
+def chunked(text, rng):
+    position = 0
+    while position < len(text):
+        size = rng.randint(1, 15)
+        yield text[position:position + size]
+        position += size
+
+
+class FakeStream:
+    """Iterates like an openai Stream of chat completion chunks"""
+
+    def __init__(self, pieces, usage=None, error=None):
+        self.pieces = pieces
+        self.usage = usage
+        self.error = error
+        self.closed = False
+
+    def __iter__(self):
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=""))])
+        for piece in self.pieces:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+        if self.error:
+            raise self.error
+        if self.usage:
+            yield SimpleNamespace(choices=[], usage=self.usage)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeCompletions:
+    def __init__(self, stream):
+        self.stream = stream
+        self.requests = []
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        return self.stream
+
+
+def streaming_agent(stream):
+    completions = FakeCompletions(stream)
+    return LLMAgent([], SimpleNamespace(chat=SimpleNamespace(completions=completions)), GPT_4O), completions
+
+
+def test_elements_are_returned_as_they_close():
+    rng = random.Random(7)
+    for _ in range(50):
+        parser = JSONArrayStream(("patterns",), ("nested", "patterns"))
+        received = []
+        for piece in chunked(RESPONSE, rng):
+            received.extend(parser.feed(piece))
+        assert received == [(("nested", "patterns"), {"ignored": True})] + [(("patterns",), p) for p in PATTERNS]
+
+    # The first pattern is available before the second one has been written
+    parser = JSONArrayStream(("patterns",))
+    cut = RESPONSE.index('"Quoted')
+    assert parser.feed(RESPONSE[:cut]) == [(("patterns",), PATTERNS[0])]
+    assert parser.feed(RESPONSE[cut:]) == [(("patterns",), PATTERNS[1])]
+    assert parser.feed('{"patterns": [{}]}') == []
+
+
+def test_preface_with_brackets_is_skipped():
+    expected = [(("patterns",), p) for p in PATTERNS]
+    prefaces = [
+        "Here are the results [JSON]: ",
+        "Here are the results [JSON]:\n",
+        "Results (see [1] and {the notes}) as {\"patterns\"} below:\n",
+        'Format: {"patterns": [...]}. Output:\n',
+    ]
+    rng = random.Random(3)
+    for preface in prefaces:
+        for document in (json.dumps(DOCUMENT), RESPONSE):
+            parser = JSONArrayStream(("patterns",))
+            received = []
+            for piece in chunked(preface + document, rng):
+                received.extend(parser.feed(piece))
+            assert received == expected, preface
+
+    # A fenced block that is preceded by text, and one that is not
+    for response in ("Sure, the patterns [below] are:\n\n" + RESPONSE, RESPONSE):
+        parser = JSONArrayStream(("patterns",))
+        assert parser.feed(response) == expected
+        assert parser.feed('{"patterns": [{}]}') == []
+
+    # Arrays are only taken as the document when the top-level array is selected
+    parser = JSONArrayStream(())
+    assert parser.feed('Found [JSON]:\n```json\n[{"a": 1}, [2]]\n```') == [((), {"a": 1}), ((), [2])]
+
+
+def test_stream_chat_completion_delivers_content_and_usage():
+    usage = SimpleNamespace(prompt_tokens=300, completion_tokens=80, total_tokens=380)
+    agent, completions = streaming_agent(FakeStream(list(chunked(RESPONSE, random.Random(1))), usage))
+    stream = agent.stream_chat_completion([{"role": "user", "content": "<Order/>"}])
+    assert stream.ok
+    assert completions.requests[0]["stream"] is True
+
+    assert "".join(stream) == RESPONSE
+    result = stream.result
+    assert result.ok and result.content == RESPONSE
+    assert result.response.usage is usage and result.cost == agent._calculate_cost(result.response)
+    assert result.time_to_first_byte is not None
+
+
+def test_interrupted_stream_is_a_failure():
+    pieces = list(chunked(RESPONSE, random.Random(2)))[:5]
+    agent, _ = streaming_agent(FakeStream(pieces, error=ConnectionResetError("connection reset")))
+    stream = agent.stream_chat_completion([{"role": "user", "content": "<Order/>"}])
+    assert "".join(stream) == "".join(pieces)
+    assert not stream.result.ok and "connection reset" in stream.result.message
+
+    # A caller that stops reading closes the connection
+    fake = FakeStream(pieces)
+    agent, _ = streaming_agent(fake)
+    stream = agent.stream_chat_completion([{"role": "user", "content": "<Order/>"}])
+    deltas = iter(stream)
+    next(deltas)
+    deltas.close()
+    assert fake.closed and not stream.result.ok
+
+
+if __name__ == "__main__":
+    for test in (test_elements_are_returned_as_they_close, test_preface_with_brackets_is_skipped,
+                 test_stream_chat_completion_delivers_content_and_usage,
+                 test_interrupted_stream_is_a_failure):
+        test()
+        print(f"✓ {test.__name__}")
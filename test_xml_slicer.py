@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Tests for the XPath-scoped XML slicer.
+
+Stored pattern paths must resolve on local names with their indices ignored, tolerate a
+renamed or wrapped root, and resolve to nothing (so the configured fallback is sent)
+when the parent chain does not match, instead of picking a same-named element from
+another section of the message.
+Run from the project root with pytest, or directly.
+"""
+
+import os
+import sys
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.xml_processing.xml_slicer import FALLBACK_EMPTY, XMLSlicer
+
+ORDER = """<ns:OrderViewRS xmlns:ns="http://www.iata.org/IATA/2015/00/2018.2/OrderViewRS">
+  <ns:Response>
+    <ns:DataLists>
+      <ns:PaxList><ns:Pax><ns:PaxID>PAX1</ns:PaxID></ns:Pax></ns:PaxList>
+      <ns:ContactInfoList><ns:ContactInfo><ns:PaxID>PAX1</ns:PaxID></ns:ContactInfo></ns:ContactInfoList>
+    </ns:DataLists>
+    <ns:Order><ns:OrderID>ORD1</ns:OrderID></ns:Order>
+  </ns:Response>
+</ns:OrderViewRS>"""
+PAX_PATH = "/OrderViewRS[0]/Response[1]/DataLists[0]/PaxList[4]"
+
+
+def names(elements):
+    return [element.tag.split("}")[-1] for element in elements]
+
+
+def test_resolves_recorded_paths():
+    slicer = XMLSlicer(ORDER)
+    assert names(slicer.resolve(PAX_PATH)) == ["PaxList"]
+    assert names(slicer.resolve("//Pax/PaxID")) == ["PaxID"]
+    assert names(slicer.resolve("ContactInfo/PaxID")) == ["PaxID"]
+
+    xml, is_excerpt = slicer.get_xml_for_pattern(PAX_PATH + "/Pax/PaxID")
+    assert is_excerpt and "PAX1" in xml and "ContactInfo" not in xml and "ORD1" not in xml
+
+    # Relationship ends are sliced together through their common ancestor
+    xml, _ = slicer.get_xml_for_pattern("/OrderViewRS/Response/DataLists/PaxList/Pax -> /OrderViewRS/Response/DataLists/ContactInfoList")
+    assert "PaxList" in xml and "ContactInfoList" in xml and "ORD1" not in xml
+
+
+def test_renamed_or_wrapped_root():
+    renamed = ORDER.replace("ns:OrderViewRS", "ns:IATA_OrderViewRS")
+    assert names(XMLSlicer(renamed).resolve(PAX_PATH)) == ["PaxList"]
+
+    wrapped = f"<Envelope><Body>{ORDER}</Body></Envelope>"
+    assert names(XMLSlicer(wrapped).resolve(PAX_PATH)) == ["PaxList"]
+
+
+def test_unmatched_path_does_not_pick_another_section():
+    slicer = XMLSlicer(ORDER, fallback=FALLBACK_EMPTY)
+    # PaxID exists, but only below Pax and ContactInfo, not below Order
+    path = "/OrderViewRS/Response/Order/PaxID"
+    assert slicer.resolve(path) == []
+    assert not slicer.has_section(path)
+    xml, is_excerpt = slicer.get_xml_for_pattern(path)
+    assert is_excerpt and xml.startswith("<!-- No element matching")
+
+    # With the default fallback the whole document is sent
+    xml, is_excerpt = XMLSlicer(ORDER, fallback="full").get_xml_for_pattern(path)
+    assert xml == ORDER and not is_excerpt
+
+
+if __name__ == "__main__":
+    for test in (test_resolves_recorded_paths, test_renamed_or_wrapped_root,
+                 test_unmatched_path_does_not_pick_another_section):
+        test()
+        print(f"✓ {test.__name__}")
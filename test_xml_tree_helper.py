@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Tests for the element paths behind the XML tree.
+
+XMLTreeHelper and the streaming XMLNodeIndex must number paths the same way, counting
+element children only, so a path taken from the Discovery tree finds the same element
+through either of them - also in documents with comments, processing instructions and
+namespaces.
+Run from the project root with pytest, or directly.
+"""
+
+import os
+import sys
+
+from lxml import etree
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.assisted_discovery.xml_tree_helper import XMLTreeHelper
+from core.xml_processing.xml_ingest import XMLNodeIndex, split_path
+
+DOCUMENT = b"""<?xml version="1.0" encoding="UTF-8"?>
+<!-- exported by the order system -->
+<OrderViewRS xmlns="http://www.iata.org/IATA/2015/00/2018.2/OrderViewRS">
+  <!-- passengers -->
+  <PaxList>
+    <?trace id="1"?>
+    <Pax><PaxID>PAX1</PaxID><!-- adult --><PTC>ADT</PTC></Pax>
+    <!-- infant -->
+    <Pax><PaxID>PAX2</PaxID><PTC>INF</PTC></Pax>
+  </PaxList>
+  <Order><OrderID>ORD1</OrderID></Order>
+</OrderViewRS>"""
+NS = "{http://www.iata.org/IATA/2015/00/2018.2/OrderViewRS}"
+
+
+def test_paths_match_the_node_index_in_documents_with_comments():
+    root = etree.fromstring(DOCUMENT)
+    node_index = XMLNodeIndex(DOCUMENT)
+    assert XMLTreeHelper.xml_to_tree(root) == node_index.to_tree()
+
+    infant = f"/{NS}OrderViewRS[0]/{NS}PaxList[0]/{NS}Pax[1]/{NS}PTC[1]"
+    assert split_path(infant)[-1] == (f"{NS}PTC", 1)
+    elements = list(root.iter(etree.Element))
+    assert len(elements) == len(node_index.paths)
+    for element, path in zip(elements, node_index.paths):
+        assert XMLTreeHelper.find_elem_by_path(root, path) is element
+    assert XMLTreeHelper.find_elem_by_path(root, infant).text == "INF"
+
+    # A subtree keeps the path it has in the document
+    pax_list = XMLTreeHelper.find_elem_by_path(root, f"/{NS}OrderViewRS[0]/{NS}PaxList[0]")
+    subtree = XMLTreeHelper.xml_to_tree(pax_list, f"/{NS}OrderViewRS[0]/{NS}PaxList[0]")
+    assert subtree["children"][1]["children"][1]["value"] == infant
+
+
+def test_unknown_paths():
+    root = etree.fromstring(DOCUMENT)
+    assert XMLTreeHelper.find_elem_by_path(root, f"/{NS}OrderViewRS[0]/{NS}Order[2]") is None
+    assert XMLTreeHelper.find_elem_by_path(root, f"/{NS}OrderViewRS[0]/{NS}PaxList[1]") is None
+    assert XMLTreeHelper.find_elem_by_path(root, f"/{NS}OrderViewRS[0]/{NS}PaxList[5]") is None
+    assert XMLTreeHelper.find_elem_by_path(root, "not a path") is None
+    assert XMLTreeHelper.find_elem_by_path(root, "/Other[0]") is None
+
+
+if __name__ == "__main__":
+    for test in (test_paths_match_the_node_index_in_documents_with_comments, test_unknown_paths):
+        test()
+        print(f"✓ {test.__name__}")